@@ -6,9 +6,12 @@ from pyodide.http import pyfetch
 from Compiler import Compiler
 
 import asyncio
+import re
 
 # Global compiler instance
 compiler = None
+# the time from the page starting to load to the end of the first compile is logged once
+first_compile_logged = False
 
 
 async def initialize_app():
@@ -20,12 +23,17 @@ async def initialize_app():
 
     # Now create the compiler
     compiler = WebInterface(grammar_text)
-    js.compileProgram = create_proxy(compiler.compile_program_sync)
+    js.compileProgram = create_proxy(compiler.compile_program)
+    console.log(f"Compiler ready {js.performance.now() / 1000:.2f}s after the page started loading")
 
 class WebInterface(Compiler):
     def __init__(self, grammar_text):
         super().__init__(grammar_text)
         """Load grammar and example program files"""
+        # the compile that is running, a new one cancels it
+        self.task = None
+        # the characters of the parse tree added to the page at a time
+        self.tree_piece_size = 64 * 1024
         document.getElementById('grammar').value = grammar_text
         document.getElementById('program').value = "// Enter your program here"
 
@@ -35,24 +43,26 @@ class WebInterface(Compiler):
         update_textboxes()
 
 
-    def compile_program_sync(self):
-        """Synchronous compile function called from JavaScript"""
-        try:
-            if compiler is None:
-                document.getElementById('program-error').value = "Compiler not initialized yet. Please wait..."
-                return
+    def compile_program(self):
+        """Called from JavaScript, starts a compile and cancels the one still running"""
+        if compiler is None:
+            document.getElementById('program-error').value = "Compiler not initialized yet. Please wait..."
+            return
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+        self.task = asyncio.ensure_future(self.compile_program_async(document.getElementById('program').value))
 
-            # Get program text
-            program_text = document.getElementById('program').value
-            count = program_text.count('\n') + 1
+    def show_progress(self, phase: str, done: int, total: int) -> None:
+        displayMessage(f"Compiling: {phase} {done}/{total}" if total > 1 else f"Compiling: {phase}", "")
 
+    async def compile_program_async(self, program_text: str):
+        """Compiles without blocking the page, the results are shown as they are ready"""
+        try:
             # Run compiler
-            (tree, assembly, binary, error, execution_time,
-             binary_to_assembly_mappings, code_mappings) = self._main(program_text)
+            tree, assembly, binary, error, execution_time, source_map, profile = await self.compile(
+                program_text, self.show_progress)
 
             # Update UI with results
-            parse_tree = document.getElementById('parse-tree')
-            parse_tree.insertAdjacentHTML('beforeend', tree)
             document.getElementById('assembly').value = assembly
             document.getElementById('binary').value = binary
             document.getElementById('program-error').value = error
@@ -60,7 +70,7 @@ class WebInterface(Compiler):
             compile_button = document.getElementById('run-program')
 
             if error == '':
-                document.getElementById('program-error').value = "No errors - compilation successful!"
+                document.getElementById('program-error').value = f"No errors - compilation successful!\n\n{profile}"
                 displayMessage(f"Compilation completed in {execution_time}s", "success")
                 compile_button.disabled = False
             else:
@@ -69,6 +79,16 @@ class WebInterface(Compiler):
 
             update_textboxes()
 
+            global first_compile_logged
+            if not first_compile_logged:
+                first_compile_logged = True
+                console.log(f"First compile done {js.performance.now() / 1000:.2f}s after the page started loading, "
+                            f"the compile took {execution_time:.3f}s")
+
+            await self.show_tree(tree)
+
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             import traceback
             displayMessage(f"Compilation error: {str(traceback.print_exc())}")
@@ -76,5 +96,43 @@ class WebInterface(Compiler):
             update_textboxes()
             document.getElementById('run-program').disabled = True
 
+    async def show_tree(self, tree: str):
+        """Replaces the parse tree a few functions at a time, the page is drawn between them"""
+        parse_tree = document.getElementById('parse-tree')
+        parse_tree.innerHTML = ""
+        if not tree:
+            return
+        head, tail, pieces = tree_pieces(tree, self.tree_piece_size)
+        parse_tree.insertAdjacentHTML('beforeend', head + tail)
+        root = parse_tree.lastElementChild
+        for piece in pieces:
+            root.insertAdjacentHTML('beforeend', piece)
+            await asyncio.sleep(0)
+
+
+def tree_pieces(tree: str, size: int) -> tuple[str, str, list[str]]:
+    """
+    Splits the html of the parse tree into its root element without the children and the children,
+    joined into pieces of about size characters, a piece only holds whole children
+    """
+    head_end = tree.index("</summary>") + len("</summary>")
+    tail = "</details>"
+    head, inner = tree[:head_end], tree[head_end:len(tree) - len(tail)]
+    pieces = []
+    depth = 0
+    piece_start = 0
+    for tag in re.finditer(r"<details open>|</details>|</div>", inner):
+        if tag.group() == "<details open>":
+            depth += 1
+            continue
+        if tag.group() == "</details>":
+            depth -= 1
+        if depth == 0 and tag.end() - piece_start >= size:
+            pieces.append(inner[piece_start:tag.end()])
+            piece_start = tag.end()
+    if piece_start < len(inner):
+        pieces.append(inner[piece_start:])
+    return head, tail, pieces
+
 # Load files on startup
 asyncio.ensure_future(initialize_app())
\ No newline at end of file
@@ -0,0 +1,209 @@
+import random
+import re
+
+
+class FuzzGenerator:
+    """
+    Writes random programs that follow grammar.txt for the differential fuzzer
+    Every statement is on its own line, a block opens at the end of a line and closes at the start of one,
+    so a program can be shrunk by taking out lines
+    Every variable is set before it is used and every loop counts a counter the rest of the program does
+    not write, so every program finishes. The program ends by drawing its variables on the bottom two rows,
+    which compares them through the framebuffer
+    """
+    # what a program can use, the default leaves out what does not compile right yet
+    features = ("if", "loops", "logic", "video", "calls", "VIDEO")
+    default_features = ("if", "loops", "logic", "video", "calls")
+    operators = ("+", "-", "*", "/", "%", "&", "|", "^", "<<", ">>")
+    compares = ("==", "!=", ">=", "<=", ">", "<")
+    # the deepest the statements and expressions nest
+    max_depth = 3
+    max_expression = 3
+
+    def __init__(self, features: tuple[str, ...] = default_features, statements: int = 12, variables: int = 5):
+        unknown = set(features) - set(self.features)
+        if unknown:
+            raise ValueError(f"Unknown fuzz features: {', '.join(sorted(unknown))}, pick from {', '.join(self.features)}")
+        self.use: set[str] = set(features)
+        self.statements: int = statements
+        self.names: list[str] = [f"v{index}" for index in range(variables)]
+        self.random: random.Random = random.Random()
+        # the functions main can call, name and number of parameters
+        self.callable: list[tuple[str, int]] = []
+
+    def generate(self, seed: int) -> str:
+        self.random = random.Random(seed)
+        self.callable = []
+        lines: list[str] = []
+        if "calls" in self.use:
+            for index in range(self.random.randint(1, 3)):
+                lines += self.function(f"f{index}")
+        lines.append("def main() {")
+        lines += [f"    {name} = {self.number()};" for name in self.names]
+        lines += self.block(self.statements, 1, self.names)
+        lines += self.draw_variables()
+        lines.append("}")
+        return "\n".join(lines) + "\n"
+
+    def function(self, name: str) -> list[str]:
+        """
+        a function of main's statements, it can call the functions before it so it never recurses,
+        it returns one value as every call has to take the same number of values
+        """
+        parameters = [f"p{index}" for index in range(self.random.randint(0, 3))]
+        local = parameters + ["t0"]
+        lines = [f"def {name}({', '.join(parameters)}) {{", f"    t0 = {self.number()};"]
+        lines += self.block(self.random.randint(1, 4), 1, local)
+        lines += [f"    return {self.expression(local, 2)};", "}"]
+        self.callable.append((name, len(parameters)))
+        return lines
+
+    def number(self) -> str:
+        """
+        a number the compiler takes, from -40 to 32767, the values past it come from wrapping around
+        """
+        choice = self.random.random()
+        if choice < 0.6:
+            return str(self.random.randint(0, 40))
+        if choice < 0.8:
+            return str(self.random.choice([127, 128, 255, 256, 4095, 16384, 32767]))
+        if choice < 0.9:
+            return hex(self.random.randint(0, 0x7FFF))
+        return f"-{self.random.randint(1, 40)}"
+
+    def expression(self, names: list[str], depth: int = max_expression) -> str:
+        return self._expression(names, depth)[0]
+
+    def _expression(self, names: list[str], depth: int) -> tuple[str, bool]:
+        """
+        returns the expression and if it is a number
+        The compiler folds an operator on two numbers without wrapping it to 16 bits and fails on what it cannot
+        fold, so an operator never gets two numbers and a number is never negated, an expression is only a number
+        when it is one. An expression that ends in a number next to the operator is in brackets,
+        otherwise the precedence of the grammar could regroup that number with the other side.
+        A shift by a number shifts by 0 to 15 and a division by a number does not divide by 0
+        """
+        choice = self.random.random()
+        if depth == 0 or choice < 0.3:
+            if self.random.random() < 0.4:
+                return self.number(), True
+            return self.random.choice(names), False
+        if choice < 0.38:
+            operand, number = self._expression(names, depth - 1)
+            return f"{self.random.choice(['-', '~'])}({self.random.choice(names) if number else operand})", False
+        if choice < 0.45 and "calls" in self.use and self.callable:
+            return self.call(names, depth), False
+        operator = self.random.choice(self.operators)
+        left, left_number = self._expression(names, depth - 1)
+        right, right_number = self._expression(names, depth - 1)
+        if left_number and right_number:
+            right, right_number = self.random.choice(names), False
+        if right_number and operator in ("<<", ">>"):
+            right = str(self.random.randint(0, 15))
+        elif right_number and operator in ("/", "%") and int(right, 0) == 0:
+            right = str(self.random.randint(1, 40))
+        if not left_number and self._is_number(left.split()[-1]):
+            left = f"({left})"
+        if not right_number and self._is_number(right.split()[0]):
+            right = f"({right})"
+        expression = f"{left} {operator} {right}"
+        return (f"({expression})" if self.random.random() < 0.5 else expression), False
+
+    @staticmethod
+    def _is_number(token: str) -> bool:
+        return re.fullmatch(r"-?(0x[0-9a-f]+|[0-9]+)", token) is not None
+
+    def call(self, names: list[str], depth: int = 1) -> str:
+        name, parameters = self.random.choice(self.callable)
+        return f"{name}({', '.join(self.expression(names, depth - 1) for _ in range(parameters))})"
+
+    def condition(self, names: list[str], depth: int = 2) -> str:
+        choice = self.random.random()
+        if depth > 0 and "logic" in self.use and choice < 0.3:
+            logic = self.random.choice(["&&", "||", "and", "or"])
+            condition = f"{self.condition(names, depth - 1)} {logic} {self.condition(names, depth - 1)}"
+            return f"({condition})" if self.random.random() < 0.5 else condition
+        # a number as the condition or on the left of a comparison fails the compile, see the issues in the README
+        left, number = self._expression(names, 2)
+        if number:
+            left = self.random.choice(names)
+        if choice < 0.4:
+            return left
+        return f"{left} {self.random.choice(self.compares)} {self.expression(names, 2)}"
+
+    def block(self, count: int, depth: int, names: list[str]) -> list[str]:
+        lines: list[str] = []
+        for _ in range(count):
+            lines += self.statement(depth, names)
+        return lines
+
+    def statement(self, depth: int, names: list[str]) -> list[str]:
+        indent = "    " * depth
+        # the variables the statement may write, the loop counters are read only
+        targets = [name for name in names if not name.startswith("l")]
+        choice = self.random.random()
+        if depth <= self.max_depth and choice < 0.25:
+            kinds = ([] if "if" not in self.use else ["if"]) + ([] if "loops" not in self.use else
+                                                             ["for", "while", "do"])
+            if kinds:
+                return self.compound(self.random.choice(kinds), depth, names)
+        if choice < 0.35 and "video" in self.use:
+            x, y = self.expression(names, 1), self.expression(names, 1)
+            if "VIDEO" in self.use and self.random.random() < 0.3:
+                colors = ", ".join(self.expression(names, 1) for _ in range(3))
+                return [f"{indent}VIDEO({colors}, {x}, {y});"]
+            color = self.random.choice(["VID_RED", "VID_GREEN", "VID_BLUE"])
+            return [f"{indent}VID_X({x}); VID_Y({y}); {color}({self.expression(names, 2)}); VID();"]
+        if choice < 0.45 and "calls" in self.use and self.callable and len(targets) >= 2:
+            first, second = self.random.sample(targets, 2)
+            return [f"{indent}{first}, {second} = {self.call(names)}, {self.expression(names, 1)};"]
+        if choice < 0.55 and len(targets) >= 2:
+            first, second = self.random.sample(targets, 2)
+            return [f"{indent}{first}, {second} = {self.expression(names, 2)}, {self.expression(names, 2)};"]
+        if choice < 0.65:
+            target = self.random.choice(targets)
+            return [f"{indent}{target}{self.random.choice(['++', '--'])};"]
+        if choice < 0.75:
+            operator = self.random.choice(["+=", "-=", "*=", "/="])
+            value, number = self._expression(names, 2)
+            if number and operator == "/=" and int(value, 0) == 0:
+                value = str(self.random.randint(1, 40))
+            return [f"{indent}{self.random.choice(targets)} {operator} {value};"]
+        return [f"{indent}{self.random.choice(targets)} = {self.expression(names)};"]
+
+    def compound(self, kind: str, depth: int, names: list[str]) -> list[str]:
+        """
+        an if, for, while or do while with its blocks, a loop runs at most 4 times
+        """
+        indent = "    " * depth
+        body = self.random.randint(1, 3)
+        if kind == "if":
+            lines = [f"{indent}if ({self.condition(names)}) {{"] + self.block(body, depth + 1, names)
+            for _ in range(self.random.choice([0, 0, 1, 2])):
+                lines += [f"{indent}}}", f"{indent}elif ({self.condition(names)}) {{"]
+                lines += self.block(self.random.randint(1, 3), depth + 1, names)
+            if self.random.random() < 0.5:
+                lines += [f"{indent}}}", f"{indent}else {{"] + self.block(self.random.randint(1, 3), depth + 1, names)
+            return lines + [f"{indent}}}"]
+
+        counter = f"l{depth}"
+        inner = names + [counter]
+        limit = self.random.randint(0, 4)
+        if kind == "for":
+            return ([f"{indent}for ({counter} = 0; {counter} < {limit}; {counter}++) {{"]
+                    + self.block(body, depth + 1, inner) + [f"{indent}}}"])
+        if kind == "while":
+            return ([f"{indent}{counter} = 0;", f"{indent}while ({counter} < {limit}) {{"]
+                    + self.block(body, depth + 1, inner) + [f"{indent}    {counter}++;", f"{indent}}}"])
+        return ([f"{indent}{counter} = 0;", f"{indent}do {{"] + self.block(body, depth + 1, inner)
+                + [f"{indent}    {counter}++;", f"{indent}}} while ({counter} < {limit});"])
+
+    def draw_variables(self) -> list[str]:
+        """
+        draws every variable as two pixels, the low 15 bits as the color of one and the sign as the red of the other
+        """
+        lines: list[str] = []
+        for index, name in enumerate(self.names):
+            lines.append(f"    VID_X({index}); VID_Y(30); VID_RED({name}); VID_GREEN({name} >> 5); "
+                         f"VID_BLUE({name} >> 10); VID(); VID_Y(31); VID_RED({name} >> 15); VID();")
+        return lines
@@ -0,0 +1,108 @@
+class ProgramGenerator:
+    """
+    Writes synthetic programs that grow along one axis, each with about the asked number of lines
+    Lark transforms the parse tree recursively, so the nesting depth, the conditions
+    and the expressions are capped and repeated instead of growing without end
+    """
+    # the deepest a generated program nests anything
+    max_depth = 32
+    # the most terms in one condition or expression
+    max_terms = 128
+
+    def __init__(self):
+        self.axes = {
+            "functions": self.functions,
+            "straight_line": self.straight_line,
+            "nested_if": self.nested_if,
+            "logic_chain": self.logic_chain,
+            "big_expression": self.big_expression,
+            "many_locals": self.many_locals,
+        }
+
+    def generate(self, axis: str, lines: int) -> str:
+        if axis not in self.axes:
+            raise ValueError(f"Unknown benchmark axis: {axis}, pick from {', '.join(self.axes)}")
+        return self.axes[axis](lines)
+
+    @staticmethod
+    def _main(body: list[str]) -> str:
+        return "def main()\n{\n" + "\n".join(body) + "\n}\n"
+
+    def functions(self, lines: int) -> str:
+        """
+        many small functions, each called once from main, 6 lines each
+        """
+        count = max(1, lines // 6)
+        body = ["  a = 1;"] + [f"  a = f{index}(a);" for index in range(count)] + ["  VID_RED(a);"]
+        functions = [f"def f{index}(x){{\n    y = x + {index % 7};\n    return y;\n}}\n" for index in range(count)]
+        return self._main(body) + "\n".join(functions)
+
+    def straight_line(self, lines: int) -> str:
+        """
+        one long basic block of assignments over a few variables
+        """
+        names = "abcdefgh"
+        body = [f"  {name} = {index};" for index, name in enumerate(names)]
+        for index in range(max(1, lines - len(names))):
+            target, first, second = names[index % 8], names[(index + 3) % 8], names[(index + 5) % 8]
+            body.append(f"  {target} = {first} + {second} * {index % 13} - {index % 5};")
+        return self._main(body)
+
+    def nested_if(self, lines: int) -> str:
+        """
+        if, elif and else chains nested max_depth deep and repeated, 3 lines for each level
+        """
+        body = ["  a = 0;", "  b = 1;"]
+        while len(body) < lines:
+            depth = min(self.max_depth, max(1, (lines - len(body)) // 3))
+            for level in range(depth):
+                body.append(f"  if (a > {level}) {{ b = b + 1;")
+                body.append(f"  }} elif (a == {level}) {{ b = b - 1;")
+                body.append("  } else { a = a + 1;")
+            body.extend("  }" for _ in range(depth))
+        return self._main(body)
+
+    def logic_chain(self, lines: int) -> str:
+        """
+        conditions of && and || up to max_terms long, 4 comparisons to a line
+        """
+        body = ["  a = 1;", "  b = 2;", "  c = 0;"]
+        count = len(body)
+        while count < lines:
+            terms = min(self.max_terms, max(2, (lines - count) * 4))
+            compares = [f"{'ab'[index % 2]} {'<>'[index % 2]} {index}" for index in range(terms)]
+            joined = [" && ".join(compares[start:start + 2]) for start in range(0, terms, 2)]
+            condition = "\n    || ".join(joined)
+            body.append(f"  if ({condition}) {{\n    c = c + 1;\n  }}")
+            count += condition.count("\n") + 3
+        return self._main(body)
+
+    def big_expression(self, lines: int) -> str:
+        """
+        expressions of up to max_terms terms over a few variables, 8 terms to a line
+        """
+        operators = ["+", "-", "*", "&", "|", "^", "+", "-"]
+        body = ["  a = 3;", "  b = 5;", "  c = 7;"]
+        count = len(body)
+        while count < lines:
+            terms = min(self.max_terms, max(2, (lines - count) * 8))
+            expression = "abc"[count % 3]
+            for index in range(1, terms):
+                term = "abc"[index % 3] if index % 2 else str(index % 17)
+                expression += f" {operators[index % len(operators)]} {term}"
+                if index % 8 == 0:
+                    expression += "\n   "
+            body.append(f"  {'abc'[count % 3]} = {expression};")
+            count += expression.count("\n") + 1
+        return self._main(body)
+
+    def many_locals(self, lines: int) -> str:
+        """
+        every line gives a new local variable a value, half of the variables stay alive until the end
+        """
+        count = max(2, lines)
+        body = ["  v0 = 1;"]
+        for index in range(1, count):
+            body.append(f"  v{index} = v{index - 1} + v{index // 2};")
+        body.append(f"  VID_RED(v{count - 1});")
+        return self._main(body)
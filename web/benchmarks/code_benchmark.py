@@ -0,0 +1,172 @@
+"""Generated code benchmark for the compiler.
+
+Compiles a corpus of programs and records how good the code is:
+the words of the binary, counted with Command.num_instruct,
+the words of ram the stack frames take and the clock cycles the program runs in the BlockEmulator.
+The results are compared against a saved baseline, a program whose code got bigger or slower
+than the threshold is reported as a regression, and so is a program that draws a different
+last frame. Unlike the compile times these numbers do not depend on the machine.
+
+With --pgo every program is compiled again with the profile of its first run,
+and the cycles of both compiles are printed.
+
+usage from web/benchmarks:
+    python code_benchmark.py --output results.json
+    python code_benchmark.py --save-baseline
+    python code_benchmark.py --pgo
+"""
+import argparse
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARK_DIR.parent / "python"))
+
+from Compiler import Compiler
+from ExecutionProfile import ExecutionProfile, ProfilingEmulator
+from RunProfile import RunProfile
+from BlockEmulator import BlockEmulator
+
+BASELINE = BENCHMARK_DIR / "baseline_code.json"
+# the examples that are part of the corpus, the rest of it is in programs
+EXAMPLES = ("gradient", "raster_fill")
+
+
+class CodeBenchmark:
+    # the measurements that are compared against the baseline
+    metrics = ("words", "frame", "cycles")
+
+    def __init__(self, max_steps: int = 200_000, pgo: bool = False):
+        self.compiler = Compiler((BENCHMARK_DIR.parent / "python" / "grammar.txt").read_text())
+        self.max_steps: int = max_steps
+        # compile every program again with the profile of its run
+        self.pgo: bool = pgo
+
+    @staticmethod
+    def corpus() -> dict[str, Path]:
+        """
+        returns the name and file of every program in the corpus
+        """
+        programs = {name: BENCHMARK_DIR.parent / "examples" / f"{name}.txt" for name in EXAMPLES}
+        programs.update((path.stem, path) for path in sorted((BENCHMARK_DIR / "programs").glob("*.txt")))
+        return programs
+
+    def run(self, names: list[str]) -> dict:
+        """
+        returns the results of every program
+        """
+        corpus = self.corpus()
+        results: dict = {"max_steps": self.max_steps, "programs": dict()}
+        for name in names:
+            if name not in corpus:
+                raise ValueError(f"Unknown benchmark program: {name}, pick from {', '.join(corpus)}")
+            result = self.measure(corpus[name].read_text())
+            results["programs"][name] = result
+            pgo = f"{result['pgo_cycles']:>12} with profile" if "pgo_cycles" in result else ""
+            print(f"{name:<18}{result['words']:>8} words{result['frame']:>6} frame{result['cycles']:>12} cycles{pgo}"
+                  f"{'' if result['halted'] else ' (did not halt)'}{' ' + result['error'] if result['error'] else ''}")
+        return results
+
+    def measure(self, program: str) -> dict:
+        """
+        compiles the program and runs it until it halts or runs max_steps commands
+        """
+        result: dict = {"error": "", "words": 0, "frame": 0, "cycles": 0, "steps": 0, "stack": 0, "halted": False,
+                        "image": ""}
+        *_, binary, error, _, source_map, profile = self.compiler._main(program)
+        if error:
+            result["error"] = error.strip().splitlines()[-1]
+            return result
+
+        emulator = ProfilingEmulator(binary) if self.pgo else BlockEmulator(binary)
+        result["halted"] = emulator.run(self.max_steps)
+        result.update(words=profile.counts.get("words", 0), frame=profile.counts.get("frame", 0),
+                      cycles=emulator.cycles, steps=emulator.steps, stack=emulator.stack_peak,
+                      image=hashlib.sha256(emulator.framebuffer.raw()).hexdigest()[:16])
+        if self.pgo:
+            result["pgo_cycles"] = self.measure_pgo(program, emulator, source_map)
+        return result
+
+    def measure_pgo(self, program: str, emulator: ProfilingEmulator, source_map) -> int:
+        """
+        compiles the program with the profile of the emulator and returns the cycles it runs in
+        the program has to draw the same frame as without the profile
+        """
+        self.compiler.run_profile = RunProfile.loads(ExecutionProfile(emulator, source_map, "", program).dumps())
+        try:
+            *_, binary, error, _, _, _ = self.compiler._main(program)
+        finally:
+            self.compiler.run_profile = None
+        if error:
+            raise ValueError(f"The compile with the profile failed: {error.strip().splitlines()[-1]}")
+        optimized = BlockEmulator(binary)
+        optimized.run(self.max_steps)
+        if optimized.framebuffer != emulator.framebuffer:
+            raise ValueError("The compile with the profile draws another frame")
+        return optimized.cycles
+
+    @classmethod
+    def regressions(cls, results: dict, baseline: dict, threshold: float) -> list[str]:
+        """
+        returns a line for every program whose code is bigger or slower than the baseline allows,
+        the cycles of a program that did not halt only count how far it got and are not compared
+        a program that is meant to fail has to fail with the same error
+        """
+        found: list[str] = []
+        for name, result in results["programs"].items():
+            old = baseline.get("programs", dict()).get(name)
+            if old is None:
+                continue
+            if result["error"] != old["error"]:
+                found.append(f"{name}: fails with {result['error']}" if result["error"] else
+                             f"{name}: compiles but the baseline failed with {old['error']}")
+                continue
+            if result["error"]:
+                continue
+            if old["halted"] and not result["halted"]:
+                found.append(f"{name}: no longer halts in {results['max_steps']} steps")
+                continue
+            if old["halted"] and old.get("image", result["image"]) != result["image"]:
+                found.append(f"{name}: draws a different frame, save it with Framebuffer.py to compare")
+            for metric in cls.metrics:
+                if metric == "cycles" and not (old["halted"] and result["halted"]):
+                    continue
+                if result[metric] > old[metric] * (1 + threshold):
+                    found.append(f"{name} {metric}: {old[metric]} -> {result[metric]}")
+        return found
+
+
+def main() -> int:
+    arguments = argparse.ArgumentParser(description="Benchmarks the size and speed of the compiled corpus")
+    arguments.add_argument("--programs", default=",".join(CodeBenchmark.corpus()),
+                           help="programs to benchmark, comma separated")
+    arguments.add_argument("--max-steps", type=int, default=200_000, help="commands a program may run")
+    arguments.add_argument("--output", help="write the results as json to this file")
+    arguments.add_argument("--baseline", default=str(BASELINE), help="results to compare against")
+    arguments.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    arguments.add_argument("--threshold", type=float, default=0.0, help="allowed growth before a regression")
+    arguments.add_argument("--pgo", action="store_true", help="also compile with the profile of the first run")
+    options = arguments.parse_args()
+
+    benchmark = CodeBenchmark(options.max_steps, options.pgo)
+    results = benchmark.run(options.programs.split(","))
+
+    if options.output:
+        Path(options.output).write_text(json.dumps(results, indent=2))
+    if options.save_baseline:
+        Path(options.baseline).write_text(json.dumps(results, indent=2))
+        return 0
+
+    if not Path(options.baseline).exists():
+        print(f"No baseline at {options.baseline}, run with --save-baseline to make one")
+        return 0
+    found = benchmark.regressions(results, json.loads(Path(options.baseline).read_text()), options.threshold)
+    for line in found:
+        print(f"\033[31mregression: {line}\033[0m")
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
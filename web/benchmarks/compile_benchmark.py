@@ -0,0 +1,153 @@
+"""Compile speed benchmark for the compiler.
+
+Compiles the programs of ProgramGenerator at several sizes and records the time and
+tracemalloc peak of every compile phase, along with the counts from CompileProfile.
+The results are written as json and compared against a saved baseline,
+a phase that got slower or bigger than the threshold is reported as a regression.
+The baseline is only meaningful on the machine that recorded it.
+
+usage from web/benchmarks:
+    python compile_benchmark.py --output results.json
+    python compile_benchmark.py --sizes 100000 --axes functions
+    python compile_benchmark.py --save-baseline
+    python compile_benchmark.py --no-tree --output no_tree.json
+
+--no-tree measures the compile that runs the Parser while Lark parses, its parse phase holds the
+transform as well, so it is only compared against a baseline recorded with --no-tree.
+"""
+import argparse
+import json
+import platform
+import sys
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARK_DIR.parent / "python"))
+
+import lark
+
+from Compiler import Compiler
+from ProgramGenerator import ProgramGenerator
+
+BASELINE = BENCHMARK_DIR / "baseline_compile.json"
+
+
+class CompileBenchmark:
+    def __init__(self, repeat: int = 3, trace_memory: bool = True, build_tree: bool = True):
+        self.compiler = Compiler((BENCHMARK_DIR.parent / "python" / "grammar.txt").read_text())
+        self.compiler.build_tree = build_tree
+        self.generator = ProgramGenerator()
+        self.repeat: int = repeat
+        self.trace_memory: bool = trace_memory
+
+    def run(self, axes: list[str], sizes: list[int]) -> dict:
+        """
+        returns the results of every axis at every size
+        """
+        results: dict = {"python": platform.python_version(), "lark": lark.__version__,
+                         "tree": self.compiler.build_tree, "axes": dict()}
+        for axis in axes:
+            results["axes"][axis] = dict()
+            for size in sizes:
+                result = self.measure(self.generator.generate(axis, size))
+                results["axes"][axis][str(size)] = result
+                print(f"{axis:<16}{size:>8} lines {result['total_time'] * 1000:>12.1f} ms"
+                      f"{' ' + result['error'] if result['error'] else ''}", flush=True)
+        return results
+
+    def measure(self, program: str) -> dict:
+        """
+        compiles the program repeat times and keeps the fastest time of every phase,
+        the memory is traced in one more compile so the tracing does not slow down the timed ones
+        """
+        result: dict = {"lines": program.count("\n"), "error": "", "phases": dict(), "counts": dict()}
+        self.compiler.trace_memory = False
+        for _ in range(self.repeat):
+            *_, error, _, _, profile = self.compiler._main(program)
+            if error:
+                result["error"] = error.strip().splitlines()[-1]
+                break
+            result["counts"] = profile.counts
+            for name, entry in profile.phases.items():
+                phase = result["phases"].setdefault(name, {"time": entry["time"], "peak": 0})
+                phase["time"] = min(phase["time"], entry["time"])
+
+        if self.trace_memory and not result["error"]:
+            self.compiler.trace_memory = True
+            profile = self.compiler._main(program)[-1]
+            self.compiler.trace_memory = False
+            for name, entry in profile.phases.items():
+                result["phases"][name]["peak"] = entry["peak"]
+
+        result["total_time"] = sum(phase["time"] for phase in result["phases"].values())
+        return result
+
+    @staticmethod
+    def regressions(results: dict, baseline: dict, threshold: float, min_time: float) -> list[str]:
+        """
+        returns a line for every phase that is slower or uses more memory than the baseline allows,
+        times shorter than min_time seconds are too noisy to compare
+        """
+        found: list[str] = []
+        for axis, sizes in results["axes"].items():
+            for size, result in sizes.items():
+                old = baseline.get("axes", dict()).get(axis, dict()).get(size)
+                if old is None:
+                    continue
+                if result["error"] and not old["error"]:
+                    found.append(f"{axis} {size}: fails with {result['error']}")
+                    continue
+                for name, phase in result["phases"].items():
+                    old_phase = old["phases"].get(name)
+                    if old_phase is None:
+                        continue
+                    if phase["time"] > max(old_phase["time"], min_time) * (1 + threshold):
+                        found.append(f"{axis} {size} {name}: {old_phase['time'] * 1000:.1f} ms -> "
+                                     f"{phase['time'] * 1000:.1f} ms")
+                    if old_phase["peak"] and phase["peak"] > old_phase["peak"] * (1 + threshold):
+                        found.append(f"{axis} {size} {name}: peak {old_phase['peak'] / 1024:.1f} KiB -> "
+                                     f"{phase['peak'] / 1024:.1f} KiB")
+        return found
+
+
+def main() -> int:
+    generator = ProgramGenerator()
+    arguments = argparse.ArgumentParser(description="Benchmarks the compile time and memory of generated programs")
+    arguments.add_argument("--sizes", default="1000,10000", help="lines of the programs, comma separated")
+    arguments.add_argument("--axes", default=",".join(generator.axes), help="programs to generate, comma separated")
+    arguments.add_argument("--repeat", type=int, default=3, help="compiles of every program, the fastest is kept")
+    arguments.add_argument("--no-memory", action="store_true", help="skip the compile that traces memory")
+    arguments.add_argument("--output", help="write the results as json to this file")
+    arguments.add_argument("--baseline", default=str(BASELINE), help="results to compare against")
+    arguments.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    arguments.add_argument("--threshold", type=float, default=0.25, help="allowed growth before a regression")
+    arguments.add_argument("--no-tree", action="store_true", help="compile without building the parse tree")
+    arguments.add_argument("--min-time", type=float, default=0.005, help="seconds below which times are not compared")
+    options = arguments.parse_args()
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    benchmark = CompileBenchmark(options.repeat, not options.no_memory, not options.no_tree)
+    results = benchmark.run(options.axes.split(","), [int(size) for size in options.sizes.split(",")])
+
+    if options.output:
+        Path(options.output).write_text(json.dumps(results, indent=2))
+    if options.save_baseline:
+        Path(options.baseline).write_text(json.dumps(results, indent=2))
+        return 0
+
+    if not Path(options.baseline).exists():
+        print(f"No baseline at {options.baseline}, run with --save-baseline to make one")
+        return 0
+    baseline = json.loads(Path(options.baseline).read_text())
+    if baseline.get("tree", True) != results["tree"]:
+        print(f"The baseline at {options.baseline} was recorded {'without' if results['tree'] else 'with'} "
+              f"the parse tree, it is not compared")
+        return 0
+    found = benchmark.regressions(results, baseline, options.threshold, options.min_time)
+    for line in found:
+        print(f"\033[31mregression: {line}\033[0m")
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+"""Differential fuzzer for the compiler.
+
+Generates random programs with FuzzGenerator, runs every one in the Interpreter, which evaluates the parse
+tree straight, and compiles it and runs the binary in the BlockEmulator. The two have to end with the same
+framebuffer, and every program ends by drawing its variables, so that compares the variables as well.
+A program fails when its framebuffer differs, it does not compile, the emulator cannot run it
+or it does not halt while the interpreter finished it. Programs the interpreter cannot finish are skipped.
+
+Every failing program is shrunk by taking out lines and blocks and taking the bodies out of blocks
+for as long as it fails the same way, and both versions are written to the output directory.
+A shrunk program never reads a variable before the line that sets it, so it stays a program the generator
+could have written.
+The programs run in a pool of processes, one per core by default.
+
+usage from web/benchmarks:
+    python differential_fuzz.py --cases 5000
+    python differential_fuzz.py --seed 1000 --cases 200 --features if,loops,logic,video,calls
+    python differential_fuzz.py --check fuzz_failures/seed_17.min.txt
+"""
+import argparse
+import contextlib
+import io
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARK_DIR.parent / "python"))
+
+from BlockEmulator import BlockEmulator
+from Compiler import Compiler
+from FuzzGenerator import FuzzGenerator
+from Interpreter import Interpreter
+
+GRAMMAR = (BENCHMARK_DIR.parent / "python" / "grammar.txt").read_text()
+
+# the compiler and interpreter of the process, made once by _start_worker
+_worker: "DifferentialFuzzer | None" = None
+
+
+class DifferentialFuzzer:
+    # statements the interpreter runs before a program is skipped, and commands the emulator may run,
+    # generated programs are far below both
+    max_interpreter_steps = 20_000
+    max_emulator_steps = 2_000_000
+
+    def __init__(self, features: tuple[str, ...] = FuzzGenerator.default_features):
+        self.compiler = Compiler(GRAMMAR)
+        self.compiler.build_tree = False
+        self.interpreter = Interpreter(GRAMMAR)
+        self.generator = FuzzGenerator(features)
+
+    def check(self, program: str) -> tuple[str, str]:
+        """
+        returns the kind of failure and what happened, no kind if the compiled program did what the interpreter did,
+        "skip" if the interpreter cannot run the program
+        """
+        try:
+            if not self.interpreter.run(program, self.max_interpreter_steps):
+                return "skip", "the interpreter did not finish"
+        except Exception as error:
+            return "skip", f"the interpreter failed: {error}"
+
+        # the compiler prints the traceback of a failed compile
+        errors = io.StringIO()
+        with contextlib.redirect_stderr(errors):
+            *_, binary, error, _, _, _ = self.compiler._main(program)
+        if error:
+            return "compile", errors.getvalue().strip().splitlines()[-1] if errors.getvalue().strip() else error
+
+        emulator = BlockEmulator(binary)
+        try:
+            halted = emulator.run(self.max_emulator_steps)
+        except Exception as error:
+            return "emulator", f"{type(error).__name__}: {error}"
+        if not halted:
+            return "halt", f"did not halt in {self.max_emulator_steps} commands"
+
+        expected, found = self.interpreter.framebuffer, emulator.framebuffer
+        if expected != found:
+            size = expected.size
+            differences = [f"({x}, {y}) {expected.pixel(x, y)} != {found.pixel(x, y)}"
+                           for y in range(size) for x in range(size) if expected.pixel(x, y) != found.pixel(x, y)]
+            return "mismatch", f"{len(differences)} pixels differ: {', '.join(differences[:4])}"
+        return "", ""
+
+    def shrink(self, program: str, failure: tuple[str, str]) -> str:
+        """
+        returns the smallest program found that still fails the same way, by taking out a block or a line,
+        or the first and last line of a block, until none of them can be taken out
+        """
+        lines = program.splitlines()
+        shrunk = True
+        while shrunk:
+            shrunk = False
+            for start, end in reversed(self._blocks(lines)):
+                candidates = [lines[:start] + lines[end + 1:]]
+                if end > start:
+                    candidates.append(lines[:start] + lines[start + 1:end] + lines[end + 1:])
+                for candidate in candidates:
+                    if self._reads_unset(candidate):
+                        continue
+                    if self._same_failure(self.check("\n".join(candidate) + "\n"), failure):
+                        lines = candidate
+                        shrunk = True
+                        break
+                if shrunk:
+                    break
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def failure_name(kind: str, detail: str) -> str:
+        """
+        a failed compile or emulator run is named by its error, other failures by their kind
+        """
+        return f"{kind}: {detail}" if kind in ("compile", "emulator") else kind
+
+    @classmethod
+    def _same_failure(cls, found: tuple[str, str], failure: tuple[str, str]) -> bool:
+        return cls.failure_name(*found) == cls.failure_name(*failure)
+
+    # words that are not variables, names followed by ( are functions
+    _keywords = frozenset(("def", "if", "elif", "else", "for", "while", "do", "return", "and", "or"))
+    _names = re.compile(r"\b([A-Za-z_]\w*)\b(?!\s*\()")
+    _assign = re.compile(r"^\s*(\w+(?:\s*,\s*\w+)*)\s*=(?!=)(.*)$")
+
+    @classmethod
+    def _reads_unset(cls, lines: list[str]) -> bool:
+        """
+        returns if a variable is read before any line above it sets it, a function starts with its parameters set
+        taking out a line that sets a variable can leave a program that reads it, which fails for another reason
+        """
+        assigned: set[str] = set()
+        for line in lines:
+            if line.strip().lower().startswith("def "):
+                assigned = set(cls._names.findall(line.split("(", 1)[1]))
+                continue
+            # the parts of a for header are in the order they run, the first one sets the counter
+            for part in line.split(";"):
+                match = cls._assign.match(part.strip("{} \t").removeprefix("for").strip(" ("))
+                targets, read = (match.group(1), match.group(2)) if match else ("", part)
+                if any(name not in assigned for name in cls._names.findall(read)
+                       if name.lower() not in cls._keywords):
+                    return True
+                assigned.update(name.strip() for name in targets.split(",") if name.strip())
+        return False
+
+    @staticmethod
+    def _blocks(lines: list[str]) -> list[tuple[int, int]]:
+        """
+        returns the first and last line of every statement, a line that opens a block ends with { and one that
+        closes it starts with }
+        """
+        blocks: list[tuple[int, int]] = []
+        opened: list[int] = []
+        for index, line in enumerate(lines):
+            text = line.strip()
+            if text.startswith("}") and opened:
+                blocks.append((opened.pop(), index))
+            if text.endswith("{"):
+                opened.append(index)
+            elif not text.startswith("}") and text:
+                blocks.append((index, index))
+        return sorted(blocks)
+
+
+def _start_worker(features: tuple[str, ...]) -> None:
+    global _worker
+    _worker = DifferentialFuzzer(features)
+
+
+def _run_case(seed: int) -> tuple[int, str, str, str]:
+    program = _worker.generator.generate(seed)
+    kind, detail = _worker.check(program)
+    return seed, kind, detail, program
+
+
+def _shrink_case(case: tuple[int, str, str, str]) -> tuple[int, str]:
+    seed, kind, detail, program = case
+    return seed, _worker.shrink(program, (kind, detail))
+
+
+def main() -> int:
+    arguments = argparse.ArgumentParser(description="Compares compiled programs against the interpreter")
+    arguments.add_argument("--cases", type=int, default=1000, help="programs to generate")
+    arguments.add_argument("--seed", type=int, default=0, help="seed of the first program")
+    arguments.add_argument("--features", default=",".join(FuzzGenerator.default_features),
+                           help=f"what the programs use, comma separated from {', '.join(FuzzGenerator.features)}")
+    arguments.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="processes to run the programs in")
+    arguments.add_argument("--shrink", type=int, default=5, help="failing programs to shrink, the first of every kind")
+    arguments.add_argument("--output", default=str(BENCHMARK_DIR / "fuzz_failures"),
+                           help="directory to write the failing programs to")
+    arguments.add_argument("--check", help="check this program instead of generating any")
+    options = arguments.parse_args()
+    features = tuple(feature for feature in options.features.split(",") if feature)
+
+    if options.check:
+        kind, detail = DifferentialFuzzer(features).check(Path(options.check).read_text())
+        print(f"{kind}: {detail}" if kind else "The compiled program does what the interpreter does")
+        return 1 if kind and kind != "skip" else 0
+
+    start = time.perf_counter()
+    failures: list[tuple[int, str, str, str]] = []
+    skipped = 0
+    with ProcessPoolExecutor(options.jobs, initializer=_start_worker, initargs=(features,)) as pool:
+        seeds = range(options.seed, options.seed + options.cases)
+        for seed, kind, detail, program in pool.map(_run_case, seeds, chunksize=16):
+            if kind == "skip":
+                skipped += 1
+            elif kind:
+                failures.append((seed, kind, detail, program))
+                print(f"seed {seed}: {kind}, {detail}")
+        elapsed = time.perf_counter() - start
+        print(f"{options.cases} programs in {elapsed:.1f}s, {options.cases / elapsed * 60:.0f} a minute, "
+              f"{len(failures)} failed, {skipped} skipped")
+        if not failures:
+            return 0
+
+        # the same bug tends to fail many programs, so the first program of every failure is shrunk first
+        groups: dict[str, list] = dict()
+        for failure in failures:
+            groups.setdefault(DifferentialFuzzer.failure_name(failure[1], failure[2]), []).append(failure)
+        for name, group in sorted(groups.items(), key=lambda item: -len(item[1])):
+            print(f"{len(group):6} {name}")
+        ordered = [group[index] for index in range(len(failures)) for group in groups.values() if index < len(group)]
+        output = Path(options.output)
+        output.mkdir(parents=True, exist_ok=True)
+        for seed, kind, detail, program in failures:
+            (output / f"seed_{seed}.txt").write_text(f"// {kind}: {detail}\n{program}")
+        for seed, program in pool.map(_shrink_case, ordered[:options.shrink]):
+            (output / f"seed_{seed}.min.txt").write_text(program)
+            print(f"seed {seed} shrunk to {len(program.splitlines())} lines: {output / f'seed_{seed}.min.txt'}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
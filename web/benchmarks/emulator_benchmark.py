@@ -0,0 +1,92 @@
+"""Emulator speed benchmark.
+
+Compiles the programs of the code benchmark and runs each of them in the Emulator,
+which decodes and dispatches one command at a time, and in the BlockEmulator,
+which translates every basic block into a python function once.
+Prints the millions of commands a second of both, with the translation counted in,
+and checks that both end in the same state. The numbers depend on the machine so there is no baseline.
+
+usage from web/benchmarks:
+    python emulator_benchmark.py --max-steps 1000000
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARK_DIR.parent / "python"))
+
+from BlockEmulator import BlockEmulator
+from code_benchmark import CodeBenchmark
+from Compiler import Compiler
+from Emulator import Emulator
+
+
+class EmulatorBenchmark:
+    emulators = {"step": Emulator, "block": BlockEmulator}
+
+    def __init__(self, max_steps: int = 1_000_000, repeat: int = 3):
+        self.compiler = Compiler((BENCHMARK_DIR.parent / "python" / "grammar.txt").read_text())
+        self.max_steps: int = max_steps
+        self.repeat: int = repeat
+
+    def run(self, names: list[str]) -> dict:
+        """
+        returns the results of every program
+        """
+        corpus = CodeBenchmark.corpus()
+        results: dict = {"max_steps": self.max_steps, "programs": dict()}
+        for name in names:
+            if name not in corpus:
+                raise ValueError(f"Unknown benchmark program: {name}, pick from {', '.join(corpus)}")
+            *_, binary, error, _, _, _ = self.compiler._main(corpus[name].read_text())
+            if error:
+                print(f"{name:<18}{error.strip().splitlines()[-1]}")
+                continue
+            result = self.measure(binary)
+            results["programs"][name] = result
+            print(f"{name:<18}{result['steps']:>10} commands{result['step']:>8.2f} MIPS step"
+                  f"{result['block']:>8.2f} MIPS block{result['block'] / result['step']:>7.1f}x")
+        return results
+
+    def measure(self, binary: str) -> dict:
+        """
+        runs the binary in both emulators, the best of repeat runs from a new emulator
+        """
+        result: dict = dict()
+        states = []
+        for name, emulator_class in self.emulators.items():
+            best = float("inf")
+            for _ in range(self.repeat):
+                emulator = emulator_class(binary)
+                start = time.perf_counter()
+                emulator.run(self.max_steps)
+                best = min(best, time.perf_counter() - start)
+            result[name] = emulator.steps / best / 1e6
+            result["steps"] = emulator.steps
+            states.append((emulator.pc, emulator.steps, emulator.cycles, emulator.registers, emulator.ram,
+                           emulator.framebuffer))
+        if states[0] != states[1]:
+            raise ValueError("The emulators ended in different states")
+        return result
+
+
+def main() -> int:
+    arguments = argparse.ArgumentParser(description="Benchmarks the emulators in millions of commands a second")
+    arguments.add_argument("--programs", default=",".join(CodeBenchmark.corpus()),
+                           help="programs to run, comma separated")
+    arguments.add_argument("--max-steps", type=int, default=1_000_000, help="commands a program may run")
+    arguments.add_argument("--repeat", type=int, default=3, help="runs of every program, the best one counts")
+    arguments.add_argument("--output", help="write the results as json to this file")
+    options = arguments.parse_args()
+
+    results = EmulatorBenchmark(options.max_steps, options.repeat).run(options.programs.split(","))
+    if options.output:
+        Path(options.output).write_text(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+import argparse
+from pathlib import Path
+
+from Command import Command, CommandLabel
+from JumpManager import jump_manager
+from Type import Operand, RamVar, RegVar, register_names
+
+
+class Assembler:
+    """
+    Turns assembly in the syntax of program.asm into a binary, so hand written code can be run
+    A command is its operand and its arguments split by commas: MOV, R0, [bp + 2]
+    The operand can be written plainly, MOV, and the form is picked like the compiler does,
+    or as a form such as MOV_L, which then has to match the arguments
+    A label is a line ending in a colon: .L3:
+    Comments start with a semicolon, the --- Inner Start --- lines of the compiler are skipped
+    Like a compile this resets jump_manager, which holds the labels
+    """
+
+    def __init__(self, assembly: str):
+        self.assembly: str = assembly
+        self.commands: list[Command] = []
+
+    def parse(self) -> list[Command]:
+        """
+        returns the commands of the assembly with their forms picked and their labels placed
+        """
+        jump_manager.reset()
+        commands: list[Command] = []
+        defined: dict[str, int] = dict()  # key: label, value: line
+        used: dict[str, int] = dict()  # key: label, value: first line it is used on
+        for line_num, line in enumerate(self.assembly.splitlines(), 1):
+            text = line.split(";", 1)[0].strip()
+            if not text or text.startswith("---"):
+                continue
+
+            if text.endswith(":"):
+                label = self.parse_label(text[:-1].strip(), line_num)
+                if label in defined:
+                    raise ValueError(f"Line {line_num}: the label {label} is already on line {defined[label]}")
+                defined[label] = line_num
+                commands.append(CommandLabel(jump_manager.get_function(label[1:]), line_num=line_num))
+                continue
+
+            parts = [part.strip() for part in text.split(",")]
+            op = self.parse_operand(parts[0], line_num)
+            arguments = parts[1:]
+            if op.check_jump():
+                if len(arguments) != 1:
+                    raise ValueError(f"Line {line_num}: {op.name} takes a label")
+                label = self.parse_label(arguments[0], line_num)
+                used.setdefault(label, line_num)
+                commands.append(Command(op, None, None, jump_manager.get_function(label[1:]), line_num=line_num))
+                continue
+
+            values = [self.parse_argument(argument, line_num) for argument in arguments]
+            commands.append(self.pick_form(op, values, line_num))
+
+        for label, line_num in used.items():
+            if label not in defined:
+                raise ValueError(f"Line {line_num}: the label {label} is not defined")
+
+        # place the labels like the labels phase of the compiler does
+        index = 0
+        for cmd in commands:
+            if cmd.operand == Operand.LABEL:
+                jump_manager.set_pos(cmd.jump_label, index)
+            else:
+                index += cmd.num_instruct()
+        if index > 0x10000:
+            raise ValueError(f"The program is {index} words, more than the 65,536 words of the instruction memory")
+
+        self.commands = commands
+        return commands
+
+    @staticmethod
+    def parse_label(text: str, line_num: int) -> str:
+        if len(text) < 2 or not text.startswith(".") or not text[1:].replace("_", "").isalnum():
+            raise ValueError(f"Line {line_num}: labels start with a dot and are a name or a number: {text}")
+        return text
+
+    @staticmethod
+    def parse_operand(text: str, line_num: int) -> Operand:
+        op = Operand.__members__.get(text.upper())
+        if op is None or op.value > Operand.RTRN.value:
+            raise ValueError(f"Line {line_num}: unknown operand {text}")
+        return op
+
+    @staticmethod
+    def parse_argument(text: str, line_num: int) -> int | RegVar | RamVar:
+        """
+        reads a register R0-R15, bp or sp, a ram variable [bp + 2] or a number, 5, -5 or 0x1F
+        """
+        lowered = text.lower()
+        if lowered in register_names:
+            return RegVar(register_names[lowered])
+
+        if lowered.startswith("[") and lowered.endswith("]"):
+            inside = lowered[1:-1].replace(" ", "")
+            if inside == "bp":
+                return RamVar(0)
+            if inside.startswith(("bp+", "bp-")) and inside[3:].isdigit():
+                offset = int(inside[3:])
+                return RamVar(offset if inside[2] == "+" else -offset)
+            raise ValueError(f"Line {line_num}: ram variables are written [bp], [bp + n] or [bp - n]: {text}")
+
+        hexadecimal = lowered.lstrip("-").startswith("0x")
+        try:
+            number = int(lowered, 16 if hexadecimal else 10)
+        except ValueError:
+            raise ValueError(f"Line {line_num}: expected a register, a ram variable or a number: {text}") from None
+        if hexadecimal and 0x8000 <= number <= 0xFFFF:
+            number -= 0x10000
+        if not -32768 <= number <= 32767:
+            raise ValueError(f"Line {line_num}: {text} does not fit in 16 bits")
+        return number
+
+    @staticmethod
+    def pick_form(op: Operand, values: list, line_num: int) -> Command:
+        """
+        picks the form of the operand from its arguments, MOV, R1, 3 -> MOV_I
+        """
+        base = op.base()
+        count = op.argument_count()
+        if len(values) != count:
+            raise ValueError(f"Line {line_num}: {base.name} takes {count} arguments, not {len(values)}")
+        cmd = Command(base, *values, line_num=line_num)
+        if count:
+            form = base.correct_op(*values) if count == 2 else base.correct_op(values[0], None)
+            if form is None:
+                raise ValueError(f"Line {line_num}: {base.name} cannot take {', '.join(map(str, values))}")
+            if op != base and op != form:
+                raise ValueError(f"Line {line_num}: {op.name} does not match its arguments, it is {form.name}")
+            cmd.operand = form
+        return cmd
+
+    def binary(self) -> str:
+        """
+        returns the hex words like program.bin
+        """
+        if not self.commands:
+            self.parse()
+        return "".join(cmd.get_binary() for cmd in self.commands)
+
+    def raw(self) -> bytes:
+        """
+        returns the words as big endian bytes, two bytes a word
+        """
+        return bytes.fromhex(self.binary())
+
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="Assembles and links assembly files into one binary")
+    arguments.add_argument("assembly", nargs="+", help="assembly files, they share their labels")
+    arguments.add_argument("--output", default="../../program.bin", help="hex file to write")
+    arguments.add_argument("--raw", metavar="FILE", help="also write the words as raw big endian bytes to FILE")
+    options = arguments.parse_args()
+
+    assembler = Assembler("\n".join(Path(path).read_text() for path in options.assembly))
+    Path(options.output).write_text(assembler.binary())
+    if options.raw:
+        Path(options.raw).write_bytes(assembler.raw())
+    print(f"Assembled {len(assembler.binary()) // 4} words to {options.output}")
@@ -0,0 +1,280 @@
+import argparse
+from pathlib import Path
+from typing import Callable
+
+from Emulator import Emulator, _ARITH_FORMS, _ONE_FORMS, _signed
+from Type import Operand, base_pointer, stack_pointer
+
+_BP = base_pointer().val
+_SP = stack_pointer().val
+
+# the python of the arithmetic commands, D and S are the unsigned destination and source,
+# d and s the signed ones, the result is masked to 16 bits after
+_ARITH_CODE: dict[Operand, str] = {
+    Operand.MOV: "S",
+    Operand.ADD: "(D + S) & 0xFFFF",
+    Operand.SUB: "(D - S) & 0xFFFF",
+    Operand.MULT: "(D * S) & 0xFFFF",
+    Operand.DIV: "(int(d / s) if s else 0) & 0xFFFF",
+    Operand.QUOT: "(d - int(d / s) * s if s else 0) & 0xFFFF",
+    Operand.AND: "D & S",
+    Operand.OR: "D | S",
+    Operand.XOR: "D ^ S",
+    Operand.SHL: "(D << (S & 0xF)) & 0xFFFF",
+    Operand.SHR: "(d >> (S & 0xF)) & 0xFFFF",
+    Operand.NEG: "-S & 0xFFFF",
+    Operand.NOT: "~S & 0xFFFF",
+}
+
+# the condition of every jump on the flags of the emulator and on the last compare of the block
+_CONDITIONS: dict[Operand, tuple[str, str]] = {
+    Operand.JEQ: ("emulator.equal", "cd == cs"),
+    Operand.JNE: ("not emulator.equal", "cd != cs"),
+    Operand.JG: ("emulator.greater", "cd > cs"),
+    Operand.JLE: ("emulator.less or emulator.equal", "cd <= cs"),
+    Operand.JL: ("emulator.less", "cd < cs"),
+    Operand.JGE: ("emulator.greater or emulator.equal", "cd >= cs"),
+}
+
+
+def _to_signed(expression: str) -> str:
+    """
+    the signed value of an unsigned 16 bit expression
+    """
+    return f"(({expression} ^ 0x8000) - 0x8000)"
+
+
+class BlockEmulator(Emulator):
+    """
+    Runs a binary like Emulator, a basic block at a time instead of a command at a time
+    Blocks start at the jump and call targets and after every jump, CALL, RTRN and HALT
+    The first time a block runs it is translated into a python function with the operands of its commands
+    decoded into constants, then the function is kept for the next time
+    The steps, cycles, flags, stack peak and pixels are the same as Emulator's after every run,
+    a block that would go past max_steps is run one command at a time by step
+    The program is not in the ram, so nothing can change a block once it is translated
+    """
+
+    def __init__(self, binary: str):
+        super().__init__(binary)
+        # key: address of the block, value: function, commands and cycles, no function if step has to run it
+        self.blocks: dict[int, tuple[Callable | None, int, int]] = dict()
+        self.leaders: set[int] = self._find_leaders()
+
+    def _word(self, address: int) -> int:
+        return self.program[address] if address < len(self.program) else 0
+
+    @staticmethod
+    def _operand(word: int) -> Operand | None:
+        """
+        returns the operand of the first word of a command, None if it is not one the emulator can run
+        """
+        try:
+            op = Operand(word >> 8)
+        except ValueError:
+            return None
+        return op if op.value <= Operand.RTRN.value else None
+
+    def _find_leaders(self) -> set[int]:
+        """
+        returns the address of every block, walking the program a command at a time
+        """
+        leaders = {0}
+        address = 0
+        while address < len(self.program):
+            op = self._operand(self.program[address])
+            if op is None:
+                address += 1
+                continue
+            after = address + op.cost()[0]
+            if op.check_jump() or op == Operand.CALL:
+                leaders.add(self._word(address + 1))
+                leaders.add(after)
+            elif op in (Operand.RTRN, Operand.HALT):
+                leaders.add(after)
+            address = after
+        return leaders
+
+    def run(self, max_steps: int = 1_000_000) -> bool:
+        """
+        runs until HALT or until max_steps commands ran, returns if the program halted
+        """
+        blocks = self.blocks
+        registers = self.registers
+        ram = self.ram
+        while not self.halted and self.steps < max_steps:
+            if self.pc >= len(self.program):
+                # past the end of the program every word is a NOP
+                skipped = max_steps - self.steps
+                self.pc += skipped
+                self.steps += skipped
+                self.cycles += skipped * Operand.NOP.cost()[1]
+                break
+            block = blocks.get(self.pc)
+            if block is None:
+                block = blocks[self.pc] = self.translate(self.pc)
+            function, commands, cycles = block
+            if function is None or self.steps + commands > max_steps:
+                self.step()
+                continue
+            self.pc = function(self, registers, ram)
+            self.steps += commands
+            self.cycles += cycles
+        return self.halted
+
+    def translate(self, start: int) -> tuple[Callable | None, int, int]:
+        """
+        translates the block at start into a function that runs it and returns the address to go to after
+        """
+        lines, commands, cycles = self.block_source(start)
+        if not commands:
+            return None, 0, 0
+        source = "def block(emulator, R, M):\n" + "".join(f"    {line}\n" for line in lines)
+        namespace: dict = dict()
+        exec(compile(source, f"<block {start:04X}>", "exec"), namespace)
+        return namespace["block"], commands, cycles
+
+    def block_source(self, start: int) -> tuple[list[str], int, int]:
+        """
+        returns the lines of python of the block at start, the commands in it and their cycles
+        the block ends before the next leader, after a command that leaves it,
+        or before a command that only step can run
+        """
+        lines: list[str] = []
+        commands = cycles = 0
+        address = start
+        # if the flags come from a compare in this block, the jump can test its values instead
+        compared = False
+        while address < len(self.program):
+            op = self._operand(self.program[address])
+            if op is None:
+                break
+            word = self.program[address]
+            first, second = (word >> 4) & 0xF, word & 0xF
+            words, cost = op.cost()
+            after = address + words
+            commands += 1
+            cycles += cost
+
+            if op == Operand.HALT:
+                lines += ["emulator.halted = True", f"return {after}"]
+                return lines, commands, cycles
+            if op == Operand.VID:
+                lines.append("emulator._draw()")
+            elif Operand.PUSH.value <= op.value <= Operand.VIDY_RR.value:
+                lines += self._one_operand_source(op, first, address)
+            elif Operand.MOV.value <= op.value <= Operand.NOT_RR.value:
+                lines += self._arithmetic_source(op, first, second, address)
+                if op.base() == Operand.CMP:
+                    compared = True
+            elif op == Operand.JMP:
+                lines.append(f"return {self._word(address + 1)}")
+                return lines, commands, cycles
+            elif op == Operand.CALL:
+                lines += self._push_source(str(after))
+                lines.append(f"return {self._word(address + 1)}")
+                return lines, commands, cycles
+            elif op.check_jump():
+                condition = _CONDITIONS[op][1 if compared else 0]
+                lines.append(f"return {self._word(address + 1)} if {condition} else {after}")
+                return lines, commands, cycles
+            elif op == Operand.RTRN:
+                lines += [f"R[{_SP}] = (R[{_SP}] - 1) & 0xFFFF", f"return M[R[{_SP}]]"]
+                return lines, commands, cycles
+
+            address = after
+            if address in self.leaders:
+                break
+
+        lines.append(f"return {address}")
+        return lines, commands, cycles
+
+    @staticmethod
+    def _ram_address(offset: int) -> str:
+        offset = _signed(offset)
+        return f"R[{_BP}]" if offset == 0 else f"(R[{_BP}] + {offset}) & 0xFFFF"
+
+    def _push_source(self, value: str) -> list[str]:
+        return [f"M[R[{_SP}]] = {value}",
+                f"R[{_SP}] = (R[{_SP}] + 1) & 0xFFFF",
+                f"if R[{_SP}] > emulator.stack_peak: emulator.stack_peak = R[{_SP}]"]
+
+    def _one_operand_source(self, op: Operand, register: int, address: int) -> list[str]:
+        base = Operand(op.value - (op.value - Operand.PUSH.value) % 3)
+        form = _ONE_FORMS[(op.value - Operand.PUSH.value) % 3]
+        lines: list[str] = []
+        match form:
+            case "imm":
+                value = str(self._word(address + 1))
+            case "reg":
+                value = f"R[{register}]"
+            case _:
+                lines.append(f"a = {self._ram_address(self._word(address + 1))}")
+                value = "M[a]"
+
+        match base:
+            case Operand.PUSH:
+                lines += self._push_source(value)
+            case Operand.POP:
+                lines.append(f"R[{_SP}] = (R[{_SP}] - 1) & 0xFFFF")
+                if form == "reg":
+                    lines.append(f"R[{register}] = M[R[{_SP}]]")
+                elif form == "ram":
+                    lines.append(f"M[a] = M[R[{_SP}]]")
+            case Operand.VID_RED | Operand.VID_GREEN | Operand.VID_BLUE:
+                lines.append(f"emulator.color[{(base.value - Operand.VID_RED.value) // 3}] = {value} % {self.color_size}")
+            case Operand.VID_X:
+                lines.append(f"emulator.x = {value} % {self.canvas_size}")
+            case Operand.VID_Y:
+                lines.append(f"emulator.y = {value} % {self.canvas_size}")
+        return lines
+
+    def _arithmetic_source(self, op: Operand, first: int, second: int, address: int) -> list[str]:
+        base = op.base()
+        dest_form, source_form = _ARITH_FORMS[(op.value - Operand.MOV.value) % 6]
+        lines: list[str] = []
+        after = address + 1
+        if dest_form == "ram":
+            lines.append(f"a = {self._ram_address(self._word(after))}")
+            after += 1
+            dest = "M[a]"
+        else:
+            dest = f"R[{first}]"
+        match source_form:
+            case "reg":
+                source = f"R[{second}]"
+                signed_source = _to_signed(source)
+            case "imm":
+                source = str(self._word(after))
+                signed_source = str(_signed(self._word(after)))
+            case _:
+                lines.append(f"S = M[{self._ram_address(self._word(after))}]")
+                source = "S"
+                signed_source = _to_signed(source)
+
+        if base == Operand.CMP:
+            lines += [f"cd = {_to_signed(dest)}", f"cs = {signed_source}",
+                      "emulator.greater = cd > cs", "emulator.equal = cd == cs", "emulator.less = cd < cs"]
+            return lines
+
+        code = _ARITH_CODE[base]
+        if "d" in code.replace("int", ""):
+            lines.append(f"d = {_to_signed(dest)}")
+        if "s" in code:
+            lines.append(f"s = {signed_source}")
+        lines.append(f"{dest} = {code.replace('D', dest).replace('S', source)}")
+        if dest_form == "reg" and first == _SP:
+            lines.append(f"if R[{_SP}] > emulator.stack_peak: emulator.stack_peak = R[{_SP}]")
+        return lines
+
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="Runs a binary such as program.bin a basic block at a time")
+    arguments.add_argument("binary", nargs="?", default="../../program.bin", help="hex file to run")
+    arguments.add_argument("--max-steps", type=int, default=10_000_000, help="commands the program may run")
+    options = arguments.parse_args()
+
+    emulator = BlockEmulator(Path(options.binary).read_text().strip())
+    halted = emulator.run(options.max_steps)
+    print(f"{'Halted' if halted else 'Stopped'} after {emulator.steps} commands and {emulator.cycles} cycles "
+          f"in {len(emulator.blocks)} blocks, {emulator.framebuffer.draws} pixels drawn")
@@ -3,7 +3,13 @@ from functools import partial
 from Type import Operand, RegVar, RamVar
 from JumpManager import jump_manager
 
+# num_instruct runs for every command, reading Operand.LABEL each time is slow
+_label = Operand.LABEL
+
 class Command:
+    # a program near the 65,536 word limit has tens of thousands of commands, slots keep each one small
+    __slots__ = ("operand", "destination", "source", "jump_label", "call_label", "line_num")
+
     def __init__(self, op, dest=None, source=None, jump_label= None, line_num:int= -1):
         """
         Forms of a command:
@@ -57,18 +63,24 @@ class Command:
         self.operand = self.operand.correct_op(self.destination, self.source)
 
     def num_instruct(self) -> int:
-        if self.operand == Operand.LABEL:
+        if self.operand is _label:
             return 0
+        if isinstance(self.jump_label, int):
+            return 2
         inst = 1
-        if isinstance(self.destination, RamVar) | isinstance(self.destination, int):
+        if isinstance(self.destination, (RamVar, int)):
             inst += 1
-        if isinstance(self.source, RamVar) | isinstance(self.source, int):
+        if isinstance(self.source, (RamVar, int)):
             inst += 1
-        if isinstance(self.jump_label, int):
-            inst = 2
-
         return inst
 
+    def cost(self) -> tuple[int, int]:
+        """
+        returns the words and clock cycles of the command in the form compute_op would pick
+        only for commands that compute_op has not been called on yet
+        """
+        return (self.operand.correct_op(self.destination, self.source) or self.operand).cost()
+
     def get_binary(self) -> str:
         """
         returns a binary string from the operand, destination, and destination and jump label
@@ -78,6 +90,7 @@ class Command:
         the source goes in the lower 4 bits if it is a register: ex 000A
         the destination goes in the lower 4 bits if it is a register: ex 00A0
         if either destination or source is a ram variable or immediate then it gets a whole 16 bits
+        negative ram offsets and immediates are written in two's complement: [bp - 2] -> FFFE
         """
         if self.operand == Operand.LABEL:
             return ""
@@ -97,7 +110,7 @@ class Command:
         binary_str2: int = 0
         if isinstance(self.destination, RamVar):
             part2_used = True
-            binary_str2 = self.destination.val
+            binary_str2 = self.format_signed_16bit_hex(self.destination.val)
         elif isinstance(self.destination, int):
             part2_used = True
             binary_str2 = self.format_signed_16bit_hex(self.destination)
@@ -109,7 +122,7 @@ class Command:
         binary_str3: int = 0
         if isinstance(self.source, RamVar):
             part3_used = True
-            binary_str3 = self.source.val
+            binary_str3 = self.format_signed_16bit_hex(self.source.val)
         elif isinstance(self.source, int):
             part3_used = True
             binary_str3 = self.format_signed_16bit_hex(self.source)
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import tempfile
+import zlib
+from pathlib import Path
+
+# the hash of the compiler sources, worked out on the first compile
+_compiler_version: str | None = None
+
+
+def compiler_version() -> str:
+    """
+    returns a hash of the python files of the compiler and the cycle table, any change to them is a new version
+    """
+    global _compiler_version
+    if _compiler_version is None:
+        digest = hashlib.sha256()
+        directory = Path(__file__).resolve().parent
+        for path in sorted(directory.glob("*.py")) + [directory / "cycles.json"]:
+            digest.update(path.name.encode())
+            digest.update(path.read_bytes())
+        _compiler_version = digest.hexdigest()
+    return _compiler_version
+
+
+class CompileCache:
+    """
+    Keeps the results of compiles on disk so a program that did not change is not compiled again
+    An entry is found by the hash of the grammar, the program, the compiler version and the options,
+    it holds the assembly, the binary, the source map, the parse tree and the counts of the profile
+    Entries are written to a temporary file and renamed into place, so compiles running at the same time
+    only ever read whole entries
+    The modified time of an entry is its last use, when the entries take more than max_bytes
+    the least recently used ones are removed
+    """
+    default_directory = Path.home() / ".cache" / "16bitcomputer"
+
+    def __init__(self, directory: str | Path | None = None, max_bytes: int = 64 * 1024 * 1024):
+        if directory is None:
+            directory = os.environ.get("COMPILE_CACHE_DIR", self.default_directory)
+        self.directory: Path = Path(directory)
+        self.max_bytes: int = max_bytes
+        self.hits: int = 0
+        self.misses: int = 0
+
+    @staticmethod
+    def key(grammar: str, program: str, options: dict) -> str:
+        digest = hashlib.sha256()
+        for part in (grammar, program, compiler_version(), json.dumps(options, sort_keys=True)):
+            data = part.encode()
+            # the length keeps the parts apart, so moving text from one part to the next changes the key
+            digest.update(len(data).to_bytes(8, "little"))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json.z"
+
+    def get(self, key: str) -> dict | None:
+        """
+        returns the entry of the key, None if it is not cached
+        """
+        path = self._path(key)
+        try:
+            entry = json.loads(zlib.decompress(path.read_bytes()))
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, zlib.error, ValueError):
+            # a broken entry is compiled again and written over
+            self.misses += 1
+            path.unlink(missing_ok=True)
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # removed by another compile since it was read
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, entry: dict) -> None:
+        """
+        writes the entry and removes the least recently used entries past max_bytes
+        """
+        data = zlib.compress(json.dumps(entry).encode())
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+        self.evict()
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        """
+        returns the last use, size and path of every entry
+        """
+        entries: list[tuple[float, int, Path]] = []
+        for path in self.directory.glob("*/*.json.z"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> None:
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self) -> None:
+        for _, _, path in self._entries():
+            path.unlink(missing_ok=True)
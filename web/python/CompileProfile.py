@@ -0,0 +1,102 @@
+import cProfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class CompileProfile:
+    """
+    Records the wall time and tracemalloc peak of every phase of a compile,
+    along with counts of what the compile produced
+    the time of a phase does not include the phases started inside it, the memory peak does
+    """
+    def __init__(self, trace_memory: bool = False, cprofile_path: str | None = None):
+        self.trace_memory: bool = trace_memory
+        self.cprofile_path: str | None = cprofile_path
+        self.phases: dict[str, dict[str, float | int]] = dict()  # name: time, peak, calls
+        self.counts: dict[str, int] = dict()
+        self._inner_times: list[float] = []  # time of the phases inside each running phase
+        self._inner_peaks: list[int] = []
+        self._started_tracing: bool = False
+        self._cprofile: cProfile.Profile | None = None
+
+    def start(self) -> None:
+        """
+        starts tracemalloc and cProfile if they were asked for
+        """
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if self.cprofile_path is not None:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def stop(self) -> None:
+        """
+        stops what start started and writes the cProfile stats to cprofile_path
+        """
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.cprofile_path)
+            self._cprofile = None
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        times the code inside the with statement as the phase name, running a phase again adds to it
+        """
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            if self._inner_peaks:
+                self._inner_peaks[-1] = max(self._inner_peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self._inner_times.append(0.0)
+        self._inner_peaks.append(0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            inner_time = self._inner_times.pop()
+            peak = self._inner_peaks.pop()
+            if self._inner_times:
+                self._inner_times[-1] += elapsed
+            if tracing:
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                if self._inner_peaks:
+                    self._inner_peaks[-1] = max(self._inner_peaks[-1], peak)
+                tracemalloc.reset_peak()
+
+            entry = self.phases.setdefault(name, {"time": 0.0, "peak": 0, "calls": 0})
+            entry["time"] += elapsed - inner_time
+            entry["peak"] = max(entry["peak"], peak)
+            entry["calls"] += 1
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+    def total_time(self) -> float:
+        return sum(entry["time"] for entry in self.phases.values())
+
+    def to_dict(self) -> dict:
+        """
+        returns the profile as plain values that can be written as json
+        """
+        return {"phases": {name: dict(entry) for name, entry in self.phases.items()},
+                "counts": dict(self.counts),
+                "total_time": self.total_time()}
+
+    def __str__(self) -> str:
+        """
+        returns the profile as a table
+        """
+        lines = [f"{'phase':<12}{'time (ms)':>12}{'peak (KiB)':>12}"]
+        for name, entry in self.phases.items():
+            peak = f"{entry['peak'] / 1024:.1f}" if self.trace_memory else "-"
+            lines.append(f"{name:<12}{entry['time'] * 1000:>12.3f}{peak:>12}")
+        lines.append(f"{'total':<12}{self.total_time() * 1000:>12.3f}")
+        lines.append(", ".join(f"{name}: {amount}" for name, amount in self.counts.items()))
+        return "\n".join(lines)
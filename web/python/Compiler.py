@@ -14,13 +14,18 @@ Main classes:
     Operand: IntEnum of the instruction set
     Jump_Manager: Manages the function/statement jumps
 """
+import asyncio
+import hashlib
 import time
 from abc import ABC
 
-from lark import Lark, Transformer, v_args
-
+from CompileCache import CompileCache
+from CompileProfile import CompileProfile
+from GrammarParser import GRAMMAR_SHA256, Discard, Lark, Transformer, Tree, load_parser, v_args
 from JumpManager import jump_manager
 from Parser import Parser
+from RunProfile import RunProfile
+from SourceMap import SourceMap
 from Type import Operand
 
 @v_args(meta=True)
@@ -43,64 +48,301 @@ class HtmlDetailsTransformer(Transformer):
         return f"<div>{token.value}</div>"
 
 
+class _Located:
+    """
+    A value made while parsing, along with the line its rule starts on
+    """
+    __slots__ = ("value", "line")
+
+    def __init__(self, value, line: int | None):
+        self.value = value
+        self.line: int | None = line
+
+
+class _Meta:
+    __slots__ = ("line",)
+
+    def __init__(self, line: int | None):
+        self.line: int | None = line
+
+
+class _Rule:
+    """
+    Stands in for the tree node Transformer._call_userfunc reads the rule name and meta from
+    """
+    __slots__ = ("data", "meta", "children")
+
+    def __init__(self, data: str, meta: _Meta, children: list):
+        self.data: str = data
+        self.meta: _Meta = meta
+        self.children: list = children
+
+
+class InlineTransformer:
+    """
+    Runs the Parser while Lark parses so the parse tree is never built.
+    Lark does not give meta to a transformer it runs inline, so the Lark parser keeps all of its tokens
+    and the line of every rule is taken from its first token, like propagate_positions does.
+    The tokens of the quoted strings in the grammar are then dropped, as Lark drops them from the tree.
+    Only __default__ is defined so Lark sends every rule and no token through it.
+    """
+
+    def __init__(self, parser: Parser):
+        self.parser: Parser = parser
+        self.dropped: set[str] = set()
+
+    def drop_strings(self, code_parser: Lark) -> None:
+        """
+        finds the terminals that are quoted strings in the grammar, such as "def" or "+"
+        """
+        self.dropped = {terminal.name for terminal in code_parser.terminals if terminal.pattern.type == "str"}
+
+    def __default__(self, data, children, _meta):
+        callback = hasattr(self.parser, data)
+        if not callback and data.startswith("_"):
+            # a repeat such as ("," sum)*, Lark splices its children into the rule that holds it
+            return _Rule(data, _Meta(None), children)
+
+        line = None
+        values = []
+        for child in children:
+            if isinstance(child, _Located):
+                if line is None:
+                    line = child.line
+                values.append(child.value)
+                continue
+            # a token
+            if line is None:
+                line = child.line
+            if child.type not in self.dropped:
+                convert = getattr(self.parser, child.type, None)
+                values.append(convert(child) if convert is not None else child)
+
+        if callback:
+            value = self.parser._call_userfunc(_Rule(data, _Meta(line), values), values)
+        else:
+            # an inlined rule that was only kept because of its tokens, for example "(" sum ")"
+            value = values[0]
+        return _Located(value, line)
+
+
+def _transform_in_steps(transformer: Transformer, tree: Tree, profile: CompileProfile, phase: str):
+    """
+    transforms the tree like transformer.transform does, a statement at a time, timed as the phase
+    yields the phase, the functions done and the number of functions after every statement and returns the result
+    """
+    functions = tree.children if tree.data == "start" else [tree]
+
+    def transform(node: Tree, done: int):
+        children = []
+        for child in node.children:
+            if isinstance(child, Tree) and child.data in ("start", "function_declaration"):
+                value = yield from transform(child, done)
+                done += 1
+                if value is not Discard:
+                    children.append(value)
+            else:
+                with profile.phase(phase):
+                    children += transformer._transform_children([child])
+                yield phase, done, len(functions)
+        with profile.phase(phase):
+            return transformer._call_userfunc(node, children)
+
+    result = yield from transform(tree, 0)
+    yield phase, len(functions), len(functions)
+    return result
+
+
 class Compiler(ABC):
     def __init__(self, grammar: str):
+        # the parsers are loaded from GrammarParser.py, which build_parser.py generates from grammar.txt
+        if hashlib.sha256(grammar.encode()).hexdigest() != GRAMMAR_SHA256:
+            raise ValueError("The grammar is not the one GrammarParser.py was generated from, "
+                             "run python build_parser.py")
         self.grammar: str = grammar
+        # the parse tree is only built when it is shown, without it the Parser runs while Lark parses
+        self.build_tree: bool = True
+        # tracing memory slows the compile down so it is only done when asked for
+        self.trace_memory: bool = False
+        # writes the cProfile stats of every compile to this file
+        self.cprofile_path: str | None = None
+        # unchanged programs are read from the cache instead of compiled, None compiles every time
+        self.cache: CompileCache | None = None
+        # the times every line ran in the emulator, lays out the branches and picks the registers by it
+        self.run_profile: RunProfile | None = None
+        # the parsers are loaded on the first compile that needs them and kept, key: build_tree
+        self._code_parsers: dict[bool, Lark] = dict()
+        # the transformer of the inline parser, its Parser is replaced for every compile
+        self._inline: InlineTransformer | None = None
 
-    def _main(self, program: str) -> tuple[str, str, str, str, float, list[int], list[int]]:
+    def _main(self, program: str) -> tuple[str, str, str, str, float, SourceMap, CompileProfile]:
+        steps = self._compile(program)
+        while True:
+            try:
+                next(steps)
+            except StopIteration as finished:
+                return finished.value
+
+    async def compile(self, program: str, progress=None, turn: float = 0.01) -> tuple[str, str, str, str, float,
+                                                                                   SourceMap, CompileProfile]:
+        """
+        compiles like _main but gives the event loop a turn once it ran for turn seconds, between phases
+        and statements, so a page stays responsive, progress is called with the phase, how much of it is done
+        and its total on every turn
+        Cancelling the task stops the compile at the next turn, the time returned leaves out the turns
+        """
+        steps = self._compile(program)
+        busy = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    step = next(steps)
+                    while time.perf_counter() - start < turn:
+                        step = next(steps)
+                except StopIteration as finished:
+                    result = finished.value
+                    return result[:4] + (busy + time.perf_counter() - start if result[4] else 0,) + result[5:]
+                busy += time.perf_counter() - start
+                if progress is not None:
+                    progress(*step)
+                await asyncio.sleep(0)
+        finally:
+            steps.close()
+
+    def _compile(self, program: str):
+        """
+        the compile as a generator that yields the phase, how much of it is done and its total between phases
+        and between the functions of the transform, and returns what _main returns
+        """
+        profile = CompileProfile(self.trace_memory, self.cprofile_path)
         try:
             start_time = time.perf_counter()
+            profile.start()
+
+            if self.run_profile is not None:
+                self.run_profile.check(program)
+
+            cache_key = None
+            if self.cache is not None:
+                with profile.phase("cache"):
+                    options = {"tree": self.build_tree,
+                               "profile": None if self.run_profile is None else self.run_profile.executions}
+                    cache_key = self.cache.key(self.grammar, program, options)
+                    entry = self.cache.get(cache_key)
+                if entry is not None:
+                    for name, amount in entry["counts"].items():
+                        profile.count(name, amount)
+                    profile.count("cache hits")
+                    profile.stop()
+                    end_time = time.perf_counter()
+                    return (entry["tree"], entry["asm"], entry["binary"], "", end_time - start_time,
+                            SourceMap.loads(entry["map"]), profile)
 
-            #loads the grammar into the parser
-            code_parser = Lark(self.grammar, start='start', parser='lalr', propagate_positions=True)
+            jump_manager.reset()
 
-            # gets the parse-tree and writes it to program.tre
-            parse_tree = code_parser.parse(program)
+            if self.build_tree:
+                #loads the grammar into the parser
+                with profile.phase("grammar"):
+                    if True not in self._code_parsers:
+                        self._code_parsers[True] = load_parser(propagate_positions=True)
+                    code_parser = self._code_parsers[True]
 
-            # transform the parse tree into assembly
-            transformed = Parser().transform(parse_tree)
+                # gets the parse-tree and writes it to program.tre
+                with profile.phase("parse"):
+                    parse_tree = code_parser.parse(program)
+                yield "parse", 1, 1
+
+                # transform the parse tree into assembly
+                with profile.phase("transform"):
+                    parser = Parser(profile, self.run_profile)
+                transformed = yield from _transform_in_steps(parser, parse_tree, profile, "transform")
+            else:
+                # the parse phase transforms into assembly as well
+                with profile.phase("grammar"):
+                    parser = Parser(profile, self.run_profile)
+                    if False not in self._code_parsers:
+                        self._inline = InlineTransformer(parser)
+                        self._code_parsers[False] = load_parser(keep_all_tokens=True, transformer=self._inline)
+                        self._inline.drop_strings(self._code_parsers[False])
+                    self._inline.parser = parser
+                    code_parser = self._code_parsers[False]
+
+                with profile.phase("parse"):
+                    transformed = code_parser.parse(program).value
+                yield "parse", 1, 1
 
             # process what index set the labels
-            index = 0
-            for cmd in transformed:
-                if cmd.operand == Operand.LABEL:
-                    jump_manager.set_pos(cmd.jump_label, index)
-                elif Operand.check_jump(cmd.operand):
-                    jump_manager.set_verify_jump(cmd.jump_label)
-                    index += cmd.num_instruct()
-                else:
-                    index += cmd.num_instruct()
+            with profile.phase("labels"):
+                index = 0
+                for cmd in transformed:
+                    if cmd.operand == Operand.LABEL:
+                        jump_manager.set_pos(cmd.jump_label, index)
+                    elif Operand.check_jump(cmd.operand):
+                        jump_manager.set_verify_jump(cmd.jump_label)
+                        index += cmd.num_instruct()
+                    else:
+                        index += cmd.num_instruct()
+                jump_manager.check_placed()
+                profile.count("words", index)
+            yield "labels", 1, 1
 
             # gets the assembly string and writes it to program.asm
-            index = 0
-            asm_str:str = ""
-            for cmd in transformed:
-                if cmd.operand != Operand.LABEL or jump_manager.verify_jump(cmd.jump_label):
-                    index += cmd.num_instruct()
-                    asm_str += str(cmd) + "\n"
+            with profile.phase("assembly"):
+                index = 0
+                asm_str:str = ""
+                # the line of program.asm every command is on, for the source map
+                asm_lines: list[int] = []
+                asm_line: int = 0
+                for cmd in transformed:
+                    if cmd.operand != Operand.LABEL or jump_manager.verify_jump(cmd.jump_label):
+                        index += cmd.num_instruct()
+                        asm_str += str(cmd) + "\n"
+                        asm_line += 1
+                        if cmd.operand == Operand.LABEL:
+                            profile.count("labels")
+                    asm_lines.append(asm_line)
+            yield "assembly", 1, 1
 
             # gets the binary string and writes it to program.hex
-            binary_str = ""
-            binary_to_assembly_mappings: list[int] = []
-            code_mappings: list[int] = []
-            total: int = 0
-            code_line: int = 1
-            for cmd in transformed:
-                cmd.compute_op()
-                temp = cmd.get_binary()
-                total += len(temp)//4
-                if cmd.line_num != -1:
-                    code_line = max(cmd.line_num, code_line)
-                binary_to_assembly_mappings.append(total)
-                code_mappings.append(code_line)
-
-                binary_str += temp
+            with profile.phase("encode"):
+                binary_str = ""
+                source_map = SourceMap()
+                total: int = 0
+                code_line: int = 1
+                for cmd, asm_line in zip(transformed, asm_lines):
+                    cmd.compute_op()
+                    temp = cmd.get_binary()
+                    if cmd.line_num != -1:
+                        code_line = cmd.line_num
+                    if temp:
+                        source_map.add(total, asm_line, code_line, len(temp)//4)
+                        total += len(temp)//4
+
+                    binary_str += temp
+            yield "encode", 1, 1
+
+            tree = ""
+            if self.build_tree:
+                tree = yield from _transform_in_steps(HtmlDetailsTransformer(), parse_tree, profile, "tree")
 
+            profile.count("commands", len(transformed))
+            if cache_key is not None:
+                with profile.phase("cache"):
+                    self.cache.put(cache_key, {"tree": tree, "asm": asm_str, "binary": binary_str,
+                                               "map": source_map.dumps(), "counts": profile.counts})
+            profile.stop()
             end_time = time.perf_counter()
 
 
-            return HtmlDetailsTransformer().transform(parse_tree), asm_str, binary_str, "", end_time - start_time, binary_to_assembly_mappings, code_mappings
+            return tree, asm_str, binary_str, "", end_time - start_time, source_map, profile
 
+        except GeneratorExit:
+            # the compile was cancelled
+            profile.stop()
+            raise
         except Exception as e:
+            profile.stop()
             import traceback
-            return "", "", "", str(traceback.print_exc()), 0, [], []
+            traceback.print_exc()
+            return "", "", "", traceback.format_exc(), 0, SourceMap(), profile
@@ -0,0 +1,286 @@
+import argparse
+import hashlib
+import json
+import xml.etree.ElementTree as ElementTree
+from pathlib import Path
+
+from Type import Operand
+
+CIRCUIT = Path(__file__).resolve().parent.parent.parent / "16bitcomputer.circ"
+TABLE = Path(__file__).resolve().parent / "cycles.json"
+
+_Point = tuple[int, int]
+
+
+def _point(text: str) -> _Point:
+    x, y = text.strip("()").split(",")
+    return int(x), int(y)
+
+
+def _turn(dx: int, dy: int, facing: str) -> _Point:
+    """
+    turns an offset drawn for a component facing east to the way the component faces
+    """
+    match facing:
+        case "west":
+            return -dx, -dy
+        case "north":
+            return dy, -dx
+        case "south":
+            return -dy, dx
+    return dx, dy
+
+
+class Circuit:
+    """
+    The combinational logic of one circuit of a Logisim file, enough of it to work out the categoriser
+    Wires that meet at an end or where an end touches the middle of another wire are one net,
+    the ports of the gates, demultiplexers and splitters are placed like Logisim places them,
+    and a net is worked out from what drives it the first time it is read
+    A gate input that nothing drives is left out like Logisim leaves it out, a net nothing drives is None
+    """
+    gates = ("AND Gate", "OR Gate", "NAND Gate", "NOR Gate", "XOR Gate", "XNOR Gate")
+
+    def __init__(self, element: ElementTree.Element):
+        self.name: str = element.get("name")
+        self._parents: dict[_Point, _Point] = dict()
+        self._join_wires([(_point(wire.get("from")), _point(wire.get("to"))) for wire in element.findall("wire")])
+        # key: net, value: how to work it out, a function of the values of the nets it is driven from
+        self.drivers: dict[_Point, list] = dict()
+        self.inputs: dict[str, _Point] = dict()
+        self.outputs: dict[str, _Point] = dict()
+        for component in element.findall("comp"):
+            attributes = {attribute.get("name"): attribute.get("val") for attribute in component.findall("a")}
+            self._add(component.get("name"), _point(component.get("loc")), attributes)
+        self._values: dict[_Point, int | None] = dict()
+
+    def _net(self, point: _Point) -> _Point:
+        parents = self._parents
+        parents.setdefault(point, point)
+        while parents[point] != point:
+            parents[point] = parents[parents[point]]
+            point = parents[point]
+        return point
+
+    def _join_wires(self, wires: list[tuple[_Point, _Point]]) -> None:
+        ends: set[_Point] = set()
+        for start, end in wires:
+            self._parents[self._net(start)] = self._net(end)
+            ends.update((start, end))
+        for point in ends:
+            for start, end in wires:
+                if start[0] == end[0] == point[0] and min(start[1], end[1]) < point[1] < max(start[1], end[1]) \
+                        or start[1] == end[1] == point[1] and min(start[0], end[0]) < point[0] < max(start[0], end[0]):
+                    self._parents[self._net(point)] = self._net(start)
+
+    def _drive(self, point: _Point, sources: list[_Point], function) -> None:
+        self.drivers.setdefault(self._net(point), []).append(([self._net(source) for source in sources], function))
+
+    def _add(self, name: str, location: _Point, attributes: dict[str, str]) -> None:
+        x, y = location
+        facing = attributes.get("facing", "east")
+        if name == "Pin":
+            pins = self.outputs if attributes.get("output") == "true" else self.inputs
+            pins[attributes.get("label") or f"pin {location}"] = location
+        elif name == "Constant":
+            value = int(attributes.get("value", "0x1"), 0)
+            self._drive(location, [], lambda: value)
+        elif name in self.gates:
+            self._add_gate(name, location, attributes, facing)
+        elif name == "NOT Gate":
+            length = 20 if attributes.get("size") == "20" else 30
+            dx, dy = _turn(-length, 0, facing)
+            width = (1 << int(attributes.get("width", "1"))) - 1
+            self._drive(location, [(x + dx, y + dy)], lambda value: None if value is None else ~value & width)
+        elif name == "Demultiplexer":
+            self._add_demultiplexer(location, attributes, facing)
+        elif name == "Splitter":
+            self._add_splitter(location, attributes, facing)
+
+    def _add_gate(self, name: str, location: _Point, attributes: dict[str, str], facing: str) -> None:
+        """
+        the inputs are spaced like AbstractGate.getInputOffset in Logisim spaces them
+        """
+        inputs = int(attributes.get("inputs", "5" if attributes.get("size", "50") != "30" else "2"))
+        size = int(attributes.get("size", "50"))
+        length = size + (10 if name.startswith("X") else 0)
+        if inputs <= 3:
+            start, distance, lower = (-5, 10, 10) if size < 40 else (-10, 20, 20) if size < 60 or inputs <= 2 \
+                else (-15, 30, 30)
+        elif inputs == 4 and size >= 60:
+            start, distance, lower = -5, 20, 0
+        else:
+            start, distance, lower = -5, 10, 10
+        ports: list[_Point] = []
+        negated: list[bool] = []
+        for index in range(inputs):
+            if inputs % 2:
+                dy = start * (inputs - 1) + distance * index
+            else:
+                dy = start * inputs + distance * index + (lower if index >= inputs // 2 else 0)
+            negate = attributes.get(f"negate{index}") == "true"
+            dx, dy = _turn(-length - (10 if negate else 0), dy, facing)
+            ports.append((location[0] + dx, location[1] + dy))
+            negated.append(negate)
+        width = (1 << int(attributes.get("width", "1"))) - 1
+        kind = name.split()[0]
+
+        def gate(*values: int | None) -> int | None:
+            values = [value ^ width if flip else value for value, flip in zip(values, negated) if value is not None]
+            if not values:
+                return None
+            result = values[0]
+            for value in values[1:]:
+                result = (result & value if kind in ("AND", "NAND") else result | value if kind in ("OR", "NOR")
+                          else result ^ value)
+            return result ^ width if kind in ("NAND", "NOR", "XNOR") else result
+
+        self._drive(location, ports, gate)
+
+    def _add_demultiplexer(self, location: _Point, attributes: dict[str, str], facing: str) -> None:
+        """
+        the input is at the location, the outputs 40 to the right and the select at the bottom, Logisim's
+        Demultiplexer with more than two outputs
+        """
+        select = int(attributes.get("select", "1"))
+        outputs = 1 << select
+        if outputs == 2:
+            offsets = [(30, -10), (30, 10)]
+            select_offset = (20, 20)
+        else:
+            offsets = [(40, -outputs // 2 * 10 + 10 * index) for index in range(outputs)]
+            select_offset = (20, outputs * 5)
+        dx, dy = _turn(*select_offset, facing)
+        select_point = (location[0] + dx, location[1] + dy)
+        for index, offset in enumerate(offsets):
+            dx, dy = _turn(*offset, facing)
+            self._drive((location[0] + dx, location[1] + dy), [location, select_point],
+                        lambda value, chosen, index=index: None if value is None or chosen is None
+                        else value if chosen == index else 0)
+
+    def _add_splitter(self, location: _Point, attributes: dict[str, str], facing: str) -> None:
+        """
+        the combined end is at the location and the split ends 20 to the right, from 10 times the fanout above,
+        only a splitter that splits a value into its ends is worked out
+        """
+        fanout = int(attributes.get("fanout", "2"))
+        incoming = int(attributes.get("incoming", "2"))
+        ends: list[list[int]] = [[] for _ in range(fanout)]
+        for bit in range(incoming):
+            end = attributes.get(f"bit{bit}", str(bit * fanout // incoming if incoming >= fanout else bit))
+            if end != "none":
+                ends[int(end)].append(bit)
+        for index, bits in enumerate(ends):
+            dx, dy = _turn(20, -10 * fanout + 10 * index, facing)
+
+            def split(value: int | None, bits: list[int] = bits) -> int | None:
+                if value is None:
+                    return None
+                return sum(((value >> bit) & 1) << place for place, bit in enumerate(bits))
+
+            self._drive((location[0] + dx, location[1] + dy), [location], split)
+
+    def evaluate(self, inputs: dict[str, int]) -> dict[str, int | None]:
+        """
+        returns the value of every output pin for the values of the input pins
+        """
+        missing = set(inputs) - set(self.inputs)
+        if missing:
+            raise ValueError(f"{self.name} has no input pins {', '.join(sorted(missing))}")
+        self._values = {self._net(self.inputs[name]): value for name, value in inputs.items()}
+        return {name: self.value(point) for name, point in self.outputs.items()}
+
+    def value(self, point: _Point) -> int | None:
+        net = self._net(point)
+        if net in self._values:
+            return self._values[net]
+        # a loop back to this net reads it as undriven
+        self._values[net] = None
+        result = None
+        for sources, function in self.drivers.get(net, []):
+            value = function(*(self.value(source) for source in sources))
+            if value is not None:
+                result = value if result is None else result | value
+        self._values[net] = result
+        return result
+
+
+def load_circuit(path: str | Path, name: str) -> Circuit:
+    for element in ElementTree.parse(path).getroot().findall("circuit"):
+        if element.get("name") == name:
+            return Circuit(element)
+    raise ValueError(f"{path} has no circuit {name}")
+
+
+def circuit_opcode(operand: Operand) -> int | None:
+    """
+    returns the opcode the categoriser decodes the operand's form under, None if it decodes no such form
+    The categoriser was drawn for an older numbering of the operands: NOP and HALT, three one operand groups
+    from 2 in the order register, immediate, ram, the groups of six forms from 11 in the order of Operand,
+    the jumps from 113, CALL at 126 and RTRN at 127
+    Every group of a kind decodes to the same cycles, so a form is read from the first group of its kind
+    """
+    value = operand.value
+    if operand in (Operand.NOP, Operand.HALT):
+        return value
+    if Operand.PUSH.value <= value <= Operand.VIDY_RR.value:
+        return 2 + (1, 0, 2)[(value - Operand.PUSH.value) % 3]
+    if Operand.MOV.value <= value <= Operand.NOT_RR.value:
+        return 11 + (value - Operand.MOV.value) % 6
+    if Operand.JMP.value <= value <= Operand.JGE.value:
+        return 113 + value - Operand.JMP.value
+    if operand == Operand.CALL:
+        return 126
+    if operand == Operand.RTRN:
+        return 127
+    return None
+
+
+def cycle_table(path: str | Path = CIRCUIT) -> dict[str, int]:
+    """
+    returns the clock cycles of every operand the computer runs
+    The CLU_Helper_Categoriser tells the CLU_Helper_Cycle_Manager that an instruction takes 2 cycles with
+    CYCLE_2_OUT and 3 with CYCLE_3_OUT, an instruction it says neither for takes 1
+    """
+    categoriser = load_circuit(path, "CLU_Helper_Categoriser")
+    table: dict[str, int] = dict()
+    for operand in Operand:
+        if operand.value > Operand.RTRN.value:
+            continue
+        opcode = circuit_opcode(operand)
+        if opcode is None:
+            table[operand.name] = 1
+            continue
+        outputs = categoriser.evaluate({"INSTRUCTION": opcode, "CYCLE_1": 1, "CYCLE_2": 0, "CYCLE_3": 0,
+                                        "FINAL_CYCLE": 0})
+        table[operand.name] = 3 if outputs["CYCLE_3_OUT"] else 2 if outputs["CYCLE_2_OUT"] else 1
+    return table
+
+
+def write_table(circuit: str | Path = CIRCUIT, table: str | Path = TABLE) -> dict[str, int]:
+    cycles = cycle_table(circuit)
+    digest = hashlib.sha256(Path(circuit).read_bytes()).hexdigest()
+    Path(table).write_text(json.dumps({"circuit": Path(circuit).name, "sha256": digest, "cycles": cycles},
+                                      indent=2) + "\n")
+    return cycles
+
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="Works out the clock cycles of every operand from the "
+                                                    "categoriser of 16bitcomputer.circ and writes cycles.json")
+    arguments.add_argument("--circuit", default=str(CIRCUIT), help="the Logisim file")
+    arguments.add_argument("--output", default=str(TABLE), help="the table the compiler and emulators read")
+    arguments.add_argument("--check", action="store_true",
+                           help="only compare the circuit against the table, exit 1 if they differ")
+    options = arguments.parse_args()
+
+    if options.check:
+        saved = json.loads(Path(options.output).read_text())["cycles"]
+        found = cycle_table(options.circuit)
+        changed = [f"{name}: {saved.get(name)} -> {cycles}" for name, cycles in found.items()
+                   if saved.get(name) != cycles]
+        print("\n".join(changed) if changed else f"{options.output} matches {options.circuit}")
+        raise SystemExit(1 if changed else 0)
+
+    for name, cycles in write_table(options.circuit, options.output).items():
+        print(f"{name:14} {cycles}")
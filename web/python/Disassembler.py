@@ -0,0 +1,191 @@
+import argparse
+import sys
+from array import array
+from pathlib import Path
+
+from Command import Command, CommandLabel
+from JumpManager import jump_manager
+from Type import Operand, RamVar, RegVar
+
+
+def _signed(value: int) -> int:
+    return value - 0x10000 if value & 0x8000 else value
+
+
+def _layouts() -> list[tuple[Operand, str | None, str | None, bool] | None]:
+    """
+    the layout of every opcode: operand, destination form, source form and if a jump address follows
+    "reg" is a register inside the first word, "imm" and "ram" take a word of their own after it
+    the forms are in the order Operand.correct_op picks them
+    """
+    layouts: list[tuple[Operand, str | None, str | None, bool] | None] = [None] * 0x100
+    for op in (Operand.NOP, Operand.HALT, Operand.VID, Operand.RTRN):
+        layouts[op.value] = (op, None, None, False)
+    for value in range(Operand.PUSH.value, Operand.VIDY_RR.value + 1):
+        form = ("imm", "reg", "ram")[(value - Operand.PUSH.value) % 3]
+        layouts[value] = (Operand(value), form, None, False)
+    for value in range(Operand.MOV.value, Operand.NOT_RR.value + 1):
+        dest, source = (("reg", "reg"), ("ram", "reg"), ("reg", "imm"),
+                        ("reg", "ram"), ("ram", "imm"), ("ram", "ram"))[(value - Operand.MOV.value) % 6]
+        layouts[value] = (Operand(value), dest, source, False)
+    for value in range(Operand.JMP.value, Operand.CALL.value + 1):
+        layouts[value] = (Operand(value), None, None, True)
+    return layouts
+
+# indexed by the upper 8 bits of the first word of a command
+_LAYOUTS = _layouts()
+
+
+class Disassembler:
+    """
+    Turns a binary back into the Commands the compiler wrote it from, in the syntax of program.asm
+    Every jump and call target gets a label named after its address: .L001A
+    Like a compile this resets jump_manager, which names the labels
+    """
+
+    def __init__(self, binary: str):
+        self.words: array = self.read_words(binary)
+        self.commands: list[Command] = []
+        # the address of every command, a label has the address of the command after it
+        self.addresses: list[int] = []
+
+    @staticmethod
+    def read_words(binary: str) -> array:
+        """
+        reads the hex of program.bin into 16 bit words, whitespace between the words is allowed
+        """
+        text = "".join(binary.split())
+        if len(text) % 4:
+            raise ValueError(f"The binary is not made of 4 digit hex words: {len(text)} digits")
+        if "-" in text:
+            # binaries from before negative ram offsets were written in two's complement: -002
+            return array("H", (int(text[i:i + 4], 16) & 0xFFFF for i in range(0, len(text), 4)))
+        words = array("H", bytes.fromhex(text))
+        if sys.byteorder == "little":
+            words.byteswap()
+        return words
+
+    def decode(self) -> list[Command]:
+        """
+        decodes every word of the binary, the image has to be made of whole commands
+        """
+        words = self.words
+        size = len(words)
+        decoded: list[Command] = []
+        addresses: list[int] = []
+        targets: dict[int, int] = dict()  # key: address, value: jump id
+        index = 0
+        while index < size:
+            word = words[index]
+            layout = _LAYOUTS[word >> 8]
+            if layout is None:
+                raise ValueError(f"Unknown operand {word >> 8:02X} at {index:04X}")
+            op, dest_form, source_form, jump = layout
+            length = op.cost()[0]
+            if index + length > size:
+                raise ValueError(f"The command {op.name} at {index:04X} is cut off by the end of the binary")
+
+            addresses.append(index)
+            after = index + 1
+            dest = source = None
+            if dest_form == "reg":
+                dest = RegVar((word >> 4) & 0xF)
+            elif dest_form is not None:
+                dest = _signed(words[after])
+                after += 1
+                if dest_form == "ram":
+                    dest = RamVar(dest)
+            if source_form == "reg":
+                source = RegVar(word & 0xF)
+            elif source_form is not None:
+                source = _signed(words[after])
+                if source_form == "ram":
+                    source = RamVar(source)
+
+            if jump:
+                target = words[after]
+                if target not in targets:
+                    targets[target] = -1
+                decoded.append(Command(op, None, None, target))
+            else:
+                decoded.append(Command(op, dest, source))
+            index += length
+
+        self.commands, self.addresses = self._add_labels(decoded, addresses, targets, size)
+        return self.commands
+
+    @staticmethod
+    def _add_labels(decoded: list[Command], addresses: list[int], targets: dict[int, int],
+                    size: int) -> tuple[list[Command], list[int]]:
+        """
+        gives every target a label and puts it before the command at its address
+        the jumps hold their target address until they get the id of its label
+        """
+        jump_manager.reset()
+        for target in targets:
+            targets[target] = jump_manager.get_function(f"L{target:04X}")
+            jump_manager.set_pos(targets[target], target)
+            jump_manager.set_verify_jump(targets[target])
+
+        commands: list[Command] = []
+        command_addresses: list[int] = []
+        placed = 0
+        for cmd, address in zip(decoded, addresses):
+            if address in targets:
+                commands.append(CommandLabel(targets[address]))
+                command_addresses.append(address)
+                placed += 1
+            if cmd.jump_label is not None:
+                cmd.jump_label = targets[cmd.jump_label]
+            commands.append(cmd)
+            command_addresses.append(address)
+        if size in targets:
+            commands.append(CommandLabel(targets[size]))
+            command_addresses.append(size)
+            placed += 1
+
+        if placed != len(targets):
+            starts = set(addresses)
+            missing = sorted(target for target in targets if target not in starts and target != size)
+            raise ValueError(f"Jumps go to addresses that are not the start of a command: "
+                             f"{', '.join(f'{target:04X}' for target in missing)}")
+        return commands, command_addresses
+
+    def assembly(self, annotate: bool = False) -> str:
+        """
+        returns the assembly like program.asm
+        annotate adds the address and the words of every command after a semicolon
+        """
+        if not self.commands:
+            self.decode()
+        lines: list[str] = []
+        for cmd, address in zip(self.commands, self.addresses):
+            line = str(cmd)
+            if annotate and cmd.operand != Operand.LABEL:
+                length = cmd.num_instruct()
+                words = " ".join(f"{word:04X}" for word in self.words[address:address + length])
+                line = f"{line}\t; {address:04X}: {words}"
+            lines.append(line)
+        return "".join(line + "\n" for line in lines)
+
+    def binary(self) -> str:
+        """
+        encodes the decoded commands again, it is the binary the disassembler was given
+        """
+        if not self.commands:
+            self.decode()
+        return "".join(cmd.get_binary() for cmd in self.commands)
+
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="Disassembles a binary such as program.bin")
+    arguments.add_argument("binary", nargs="?", default="../../program.bin", help="hex file to disassemble")
+    arguments.add_argument("--annotate", action="store_true", help="add the address and words of every command")
+    arguments.add_argument("--output", help="write the assembly to this file instead of printing it")
+    options = arguments.parse_args()
+
+    assembly = Disassembler(Path(options.binary).read_text()).assembly(options.annotate)
+    if options.output:
+        Path(options.output).write_text(assembly)
+    else:
+        print(assembly, end="")
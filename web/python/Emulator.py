@@ -0,0 +1,194 @@
+from Framebuffer import Framebuffer
+from Type import Operand, base_pointer, stack_pointer
+
+# the parts of the ram a one operand command reads from, in the order of its forms
+_ONE_FORMS = ("imm", "reg", "ram")
+# the destination and source of an arithmetic command, in the order of its forms
+_ARITH_FORMS = (("reg", "reg"), ("ram", "reg"), ("reg", "imm"), ("reg", "ram"), ("ram", "imm"), ("ram", "ram"))
+
+
+def _signed(value: int) -> int:
+    value &= 0xFFFF
+    return value - 0x10000 if value & 0x8000 else value
+
+
+class Emulator:
+    """
+    Runs a compiled binary without the browser and counts the clock cycles it takes
+    The cycles of every command come from Operand.cost
+    ram operands are relative to the base pointer like the compiler writes them, [bp + 2]
+    CALL pushes the return address and RTRN pops it
+    """
+    canvas_size = Framebuffer.size
+    color_size = 32
+
+    def __init__(self, binary: str):
+        self.program: list[int] = [int(binary[i:i + 4], 16) & 0xFFFF for i in range(0, len(binary), 4)]
+        self.ram: list[int] = [0] * 0x10000
+        self.registers: list[int] = [0] * 16
+        self.pc: int = 0
+        self.greater: bool = False
+        self.equal: bool = False
+        self.less: bool = False
+        self.halted: bool = False
+        self.steps: int = 0
+        self.cycles: int = 0
+        # the highest the stack pointer went
+        self.stack_peak: int = 0
+        # the pixels VID drew
+        self.framebuffer: Framebuffer = Framebuffer()
+        self.color: list[int] = [0, 0, 0]
+        self.x: int = 0
+        self.y: int = 0
+
+    def _fetch(self) -> int:
+        word = self.program[self.pc] if self.pc < len(self.program) else 0
+        self.pc += 1
+        return word
+
+    def _address(self, offset: int) -> int:
+        return (self.registers[base_pointer().val] + _signed(offset)) & 0xFFFF
+
+    def _push(self, value: int) -> None:
+        sp = stack_pointer().val
+        self.ram[self.registers[sp]] = value & 0xFFFF
+        self.registers[sp] = (self.registers[sp] + 1) & 0xFFFF
+        self.stack_peak = max(self.stack_peak, self.registers[sp])
+
+    def _pop(self) -> int:
+        sp = stack_pointer().val
+        self.registers[sp] = (self.registers[sp] - 1) & 0xFFFF
+        return self.ram[self.registers[sp]]
+
+    def _draw(self) -> None:
+        """
+        draws the color at x and y, what VID does
+        """
+        self.framebuffer.draw(self.x, self.y, self.color[0], self.color[1], self.color[2])
+
+    def run(self, max_steps: int = 1_000_000) -> bool:
+        """
+        runs until HALT or until max_steps commands ran, returns if the program halted
+        """
+        while not self.halted and self.steps < max_steps:
+            self.step()
+        return self.halted
+
+    def step(self) -> None:
+        """
+        runs one command
+        """
+        word = self._fetch()
+        op = Operand(word >> 8)
+        first, second = (word >> 4) & 0xF, word & 0xF
+        self.steps += 1
+        self.cycles += op.cost()[1]
+
+        if op.value <= Operand.VID.value:
+            if op == Operand.HALT:
+                self.halted = True
+            elif op == Operand.VID:
+                self._draw()
+            return
+
+        if Operand.PUSH.value <= op.value <= Operand.VIDY_RR.value:
+            self._one_operand(op, first)
+        elif Operand.MOV.value <= op.value <= Operand.NOT_RR.value:
+            self._arithmetic(op, first, second)
+        elif op == Operand.CALL:
+            target = self._fetch()
+            self._push(self.pc)
+            self.pc = target
+        elif op.check_jump():
+            target = self._fetch()
+            taken = {Operand.JMP: True, Operand.JEQ: self.equal, Operand.JNE: not self.equal,
+                     Operand.JG: self.greater, Operand.JLE: self.less or self.equal,
+                     Operand.JL: self.less, Operand.JGE: self.greater or self.equal}[op]
+            if taken:
+                self.pc = target
+        elif op == Operand.RTRN:
+            self.pc = self._pop()
+        else:
+            raise ValueError(f"Cannot run the operand {op.name} at {self.pc - 1}")
+
+    def _one_operand(self, op: Operand, register: int) -> None:
+        base = Operand(op.value - (op.value - Operand.PUSH.value) % 3)
+        form = _ONE_FORMS[(op.value - Operand.PUSH.value) % 3]
+        address = None
+        match form:
+            case "imm":
+                value = self._fetch()
+            case "reg":
+                value = self.registers[register]
+            case _:
+                address = self._address(self._fetch())
+                value = self.ram[address]
+
+        match base:
+            case Operand.PUSH:
+                self._push(value)
+            case Operand.POP:
+                value = self._pop()
+                if form == "reg":
+                    self.registers[register] = value
+                elif form == "ram":
+                    self.ram[address] = value
+            case Operand.VID_RED | Operand.VID_GREEN | Operand.VID_BLUE:
+                self.color[(base.value - Operand.VID_RED.value) // 3] = value % self.color_size
+            case Operand.VID_X:
+                self.x = value % self.canvas_size
+            case Operand.VID_Y:
+                self.y = value % self.canvas_size
+
+    def _arithmetic(self, op: Operand, first: int, second: int) -> None:
+        base = Operand(op.value - (op.value - Operand.MOV.value) % 6)
+        dest_form, source_form = _ARITH_FORMS[(op.value - Operand.MOV.value) % 6]
+
+        address = self._address(self._fetch()) if dest_form == "ram" else None
+        dest = self.registers[first] if address is None else self.ram[address]
+        match source_form:
+            case "reg":
+                source = self.registers[second]
+            case "imm":
+                source = self._fetch()
+            case _:
+                source = self.ram[self._address(self._fetch())]
+
+        dest, source = _signed(dest), _signed(source)
+        match base:
+            case Operand.CMP:
+                self.greater, self.equal, self.less = dest > source, dest == source, dest < source
+                return
+            case Operand.MOV:
+                result = source
+            case Operand.ADD:
+                result = dest + source
+            case Operand.SUB:
+                result = dest - source
+            case Operand.MULT:
+                result = dest * source
+            case Operand.DIV:
+                result = int(dest / source) if source else 0
+            case Operand.QUOT:
+                result = dest - int(dest / source) * source if source else 0
+            case Operand.AND:
+                result = dest & source
+            case Operand.OR:
+                result = dest | source
+            case Operand.XOR:
+                result = dest ^ source
+            case Operand.SHL:
+                result = dest << (source & 0xF)
+            case Operand.SHR:
+                result = dest >> (source & 0xF)
+            case Operand.NEG:
+                result = -source
+            case _:
+                result = ~source
+
+        if address is None:
+            self.registers[first] = result & 0xFFFF
+            if first == stack_pointer().val:
+                self.stack_peak = max(self.stack_peak, self.registers[first])
+        else:
+            self.ram[address] = result & 0xFFFF
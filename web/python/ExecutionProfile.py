@@ -0,0 +1,316 @@
+import argparse
+import json
+import re
+from bisect import bisect_right
+from pathlib import Path
+
+from BlockEmulator import BlockEmulator
+from RunProfile import program_digest
+from SourceMap import SourceMap
+from Type import Operand
+
+# labels the compiler makes inside a function, the rest of the labels start a function
+_LOCAL_LABEL = re.compile(r"\.L\d+$")
+
+
+class ProfilingEmulator(BlockEmulator):
+    """
+    Runs a binary like BlockEmulator and counts where the steps and cycles went
+    Counts how often every block and every command run by step ran, the cycles of every call stack
+    and how often every conditional jump ran and was taken
+    The call stacks are a tree of the addresses of the CALLs that made them, CALL goes down it and RTRN up
+    """
+
+    def __init__(self, binary: str):
+        super().__init__(binary)
+        self.block_runs: dict[int, int] = dict()  # key: address of the block, value: runs
+        self.command_runs: dict[int, int] = dict()  # key: address of the command, value: runs by step
+        # the addresses of the commands of every block and the address of its last command
+        self.block_commands: dict[int, tuple[int, ...]] = dict()
+        self.branches: dict[int, list[int]] = dict()  # key: address of the jump, value: runs, taken
+        # the call stack tree, node 0 is the stack without calls
+        self.stack_parents: list[int] = [0]
+        self.stack_calls: list[int] = [-1]  # the address of the CALL of every node
+        self._stack_children: dict[tuple[int, int], int] = dict()
+        self.stack: int = 0
+        self.stack_cycles: dict[tuple[int, int], int] = dict()  # key: node, address of the block, value: cycles
+
+    def commands_of(self, start: int, commands: int) -> tuple[int, ...]:
+        """
+        returns the address of every command of the block at start
+        """
+        addresses: list[int] = []
+        address = start
+        for _ in range(commands):
+            addresses.append(address)
+            address += Operand(self._word(address) >> 8).cost()[0]
+        return tuple(addresses)
+
+    def run(self, max_steps: int = 1_000_000) -> bool:
+        """
+        runs until HALT or until max_steps commands ran, returns if the program halted
+        """
+        blocks = self.blocks
+        registers = self.registers
+        ram = self.ram
+        while not self.halted and self.steps < max_steps:
+            if self.pc >= len(self.program):
+                # the NOPs past the end of the program are not part of the profile
+                return super().run(max_steps)
+            block = blocks.get(self.pc)
+            if block is None:
+                block = blocks[self.pc] = self.translate(self.pc)
+                if block[0] is not None:
+                    self.block_commands[self.pc] = self.commands_of(self.pc, block[1])
+            function, commands, cycles = block
+            if function is None or self.steps + commands > max_steps:
+                self.step()
+                continue
+            start = self.pc
+            self.pc = function(self, registers, ram)
+            self.steps += commands
+            self.cycles += cycles
+            self.block_runs[start] = self.block_runs.get(start, 0) + 1
+            self._record(start, self.block_commands[start][-1], cycles)
+        return self.halted
+
+    def step(self) -> None:
+        address = self.pc
+        cycles = self.cycles
+        super().step()
+        self.command_runs[address] = self.command_runs.get(address, 0) + 1
+        self._record(address, address, self.cycles - cycles)
+
+    def _record(self, start: int, last: int, cycles: int) -> None:
+        """
+        adds the cycles of the commands from start to last to the call stack they ran in,
+        then follows the call stack and the conditional jump of the last command
+        """
+        key = (self.stack, start)
+        self.stack_cycles[key] = self.stack_cycles.get(key, 0) + cycles
+
+        op = Operand(self._word(last) >> 8)
+        if op == Operand.CALL:
+            child = self._stack_children.get((self.stack, last))
+            if child is None:
+                child = self._stack_children[(self.stack, last)] = len(self.stack_parents)
+                self.stack_parents.append(self.stack)
+                self.stack_calls.append(last)
+            self.stack = child
+        elif op == Operand.RTRN:
+            self.stack = self.stack_parents[self.stack]
+        elif op.check_jump() and op != Operand.JMP:
+            counts = self.branches.setdefault(last, [0, 0])
+            counts[0] += 1
+            if self.pc == self._word(last + 1) and self.pc != last + 2:
+                counts[1] += 1
+
+    def address_runs(self) -> dict[int, int]:
+        """
+        returns how often the command at every address ran
+        """
+        runs = dict(self.command_runs)
+        for start, count in self.block_runs.items():
+            for address in self.block_commands[start]:
+                runs[address] = runs.get(address, 0) + count
+        return runs
+
+    def stack_path(self, node: int, limit: int | None = None) -> list[int]:
+        """
+        returns the addresses of the CALLs of the call stack node, the first call first
+        limit keeps only the last calls
+        """
+        path: list[int] = []
+        while node and len(path) != limit:
+            path.append(self.stack_calls[node])
+            node = self.stack_parents[node]
+        path.reverse()
+        return path
+
+
+class ExecutionProfile:
+    """
+    Puts the counts of a ProfilingEmulator together by command, by line of the program and by function
+    The lines come from the source map of the compile, the commands and the function names from program.asm,
+    the functions are the labels that are not local labels such as .L3
+    Without program.asm the functions are named after the address of the first command, like the disassembler
+    """
+
+    def __init__(self, emulator: ProfilingEmulator, source_map: SourceMap | None = None,
+                 assembly: str = "", program: str = ""):
+        self.emulator: ProfilingEmulator = emulator
+        self.source_map: SourceMap | None = source_map
+        self.asm_lines: list[str] = assembly.splitlines()
+        self.program_lines: list[str] = program.splitlines()
+        self.runs: dict[int, int] = emulator.address_runs()
+        self.function_starts: list[int] = []
+        self.function_names: list[str] = []
+        self._find_functions()
+
+    def _find_functions(self) -> None:
+        functions: list[tuple[int, str]] = []
+        if self.asm_lines and self.source_map is not None:
+            name = None
+            for line_num, line in enumerate(self.asm_lines, 1):
+                text = line.strip()
+                if text.endswith(":"):
+                    if not _LOCAL_LABEL.match(text[:-1]):
+                        name = text[1:-1]
+                    continue
+                if name is not None:
+                    address = self.source_map.address_of_asm_line(line_num)
+                    if address is not None:
+                        functions.append((address, name))
+                        name = None
+        else:
+            targets = {self.emulator._word(call + 1) for call in self.emulator.stack_calls[1:]}
+            functions = [(target, f"L{target:04X}") for target in targets]
+        if not any(address == 0 for address, _ in functions):
+            functions.append((0, "start"))
+        functions.sort()
+        self.function_starts = [address for address, _ in functions]
+        self.function_names = [name for _, name in functions]
+
+    def function(self, address: int) -> str:
+        return self.function_names[bisect_right(self.function_starts, address) - 1]
+
+    def cycles(self, address: int) -> int:
+        """
+        returns the cycles the command at the address took in all
+        """
+        return self.runs.get(address, 0) * Operand(self.emulator._word(address) >> 8).cost()[1]
+
+    def source_line(self, address: int) -> int | None:
+        return None if self.source_map is None else self.source_map.source_line(address)
+
+    def command_text(self, address: int) -> str:
+        asm_line = None if self.source_map is None else self.source_map.asm_line(address)
+        if asm_line is not None and 0 < asm_line <= len(self.asm_lines):
+            return self.asm_lines[asm_line - 1].strip()
+        return Operand(self.emulator._word(address) >> 8).name
+
+    def by_command(self) -> list[dict]:
+        """
+        returns the runs and cycles of every command that ran, the most cycles first
+        """
+        commands = [{"address": address, "runs": runs, "cycles": self.cycles(address),
+                     "line": self.source_line(address), "function": self.function(address),
+                     "command": self.command_text(address)}
+                    for address, runs in self.runs.items()]
+        return sorted(commands, key=lambda command: (-command["cycles"], command["address"]))
+
+    def by_line(self) -> list[dict]:
+        """
+        returns the commands run and cycles of every line of the program that ran, the most cycles first
+        the executions of a line are the runs of its command that ran the most
+        """
+        lines: dict[int | None, dict] = dict()
+        for address, runs in self.runs.items():
+            line = self.source_line(address)
+            entry = lines.setdefault(line, {"line": line, "executions": 0, "runs": 0, "cycles": 0})
+            entry["executions"] = max(entry["executions"], runs)
+            entry["runs"] += runs
+            entry["cycles"] += self.cycles(address)
+        for entry in lines.values():
+            line = entry["line"]
+            entry["text"] = self.program_lines[line - 1].strip() if line and line <= len(self.program_lines) else ""
+        return sorted(lines.values(), key=lambda entry: (-entry["cycles"], entry["line"] or 0))
+
+    def by_function(self) -> list[dict]:
+        """
+        returns the cycles of every function itself and with the functions it called, the most cycles first
+        """
+        functions: dict[str, dict] = dict()
+        for address in self.runs:
+            name = self.function(address)
+            entry = functions.setdefault(name, {"function": name, "self": 0, "total": 0})
+            entry["self"] += self.cycles(address)
+        # the functions of the calls of every call stack, a node has the functions of its parent and its call
+        stack_functions: list[frozenset[str]] = [frozenset()]
+        for call, parent in zip(self.emulator.stack_calls[1:], self.emulator.stack_parents[1:]):
+            stack_functions.append(stack_functions[parent] | {self.function(call)})
+        for (node, start), cycles in self.emulator.stack_cycles.items():
+            for name in stack_functions[node] | {self.function(start)}:
+                functions.setdefault(name, {"function": name, "self": 0, "total": 0})["total"] += cycles
+        return sorted(functions.values(), key=lambda entry: (-entry["total"], entry["function"]))
+
+    def branches(self) -> list[dict]:
+        """
+        returns how often every conditional jump ran and was taken, in the order of their addresses
+        """
+        return [{"address": address, "line": self.source_line(address), "runs": runs, "taken": taken,
+                 "command": self.command_text(address)}
+                for address, (runs, taken) in sorted(self.emulator.branches.items())]
+
+    def collapsed(self, max_depth: int = 128) -> str:
+        """
+        returns the cycles of every call stack in the collapsed stack format of flamegraph.pl:
+        main;H;liney_5 1234
+        stacks deeper than max_depth keep their innermost functions
+        """
+        folded: dict[str, int] = dict()
+        for (node, start), cycles in self.emulator.stack_cycles.items():
+            # the function of every call and the function the block is in, the outer calls past max_depth are cut
+            path = self.emulator.stack_path(node, max_depth)
+            names = [self.function(call) for call in path] + [self.function(start)]
+            if len(names) > max_depth:
+                names = ["..."] + names[-max_depth:]
+            stack = ";".join(names)
+            folded[stack] = folded.get(stack, 0) + cycles
+        return "".join(f"{stack} {cycles}\n" for stack, cycles in sorted(folded.items()))
+
+    def report(self, top: int = 10) -> str:
+        """
+        returns the hot spots as text, the lines, functions and commands that took the most cycles
+        """
+        total = self.emulator.cycles or 1
+        out = [f"{self.emulator.steps} commands, {self.emulator.cycles} cycles"
+               f"{'' if self.emulator.halted else ' (did not halt)'}", "", "cycles      %    runs  line"]
+        for entry in self.by_line()[:top]:
+            out.append(f"{entry['cycles']:>8} {entry['cycles'] / total:>6.1%} {entry['runs']:>7}  "
+                       f"{entry['line'] if entry['line'] is not None else '-':>4}  {entry['text']}")
+        out += ["", "  self   total      %  function"]
+        for entry in self.by_function()[:top]:
+            out.append(f"{entry['self']:>6} {entry['total']:>7} {entry['total'] / total:>6.1%}  {entry['function']}")
+        out += ["", "cycles      %    runs  address  command"]
+        for entry in self.by_command()[:top]:
+            out.append(f"{entry['cycles']:>8} {entry['cycles'] / total:>6.1%} {entry['runs']:>7}  "
+                       f"{entry['address']:04X}     {entry['command']}")
+        return "\n".join(out) + "\n"
+
+    def dumps(self) -> str:
+        """
+        returns the profile as json, the counts by line, function and command and the conditional jumps
+        the hash of the program lets the compiler check the profile is of the program it compiles
+        """
+        return json.dumps({"version": 1, "program": program_digest("\n".join(self.program_lines)) if self.program_lines
+                           else None, "steps": self.emulator.steps, "cycles": self.emulator.cycles,
+                           "halted": self.emulator.halted, "lines": self.by_line(),
+                           "functions": self.by_function(), "commands": self.by_command(),
+                           "branches": self.branches()}, indent=1)
+
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="Runs a binary such as program.bin and shows where its cycles go")
+    arguments.add_argument("binary", nargs="?", default="../../program.bin", help="hex file to run")
+    arguments.add_argument("--map", default="../../program.map", help="the source map of the binary")
+    arguments.add_argument("--asm", default="../../program.asm", help="the assembly of the binary")
+    arguments.add_argument("--program", default="../examples/hello_world.txt", help="the program it was compiled from")
+    arguments.add_argument("--max-steps", type=int, default=10_000_000, help="commands the program may run")
+    arguments.add_argument("--top", type=int, default=10, help="lines, functions and commands in the report")
+    arguments.add_argument("--collapsed", default="../../program.folded", help="write the collapsed stacks here")
+    arguments.add_argument("--output", default="../../program.profile", help="write the profile as json here")
+    options = arguments.parse_args()
+
+    def read(path: str) -> str:
+        return Path(path).read_text() if Path(path).exists() else ""
+
+    profiler = ProfilingEmulator(Path(options.binary).read_text().strip())
+    profiler.run(options.max_steps)
+    map_text = read(options.map)
+    profile = ExecutionProfile(profiler, SourceMap.loads(map_text) if map_text else None,
+                               read(options.asm), read(options.program))
+    print(profile.report(options.top), end="")
+    Path(options.collapsed).write_text(profile.collapsed())
+    Path(options.output).write_text(profile.dumps())
+    print(f"\nCollapsed stacks saved to {options.collapsed}, the profile to {options.output}")
@@ -0,0 +1,132 @@
+import argparse
+import struct
+import sys
+import zlib
+from array import array
+from pathlib import Path
+
+
+class Framebuffer:
+    """
+    The 32x32 display that VID draws on, kept in memory so programs can be rendered without the browser
+    pixels holds one RGB555 word a pixel, RRRRR GGGGG BBBBB, row by row from the top left,
+    it is an array so numpy can use it without a copy:
+        numpy.frombuffer(framebuffer.pixels, numpy.uint16).reshape(32, 32)
+    The dirty region is the box around the pixels drawn since it was last taken
+    The frames are written like the browser canvas shows them, a color of 31 is 248
+    """
+    size = 32
+
+    def __init__(self):
+        self.pixels: array = array("H", bytes(2 * self.size * self.size))
+        # the pixels VID drew, drawing one again counts again
+        self.draws: int = 0
+        # the first column and row of the dirty region and the ones after its last, None if nothing was drawn
+        self.dirty: tuple[int, int, int, int] | None = None
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Framebuffer) and self.pixels == other.pixels
+
+    def draw(self, x: int, y: int, red: int, green: int, blue: int) -> None:
+        self.pixels[y * self.size + x] = (red << 10) | (green << 5) | blue
+        self.draws += 1
+        if self.dirty is None:
+            self.dirty = (x, y, x + 1, y + 1)
+        else:
+            left, top, right, bottom = self.dirty
+            self.dirty = (min(left, x), min(top, y), max(right, x + 1), max(bottom, y + 1))
+
+    def pixel(self, x: int, y: int) -> tuple[int, int, int]:
+        """
+        returns the red, green and blue of the pixel, 0-31
+        """
+        word = self.pixels[y * self.size + x]
+        return word >> 10, (word >> 5) & 0x1F, word & 0x1F
+
+    def take_dirty(self) -> tuple[int, int, int, int] | None:
+        """
+        returns the dirty region and starts a new one
+        """
+        dirty = self.dirty
+        self.dirty = None
+        return dirty
+
+    def rgb(self, scale: int = 1) -> bytes:
+        """
+        returns the rows of the frame as 8 bit red, green and blue, every pixel scale times wider and taller
+        """
+        rows: list[bytes] = []
+        for y in range(self.size):
+            row = bytearray()
+            for word in self.pixels[y * self.size:(y + 1) * self.size]:
+                row += bytes(((word >> 10) << 3, ((word >> 5) & 0x1F) << 3, (word & 0x1F) << 3)) * scale
+            rows.extend([bytes(row)] * scale)
+        return b"".join(rows)
+
+    def ppm(self, scale: int = 1) -> bytes:
+        side = self.size * scale
+        return f"P6\n{side} {side}\n255\n".encode() + self.rgb(scale)
+
+    def png(self, scale: int = 1) -> bytes:
+        side = self.size * scale
+        rgb = self.rgb(scale)
+        stride = side * 3
+        # every row starts with filter type 0, no filter
+        image = b"".join(b"\x00" + rgb[row * stride:(row + 1) * stride] for row in range(side))
+
+        def chunk(kind: bytes, data: bytes) -> bytes:
+            return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+        return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", side, side, 8, 2, 0, 0, 0))
+                + chunk(b"IDAT", zlib.compress(image, 9)) + chunk(b"IEND", b""))
+
+    def raw(self) -> bytes:
+        """
+        returns the RGB555 words as little endian bytes
+        """
+        pixels = array("H", self.pixels)
+        if sys.byteorder == "big":
+            pixels.byteswap()
+        return pixels.tobytes()
+
+    def save(self, path: str | Path, scale: int = 1) -> None:
+        """
+        writes the frame as a .png, .ppm or .raw file, picked by the suffix of the path
+        """
+        path = Path(path)
+        writers = {".png": self.png, ".ppm": self.ppm, ".raw": lambda _: self.raw()}
+        if path.suffix not in writers:
+            raise ValueError(f"Frames are saved as .png, .ppm or .raw, not {path.suffix}")
+        path.write_bytes(writers[path.suffix](scale))
+
+
+if __name__ == "__main__":
+    from BlockEmulator import BlockEmulator
+
+    arguments = argparse.ArgumentParser(description="Runs a binary such as program.bin and saves its frames")
+    arguments.add_argument("binary", nargs="?", default="../../program.bin", help="hex file to run")
+    arguments.add_argument("--at", default="", help="commands to save a frame after, comma separated")
+    arguments.add_argument("--every", type=int, default=0, help="also save a frame every this many commands")
+    arguments.add_argument("--max-steps", type=int, default=10_000_000, help="commands the program may run")
+    arguments.add_argument("--format", choices=("png", "ppm", "raw"), default="png", help="the file type of the frames")
+    arguments.add_argument("--scale", type=int, default=8, help="how many times bigger the frames are")
+    arguments.add_argument("--output", default="../../frames", help="the directory of the frames")
+    options = arguments.parse_args()
+
+    stops = {int(step) for step in options.at.split(",") if step}
+    if options.every:
+        stops.update(range(options.every, options.max_steps, options.every))
+    output = Path(options.output)
+    output.mkdir(parents=True, exist_ok=True)
+
+    # a frame at every stop and one when the program halts or runs out of steps
+    emulator = BlockEmulator(Path(options.binary).read_text().strip())
+    for stop in sorted(step for step in stops if step < options.max_steps) + [options.max_steps]:
+        emulator.run(stop)
+        dirty = emulator.framebuffer.take_dirty()
+        path = output / f"frame_{emulator.steps:08d}.{options.format}"
+        emulator.framebuffer.save(path, 1 if options.format == "raw" else options.scale)
+        print(f"{path}: {'halted after ' if emulator.halted else ''}{emulator.steps} commands, "
+              f"changed {dirty if dirty else 'nothing'}")
+        if emulator.halted:
+            break
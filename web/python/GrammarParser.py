@@ -0,0 +1,3589 @@
+"""The parser of grammar.txt, generated by build_parser.py, do not edit"""
+# The file was automatically generated by Lark v1.3.1
+__version__ = "1.3.1"
+
+#
+#
+#   Lark Stand-alone Generator Tool
+# ----------------------------------
+# Generates a stand-alone LALR(1) parser
+#
+# Git:    https://github.com/erezsh/lark
+# Author: Erez Shinan (erezshin@gmail.com)
+#
+#
+#    >>> LICENSE
+#
+#    This tool and its generated code use a separate license from Lark,
+#    and are subject to the terms of the Mozilla Public License, v. 2.0.
+#    If a copy of the MPL was not distributed with this
+#    file, You can obtain one at https://mozilla.org/MPL/2.0/.
+#
+#    If you wish to purchase a commercial license for this tool and its
+#    generated code, you may contact me via email or otherwise.
+#
+#    If MPL2 is incompatible with your free or open-source project,
+#    contact me and we'll work it out.
+#
+#
+
+from copy import deepcopy
+from abc import ABC, abstractmethod
+from types import ModuleType
+from typing import (
+    TypeVar, Generic, Type, Tuple, List, Dict, Iterator, Collection, Callable, Optional, FrozenSet, Any,
+    Union, Iterable, IO, TYPE_CHECKING, overload, Sequence,
+    Pattern as REPattern, ClassVar, Set, Mapping
+)
+
+
+class LarkError(Exception):
+    pass
+
+
+class ConfigurationError(LarkError, ValueError):
+    pass
+
+
+def assert_config(value, options: Collection, msg='Got %r, expected one of %s'):
+    if value not in options:
+        raise ConfigurationError(msg % (value, options))
+
+
+class GrammarError(LarkError):
+    pass
+
+
+class ParseError(LarkError):
+    pass
+
+
+class LexError(LarkError):
+    pass
+
+T = TypeVar('T')
+
+class UnexpectedInput(LarkError):
+    #--
+    line: int
+    column: int
+    pos_in_stream = None
+    state: Any
+    _terminals_by_name = None
+    interactive_parser: 'InteractiveParser'
+
+    def get_context(self, text: str, span: int=40) -> str:
+        #--
+        pos = self.pos_in_stream or 0
+        start = max(pos - span, 0)
+        end = pos + span
+        if not isinstance(text, bytes):
+            before = text[start:pos].rsplit('\n', 1)[-1]
+            after = text[pos:end].split('\n', 1)[0]
+            return before + after + '\n' + ' ' * len(before.expandtabs()) + '^\n'
+        else:
+            before = text[start:pos].rsplit(b'\n', 1)[-1]
+            after = text[pos:end].split(b'\n', 1)[0]
+            return (before + after + b'\n' + b' ' * len(before.expandtabs()) + b'^\n').decode("ascii", "backslashreplace")
+
+    def match_examples(self, parse_fn: 'Callable[[str], Tree]',
+                             examples: Union[Mapping[T, Iterable[str]], Iterable[Tuple[T, Iterable[str]]]],
+                             token_type_match_fallback: bool=False,
+                             use_accepts: bool=True
+                         ) -> Optional[T]:
+        #--
+        assert self.state is not None, "Not supported for this exception"
+
+        if isinstance(examples, Mapping):
+            examples = examples.items()
+
+        candidate = (None, False)
+        for i, (label, example) in enumerate(examples):
+            assert not isinstance(example, str), "Expecting a list"
+
+            for j, malformed in enumerate(example):
+                try:
+                    parse_fn(malformed)
+                except UnexpectedInput as ut:
+                    if ut.state == self.state:
+                        if (
+                            use_accepts
+                            and isinstance(self, UnexpectedToken)
+                            and isinstance(ut, UnexpectedToken)
+                            and ut.accepts != self.accepts
+                        ):
+                            logger.debug("Different accepts with same state[%d]: %s != %s at example [%s][%s]" %
+                                         (self.state, self.accepts, ut.accepts, i, j))
+                            continue
+                        if (
+                            isinstance(self, (UnexpectedToken, UnexpectedEOF))
+                            and isinstance(ut, (UnexpectedToken, UnexpectedEOF))
+                        ):
+                            if ut.token == self.token:  ##
+
+                                logger.debug("Exact Match at example [%s][%s]" % (i, j))
+                                return label
+
+                            if token_type_match_fallback:
+                                ##
+
+                                if (ut.token.type == self.token.type) and not candidate[-1]:
+                                    logger.debug("Token Type Fallback at example [%s][%s]" % (i, j))
+                                    candidate = label, True
+
+                        if candidate[0] is None:
+                            logger.debug("Same State match at example [%s][%s]" % (i, j))
+                            candidate = label, False
+
+        return candidate[0]
+
+    def _format_expected(self, expected):
+        if self._terminals_by_name:
+            d = self._terminals_by_name
+            expected = [d[t_name].user_repr() if t_name in d else t_name for t_name in expected]
+        return "Expected one of: \n\t* %s\n" % '\n\t* '.join(expected)
+
+
+class UnexpectedEOF(ParseError, UnexpectedInput):
+    #--
+    expected: 'List[Token]'
+
+    def __init__(self, expected, state=None, terminals_by_name=None):
+        super(UnexpectedEOF, self).__init__()
+
+        self.expected = expected
+        self.state = state
+        from .lexer import Token
+        self.token = Token("<EOF>", "")  ##
+
+        self.pos_in_stream = -1
+        self.line = -1
+        self.column = -1
+        self._terminals_by_name = terminals_by_name
+
+
+    def __str__(self):
+        message = "Unexpected end-of-input. "
+        message += self._format_expected(self.expected)
+        return message
+
+
+class UnexpectedCharacters(LexError, UnexpectedInput):
+    #--
+
+    allowed: Set[str]
+    considered_tokens: Set[Any]
+
+    def __init__(self, seq, lex_pos, line, column, allowed=None, considered_tokens=None, state=None, token_history=None,
+                 terminals_by_name=None, considered_rules=None):
+        super(UnexpectedCharacters, self).__init__()
+
+        ##
+
+        self.line = line
+        self.column = column
+        self.pos_in_stream = lex_pos
+        self.state = state
+        self._terminals_by_name = terminals_by_name
+
+        self.allowed = allowed
+        self.considered_tokens = considered_tokens
+        self.considered_rules = considered_rules
+        self.token_history = token_history
+
+        if isinstance(seq, bytes):
+            self.char = seq[lex_pos:lex_pos + 1].decode("ascii", "backslashreplace")
+        else:
+            self.char = seq[lex_pos]
+        self._context = self.get_context(seq)
+
+
+    def __str__(self):
+        message = "No terminal matches '%s' in the current parser context, at line %d col %d" % (self.char, self.line, self.column)
+        message += '\n\n' + self._context
+        if self.allowed:
+            message += self._format_expected(self.allowed)
+        if self.token_history:
+            message += '\nPrevious tokens: %s\n' % ', '.join(repr(t) for t in self.token_history)
+        return message
+
+
+class UnexpectedToken(ParseError, UnexpectedInput):
+    #--
+
+    expected: Set[str]
+    considered_rules: Set[str]
+
+    def __init__(self, token, expected, considered_rules=None, state=None, interactive_parser=None, terminals_by_name=None, token_history=None):
+        super(UnexpectedToken, self).__init__()
+
+        ##
+
+        self.line = getattr(token, 'line', '?')
+        self.column = getattr(token, 'column', '?')
+        self.pos_in_stream = getattr(token, 'start_pos', None)
+        self.state = state
+
+        self.token = token
+        self.expected = expected  ##
+
+        self._accepts = NO_VALUE
+        self.considered_rules = considered_rules
+        self.interactive_parser = interactive_parser
+        self._terminals_by_name = terminals_by_name
+        self.token_history = token_history
+
+
+    @property
+    def accepts(self) -> Set[str]:
+        if self._accepts is NO_VALUE:
+            self._accepts = self.interactive_parser and self.interactive_parser.accepts()
+        return self._accepts
+
+    def __str__(self):
+        message = ("Unexpected token %r at line %s, column %s.\n%s"
+                   % (self.token, self.line, self.column, self._format_expected(self.accepts or self.expected)))
+        if self.token_history:
+            message += "Previous tokens: %r\n" % self.token_history
+
+        return message
+
+
+
+class VisitError(LarkError):
+    #--
+
+    obj: 'Union[Tree, Token]'
+    orig_exc: Exception
+
+    def __init__(self, rule, obj, orig_exc):
+        message = 'Error trying to process rule "%s":\n\n%s' % (rule, orig_exc)
+        super(VisitError, self).__init__(message)
+
+        self.rule = rule
+        self.obj = obj
+        self.orig_exc = orig_exc
+
+
+class MissingVariableError(LarkError):
+    pass
+
+
+import sys, re
+import logging
+from dataclasses import dataclass
+from typing import Generic, AnyStr
+
+logger: logging.Logger = logging.getLogger("lark")
+logger.addHandler(logging.StreamHandler())
+##
+
+##
+
+logger.setLevel(logging.CRITICAL)
+
+
+NO_VALUE = object()
+
+T = TypeVar("T")
+
+
+def classify(seq: Iterable, key: Optional[Callable] = None, value: Optional[Callable] = None) -> Dict:
+    d: Dict[Any, Any] = {}
+    for item in seq:
+        k = key(item) if (key is not None) else item
+        v = value(item) if (value is not None) else item
+        try:
+            d[k].append(v)
+        except KeyError:
+            d[k] = [v]
+    return d
+
+
+def _deserialize(data: Any, namespace: Dict[str, Any], memo: Dict) -> Any:
+    if isinstance(data, dict):
+        if '__type__' in data:  ##
+
+            class_ = namespace[data['__type__']]
+            return class_.deserialize(data, memo)
+        elif '@' in data:
+            return memo[data['@']]
+        return {key:_deserialize(value, namespace, memo) for key, value in data.items()}
+    elif isinstance(data, list):
+        return [_deserialize(value, namespace, memo) for value in data]
+    return data
+
+
+_T = TypeVar("_T", bound="Serialize")
+
+class Serialize:
+    #--
+
+    def memo_serialize(self, types_to_memoize: List) -> Any:
+        memo = SerializeMemoizer(types_to_memoize)
+        return self.serialize(memo), memo.serialize()
+
+    def serialize(self, memo = None) -> Dict[str, Any]:
+        if memo and memo.in_types(self):
+            return {'@': memo.memoized.get(self)}
+
+        fields = getattr(self, '__serialize_fields__')
+        res = {f: _serialize(getattr(self, f), memo) for f in fields}
+        res['__type__'] = type(self).__name__
+        if hasattr(self, '_serialize'):
+            self._serialize(res, memo)
+        return res
+
+    @classmethod
+    def deserialize(cls: Type[_T], data: Dict[str, Any], memo: Dict[int, Any]) -> _T:
+        namespace = getattr(cls, '__serialize_namespace__', [])
+        namespace = {c.__name__:c for c in namespace}
+
+        fields = getattr(cls, '__serialize_fields__')
+
+        if '@' in data:
+            return memo[data['@']]
+
+        inst = cls.__new__(cls)
+        for f in fields:
+            try:
+                setattr(inst, f, _deserialize(data[f], namespace, memo))
+            except KeyError as e:
+                raise KeyError("Cannot find key for class", cls, e)
+
+        if hasattr(inst, '_deserialize'):
+            inst._deserialize()
+
+        return inst
+
+
+class SerializeMemoizer(Serialize):
+    #--
+
+    __serialize_fields__ = 'memoized',
+
+    def __init__(self, types_to_memoize: List) -> None:
+        self.types_to_memoize = tuple(types_to_memoize)
+        self.memoized = Enumerator()
+
+    def in_types(self, value: Serialize) -> bool:
+        return isinstance(value, self.types_to_memoize)
+
+    def serialize(self) -> Dict[int, Any]:  ##
+
+        return _serialize(self.memoized.reversed(), None)
+
+    @classmethod
+    def deserialize(cls, data: Dict[int, Any], namespace: Dict[str, Any], memo: Dict[Any, Any]) -> Dict[int, Any]:  ##
+
+        return _deserialize(data, namespace, memo)
+
+
+try:
+    import regex
+    _has_regex = True
+except ImportError:
+    _has_regex = False
+
+if sys.version_info >= (3, 11):
+    import re._parser as sre_parse
+    import re._constants as sre_constants
+else:
+    import sre_parse
+    import sre_constants
+
+categ_pattern = re.compile(r'\\p{[A-Za-z_]+}')
+
+def get_regexp_width(expr: str) -> Union[Tuple[int, int], List[int]]:
+    if _has_regex:
+        ##
+
+        ##
+
+        ##
+
+        regexp_final = re.sub(categ_pattern, 'A', expr)
+    else:
+        if re.search(categ_pattern, expr):
+            raise ImportError('`regex` module must be installed in order to use Unicode categories.', expr)
+        regexp_final = expr
+    try:
+        ##
+
+        return [int(x) for x in sre_parse.parse(regexp_final).getwidth()]
+    except sre_constants.error:
+        if not _has_regex:
+            raise ValueError(expr)
+        else:
+            ##
+
+            ##
+
+            c = regex.compile(regexp_final)
+            ##
+
+            ##
+
+            MAXWIDTH = getattr(sre_parse, "MAXWIDTH", sre_constants.MAXREPEAT)
+            if c.match('') is None:
+                ##
+
+                return 1, int(MAXWIDTH)
+            else:
+                return 0, int(MAXWIDTH)
+
+
+@dataclass(frozen=True)
+class TextSlice(Generic[AnyStr]):
+    #--
+    text: AnyStr
+    start: int
+    end: int
+
+    def __post_init__(self):
+        if not isinstance(self.text, (str, bytes)):
+            raise TypeError("text must be str or bytes")
+
+        if self.start < 0:
+            object.__setattr__(self, 'start', self.start + len(self.text))
+            assert self.start >=0
+
+        if self.end is None:
+            object.__setattr__(self, 'end', len(self.text))
+        elif self.end < 0:
+            object.__setattr__(self, 'end', self.end + len(self.text))
+            assert self.end <= len(self.text)
+
+    @classmethod
+    def cast_from(cls, text: 'TextOrSlice') -> 'TextSlice[AnyStr]':
+        if isinstance(text, TextSlice):
+            return text
+
+        return cls(text, 0, len(text))
+
+    def is_complete_text(self):
+        return self.start == 0 and self.end == len(self.text)
+
+    def __len__(self):
+        return self.end - self.start
+
+    def count(self, substr: AnyStr):
+        return self.text.count(substr, self.start, self.end)
+
+    def rindex(self, substr: AnyStr):
+        return self.text.rindex(substr, self.start, self.end)
+
+
+TextOrSlice = Union[AnyStr, 'TextSlice[AnyStr]']
+LarkInput = Union[AnyStr, TextSlice[AnyStr], Any]
+
+
+
+class Meta:
+
+    empty: bool
+    line: int
+    column: int
+    start_pos: int
+    end_line: int
+    end_column: int
+    end_pos: int
+    orig_expansion: 'List[TerminalDef]'
+    match_tree: bool
+
+    def __init__(self):
+        self.empty = True
+
+
+_Leaf_T = TypeVar("_Leaf_T")
+Branch = Union[_Leaf_T, 'Tree[_Leaf_T]']
+
+
+class Tree(Generic[_Leaf_T]):
+    #--
+
+    data: str
+    children: 'List[Branch[_Leaf_T]]'
+
+    def __init__(self, data: str, children: 'List[Branch[_Leaf_T]]', meta: Optional[Meta]=None) -> None:
+        self.data = data
+        self.children = children
+        self._meta = meta
+
+    @property
+    def meta(self) -> Meta:
+        if self._meta is None:
+            self._meta = Meta()
+        return self._meta
+
+    def __repr__(self):
+        return 'Tree(%r, %r)' % (self.data, self.children)
+
+    __match_args__ = ("data", "children")
+
+    def _pretty_label(self):
+        return self.data
+
+    def _pretty(self, level, indent_str):
+        yield f'{indent_str*level}{self._pretty_label()}'
+        if len(self.children) == 1 and not isinstance(self.children[0], Tree):
+            yield f'\t{self.children[0]}\n'
+        else:
+            yield '\n'
+            for n in self.children:
+                if isinstance(n, Tree):
+                    yield from n._pretty(level+1, indent_str)
+                else:
+                    yield f'{indent_str*(level+1)}{n}\n'
+
+    def pretty(self, indent_str: str='  ') -> str:
+        #--
+        return ''.join(self._pretty(0, indent_str))
+
+    def __rich__(self, parent:Optional['rich.tree.Tree']=None) -> 'rich.tree.Tree':
+        #--
+        return self._rich(parent)
+
+    def _rich(self, parent):
+        if parent:
+            tree = parent.add(f'[bold]{self.data}[/bold]')
+        else:
+            import rich.tree
+            tree = rich.tree.Tree(self.data)
+
+        for c in self.children:
+            if isinstance(c, Tree):
+                c._rich(tree)
+            else:
+                tree.add(f'[green]{c}[/green]')
+
+        return tree
+
+    def __eq__(self, other):
+        try:
+            return self.data == other.data and self.children == other.children
+        except AttributeError:
+            return False
+
+    def __ne__(self, other):
+        return not (self == other)
+
+    def __hash__(self) -> int:
+        return hash((self.data, tuple(self.children)))
+
+    def iter_subtrees(self) -> 'Iterator[Tree[_Leaf_T]]':
+        #--
+        queue = [self]
+        subtrees = dict()
+        for subtree in queue:
+            subtrees[id(subtree)] = subtree
+            queue += [c for c in reversed(subtree.children)
+                      if isinstance(c, Tree) and id(c) not in subtrees]
+
+        del queue
+        return reversed(list(subtrees.values()))
+
+    def iter_subtrees_topdown(self):
+        #--
+        stack = [self]
+        stack_append = stack.append
+        stack_pop = stack.pop
+        while stack:
+            node = stack_pop()
+            if not isinstance(node, Tree):
+                continue
+            yield node
+            for child in reversed(node.children):
+                stack_append(child)
+
+    def find_pred(self, pred: 'Callable[[Tree[_Leaf_T]], bool]') -> 'Iterator[Tree[_Leaf_T]]':
+        #--
+        return filter(pred, self.iter_subtrees())
+
+    def find_data(self, data: str) -> 'Iterator[Tree[_Leaf_T]]':
+        #--
+        return self.find_pred(lambda t: t.data == data)
+
+
+from functools import wraps, update_wrapper
+from inspect import getmembers, getmro
+
+_Return_T = TypeVar('_Return_T')
+_Return_V = TypeVar('_Return_V')
+_Leaf_T = TypeVar('_Leaf_T')
+_Leaf_U = TypeVar('_Leaf_U')
+_R = TypeVar('_R')
+_FUNC = Callable[..., _Return_T]
+_DECORATED = Union[_FUNC, type]
+
+class _DiscardType:
+    #--
+
+    def __repr__(self):
+        return "lark.visitors.Discard"
+
+Discard = _DiscardType()
+
+##
+
+
+class _Decoratable:
+    #--
+
+    @classmethod
+    def _apply_v_args(cls, visit_wrapper):
+        mro = getmro(cls)
+        assert mro[0] is cls
+        libmembers = {name for _cls in mro[1:] for name, _ in getmembers(_cls)}
+        for name, value in getmembers(cls):
+
+            ##
+
+            if name.startswith('_') or (name in libmembers and name not in cls.__dict__):
+                continue
+            if not callable(value):
+                continue
+
+            ##
+
+            if isinstance(cls.__dict__[name], _VArgsWrapper):
+                continue
+
+            setattr(cls, name, _VArgsWrapper(cls.__dict__[name], visit_wrapper))
+        return cls
+
+    def __class_getitem__(cls, _):
+        return cls
+
+
+class Transformer(_Decoratable, ABC, Generic[_Leaf_T, _Return_T]):
+    #--
+    __visit_tokens__ = True   ##
+
+
+    def __init__(self,  visit_tokens: bool=True) -> None:
+        self.__visit_tokens__ = visit_tokens
+
+    def _call_userfunc(self, tree, new_children=None):
+        ##
+
+        children = new_children if new_children is not None else tree.children
+        try:
+            f = getattr(self, tree.data)
+        except AttributeError:
+            return self.__default__(tree.data, children, tree.meta)
+        else:
+            try:
+                wrapper = getattr(f, 'visit_wrapper', None)
+                if wrapper is not None:
+                    return f.visit_wrapper(f, tree.data, children, tree.meta)
+                else:
+                    return f(children)
+            except GrammarError:
+                raise
+            except Exception as e:
+                raise VisitError(tree.data, tree, e)
+
+    def _call_userfunc_token(self, token):
+        try:
+            f = getattr(self, token.type)
+        except AttributeError:
+            return self.__default_token__(token)
+        else:
+            try:
+                return f(token)
+            except GrammarError:
+                raise
+            except Exception as e:
+                raise VisitError(token.type, token, e)
+
+    def _transform_children(self, children):
+        for c in children:
+            if isinstance(c, Tree):
+                res = self._transform_tree(c)
+            elif self.__visit_tokens__ and isinstance(c, Token):
+                res = self._call_userfunc_token(c)
+            else:
+                res = c
+
+            if res is not Discard:
+                yield res
+
+    def _transform_tree(self, tree):
+        children = list(self._transform_children(tree.children))
+        return self._call_userfunc(tree, children)
+
+    def transform(self, tree: Tree[_Leaf_T]) -> _Return_T:
+        #--
+        res = list(self._transform_children([tree]))
+        if not res:
+            return None     ##
+
+        assert len(res) == 1
+        return res[0]
+
+    def __mul__(
+            self: 'Transformer[_Leaf_T, Tree[_Leaf_U]]',
+            other: 'Union[Transformer[_Leaf_U, _Return_V], TransformerChain[_Leaf_U, _Return_V,]]'
+    ) -> 'TransformerChain[_Leaf_T, _Return_V]':
+        #--
+        return TransformerChain(self, other)
+
+    def __default__(self, data, children, meta):
+        #--
+        return Tree(data, children, meta)
+
+    def __default_token__(self, token):
+        #--
+        return token
+
+
+def merge_transformers(base_transformer=None, **transformers_to_merge):
+    #--
+    if base_transformer is None:
+        base_transformer = Transformer()
+    for prefix, transformer in transformers_to_merge.items():
+        for method_name in dir(transformer):
+            method = getattr(transformer, method_name)
+            if not callable(method):
+                continue
+            if method_name.startswith("_") or method_name == "transform":
+                continue
+            prefixed_method = prefix + "__" + method_name
+            if hasattr(base_transformer, prefixed_method):
+                raise AttributeError("Cannot merge: method '%s' appears more than once" % prefixed_method)
+
+            setattr(base_transformer, prefixed_method, method)
+
+    return base_transformer
+
+
+class InlineTransformer(Transformer):   ##
+
+    def _call_userfunc(self, tree, new_children=None):
+        ##
+
+        children = new_children if new_children is not None else tree.children
+        try:
+            f = getattr(self, tree.data)
+        except AttributeError:
+            return self.__default__(tree.data, children, tree.meta)
+        else:
+            return f(*children)
+
+
+class TransformerChain(Generic[_Leaf_T, _Return_T]):
+
+    transformers: 'Tuple[Union[Transformer, TransformerChain], ...]'
+
+    def __init__(self, *transformers: 'Union[Transformer, TransformerChain]') -> None:
+        self.transformers = transformers
+
+    def transform(self, tree: Tree[_Leaf_T]) -> _Return_T:
+        for t in self.transformers:
+            tree = t.transform(tree)
+        return cast(_Return_T, tree)
+
+    def __mul__(
+            self: 'TransformerChain[_Leaf_T, Tree[_Leaf_U]]',
+            other: 'Union[Transformer[_Leaf_U, _Return_V], TransformerChain[_Leaf_U, _Return_V]]'
+    ) -> 'TransformerChain[_Leaf_T, _Return_V]':
+        return TransformerChain(*self.transformers + (other,))
+
+
+class Transformer_InPlace(Transformer[_Leaf_T, _Return_T]):
+    #--
+    def _transform_tree(self, tree):           ##
+
+        return self._call_userfunc(tree)
+
+    def transform(self, tree: Tree[_Leaf_T]) -> _Return_T:
+        for subtree in tree.iter_subtrees():
+            subtree.children = list(self._transform_children(subtree.children))
+
+        return self._transform_tree(tree)
+
+
+class Transformer_NonRecursive(Transformer[_Leaf_T, _Return_T]):
+    #--
+
+    def transform(self, tree: Tree[_Leaf_T]) -> _Return_T:
+        ##
+
+        rev_postfix = []
+        q: List[Branch[_Leaf_T]] = [tree]
+        while q:
+            t = q.pop()
+            rev_postfix.append(t)
+            if isinstance(t, Tree):
+                q += t.children
+
+        ##
+
+        stack: List = []
+        for x in reversed(rev_postfix):
+            if isinstance(x, Tree):
+                size = len(x.children)
+                if size:
+                    args = stack[-size:]
+                    del stack[-size:]
+                else:
+                    args = []
+
+                res = self._call_userfunc(x, args)
+                if res is not Discard:
+                    stack.append(res)
+
+            elif self.__visit_tokens__ and isinstance(x, Token):
+                res = self._call_userfunc_token(x)
+                if res is not Discard:
+                    stack.append(res)
+            else:
+                stack.append(x)
+
+        result, = stack  ##
+
+        ##
+
+        ##
+
+        ##
+
+        return cast(_Return_T, result)
+
+
+class Transformer_InPlaceRecursive(Transformer[_Leaf_T, _Return_T]):
+    #--
+    def _transform_tree(self, tree):
+        tree.children = list(self._transform_children(tree.children))
+        return self._call_userfunc(tree)
+
+
+##
+
+
+class VisitorBase:
+    def _call_userfunc(self, tree):
+        return getattr(self, tree.data, self.__default__)(tree)
+
+    def __default__(self, tree):
+        #--
+        return tree
+
+    def __class_getitem__(cls, _):
+        return cls
+
+
+class Visitor(VisitorBase, ABC, Generic[_Leaf_T]):
+    #--
+
+    def visit(self, tree: Tree[_Leaf_T]) -> Tree[_Leaf_T]:
+        #--
+        for subtree in tree.iter_subtrees():
+            self._call_userfunc(subtree)
+        return tree
+
+    def visit_topdown(self, tree: Tree[_Leaf_T]) -> Tree[_Leaf_T]:
+        #--
+        for subtree in tree.iter_subtrees_topdown():
+            self._call_userfunc(subtree)
+        return tree
+
+
+class Visitor_Recursive(VisitorBase, Generic[_Leaf_T]):
+    #--
+
+    def visit(self, tree: Tree[_Leaf_T]) -> Tree[_Leaf_T]:
+        #--
+        for child in tree.children:
+            if isinstance(child, Tree):
+                self.visit(child)
+
+        self._call_userfunc(tree)
+        return tree
+
+    def visit_topdown(self,tree: Tree[_Leaf_T]) -> Tree[_Leaf_T]:
+        #--
+        self._call_userfunc(tree)
+
+        for child in tree.children:
+            if isinstance(child, Tree):
+                self.visit_topdown(child)
+
+        return tree
+
+
+class Interpreter(_Decoratable, ABC, Generic[_Leaf_T, _Return_T]):
+    #--
+
+    def visit(self, tree: Tree[_Leaf_T]) -> _Return_T:
+        ##
+
+        ##
+
+        ##
+
+        return self._visit_tree(tree)
+
+    def _visit_tree(self, tree: Tree[_Leaf_T]):
+        f = getattr(self, tree.data)
+        wrapper = getattr(f, 'visit_wrapper', None)
+        if wrapper is not None:
+            return f.visit_wrapper(f, tree.data, tree.children, tree.meta)
+        else:
+            return f(tree)
+
+    def visit_children(self, tree: Tree[_Leaf_T]) -> List:
+        return [self._visit_tree(child) if isinstance(child, Tree) else child
+                for child in tree.children]
+
+    def __getattr__(self, name):
+        return self.__default__
+
+    def __default__(self, tree):
+        return self.visit_children(tree)
+
+
+_InterMethod = Callable[[Type[Interpreter], _Return_T], _R]
+
+def visit_children_decor(func: _InterMethod) -> _InterMethod:
+    #--
+    @wraps(func)
+    def inner(cls, tree):
+        values = cls.visit_children(tree)
+        return func(cls, values)
+    return inner
+
+##
+
+
+def _apply_v_args(obj, visit_wrapper):
+    try:
+        _apply = obj._apply_v_args
+    except AttributeError:
+        return _VArgsWrapper(obj, visit_wrapper)
+    else:
+        return _apply(visit_wrapper)
+
+
+class _VArgsWrapper:
+    #--
+    base_func: Callable
+
+    def __init__(self, func: Callable, visit_wrapper: Callable[[Callable, str, list, Any], Any]):
+        if isinstance(func, _VArgsWrapper):
+            func = func.base_func
+        self.base_func = func
+        self.visit_wrapper = visit_wrapper
+        update_wrapper(self, func)
+
+    def __call__(self, *args, **kwargs):
+        return self.base_func(*args, **kwargs)
+
+    def __get__(self, instance, owner=None):
+        try:
+            ##
+
+            ##
+
+            g = type(self.base_func).__get__
+        except AttributeError:
+            return self
+        else:
+            return _VArgsWrapper(g(self.base_func, instance, owner), self.visit_wrapper)
+
+    def __set_name__(self, owner, name):
+        try:
+            f = type(self.base_func).__set_name__
+        except AttributeError:
+            return
+        else:
+            f(self.base_func, owner, name)
+
+
+def _vargs_inline(f, _data, children, _meta):
+    return f(*children)
+def _vargs_meta_inline(f, _data, children, meta):
+    return f(meta, *children)
+def _vargs_meta(f, _data, children, meta):
+    return f(meta, children)
+def _vargs_tree(f, data, children, meta):
+    return f(Tree(data, children, meta))
+
+
+def v_args(inline: bool = False, meta: bool = False, tree: bool = False, wrapper: Optional[Callable] = None) -> Callable[[_DECORATED], _DECORATED]:
+    #--
+    if tree and (meta or inline):
+        raise ValueError("Visitor functions cannot combine 'tree' with 'meta' or 'inline'.")
+
+    func = None
+    if meta:
+        if inline:
+            func = _vargs_meta_inline
+        else:
+            func = _vargs_meta
+    elif inline:
+        func = _vargs_inline
+    elif tree:
+        func = _vargs_tree
+
+    if wrapper is not None:
+        if func is not None:
+            raise ValueError("Cannot use 'wrapper' along with 'tree', 'meta' or 'inline'.")
+        func = wrapper
+
+    def _visitor_args_dec(obj):
+        return _apply_v_args(obj, func)
+    return _visitor_args_dec
+
+
+
+TOKEN_DEFAULT_PRIORITY = 0
+
+
+class Symbol(Serialize):
+    __slots__ = ('name',)
+
+    name: str
+    is_term: ClassVar[bool] = NotImplemented
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __eq__(self, other):
+        if not isinstance(other, Symbol):
+            return NotImplemented
+        return self.is_term == other.is_term and self.name == other.name
+
+    def __ne__(self, other):
+        return not (self == other)
+
+    def __hash__(self):
+        return hash(self.name)
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.name)
+
+    fullrepr = property(__repr__)
+
+    def renamed(self, f):
+        return type(self)(f(self.name))
+
+
+class Terminal(Symbol):
+    __serialize_fields__ = 'name', 'filter_out'
+
+    is_term: ClassVar[bool] = True
+
+    def __init__(self, name: str, filter_out: bool = False) -> None:
+        self.name = name
+        self.filter_out = filter_out
+
+    @property
+    def fullrepr(self):
+        return '%s(%r, %r)' % (type(self).__name__, self.name, self.filter_out)
+
+    def renamed(self, f):
+        return type(self)(f(self.name), self.filter_out)
+
+
+class NonTerminal(Symbol):
+    __serialize_fields__ = 'name',
+
+    is_term: ClassVar[bool] = False
+
+    def serialize(self, memo=None) -> Dict[str, Any]:
+        ##
+
+        ##
+
+        return {'name': str(self.name), '__type__': 'NonTerminal'}
+
+
+class RuleOptions(Serialize):
+    __serialize_fields__ = 'keep_all_tokens', 'expand1', 'priority', 'template_source', 'empty_indices'
+
+    keep_all_tokens: bool
+    expand1: bool
+    priority: Optional[int]
+    template_source: Optional[str]
+    empty_indices: Tuple[bool, ...]
+
+    def __init__(self, keep_all_tokens: bool=False, expand1: bool=False, priority: Optional[int]=None, template_source: Optional[str]=None, empty_indices: Tuple[bool, ...]=()) -> None:
+        self.keep_all_tokens = keep_all_tokens
+        self.expand1 = expand1
+        self.priority = priority
+        self.template_source = template_source
+        self.empty_indices = empty_indices
+
+    def __repr__(self):
+        return 'RuleOptions(%r, %r, %r, %r)' % (
+            self.keep_all_tokens,
+            self.expand1,
+            self.priority,
+            self.template_source
+        )
+
+
+class Rule(Serialize):
+    #--
+    __slots__ = ('origin', 'expansion', 'alias', 'options', 'order', '_hash')
+
+    __serialize_fields__ = 'origin', 'expansion', 'order', 'alias', 'options'
+    __serialize_namespace__ = Terminal, NonTerminal, RuleOptions
+
+    origin: NonTerminal
+    expansion: Sequence[Symbol]
+    order: int
+    alias: Optional[str]
+    options: RuleOptions
+    _hash: int
+
+    def __init__(self, origin: NonTerminal, expansion: Sequence[Symbol],
+                 order: int=0, alias: Optional[str]=None, options: Optional[RuleOptions]=None):
+        self.origin = origin
+        self.expansion = expansion
+        self.alias = alias
+        self.order = order
+        self.options = options or RuleOptions()
+        self._hash = hash((self.origin, tuple(self.expansion)))
+
+    def _deserialize(self):
+        self._hash = hash((self.origin, tuple(self.expansion)))
+
+    def __str__(self):
+        return '<%s : %s>' % (self.origin.name, ' '.join(x.name for x in self.expansion))
+
+    def __repr__(self):
+        return 'Rule(%r, %r, %r, %r)' % (self.origin, self.expansion, self.alias, self.options)
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if not isinstance(other, Rule):
+            return False
+        return self.origin == other.origin and self.expansion == other.expansion
+
+
+
+from contextlib import suppress
+from copy import copy
+
+try:  ##
+
+    has_interegular = bool(interegular)
+except NameError:
+    has_interegular = False
+
+class Pattern(Serialize, ABC):
+    #--
+
+    value: str
+    flags: Collection[str]
+    raw: Optional[str]
+    type: ClassVar[str]
+
+    def __init__(self, value: str, flags: Collection[str] = (), raw: Optional[str] = None) -> None:
+        self.value = value
+        self.flags = frozenset(flags)
+        self.raw = raw
+
+    def __repr__(self):
+        return repr(self.to_regexp())
+
+    ##
+
+    def __hash__(self):
+        return hash((type(self), self.value, self.flags))
+
+    def __eq__(self, other):
+        return type(self) == type(other) and self.value == other.value and self.flags == other.flags
+
+    @abstractmethod
+    def to_regexp(self) -> str:
+        raise NotImplementedError()
+
+    @property
+    @abstractmethod
+    def min_width(self) -> int:
+        raise NotImplementedError()
+
+    @property
+    @abstractmethod
+    def max_width(self) -> int:
+        raise NotImplementedError()
+
+    def _get_flags(self, value):
+        for f in self.flags:
+            value = ('(?%s:%s)' % (f, value))
+        return value
+
+
+class PatternStr(Pattern):
+    __serialize_fields__ = 'value', 'flags', 'raw'
+
+    type: ClassVar[str] = "str"
+
+    def to_regexp(self) -> str:
+        return self._get_flags(re.escape(self.value))
+
+    @property
+    def min_width(self) -> int:
+        return len(self.value)
+
+    @property
+    def max_width(self) -> int:
+        return len(self.value)
+
+
+class PatternRE(Pattern):
+    __serialize_fields__ = 'value', 'flags', 'raw', '_width'
+
+    type: ClassVar[str] = "re"
+
+    def to_regexp(self) -> str:
+        return self._get_flags(self.value)
+
+    _width = None
+    def _get_width(self):
+        if self._width is None:
+            self._width = get_regexp_width(self.to_regexp())
+        return self._width
+
+    @property
+    def min_width(self) -> int:
+        return self._get_width()[0]
+
+    @property
+    def max_width(self) -> int:
+        return self._get_width()[1]
+
+
+class TerminalDef(Serialize):
+    #--
+    __serialize_fields__ = 'name', 'pattern', 'priority'
+    __serialize_namespace__ = PatternStr, PatternRE
+
+    name: str
+    pattern: Pattern
+    priority: int
+
+    def __init__(self, name: str, pattern: Pattern, priority: int = TOKEN_DEFAULT_PRIORITY) -> None:
+        assert isinstance(pattern, Pattern), pattern
+        self.name = name
+        self.pattern = pattern
+        self.priority = priority
+
+    def __repr__(self):
+        return '%s(%r, %r)' % (type(self).__name__, self.name, self.pattern)
+
+    def user_repr(self) -> str:
+        if self.name.startswith('__'):  ##
+
+            return self.pattern.raw or self.name
+        else:
+            return self.name
+
+_T = TypeVar('_T', bound="Token")
+
+class Token(str):
+    #--
+    __slots__ = ('type', 'start_pos', 'value', 'line', 'column', 'end_line', 'end_column', 'end_pos')
+
+    __match_args__ = ('type', 'value')
+
+    type: str
+    start_pos: Optional[int]
+    value: Any
+    line: Optional[int]
+    column: Optional[int]
+    end_line: Optional[int]
+    end_column: Optional[int]
+    end_pos: Optional[int]
+
+
+    @overload
+    def __new__(
+            cls,
+            type: str,
+            value: Any,
+            start_pos: Optional[int] = None,
+            line: Optional[int] = None,
+            column: Optional[int] = None,
+            end_line: Optional[int] = None,
+            end_column: Optional[int] = None,
+            end_pos: Optional[int] = None
+    ) -> 'Token':
+        ...
+
+    @overload
+    def __new__(
+            cls,
+            type_: str,
+            value: Any,
+            start_pos: Optional[int] = None,
+            line: Optional[int] = None,
+            column: Optional[int] = None,
+            end_line: Optional[int] = None,
+            end_column: Optional[int] = None,
+            end_pos: Optional[int] = None
+    ) -> 'Token':        ...
+
+    def __new__(cls, *args, **kwargs):
+        if "type_" in kwargs:
+            warnings.warn("`type_` is deprecated use `type` instead", DeprecationWarning)
+
+            if "type" in kwargs:
+                raise TypeError("Error: using both 'type' and the deprecated 'type_' as arguments.")
+            kwargs["type"] = kwargs.pop("type_")
+
+        return cls._future_new(*args, **kwargs)
+
+
+    @classmethod
+    def _future_new(cls, type, value, start_pos=None, line=None, column=None, end_line=None, end_column=None, end_pos=None):
+        inst = super(Token, cls).__new__(cls, value)
+
+        inst.type = type
+        inst.start_pos = start_pos
+        inst.value = value
+        inst.line = line
+        inst.column = column
+        inst.end_line = end_line
+        inst.end_column = end_column
+        inst.end_pos = end_pos
+        return inst
+
+    @overload
+    def update(self, type: Optional[str] = None, value: Optional[Any] = None) -> 'Token':
+        ...
+
+    @overload
+    def update(self, type_: Optional[str] = None, value: Optional[Any] = None) -> 'Token':
+        ...
+
+    def update(self, *args, **kwargs):
+        if "type_" in kwargs:
+            warnings.warn("`type_` is deprecated use `type` instead", DeprecationWarning)
+
+            if "type" in kwargs:
+                raise TypeError("Error: using both 'type' and the deprecated 'type_' as arguments.")
+            kwargs["type"] = kwargs.pop("type_")
+
+        return self._future_update(*args, **kwargs)
+
+    def _future_update(self, type: Optional[str] = None, value: Optional[Any] = None) -> 'Token':
+        return Token.new_borrow_pos(
+            type if type is not None else self.type,
+            value if value is not None else self.value,
+            self
+        )
+
+    @classmethod
+    def new_borrow_pos(cls: Type[_T], type_: str, value: Any, borrow_t: 'Token') -> _T:
+        return cls(type_, value, borrow_t.start_pos, borrow_t.line, borrow_t.column, borrow_t.end_line, borrow_t.end_column, borrow_t.end_pos)
+
+    def __reduce__(self):
+        return (self.__class__, (self.type, self.value, self.start_pos, self.line, self.column))
+
+    def __repr__(self):
+        return 'Token(%r, %r)' % (self.type, self.value)
+
+    def __deepcopy__(self, memo):
+        return Token(self.type, self.value, self.start_pos, self.line, self.column)
+
+    def __eq__(self, other):
+        if isinstance(other, Token) and self.type != other.type:
+            return False
+
+        return str.__eq__(self, other)
+
+    __hash__ = str.__hash__
+
+
+class LineCounter:
+    #--
+
+    __slots__ = 'char_pos', 'line', 'column', 'line_start_pos', 'newline_char'
+
+    def __init__(self, newline_char):
+        self.newline_char = newline_char
+        self.char_pos = 0
+        self.line = 1
+        self.column = 1
+        self.line_start_pos = 0
+
+    def __eq__(self, other):
+        if not isinstance(other, LineCounter):
+            return NotImplemented
+
+        return self.char_pos == other.char_pos and self.newline_char == other.newline_char
+
+    def feed(self, token: TextOrSlice, test_newline=True):
+        #--
+        if test_newline:
+            newlines = token.count(self.newline_char)
+            if newlines:
+                self.line += newlines
+                self.line_start_pos = self.char_pos + token.rindex(self.newline_char) + 1
+
+        self.char_pos += len(token)
+        self.column = self.char_pos - self.line_start_pos + 1
+
+
+class UnlessCallback:
+    def __init__(self, scanner: 'Scanner'):
+        self.scanner = scanner
+
+    def __call__(self, t: Token):
+        res = self.scanner.fullmatch(t.value)
+        if res is not None:
+            t.type = res
+        return t
+
+
+class CallChain:
+    def __init__(self, callback1, callback2, cond):
+        self.callback1 = callback1
+        self.callback2 = callback2
+        self.cond = cond
+
+    def __call__(self, t):
+        t2 = self.callback1(t)
+        return self.callback2(t) if self.cond(t2) else t2
+
+
+def _get_match(re_, regexp, s, flags):
+    m = re_.match(regexp, s, flags)
+    if m:
+        return m.group(0)
+
+def _create_unless(terminals, g_regex_flags, re_, use_bytes):
+    tokens_by_type = classify(terminals, lambda t: type(t.pattern))
+    assert len(tokens_by_type) <= 2, tokens_by_type.keys()
+    embedded_strs = set()
+    callback = {}
+    for retok in tokens_by_type.get(PatternRE, []):
+        unless = []
+        for strtok in tokens_by_type.get(PatternStr, []):
+            if strtok.priority != retok.priority:
+                continue
+            s = strtok.pattern.value
+            if s == _get_match(re_, retok.pattern.to_regexp(), s, g_regex_flags):
+                unless.append(strtok)
+                if strtok.pattern.flags <= retok.pattern.flags:
+                    embedded_strs.add(strtok)
+        if unless:
+            callback[retok.name] = UnlessCallback(Scanner(unless, g_regex_flags, re_, use_bytes=use_bytes))
+
+    new_terminals = [t for t in terminals if t not in embedded_strs]
+    return new_terminals, callback
+
+
+class Scanner:
+    def __init__(self, terminals, g_regex_flags, re_, use_bytes):
+        self.terminals = terminals
+        self.g_regex_flags = g_regex_flags
+        self.re_ = re_
+        self.use_bytes = use_bytes
+
+        self.allowed_types = {t.name for t in self.terminals}
+
+        self._mres = self._build_mres(terminals, len(terminals))
+
+    def _build_mres(self, terminals, max_size):
+        ##
+
+        ##
+
+        ##
+
+        mres = []
+        while terminals:
+            pattern = u'|'.join(u'(?P<%s>%s)' % (t.name, t.pattern.to_regexp()) for t in terminals[:max_size])
+            if self.use_bytes:
+                pattern = pattern.encode('latin-1')
+            try:
+                mre = self.re_.compile(pattern, self.g_regex_flags)
+            except AssertionError:  ##
+
+                return self._build_mres(terminals, max_size // 2)
+
+            mres.append(mre)
+            terminals = terminals[max_size:]
+        return mres
+
+    def match(self, text: TextSlice, pos):
+        for mre in self._mres:
+            m = mre.match(text.text, pos, text.end)
+            if m:
+                return m.group(0), m.lastgroup
+
+
+    def fullmatch(self, text: str) -> Optional[str]:
+        for mre in self._mres:
+            m = mre.fullmatch(text)
+            if m:
+                return m.lastgroup
+        return None
+
+def _regexp_has_newline(r: str):
+    #--
+    return '\n' in r or '\\n' in r or '\\s' in r or '[^' in r or ('(?s' in r and '.' in r)
+
+
+class LexerState:
+    #--
+
+    __slots__ = 'text', 'line_ctr', 'last_token'
+
+    text: TextSlice
+    line_ctr: LineCounter
+    last_token: Optional[Token]
+
+    def __init__(self, text: TextSlice, line_ctr: Optional[LineCounter] = None, last_token: Optional[Token]=None):
+        if isinstance(text, TextSlice):
+            if line_ctr is None:
+                line_ctr = LineCounter(b'\n' if isinstance(text.text, bytes) else '\n')
+
+                if text.start > 0:
+                    ##
+
+                    line_ctr.feed(TextSlice(text.text, 0, text.start))
+
+            if not (text.start <= line_ctr.char_pos <= text.end):
+                raise ValueError("LineCounter.char_pos is out of bounds")
+
+        self.text = text
+        self.line_ctr = line_ctr
+        self.last_token = last_token
+
+
+    def __eq__(self, other):
+        if not isinstance(other, LexerState):
+            return NotImplemented
+
+        return self.text == other.text and self.line_ctr == other.line_ctr and self.last_token == other.last_token
+
+    def __copy__(self):
+        return type(self)(self.text, copy(self.line_ctr), self.last_token)
+
+
+class LexerThread:
+    #--
+
+    def __init__(self, lexer: 'Lexer', lexer_state: Optional[LexerState]):
+        self.lexer = lexer
+        self.state = lexer_state
+
+    @classmethod
+    def from_text(cls, lexer: 'Lexer', text_or_slice: TextOrSlice) -> 'LexerThread':
+        text = TextSlice.cast_from(text_or_slice)
+        return cls(lexer, LexerState(text))
+
+    @classmethod
+    def from_custom_input(cls, lexer: 'Lexer', text: Any) -> 'LexerThread':
+        return cls(lexer, LexerState(text))
+
+    def lex(self, parser_state):
+        if self.state is None:
+            raise TypeError("Cannot lex: No text assigned to lexer state")
+        return self.lexer.lex(self.state, parser_state)
+
+    def __copy__(self):
+        return type(self)(self.lexer, copy(self.state))
+
+    _Token = Token
+
+
+_Callback = Callable[[Token], Token]
+
+class Lexer(ABC):
+    #--
+    @abstractmethod
+    def lex(self, lexer_state: LexerState, parser_state: Any) -> Iterator[Token]:
+        return NotImplemented
+
+    def make_lexer_state(self, text: str):
+        #--
+        return LexerState(TextSlice.cast_from(text))
+
+
+def _check_regex_collisions(terminal_to_regexp: Dict[TerminalDef, str], comparator, strict_mode, max_collisions_to_show=8):
+    if not comparator:
+        comparator = interegular.Comparator.from_regexes(terminal_to_regexp)
+
+    ##
+
+    ##
+
+    max_time = 2 if strict_mode else 0.2
+
+    ##
+
+    if comparator.count_marked_pairs() >= max_collisions_to_show:
+        return
+    for group in classify(terminal_to_regexp, lambda t: t.priority).values():
+        for a, b in comparator.check(group, skip_marked=True):
+            assert a.priority == b.priority
+            ##
+
+            comparator.mark(a, b)
+
+            ##
+
+            message = f"Collision between Terminals {a.name} and {b.name}. "
+            try:
+                example = comparator.get_example_overlap(a, b, max_time).format_multiline()
+            except ValueError:
+                ##
+
+                example = "No example could be found fast enough. However, the collision does still exists"
+            if strict_mode:
+                raise LexError(f"{message}\n{example}")
+            logger.warning("%s The lexer will choose between them arbitrarily.\n%s", message, example)
+            if comparator.count_marked_pairs() >= max_collisions_to_show:
+                logger.warning("Found 8 regex collisions, will not check for more.")
+                return
+
+
+class AbstractBasicLexer(Lexer):
+    terminals_by_name: Dict[str, TerminalDef]
+
+    @abstractmethod
+    def __init__(self, conf: 'LexerConf', comparator=None) -> None:
+        ...
+
+    @abstractmethod
+    def next_token(self, lex_state: LexerState, parser_state: Any = None) -> Token:
+        ...
+
+    def lex(self, state: LexerState, parser_state: Any) -> Iterator[Token]:
+        with suppress(EOFError):
+            while True:
+                yield self.next_token(state, parser_state)
+
+
+class BasicLexer(AbstractBasicLexer):
+    terminals: Collection[TerminalDef]
+    ignore_types: FrozenSet[str]
+    newline_types: FrozenSet[str]
+    user_callbacks: Dict[str, _Callback]
+    callback: Dict[str, _Callback]
+    re: ModuleType
+
+    def __init__(self, conf: 'LexerConf', comparator=None) -> None:
+        terminals = list(conf.terminals)
+        assert all(isinstance(t, TerminalDef) for t in terminals), terminals
+
+        self.re = conf.re_module
+
+        if not conf.skip_validation:
+            ##
+
+            terminal_to_regexp = {}
+            for t in terminals:
+                regexp = t.pattern.to_regexp()
+                try:
+                    self.re.compile(regexp, conf.g_regex_flags)
+                except self.re.error:
+                    raise LexError("Cannot compile token %s: %s" % (t.name, t.pattern))
+
+                if t.pattern.min_width == 0:
+                    raise LexError("Lexer does not allow zero-width terminals. (%s: %s)" % (t.name, t.pattern))
+                if t.pattern.type == "re":
+                    terminal_to_regexp[t] = regexp
+
+            if not (set(conf.ignore) <= {t.name for t in terminals}):
+                raise LexError("Ignore terminals are not defined: %s" % (set(conf.ignore) - {t.name for t in terminals}))
+
+            if has_interegular:
+                _check_regex_collisions(terminal_to_regexp, comparator, conf.strict)
+            elif conf.strict:
+                raise LexError("interegular must be installed for strict mode. Use `pip install 'lark[interegular]'`.")
+
+        ##
+
+        self.newline_types = frozenset(t.name for t in terminals if _regexp_has_newline(t.pattern.to_regexp()))
+        self.ignore_types = frozenset(conf.ignore)
+
+        terminals.sort(key=lambda x: (-x.priority, -x.pattern.max_width, -len(x.pattern.value), x.name))
+        self.terminals = terminals
+        self.user_callbacks = conf.callbacks
+        self.g_regex_flags = conf.g_regex_flags
+        self.use_bytes = conf.use_bytes
+        self.terminals_by_name = conf.terminals_by_name
+
+        self._scanner: Optional[Scanner] = None
+
+    def _build_scanner(self) -> Scanner:
+        terminals, self.callback = _create_unless(self.terminals, self.g_regex_flags, self.re, self.use_bytes)
+        assert all(self.callback.values())
+
+        for type_, f in self.user_callbacks.items():
+            if type_ in self.callback:
+                ##
+
+                self.callback[type_] = CallChain(self.callback[type_], f, lambda t: t.type == type_)
+            else:
+                self.callback[type_] = f
+
+        return Scanner(terminals, self.g_regex_flags, self.re, self.use_bytes)
+
+    @property
+    def scanner(self) -> Scanner:
+        if self._scanner is None:
+            self._scanner = self._build_scanner()
+        return self._scanner
+
+    def match(self, text, pos):
+        return self.scanner.match(text, pos)
+
+    def next_token(self, lex_state: LexerState, parser_state: Any = None) -> Token:
+        line_ctr = lex_state.line_ctr
+        while line_ctr.char_pos < lex_state.text.end:
+            res = self.match(lex_state.text, line_ctr.char_pos)
+            if not res:
+                allowed = self.scanner.allowed_types - self.ignore_types
+                if not allowed:
+                    allowed = {"<END-OF-FILE>"}
+                raise UnexpectedCharacters(lex_state.text.text, line_ctr.char_pos, line_ctr.line, line_ctr.column,
+                                           allowed=allowed, token_history=lex_state.last_token and [lex_state.last_token],
+                                           state=parser_state, terminals_by_name=self.terminals_by_name)
+
+            value, type_ = res
+
+            ignored = type_ in self.ignore_types
+            t = None
+            if not ignored or type_ in self.callback:
+                t = Token(type_, value, line_ctr.char_pos, line_ctr.line, line_ctr.column)
+            line_ctr.feed(value, type_ in self.newline_types)
+            if t is not None:
+                t.end_line = line_ctr.line
+                t.end_column = line_ctr.column
+                t.end_pos = line_ctr.char_pos
+                if t.type in self.callback:
+                    t = self.callback[t.type](t)
+                if not ignored:
+                    if not isinstance(t, Token):
+                        raise LexError("Callbacks must return a token (returned %r)" % t)
+                    lex_state.last_token = t
+                    return t
+
+        ##
+
+        raise EOFError(self)
+
+
+class ContextualLexer(Lexer):
+    lexers: Dict[int, AbstractBasicLexer]
+    root_lexer: AbstractBasicLexer
+
+    BasicLexer: Type[AbstractBasicLexer] = BasicLexer
+
+    def __init__(self, conf: 'LexerConf', states: Dict[int, Collection[str]], always_accept: Collection[str]=()) -> None:
+        terminals = list(conf.terminals)
+        terminals_by_name = conf.terminals_by_name
+
+        trad_conf = copy(conf)
+        trad_conf.terminals = terminals
+
+        if has_interegular and not conf.skip_validation:
+            comparator = interegular.Comparator.from_regexes({t: t.pattern.to_regexp() for t in terminals})
+        else:
+            comparator = None
+        lexer_by_tokens: Dict[FrozenSet[str], AbstractBasicLexer] = {}
+        self.lexers = {}
+        for state, accepts in states.items():
+            key = frozenset(accepts)
+            try:
+                lexer = lexer_by_tokens[key]
+            except KeyError:
+                accepts = set(accepts) | set(conf.ignore) | set(always_accept)
+                lexer_conf = copy(trad_conf)
+                lexer_conf.terminals = [terminals_by_name[n] for n in accepts if n in terminals_by_name]
+                lexer = self.BasicLexer(lexer_conf, comparator)
+                lexer_by_tokens[key] = lexer
+
+            self.lexers[state] = lexer
+
+        assert trad_conf.terminals is terminals
+        trad_conf.skip_validation = True  ##
+
+        self.root_lexer = self.BasicLexer(trad_conf, comparator)
+
+    def lex(self, lexer_state: LexerState, parser_state: 'ParserState') -> Iterator[Token]:
+        try:
+            while True:
+                lexer = self.lexers[parser_state.position]
+                yield lexer.next_token(lexer_state, parser_state)
+        except EOFError:
+            pass
+        except UnexpectedCharacters as e:
+            ##
+
+            ##
+
+            try:
+                last_token = lexer_state.last_token  ##
+
+                token = self.root_lexer.next_token(lexer_state, parser_state)
+                raise UnexpectedToken(token, e.allowed, state=parser_state, token_history=[last_token], terminals_by_name=self.root_lexer.terminals_by_name)
+            except UnexpectedCharacters:
+                raise e  ##
+
+
+
+
+_ParserArgType: 'TypeAlias' = 'Literal["earley", "lalr", "cyk", "auto"]'
+_LexerArgType: 'TypeAlias' = 'Union[Literal["auto", "basic", "contextual", "dynamic", "dynamic_complete"], Type[Lexer]]'
+_LexerCallback = Callable[[Token], Token]
+ParserCallbacks = Dict[str, Callable]
+
+class LexerConf(Serialize):
+    __serialize_fields__ = 'terminals', 'ignore', 'g_regex_flags', 'use_bytes', 'lexer_type'
+    __serialize_namespace__ = TerminalDef,
+
+    terminals: Collection[TerminalDef]
+    re_module: ModuleType
+    ignore: Collection[str]
+    postlex: 'Optional[PostLex]'
+    callbacks: Dict[str, _LexerCallback]
+    g_regex_flags: int
+    skip_validation: bool
+    use_bytes: bool
+    lexer_type: Optional[_LexerArgType]
+    strict: bool
+
+    def __init__(self, terminals: Collection[TerminalDef], re_module: ModuleType, ignore: Collection[str]=(), postlex: 'Optional[PostLex]'=None,
+                 callbacks: Optional[Dict[str, _LexerCallback]]=None, g_regex_flags: int=0, skip_validation: bool=False, use_bytes: bool=False, strict: bool=False):
+        self.terminals = terminals
+        self.terminals_by_name = {t.name: t for t in self.terminals}
+        assert len(self.terminals) == len(self.terminals_by_name)
+        self.ignore = ignore
+        self.postlex = postlex
+        self.callbacks = callbacks or {}
+        self.g_regex_flags = g_regex_flags
+        self.re_module = re_module
+        self.skip_validation = skip_validation
+        self.use_bytes = use_bytes
+        self.strict = strict
+        self.lexer_type = None
+
+    def _deserialize(self):
+        self.terminals_by_name = {t.name: t for t in self.terminals}
+
+    def __deepcopy__(self, memo=None):
+        return type(self)(
+            deepcopy(self.terminals, memo),
+            self.re_module,
+            deepcopy(self.ignore, memo),
+            deepcopy(self.postlex, memo),
+            deepcopy(self.callbacks, memo),
+            deepcopy(self.g_regex_flags, memo),
+            deepcopy(self.skip_validation, memo),
+            deepcopy(self.use_bytes, memo),
+        )
+
+class ParserConf(Serialize):
+    __serialize_fields__ = 'rules', 'start', 'parser_type'
+
+    rules: List['Rule']
+    callbacks: ParserCallbacks
+    start: List[str]
+    parser_type: _ParserArgType
+
+    def __init__(self, rules: List['Rule'], callbacks: ParserCallbacks, start: List[str]):
+        assert isinstance(start, list)
+        self.rules = rules
+        self.callbacks = callbacks
+        self.start = start
+
+
+from functools import partial, wraps
+from itertools import product
+
+
+class ExpandSingleChild:
+    def __init__(self, node_builder):
+        self.node_builder = node_builder
+
+    def __call__(self, children):
+        if len(children) == 1:
+            return children[0]
+        else:
+            return self.node_builder(children)
+
+
+
+class PropagatePositions:
+    def __init__(self, node_builder, node_filter=None):
+        self.node_builder = node_builder
+        self.node_filter = node_filter
+
+    def __call__(self, children):
+        res = self.node_builder(children)
+
+        if isinstance(res, Tree):
+            ##
+
+            ##
+
+            ##
+
+            ##
+
+
+            res_meta = res.meta
+
+            first_meta = self._pp_get_meta(children)
+            if first_meta is not None:
+                if not hasattr(res_meta, 'line'):
+                    ##
+
+                    res_meta.line = getattr(first_meta, 'container_line', first_meta.line)
+                    res_meta.column = getattr(first_meta, 'container_column', first_meta.column)
+                    res_meta.start_pos = getattr(first_meta, 'container_start_pos', first_meta.start_pos)
+                    res_meta.empty = False
+
+                res_meta.container_line = getattr(first_meta, 'container_line', first_meta.line)
+                res_meta.container_column = getattr(first_meta, 'container_column', first_meta.column)
+                res_meta.container_start_pos = getattr(first_meta, 'container_start_pos', first_meta.start_pos)
+
+            last_meta = self._pp_get_meta(reversed(children))
+            if last_meta is not None:
+                if not hasattr(res_meta, 'end_line'):
+                    res_meta.end_line = getattr(last_meta, 'container_end_line', last_meta.end_line)
+                    res_meta.end_column = getattr(last_meta, 'container_end_column', last_meta.end_column)
+                    res_meta.end_pos = getattr(last_meta, 'container_end_pos', last_meta.end_pos)
+                    res_meta.empty = False
+
+                res_meta.container_end_line = getattr(last_meta, 'container_end_line', last_meta.end_line)
+                res_meta.container_end_column = getattr(last_meta, 'container_end_column', last_meta.end_column)
+                res_meta.container_end_pos = getattr(last_meta, 'container_end_pos', last_meta.end_pos)
+
+        return res
+
+    def _pp_get_meta(self, children):
+        for c in children:
+            if self.node_filter is not None and not self.node_filter(c):
+                continue
+            if isinstance(c, Tree):
+                if not c.meta.empty:
+                    return c.meta
+            elif isinstance(c, Token):
+                return c
+            elif hasattr(c, '__lark_meta__'):
+                return c.__lark_meta__()
+
+def make_propagate_positions(option):
+    if callable(option):
+        return partial(PropagatePositions, node_filter=option)
+    elif option is True:
+        return PropagatePositions
+    elif option is False:
+        return None
+
+    raise ConfigurationError('Invalid option for propagate_positions: %r' % option)
+
+
+class ChildFilter:
+    def __init__(self, to_include, append_none, node_builder):
+        self.node_builder = node_builder
+        self.to_include = to_include
+        self.append_none = append_none
+
+    def __call__(self, children):
+        filtered = []
+
+        for i, to_expand, add_none in self.to_include:
+            if add_none:
+                filtered += [None] * add_none
+            if to_expand:
+                filtered += children[i].children
+            else:
+                filtered.append(children[i])
+
+        if self.append_none:
+            filtered += [None] * self.append_none
+
+        return self.node_builder(filtered)
+
+
+class ChildFilterLALR(ChildFilter):
+    #--
+
+    def __call__(self, children):
+        filtered = []
+        for i, to_expand, add_none in self.to_include:
+            if add_none:
+                filtered += [None] * add_none
+            if to_expand:
+                if filtered:
+                    filtered += children[i].children
+                else:   ##
+
+                    filtered = children[i].children
+            else:
+                filtered.append(children[i])
+
+        if self.append_none:
+            filtered += [None] * self.append_none
+
+        return self.node_builder(filtered)
+
+
+class ChildFilterLALR_NoPlaceholders(ChildFilter):
+    #--
+    def __init__(self, to_include, node_builder):
+        self.node_builder = node_builder
+        self.to_include = to_include
+
+    def __call__(self, children):
+        filtered = []
+        for i, to_expand in self.to_include:
+            if to_expand:
+                if filtered:
+                    filtered += children[i].children
+                else:   ##
+
+                    filtered = children[i].children
+            else:
+                filtered.append(children[i])
+        return self.node_builder(filtered)
+
+
+def _should_expand(sym):
+    return not sym.is_term and sym.name.startswith('_')
+
+
+def maybe_create_child_filter(expansion, keep_all_tokens, ambiguous, _empty_indices: List[bool]):
+    ##
+
+    if _empty_indices:
+        assert _empty_indices.count(False) == len(expansion)
+        s = ''.join(str(int(b)) for b in _empty_indices)
+        empty_indices = [len(ones) for ones in s.split('0')]
+        assert len(empty_indices) == len(expansion)+1, (empty_indices, len(expansion))
+    else:
+        empty_indices = [0] * (len(expansion)+1)
+
+    to_include = []
+    nones_to_add = 0
+    for i, sym in enumerate(expansion):
+        nones_to_add += empty_indices[i]
+        if keep_all_tokens or not (sym.is_term and sym.filter_out):
+            to_include.append((i, _should_expand(sym), nones_to_add))
+            nones_to_add = 0
+
+    nones_to_add += empty_indices[len(expansion)]
+
+    if _empty_indices or len(to_include) < len(expansion) or any(to_expand for i, to_expand,_ in to_include):
+        if _empty_indices or ambiguous:
+            return partial(ChildFilter if ambiguous else ChildFilterLALR, to_include, nones_to_add)
+        else:
+            ##
+
+            return partial(ChildFilterLALR_NoPlaceholders, [(i, x) for i,x,_ in to_include])
+
+
+class AmbiguousExpander:
+    #--
+    def __init__(self, to_expand, tree_class, node_builder):
+        self.node_builder = node_builder
+        self.tree_class = tree_class
+        self.to_expand = to_expand
+
+    def __call__(self, children):
+        def _is_ambig_tree(t):
+            return hasattr(t, 'data') and t.data == '_ambig'
+
+        ##
+
+        ##
+
+        ##
+
+        ##
+
+        ambiguous = []
+        for i, child in enumerate(children):
+            if _is_ambig_tree(child):
+                if i in self.to_expand:
+                    ambiguous.append(i)
+
+                child.expand_kids_by_data('_ambig')
+
+        if not ambiguous:
+            return self.node_builder(children)
+
+        expand = [child.children if i in ambiguous else (child,) for i, child in enumerate(children)]
+        return self.tree_class('_ambig', [self.node_builder(list(f)) for f in product(*expand)])
+
+
+def maybe_create_ambiguous_expander(tree_class, expansion, keep_all_tokens):
+    to_expand = [i for i, sym in enumerate(expansion)
+                 if keep_all_tokens or ((not (sym.is_term and sym.filter_out)) and _should_expand(sym))]
+    if to_expand:
+        return partial(AmbiguousExpander, to_expand, tree_class)
+
+
+class AmbiguousIntermediateExpander:
+    #--
+
+    def __init__(self, tree_class, node_builder):
+        self.node_builder = node_builder
+        self.tree_class = tree_class
+
+    def __call__(self, children):
+        def _is_iambig_tree(child):
+            return hasattr(child, 'data') and child.data == '_iambig'
+
+        def _collapse_iambig(children):
+            #--
+
+            ##
+
+            ##
+
+            if children and _is_iambig_tree(children[0]):
+                iambig_node = children[0]
+                result = []
+                for grandchild in iambig_node.children:
+                    collapsed = _collapse_iambig(grandchild.children)
+                    if collapsed:
+                        for child in collapsed:
+                            child.children += children[1:]
+                        result += collapsed
+                    else:
+                        new_tree = self.tree_class('_inter', grandchild.children + children[1:])
+                        result.append(new_tree)
+                return result
+
+        collapsed = _collapse_iambig(children)
+        if collapsed:
+            processed_nodes = [self.node_builder(c.children) for c in collapsed]
+            return self.tree_class('_ambig', processed_nodes)
+
+        return self.node_builder(children)
+
+
+
+def inplace_transformer(func):
+    @wraps(func)
+    def f(children):
+        ##
+
+        tree = Tree(func.__name__, children)
+        return func(tree)
+    return f
+
+
+def apply_visit_wrapper(func, name, wrapper):
+    if wrapper is _vargs_meta or wrapper is _vargs_meta_inline:
+        raise NotImplementedError("Meta args not supported for internal transformer; use YourTransformer().transform(parser.parse()) instead")
+
+    @wraps(func)
+    def f(children):
+        return wrapper(func, name, children, None)
+    return f
+
+
+class ParseTreeBuilder:
+    def __init__(self, rules, tree_class, propagate_positions=False, ambiguous=False, maybe_placeholders=False):
+        self.tree_class = tree_class
+        self.propagate_positions = propagate_positions
+        self.ambiguous = ambiguous
+        self.maybe_placeholders = maybe_placeholders
+
+        self.rule_builders = list(self._init_builders(rules))
+
+    def _init_builders(self, rules):
+        propagate_positions = make_propagate_positions(self.propagate_positions)
+
+        for rule in rules:
+            options = rule.options
+            keep_all_tokens = options.keep_all_tokens
+            expand_single_child = options.expand1
+
+            wrapper_chain = list(filter(None, [
+                (expand_single_child and not rule.alias) and ExpandSingleChild,
+                maybe_create_child_filter(rule.expansion, keep_all_tokens, self.ambiguous, options.empty_indices if self.maybe_placeholders else None),
+                propagate_positions,
+                self.ambiguous and maybe_create_ambiguous_expander(self.tree_class, rule.expansion, keep_all_tokens),
+                self.ambiguous and partial(AmbiguousIntermediateExpander, self.tree_class)
+            ]))
+
+            yield rule, wrapper_chain
+
+    def create_callback(self, transformer=None):
+        callbacks = {}
+
+        default_handler = getattr(transformer, '__default__', None)
+        if default_handler:
+            def default_callback(data, children):
+                return default_handler(data, children, None)
+        else:
+            default_callback = self.tree_class
+
+        for rule, wrapper_chain in self.rule_builders:
+
+            user_callback_name = rule.alias or rule.options.template_source or rule.origin.name
+            try:
+                f = getattr(transformer, user_callback_name)
+                wrapper = getattr(f, 'visit_wrapper', None)
+                if wrapper is not None:
+                    f = apply_visit_wrapper(f, user_callback_name, wrapper)
+                elif isinstance(transformer, Transformer_InPlace):
+                    f = inplace_transformer(f)
+            except AttributeError:
+                f = partial(default_callback, user_callback_name)
+
+            for w in wrapper_chain:
+                f = w(f)
+
+            if rule in callbacks:
+                raise GrammarError("Rule '%s' already exists" % (rule,))
+
+            callbacks[rule] = f
+
+        return callbacks
+
+
+
+class Action:
+    def __init__(self, name):
+        self.name = name
+    def __str__(self):
+        return self.name
+    def __repr__(self):
+        return str(self)
+
+Shift = Action('Shift')
+Reduce = Action('Reduce')
+
+StateT = TypeVar("StateT")
+
+class ParseTableBase(Generic[StateT]):
+    states: Dict[StateT, Dict[str, Tuple]]
+    start_states: Dict[str, StateT]
+    end_states: Dict[str, StateT]
+
+    def __init__(self, states, start_states, end_states):
+        self.states = states
+        self.start_states = start_states
+        self.end_states = end_states
+
+    def serialize(self, memo):
+        tokens = Enumerator()
+
+        states = {
+            state: {tokens.get(token): ((1, arg.serialize(memo)) if action is Reduce else (0, arg))
+                    for token, (action, arg) in actions.items()}
+            for state, actions in self.states.items()
+        }
+
+        return {
+            'tokens': tokens.reversed(),
+            'states': states,
+            'start_states': self.start_states,
+            'end_states': self.end_states,
+        }
+
+    @classmethod
+    def deserialize(cls, data, memo):
+        tokens = data['tokens']
+        states = {
+            state: {tokens[token]: ((Reduce, Rule.deserialize(arg, memo)) if action==1 else (Shift, arg))
+                    for token, (action, arg) in actions.items()}
+            for state, actions in data['states'].items()
+        }
+        return cls(states, data['start_states'], data['end_states'])
+
+class ParseTable(ParseTableBase['State']):
+    #--
+    pass
+
+
+class IntParseTable(ParseTableBase[int]):
+    #--
+
+    @classmethod
+    def from_ParseTable(cls, parse_table: ParseTable):
+        enum = list(parse_table.states)
+        state_to_idx: Dict['State', int] = {s:i for i,s in enumerate(enum)}
+        int_states = {}
+
+        for s, la in parse_table.states.items():
+            la = {k:(v[0], state_to_idx[v[1]]) if v[0] is Shift else v
+                  for k,v in la.items()}
+            int_states[ state_to_idx[s] ] = la
+
+
+        start_states = {start:state_to_idx[s] for start, s in parse_table.start_states.items()}
+        end_states = {start:state_to_idx[s] for start, s in parse_table.end_states.items()}
+        return cls(int_states, start_states, end_states)
+
+
+
+class ParseConf(Generic[StateT]):
+    __slots__ = 'parse_table', 'callbacks', 'start', 'start_state', 'end_state', 'states'
+
+    parse_table: ParseTableBase[StateT]
+    callbacks: ParserCallbacks
+    start: str
+
+    start_state: StateT
+    end_state: StateT
+    states: Dict[StateT, Dict[str, tuple]]
+
+    def __init__(self, parse_table: ParseTableBase[StateT], callbacks: ParserCallbacks, start: str):
+        self.parse_table = parse_table
+
+        self.start_state = self.parse_table.start_states[start]
+        self.end_state = self.parse_table.end_states[start]
+        self.states = self.parse_table.states
+
+        self.callbacks = callbacks
+        self.start = start
+
+class ParserState(Generic[StateT]):
+    __slots__ = 'parse_conf', 'lexer', 'state_stack', 'value_stack'
+
+    parse_conf: ParseConf[StateT]
+    lexer: LexerThread
+    state_stack: List[StateT]
+    value_stack: list
+
+    def __init__(self, parse_conf: ParseConf[StateT], lexer: LexerThread, state_stack=None, value_stack=None):
+        self.parse_conf = parse_conf
+        self.lexer = lexer
+        self.state_stack = state_stack or [self.parse_conf.start_state]
+        self.value_stack = value_stack or []
+
+    @property
+    def position(self) -> StateT:
+        return self.state_stack[-1]
+
+    ##
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ParserState):
+            return NotImplemented
+        return len(self.state_stack) == len(other.state_stack) and self.position == other.position
+
+    def __copy__(self):
+        return self.copy()
+
+    def copy(self, deepcopy_values=True) -> 'ParserState[StateT]':
+        return type(self)(
+            self.parse_conf,
+            self.lexer, ##
+
+            copy(self.state_stack),
+            deepcopy(self.value_stack) if deepcopy_values else copy(self.value_stack),
+        )
+
+    def feed_token(self, token: Token, is_end=False) -> Any:
+        state_stack = self.state_stack
+        value_stack = self.value_stack
+        states = self.parse_conf.states
+        end_state = self.parse_conf.end_state
+        callbacks = self.parse_conf.callbacks
+
+        while True:
+            state = state_stack[-1]
+            try:
+                action, arg = states[state][token.type]
+            except KeyError:
+                expected = {s for s in states[state].keys() if s.isupper()}
+                raise UnexpectedToken(token, expected, state=self, interactive_parser=None)
+
+            assert arg != end_state
+
+            if action is Shift:
+                ##
+
+                assert not is_end
+                state_stack.append(arg)
+                value_stack.append(token if token.type not in callbacks else callbacks[token.type](token))
+                return
+            else:
+                ##
+
+                rule = arg
+                size = len(rule.expansion)
+                if size:
+                    s = value_stack[-size:]
+                    del state_stack[-size:]
+                    del value_stack[-size:]
+                else:
+                    s = []
+
+                value = callbacks[rule](s) if callbacks else s
+
+                _action, new_state = states[state_stack[-1]][rule.origin.name]
+                assert _action is Shift
+                state_stack.append(new_state)
+                value_stack.append(value)
+
+                if is_end and state_stack[-1] == end_state:
+                    return value_stack[-1]
+
+
+class LALR_Parser(Serialize):
+    def __init__(self, parser_conf: ParserConf, debug: bool=False, strict: bool=False):
+        analysis = LALR_Analyzer(parser_conf, debug=debug, strict=strict)
+        analysis.compute_lalr()
+        callbacks = parser_conf.callbacks
+
+        self._parse_table = analysis.parse_table
+        self.parser_conf = parser_conf
+        self.parser = _Parser(analysis.parse_table, callbacks, debug)
+
+    @classmethod
+    def deserialize(cls, data, memo, callbacks, debug=False):
+        inst = cls.__new__(cls)
+        inst._parse_table = IntParseTable.deserialize(data, memo)
+        inst.parser = _Parser(inst._parse_table, callbacks, debug)
+        return inst
+
+    def serialize(self, memo: Any = None) -> Dict[str, Any]:
+        return self._parse_table.serialize(memo)
+
+    def parse_interactive(self, lexer: LexerThread, start: str):
+        return self.parser.parse(lexer, start, start_interactive=True)
+
+    def parse(self, lexer, start, on_error=None):
+        try:
+            return self.parser.parse(lexer, start)
+        except UnexpectedInput as e:
+            if on_error is None:
+                raise
+
+            while True:
+                if isinstance(e, UnexpectedCharacters):
+                    s = e.interactive_parser.lexer_thread.state
+                    p = s.line_ctr.char_pos
+
+                if not on_error(e):
+                    raise e
+
+                if isinstance(e, UnexpectedCharacters):
+                    ##
+
+                    if p == s.line_ctr.char_pos:
+                        s.line_ctr.feed(s.text.text[p:p+1])
+
+                try:
+                    return e.interactive_parser.resume_parse()
+                except UnexpectedToken as e2:
+                    if (isinstance(e, UnexpectedToken)
+                        and e.token.type == e2.token.type == '$END'
+                        and e.interactive_parser == e2.interactive_parser):
+                        ##
+
+                        raise e2
+                    e = e2
+                except UnexpectedCharacters as e2:
+                    e = e2
+
+
+class _Parser:
+    parse_table: ParseTableBase
+    callbacks: ParserCallbacks
+    debug: bool
+
+    def __init__(self, parse_table: ParseTableBase, callbacks: ParserCallbacks, debug: bool=False):
+        self.parse_table = parse_table
+        self.callbacks = callbacks
+        self.debug = debug
+
+    def parse(self, lexer: LexerThread, start: str, value_stack=None, state_stack=None, start_interactive=False):
+        parse_conf = ParseConf(self.parse_table, self.callbacks, start)
+        parser_state = ParserState(parse_conf, lexer, state_stack, value_stack)
+        if start_interactive:
+            return InteractiveParser(self, parser_state, parser_state.lexer)
+        return self.parse_from_state(parser_state)
+
+
+    def parse_from_state(self, state: ParserState, last_token: Optional[Token]=None):
+        #--
+        try:
+            token = last_token
+            for token in state.lexer.lex(state):
+                assert token is not None
+                state.feed_token(token)
+
+            end_token = Token.new_borrow_pos('$END', '', token) if token else Token('$END', '', 0, 1, 1)
+            return state.feed_token(end_token, True)
+        except UnexpectedInput as e:
+            try:
+                e.interactive_parser = InteractiveParser(self, state, state.lexer)
+            except NameError:
+                pass
+            raise e
+        except Exception as e:
+            if self.debug:
+                print("")
+                print("STATE STACK DUMP")
+                print("----------------")
+                for i, s in enumerate(state.state_stack):
+                    print('%d)' % i , s)
+                print("")
+
+            raise
+
+
+class InteractiveParser:
+    #--
+    def __init__(self, parser, parser_state: ParserState, lexer_thread: LexerThread):
+        self.parser = parser
+        self.parser_state = parser_state
+        self.lexer_thread = lexer_thread
+        self.result = None
+
+    @property
+    def lexer_state(self) -> LexerThread:
+        warnings.warn("lexer_state will be removed in subsequent releases. Use lexer_thread instead.", DeprecationWarning)
+        return self.lexer_thread
+
+    def feed_token(self, token: Token):
+        #--
+        return self.parser_state.feed_token(token, token.type == '$END')
+
+    def iter_parse(self) -> Iterator[Token]:
+        #--
+        for token in self.lexer_thread.lex(self.parser_state):
+            yield token
+            self.result = self.feed_token(token)
+
+    def exhaust_lexer(self) -> List[Token]:
+        #--
+        return list(self.iter_parse())
+
+
+    def feed_eof(self, last_token=None):
+        #--
+        eof = Token.new_borrow_pos('$END', '', last_token) if last_token is not None else self.lexer_thread._Token('$END', '', 0, 1, 1)
+        return self.feed_token(eof)
+
+
+    def __copy__(self):
+        #--
+        return self.copy()
+
+    def copy(self, deepcopy_values=True):
+        return type(self)(
+            self.parser,
+            self.parser_state.copy(deepcopy_values=deepcopy_values),
+            copy(self.lexer_thread),
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, InteractiveParser):
+            return False
+
+        return self.parser_state == other.parser_state and self.lexer_thread == other.lexer_thread
+
+    def as_immutable(self):
+        #--
+        p = copy(self)
+        return ImmutableInteractiveParser(p.parser, p.parser_state, p.lexer_thread)
+
+    def pretty(self):
+        #--
+        out = ["Parser choices:"]
+        for k, v in self.choices().items():
+            out.append('\t- %s -> %r' % (k, v))
+        out.append('stack size: %s' % len(self.parser_state.state_stack))
+        return '\n'.join(out)
+
+    def choices(self):
+        #--
+        return self.parser_state.parse_conf.parse_table.states[self.parser_state.position]
+
+    def accepts(self):
+        #--
+        accepts = set()
+        conf_no_callbacks = copy(self.parser_state.parse_conf)
+        ##
+
+        ##
+
+        conf_no_callbacks.callbacks = {}
+        for t in self.choices():
+            if t.isupper(): ##
+
+                new_cursor = self.copy(deepcopy_values=False)
+                new_cursor.parser_state.parse_conf = conf_no_callbacks
+                try:
+                    new_cursor.feed_token(self.lexer_thread._Token(t, ''))
+                except UnexpectedToken:
+                    pass
+                else:
+                    accepts.add(t)
+        return accepts
+
+    def resume_parse(self):
+        #--
+        return self.parser.parse_from_state(self.parser_state, last_token=self.lexer_thread.state.last_token)
+
+
+
+class ImmutableInteractiveParser(InteractiveParser):
+    #--
+
+    result = None
+
+    def __hash__(self):
+        return hash((self.parser_state, self.lexer_thread))
+
+    def feed_token(self, token):
+        c = copy(self)
+        c.result = InteractiveParser.feed_token(c, token)
+        return c
+
+    def exhaust_lexer(self):
+        #--
+        cursor = self.as_mutable()
+        cursor.exhaust_lexer()
+        return cursor.as_immutable()
+
+    def as_mutable(self):
+        #--
+        p = copy(self)
+        return InteractiveParser(p.parser, p.parser_state, p.lexer_thread)
+
+
+
+def _wrap_lexer(lexer_class):
+    future_interface = getattr(lexer_class, '__future_interface__', 0)
+    if future_interface == 2:
+        return lexer_class
+    elif future_interface == 1:
+        class CustomLexerWrapper1(Lexer):
+            def __init__(self, lexer_conf):
+                self.lexer = lexer_class(lexer_conf)
+            def lex(self, lexer_state, parser_state):
+                if isinstance(lexer_state.text, TextSlice) and not lexer_state.text.is_complete_text():
+                    raise TypeError("Interface=1 Custom Lexer don't support TextSlice")
+                lexer_state.text = lexer_state.text
+                return self.lexer.lex(lexer_state, parser_state)
+        return CustomLexerWrapper1
+    elif future_interface == 0:
+        class CustomLexerWrapper0(Lexer):
+            def __init__(self, lexer_conf):
+                self.lexer = lexer_class(lexer_conf)
+
+            def lex(self, lexer_state, parser_state):
+                if isinstance(lexer_state.text, TextSlice):
+                    if not lexer_state.text.is_complete_text():
+                        raise TypeError("Interface=0 Custom Lexer don't support TextSlice")
+                    return self.lexer.lex(lexer_state.text.text)
+                return self.lexer.lex(lexer_state.text)
+        return CustomLexerWrapper0
+    else:
+        raise ValueError(f"Unknown __future_interface__ value {future_interface}, integer 0-2 expected")
+
+
+def _deserialize_parsing_frontend(data, memo, lexer_conf, callbacks, options):
+    parser_conf = ParserConf.deserialize(data['parser_conf'], memo)
+    cls = (options and options._plugins.get('LALR_Parser')) or LALR_Parser
+    parser = cls.deserialize(data['parser'], memo, callbacks, options.debug)
+    parser_conf.callbacks = callbacks
+    return ParsingFrontend(lexer_conf, parser_conf, options, parser=parser)
+
+
+_parser_creators: 'Dict[str, Callable[[LexerConf, Any, Any], Any]]' = {}
+
+
+class ParsingFrontend(Serialize):
+    __serialize_fields__ = 'lexer_conf', 'parser_conf', 'parser'
+
+    lexer_conf: LexerConf
+    parser_conf: ParserConf
+    options: Any
+
+    def __init__(self, lexer_conf: LexerConf, parser_conf: ParserConf, options, parser=None):
+        self.parser_conf = parser_conf
+        self.lexer_conf = lexer_conf
+        self.options = options
+
+        ##
+
+        if parser:  ##
+
+            self.parser = parser
+        else:
+            create_parser = _parser_creators.get(parser_conf.parser_type)
+            assert create_parser is not None, "{} is not supported in standalone mode".format(
+                    parser_conf.parser_type
+                )
+            self.parser = create_parser(lexer_conf, parser_conf, options)
+
+        ##
+
+        lexer_type = lexer_conf.lexer_type
+        self.skip_lexer = False
+        if lexer_type in ('dynamic', 'dynamic_complete'):
+            assert lexer_conf.postlex is None
+            self.skip_lexer = True
+            return
+
+        if isinstance(lexer_type, type):
+            assert issubclass(lexer_type, Lexer)
+            self.lexer = _wrap_lexer(lexer_type)(lexer_conf)
+        elif isinstance(lexer_type, str):
+            create_lexer = {
+                'basic': create_basic_lexer,
+                'contextual': create_contextual_lexer,
+            }[lexer_type]
+            self.lexer = create_lexer(lexer_conf, self.parser, lexer_conf.postlex, options)
+        else:
+            raise TypeError("Bad value for lexer_type: {lexer_type}")
+
+        if lexer_conf.postlex:
+            self.lexer = PostLexConnector(self.lexer, lexer_conf.postlex)
+
+    def _verify_start(self, start=None):
+        if start is None:
+            start_decls = self.parser_conf.start
+            if len(start_decls) > 1:
+                raise ConfigurationError("Lark initialized with more than 1 possible start rule. Must specify which start rule to parse", start_decls)
+            start ,= start_decls
+        elif start not in self.parser_conf.start:
+            raise ConfigurationError("Unknown start rule %s. Must be one of %r" % (start, self.parser_conf.start))
+        return start
+
+    def _make_lexer_thread(self, text: Optional[LarkInput]) -> Union[LarkInput, LexerThread, None]:
+        cls = (self.options and self.options._plugins.get('LexerThread')) or LexerThread
+        if self.skip_lexer:
+            return text
+        if text is None:
+            return cls(self.lexer, None)
+        if isinstance(text, (str, bytes, TextSlice)):
+            return cls.from_text(self.lexer, text)
+        return cls.from_custom_input(self.lexer, text)
+
+    def parse(self, text: Optional[LarkInput], start=None, on_error=None):
+        if self.lexer_conf.lexer_type in ("dynamic", "dynamic_complete"):
+            if isinstance(text, TextSlice) and not text.is_complete_text():
+                raise TypeError(f"Lexer {self.lexer_conf.lexer_type} does not support text slices.")
+
+        chosen_start = self._verify_start(start)
+        kw = {} if on_error is None else {'on_error': on_error}
+        stream = self._make_lexer_thread(text)
+        return self.parser.parse(stream, chosen_start, **kw)
+
+    def parse_interactive(self, text: Optional[TextOrSlice]=None, start=None):
+        ##
+
+        ##
+
+        chosen_start = self._verify_start(start)
+        if self.parser_conf.parser_type != 'lalr':
+            raise ConfigurationError("parse_interactive() currently only works with parser='lalr' ")
+        stream = self._make_lexer_thread(text)
+        return self.parser.parse_interactive(stream, chosen_start)
+
+
+def _validate_frontend_args(parser, lexer) -> None:
+    assert_config(parser, ('lalr', 'earley', 'cyk'))
+    if not isinstance(lexer, type):     ##
+
+        expected = {
+            'lalr': ('basic', 'contextual'),
+            'earley': ('basic', 'dynamic', 'dynamic_complete'),
+            'cyk': ('basic', ),
+         }[parser]
+        assert_config(lexer, expected, 'Parser %r does not support lexer %%r, expected one of %%s' % parser)
+
+
+def _get_lexer_callbacks(transformer, terminals):
+    result = {}
+    for terminal in terminals:
+        callback = getattr(transformer, terminal.name, None)
+        if callback is not None:
+            result[terminal.name] = callback
+    return result
+
+class PostLexConnector:
+    def __init__(self, lexer, postlexer):
+        self.lexer = lexer
+        self.postlexer = postlexer
+
+    def lex(self, lexer_state, parser_state):
+        i = self.lexer.lex(lexer_state, parser_state)
+        return self.postlexer.process(i)
+
+
+
+def create_basic_lexer(lexer_conf, parser, postlex, options) -> BasicLexer:
+    cls = (options and options._plugins.get('BasicLexer')) or BasicLexer
+    return cls(lexer_conf)
+
+def create_contextual_lexer(lexer_conf: LexerConf, parser, postlex, options) -> ContextualLexer:
+    cls = (options and options._plugins.get('ContextualLexer')) or ContextualLexer
+    parse_table: ParseTableBase[int] = parser._parse_table
+    states: Dict[int, Collection[str]] = {idx:list(t.keys()) for idx, t in parse_table.states.items()}
+    always_accept: Collection[str] = postlex.always_accept if postlex else ()
+    return cls(lexer_conf, states, always_accept=always_accept)
+
+def create_lalr_parser(lexer_conf: LexerConf, parser_conf: ParserConf, options=None) -> LALR_Parser:
+    debug = options.debug if options else False
+    strict = options.strict if options else False
+    cls = (options and options._plugins.get('LALR_Parser')) or LALR_Parser
+    return cls(parser_conf, debug=debug, strict=strict)
+
+_parser_creators['lalr'] = create_lalr_parser
+
+
+
+
+class PostLex(ABC):
+    @abstractmethod
+    def process(self, stream: Iterator[Token]) -> Iterator[Token]:
+        return stream
+
+    always_accept: Iterable[str] = ()
+
+class LarkOptions(Serialize):
+    #--
+
+    start: List[str]
+    debug: bool
+    strict: bool
+    transformer: 'Optional[Transformer]'
+    propagate_positions: Union[bool, str]
+    maybe_placeholders: bool
+    cache: Union[bool, str]
+    cache_grammar: bool
+    regex: bool
+    g_regex_flags: int
+    keep_all_tokens: bool
+    tree_class: Optional[Callable[[str, List], Any]]
+    parser: _ParserArgType
+    lexer: _LexerArgType
+    ambiguity: 'Literal["auto", "resolve", "explicit", "forest"]'
+    postlex: Optional[PostLex]
+    priority: 'Optional[Literal["auto", "normal", "invert"]]'
+    lexer_callbacks: Dict[str, Callable[[Token], Token]]
+    use_bytes: bool
+    ordered_sets: bool
+    edit_terminals: Optional[Callable[[TerminalDef], TerminalDef]]
+    import_paths: 'List[Union[str, Callable[[Union[None, str, PackageResource], str], Tuple[str, str]]]]'
+    source_path: Optional[str]
+
+    OPTIONS_DOC = r"""
+    **===  General Options  ===**
+
+    start
+            The start symbol. Either a string, or a list of strings for multiple possible starts (Default: "start")
+    debug
+            Display debug information and extra warnings. Use only when debugging (Default: ``False``)
+            When used with Earley, it generates a forest graph as "sppf.png", if 'dot' is installed.
+    strict
+            Throw an exception on any potential ambiguity, including shift/reduce conflicts, and regex collisions.
+    transformer
+            Applies the transformer to every parse tree (equivalent to applying it after the parse, but faster)
+    propagate_positions
+            Propagates positional attributes into the 'meta' attribute of all tree branches.
+            Sets attributes: (line, column, end_line, end_column, start_pos, end_pos,
+                              container_line, container_column, container_end_line, container_end_column)
+            Accepts ``False``, ``True``, or a callable, which will filter which nodes to ignore when propagating.
+    maybe_placeholders
+            When ``True``, the ``[]`` operator returns ``None`` when not matched.
+            When ``False``,  ``[]`` behaves like the ``?`` operator, and returns no value at all.
+            (default= ``True``)
+    cache
+            Cache the results of the Lark grammar analysis, for x2 to x3 faster loading. LALR only for now.
+
+            - When ``False``, does nothing (default)
+            - When ``True``, caches to a temporary file in the local directory
+            - When given a string, caches to the path pointed by the string
+    cache_grammar
+            For use with ``cache`` option. When ``True``, the unanalyzed grammar is also included in the cache.
+            Useful for classes that require the ``Lark.grammar`` to be present (e.g. Reconstructor).
+            (default= ``False``)
+    regex
+            When True, uses the ``regex`` module instead of the stdlib ``re``.
+    g_regex_flags
+            Flags that are applied to all terminals (both regex and strings)
+    keep_all_tokens
+            Prevent the tree builder from automagically removing "punctuation" tokens (Default: ``False``)
+    tree_class
+            Lark will produce trees comprised of instances of this class instead of the default ``lark.Tree``.
+
+    **=== Algorithm Options ===**
+
+    parser
+            Decides which parser engine to use. Accepts "earley" or "lalr". (Default: "earley").
+            (there is also a "cyk" option for legacy)
+    lexer
+            Decides whether or not to use a lexer stage
+
+            - "auto" (default): Choose for me based on the parser
+            - "basic": Use a basic lexer
+            - "contextual": Stronger lexer (only works with parser="lalr")
+            - "dynamic": Flexible and powerful (only with parser="earley")
+            - "dynamic_complete": Same as dynamic, but tries *every* variation of tokenizing possible.
+    ambiguity
+            Decides how to handle ambiguity in the parse. Only relevant if parser="earley"
+
+            - "resolve": The parser will automatically choose the simplest derivation
+              (it chooses consistently: greedy for tokens, non-greedy for rules)
+            - "explicit": The parser will return all derivations wrapped in "_ambig" tree nodes (i.e. a forest).
+            - "forest": The parser will return the root of the shared packed parse forest.
+
+    **=== Misc. / Domain Specific Options ===**
+
+    postlex
+            Lexer post-processing (Default: ``None``) Only works with the basic and contextual lexers.
+    priority
+            How priorities should be evaluated - "auto", ``None``, "normal", "invert" (Default: "auto")
+    lexer_callbacks
+            Dictionary of callbacks for the lexer. May alter tokens during lexing. Use with caution.
+    use_bytes
+            Accept an input of type ``bytes`` instead of ``str``.
+    ordered_sets
+            Should Earley use ordered-sets to achieve stable output (~10% slower than regular sets. Default: True)
+    edit_terminals
+            A callback for editing the terminals before parse.
+    import_paths
+            A List of either paths or loader functions to specify from where grammars are imported
+    source_path
+            Override the source of from where the grammar was loaded. Useful for relative imports and unconventional grammar loading
+    **=== End of Options ===**
+    """
+    if __doc__:
+        __doc__ += OPTIONS_DOC
+
+
+    ##
+
+    ##
+
+    ##
+
+    ##
+
+    ##
+
+    ##
+
+    _defaults: Dict[str, Any] = {
+        'debug': False,
+        'strict': False,
+        'keep_all_tokens': False,
+        'tree_class': None,
+        'cache': False,
+        'cache_grammar': False,
+        'postlex': None,
+        'parser': 'earley',
+        'lexer': 'auto',
+        'transformer': None,
+        'start': 'start',
+        'priority': 'auto',
+        'ambiguity': 'auto',
+        'regex': False,
+        'propagate_positions': False,
+        'lexer_callbacks': {},
+        'maybe_placeholders': True,
+        'edit_terminals': None,
+        'g_regex_flags': 0,
+        'use_bytes': False,
+        'ordered_sets': True,
+        'import_paths': [],
+        'source_path': None,
+        '_plugins': {},
+    }
+
+    def __init__(self, options_dict: Dict[str, Any]) -> None:
+        o = dict(options_dict)
+
+        options = {}
+        for name, default in self._defaults.items():
+            if name in o:
+                value = o.pop(name)
+                if isinstance(default, bool) and name not in ('cache', 'use_bytes', 'propagate_positions'):
+                    value = bool(value)
+            else:
+                value = default
+
+            options[name] = value
+
+        if isinstance(options['start'], str):
+            options['start'] = [options['start']]
+
+        self.__dict__['options'] = options
+
+
+        assert_config(self.parser, ('earley', 'lalr', 'cyk', None))
+
+        if self.parser == 'earley' and self.transformer:
+            raise ConfigurationError('Cannot specify an embedded transformer when using the Earley algorithm. '
+                             'Please use your transformer on the resulting parse tree, or use a different algorithm (i.e. LALR)')
+
+        if self.cache_grammar and not self.cache:
+            raise ConfigurationError('cache_grammar cannot be set when cache is disabled')
+
+        if o:
+            raise ConfigurationError("Unknown options: %s" % o.keys())
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self.__dict__['options'][name]
+        except KeyError as e:
+            raise AttributeError(e)
+
+    def __setattr__(self, name: str, value: str) -> None:
+        assert_config(name, self.options.keys(), "%r isn't a valid option. Expected one of: %s")
+        self.options[name] = value
+
+    def serialize(self, memo = None) -> Dict[str, Any]:
+        return self.options
+
+    @classmethod
+    def deserialize(cls, data: Dict[str, Any], memo: Dict[int, Union[TerminalDef, Rule]]) -> "LarkOptions":
+        return cls(data)
+
+
+##
+
+##
+
+_LOAD_ALLOWED_OPTIONS = {'postlex', 'transformer', 'lexer_callbacks', 'use_bytes', 'debug', 'g_regex_flags', 'regex', 'propagate_positions', 'tree_class', '_plugins'}
+
+_VALID_PRIORITY_OPTIONS = ('auto', 'normal', 'invert', None)
+_VALID_AMBIGUITY_OPTIONS = ('auto', 'resolve', 'explicit', 'forest')
+
+
+_T = TypeVar('_T', bound="Lark")
+
+class Lark(Serialize):
+    #--
+
+    source_path: str
+    source_grammar: str
+    grammar: 'Grammar'
+    options: LarkOptions
+    lexer: Lexer
+    parser: 'ParsingFrontend'
+    terminals: Collection[TerminalDef]
+
+    __serialize_fields__ = ['parser', 'rules', 'options']
+
+    def __init__(self, grammar: 'Union[Grammar, str, IO[str]]', **options) -> None:
+        self.options = LarkOptions(options)
+        re_module: types.ModuleType
+
+        ##
+
+        if self.options.cache_grammar:
+            self.__serialize_fields__ = self.__serialize_fields__ + ['grammar']
+
+        ##
+
+        use_regex = self.options.regex
+        if use_regex:
+            if _has_regex:
+                re_module = regex
+            else:
+                raise ImportError('`regex` module must be installed if calling `Lark(regex=True)`.')
+        else:
+            re_module = re
+
+        ##
+
+        if self.options.source_path is None:
+            try:
+                self.source_path = grammar.name  ##
+
+            except AttributeError:
+                self.source_path = '<string>'
+        else:
+            self.source_path = self.options.source_path
+
+        ##
+
+        try:
+            read = grammar.read  ##
+
+        except AttributeError:
+            pass
+        else:
+            grammar = read()
+
+        cache_fn = None
+        cache_sha256 = None
+        if isinstance(grammar, str):
+            self.source_grammar = grammar
+            if self.options.use_bytes:
+                if not grammar.isascii():
+                    raise ConfigurationError("Grammar must be ascii only, when use_bytes=True")
+
+            if self.options.cache:
+                if self.options.parser != 'lalr':
+                    raise ConfigurationError("cache only works with parser='lalr' for now")
+
+                unhashable = ('transformer', 'postlex', 'lexer_callbacks', 'edit_terminals', '_plugins')
+                options_str = ''.join(k+str(v) for k, v in options.items() if k not in unhashable)
+                from . import __version__
+                s = grammar + options_str + __version__ + str(sys.version_info[:2])
+                cache_sha256 = sha256_digest(s)
+
+                if isinstance(self.options.cache, str):
+                    cache_fn = self.options.cache
+                else:
+                    if self.options.cache is not True:
+                        raise ConfigurationError("cache argument must be bool or str")
+
+                    try:
+                        username = getpass.getuser()
+                    except Exception:
+                        ##
+
+                        ##
+
+                        ##
+
+                        username = "unknown"
+
+
+                    cache_fn = tempfile.gettempdir() + "/.lark_%s_%s_%s_%s_%s.tmp" % (
+                        "cache_grammar" if self.options.cache_grammar else "cache", username, cache_sha256, *sys.version_info[:2])
+
+                old_options = self.options
+                try:
+                    with FS.open(cache_fn, 'rb') as f:
+                        logger.debug('Loading grammar from cache: %s', cache_fn)
+                        ##
+
+                        for name in (set(options) - _LOAD_ALLOWED_OPTIONS):
+                            del options[name]
+                        file_sha256 = f.readline().rstrip(b'\n')
+                        cached_used_files = pickle.load(f)
+                        if file_sha256 == cache_sha256.encode('utf8') and verify_used_files(cached_used_files):
+                            cached_parser_data = pickle.load(f)
+                            self._load(cached_parser_data, **options)
+                            return
+                except FileNotFoundError:
+                    ##
+
+                    pass
+                except Exception: ##
+
+                    logger.exception("Failed to load Lark from cache: %r. We will try to carry on.", cache_fn)
+
+                    ##
+
+                    ##
+
+                    self.options = old_options
+
+
+            ##
+
+            self.grammar, used_files = load_grammar(grammar, self.source_path, self.options.import_paths, self.options.keep_all_tokens)
+        else:
+            assert isinstance(grammar, Grammar)
+            self.grammar = grammar
+
+
+        if self.options.lexer == 'auto':
+            if self.options.parser == 'lalr':
+                self.options.lexer = 'contextual'
+            elif self.options.parser == 'earley':
+                if self.options.postlex is not None:
+                    logger.info("postlex can't be used with the dynamic lexer, so we use 'basic' instead. "
+                                "Consider using lalr with contextual instead of earley")
+                    self.options.lexer = 'basic'
+                else:
+                    self.options.lexer = 'dynamic'
+            elif self.options.parser == 'cyk':
+                self.options.lexer = 'basic'
+            else:
+                assert False, self.options.parser
+        lexer = self.options.lexer
+        if isinstance(lexer, type):
+            assert issubclass(lexer, Lexer)     ##
+
+        else:
+            assert_config(lexer, ('basic', 'contextual', 'dynamic', 'dynamic_complete'))
+            if self.options.postlex is not None and 'dynamic' in lexer:
+                raise ConfigurationError("Can't use postlex with a dynamic lexer. Use basic or contextual instead")
+
+        if self.options.ambiguity == 'auto':
+            if self.options.parser == 'earley':
+                self.options.ambiguity = 'resolve'
+        else:
+            assert_config(self.options.parser, ('earley', 'cyk'), "%r doesn't support disambiguation. Use one of these parsers instead: %s")
+
+        if self.options.priority == 'auto':
+            self.options.priority = 'normal'
+
+        if self.options.priority not in _VALID_PRIORITY_OPTIONS:
+            raise ConfigurationError("invalid priority option: %r. Must be one of %r" % (self.options.priority, _VALID_PRIORITY_OPTIONS))
+        if self.options.ambiguity not in _VALID_AMBIGUITY_OPTIONS:
+            raise ConfigurationError("invalid ambiguity option: %r. Must be one of %r" % (self.options.ambiguity, _VALID_AMBIGUITY_OPTIONS))
+
+        if self.options.parser is None:
+            terminals_to_keep = '*'     ##
+
+        elif self.options.postlex is not None:
+            terminals_to_keep = set(self.options.postlex.always_accept)
+        else:
+            terminals_to_keep = set()
+
+        ##
+
+        self.terminals, self.rules, self.ignore_tokens = self.grammar.compile(self.options.start, terminals_to_keep)
+
+        if self.options.edit_terminals:
+            for t in self.terminals:
+                self.options.edit_terminals(t)
+
+        self._terminals_dict = {t.name: t for t in self.terminals}
+
+        ##
+
+        if self.options.priority == 'invert':
+            for rule in self.rules:
+                if rule.options.priority is not None:
+                    rule.options.priority = -rule.options.priority
+            for term in self.terminals:
+                term.priority = -term.priority
+        ##
+
+        ##
+
+        ##
+
+        elif self.options.priority is None:
+            for rule in self.rules:
+                if rule.options.priority is not None:
+                    rule.options.priority = None
+            for term in self.terminals:
+                term.priority = 0
+
+        ##
+
+        self.lexer_conf = LexerConf(
+                self.terminals, re_module, self.ignore_tokens, self.options.postlex,
+                self.options.lexer_callbacks, self.options.g_regex_flags, use_bytes=self.options.use_bytes, strict=self.options.strict
+            )
+
+        if self.options.parser:
+            self.parser = self._build_parser()
+        elif lexer:
+            self.lexer = self._build_lexer()
+
+        if cache_fn:
+            logger.debug('Saving grammar to cache: %s', cache_fn)
+            try:
+                with FS.open(cache_fn, 'wb') as f:
+                    assert cache_sha256 is not None
+                    f.write(cache_sha256.encode('utf8') + b'\n')
+                    pickle.dump(used_files, f)
+                    self.save(f, _LOAD_ALLOWED_OPTIONS)
+            except IOError as e:
+                logger.exception("Failed to save Lark to cache: %r.", cache_fn, e)
+
+    if __doc__:
+        __doc__ += "\n\n" + LarkOptions.OPTIONS_DOC
+
+    def _build_lexer(self, dont_ignore: bool=False) -> BasicLexer:
+        lexer_conf = self.lexer_conf
+        if dont_ignore:
+            from copy import copy
+            lexer_conf = copy(lexer_conf)
+            lexer_conf.ignore = ()
+        return BasicLexer(lexer_conf)
+
+    def _prepare_callbacks(self) -> None:
+        self._callbacks = {}
+        ##
+
+        if self.options.ambiguity != 'forest':
+            self._parse_tree_builder = ParseTreeBuilder(
+                    self.rules,
+                    self.options.tree_class or Tree,
+                    self.options.propagate_positions,
+                    self.options.parser != 'lalr' and self.options.ambiguity == 'explicit',
+                    self.options.maybe_placeholders
+                )
+            self._callbacks = self._parse_tree_builder.create_callback(self.options.transformer)
+        self._callbacks.update(_get_lexer_callbacks(self.options.transformer, self.terminals))
+
+    def _build_parser(self) -> "ParsingFrontend":
+        self._prepare_callbacks()
+        _validate_frontend_args(self.options.parser, self.options.lexer)
+        parser_conf = ParserConf(self.rules, self._callbacks, self.options.start)
+        return _construct_parsing_frontend(
+            self.options.parser,
+            self.options.lexer,
+            self.lexer_conf,
+            parser_conf,
+            options=self.options
+        )
+
+    def save(self, f, exclude_options: Collection[str] = ()) -> None:
+        #--
+        if self.options.parser != 'lalr':
+            raise NotImplementedError("Lark.save() is only implemented for the LALR(1) parser.")
+        data, m = self.memo_serialize([TerminalDef, Rule])
+        if exclude_options:
+            data["options"] = {n: v for n, v in data["options"].items() if n not in exclude_options}
+        pickle.dump({'data': data, 'memo': m}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls: Type[_T], f) -> _T:
+        #--
+        inst = cls.__new__(cls)
+        return inst._load(f)
+
+    def _deserialize_lexer_conf(self, data: Dict[str, Any], memo: Dict[int, Union[TerminalDef, Rule]], options: LarkOptions) -> LexerConf:
+        lexer_conf = LexerConf.deserialize(data['lexer_conf'], memo)
+        lexer_conf.callbacks = options.lexer_callbacks or {}
+        lexer_conf.re_module = regex if options.regex else re
+        lexer_conf.use_bytes = options.use_bytes
+        lexer_conf.g_regex_flags = options.g_regex_flags
+        lexer_conf.skip_validation = True
+        lexer_conf.postlex = options.postlex
+        return lexer_conf
+
+    def _load(self: _T, f: Any, **kwargs) -> _T:
+        if isinstance(f, dict):
+            d = f
+        else:
+            d = pickle.load(f)
+        memo_json = d['memo']
+        data = d['data']
+
+        assert memo_json
+        memo = SerializeMemoizer.deserialize(memo_json, {'Rule': Rule, 'TerminalDef': TerminalDef}, {})
+        if 'grammar' in data:
+            self.grammar = Grammar.deserialize(data['grammar'], memo)
+        options = dict(data['options'])
+        if (set(kwargs) - _LOAD_ALLOWED_OPTIONS) & set(LarkOptions._defaults):
+            raise ConfigurationError("Some options are not allowed when loading a Parser: {}"
+                             .format(set(kwargs) - _LOAD_ALLOWED_OPTIONS))
+        options.update(kwargs)
+        self.options = LarkOptions.deserialize(options, memo)
+        self.rules = [Rule.deserialize(r, memo) for r in data['rules']]
+        self.source_path = '<deserialized>'
+        _validate_frontend_args(self.options.parser, self.options.lexer)
+        self.lexer_conf = self._deserialize_lexer_conf(data['parser'], memo, self.options)
+        self.terminals = self.lexer_conf.terminals
+        self._prepare_callbacks()
+        self._terminals_dict = {t.name: t for t in self.terminals}
+        self.parser = _deserialize_parsing_frontend(
+            data['parser'],
+            memo,
+            self.lexer_conf,
+            self._callbacks,
+            self.options,  ##
+
+        )
+        return self
+
+    @classmethod
+    def _load_from_dict(cls, data, memo, **kwargs):
+        inst = cls.__new__(cls)
+        return inst._load({'data': data, 'memo': memo}, **kwargs)
+
+    @classmethod
+    def open(cls: Type[_T], grammar_filename: str, rel_to: Optional[str]=None, **options) -> _T:
+        #--
+        if rel_to:
+            basepath = os.path.dirname(rel_to)
+            grammar_filename = os.path.join(basepath, grammar_filename)
+        with open(grammar_filename, encoding='utf8') as f:
+            return cls(f, **options)
+
+    @classmethod
+    def open_from_package(cls: Type[_T], package: str, grammar_path: str, search_paths: 'Sequence[str]'=[""], **options) -> _T:
+        #--
+        package_loader = FromPackageLoader(package, search_paths)
+        full_path, text = package_loader(None, grammar_path)
+        options.setdefault('source_path', full_path)
+        options.setdefault('import_paths', [])
+        options['import_paths'].append(package_loader)
+        return cls(text, **options)
+
+    def __repr__(self):
+        return 'Lark(open(%r), parser=%r, lexer=%r, ...)' % (self.source_path, self.options.parser, self.options.lexer)
+
+
+    def lex(self, text: TextOrSlice, dont_ignore: bool=False) -> Iterator[Token]:
+        #--
+        lexer: Lexer
+        if not hasattr(self, 'lexer') or dont_ignore:
+            lexer = self._build_lexer(dont_ignore)
+        else:
+            lexer = self.lexer
+        lexer_thread = LexerThread.from_text(lexer, text)
+        stream = lexer_thread.lex(None)
+        if self.options.postlex:
+            return self.options.postlex.process(stream)
+        return stream
+
+    def get_terminal(self, name: str) -> TerminalDef:
+        #--
+        return self._terminals_dict[name]
+
+    def parse_interactive(self, text: Optional[LarkInput]=None, start: Optional[str]=None) -> 'InteractiveParser':
+        #--
+        return self.parser.parse_interactive(text, start=start)
+
+    def parse(self, text: LarkInput, start: Optional[str]=None, on_error: 'Optional[Callable[[UnexpectedInput], bool]]'=None) -> 'ParseTree':
+        #--
+        if on_error is not None and self.options.parser != 'lalr':
+            raise NotImplementedError("The on_error option is only implemented for the LALR(1) parser.")
+        return self.parser.parse(text, start=start, on_error=on_error)
+
+
+
+
+class DedentError(LarkError):
+    pass
+
+class Indenter(PostLex, ABC):
+    #--
+    paren_level: int
+    indent_level: List[int]
+
+    def __init__(self) -> None:
+        self.paren_level = 0
+        self.indent_level = [0]
+        assert self.tab_len > 0
+
+    def handle_NL(self, token: Token) -> Iterator[Token]:
+        if self.paren_level > 0:
+            return
+
+        yield token
+
+        indent_str = token.rsplit('\n', 1)[1] ##
+
+        indent = indent_str.count(' ') + indent_str.count('\t') * self.tab_len
+
+        if indent > self.indent_level[-1]:
+            self.indent_level.append(indent)
+            yield Token.new_borrow_pos(self.INDENT_type, indent_str, token)
+        else:
+            while indent < self.indent_level[-1]:
+                self.indent_level.pop()
+                yield Token.new_borrow_pos(self.DEDENT_type, indent_str, token)
+
+            if indent != self.indent_level[-1]:
+                raise DedentError('Unexpected dedent to column %s. Expected dedent to %s' % (indent, self.indent_level[-1]))
+
+    def _process(self, stream):
+        token = None
+        for token in stream:
+            if token.type == self.NL_type:
+                yield from self.handle_NL(token)
+            else:
+                yield token
+
+            if token.type in self.OPEN_PAREN_types:
+                self.paren_level += 1
+            elif token.type in self.CLOSE_PAREN_types:
+                self.paren_level -= 1
+                assert self.paren_level >= 0
+
+        while len(self.indent_level) > 1:
+            self.indent_level.pop()
+            yield Token.new_borrow_pos(self.DEDENT_type, '', token) if token else Token(self.DEDENT_type, '', 0, 0, 0, 0, 0, 0)
+
+        assert self.indent_level == [0], self.indent_level
+
+    def process(self, stream):
+        self.paren_level = 0
+        self.indent_level = [0]
+        return self._process(stream)
+
+    ##
+
+    @property
+    def always_accept(self):
+        return (self.NL_type,)
+
+    @property
+    @abstractmethod
+    def NL_type(self) -> str:
+        #--
+        raise NotImplementedError()
+
+    @property
+    @abstractmethod
+    def OPEN_PAREN_types(self) -> List[str]:
+        #--
+        raise NotImplementedError()
+
+    @property
+    @abstractmethod
+    def CLOSE_PAREN_types(self) -> List[str]:
+        #--
+        raise NotImplementedError()
+
+    @property
+    @abstractmethod
+    def INDENT_type(self) -> str:
+        #--
+        raise NotImplementedError()
+
+    @property
+    @abstractmethod
+    def DEDENT_type(self) -> str:
+        #--
+        raise NotImplementedError()
+
+    @property
+    @abstractmethod
+    def tab_len(self) -> int:
+        #--
+        raise NotImplementedError()
+
+
+class PythonIndenter(Indenter):
+    #--
+
+    NL_type = '_NEWLINE'
+    OPEN_PAREN_types = ['LPAR', 'LSQB', 'LBRACE']
+    CLOSE_PAREN_types = ['RPAR', 'RSQB', 'RBRACE']
+    INDENT_type = '_INDENT'
+    DEDENT_type = '_DEDENT'
+    tab_len = 8
+
+
+import pickle, zlib, base64
+DATA = (
+b'eJztnOd7E2fWxgW2wQZMc3pIJaGl0rEdd2RsxgVsCGlEEUa2heWCpFGLegskE0jCZHu2993sZnvvJdt3/6R9ysj8XmNs48B1vR82+XD7THvOuc859/PMjJhszbsfnnCp/1L2DmvVjDcY8gVt+feagC/mC3pGpqdGlV0X9gUn/VPeQMg+be9I2daKdttwhVL2eK2xQsNKDVUaqjXUaFilYbWGWg11GtZoWKthnYZ6Des1bNCwUcMmDZs1NGi4TcPtGu7QcKeGuzTcreEeDfdq2KLhPg33a3hAw4MaHtLwsIatGh7R8KiGbRq2a9ihYaeGXRoe0/C4hic0PKnhKQ1Pa9itYY+GvRr2adgf8lmr/GNT00GfTIRVd2rY0zvQ1zvgtq3VA+5Tzl9dg/397oETts+qH/MEfWO+mGc04B0LiZxZdWbI5zkTD/tC9sVKnsPxGZ9trRHpDvtiYdMbsK1aj9rq8dhWXZ88qEvWgmmt1VVytTRqgmbA55SF8PCAdvSghkMaGjU0aWjW8IyGFg2tGto0tGvo0NCpoUvDYQ1uDd0ajmjo0dCr4agGQ0Ofhn4NAxoGNRzTcFzDkIZhDSc0nNTwrIZTGp7T8LyGFzS8qOElDac1vKzBo+EVDV4NZzSMaDirwadhVMOYhnENfg3nNExoCGiY1DClYVrDjIbzGoIaQhrCGkwNEQ1RDTENcQ0JDa9qSGpIaUhryGjIashpyGsoaChqKGkoa3hNwwUNFzW8ruENDZaGNzVc0nBZw1sa3tbwjoYrGmwN74rWqQmFvcGwqNXx972zlayLvzrgDQTt8SPWmmNqsy738RVKGcPTE76pkCx30UCrBk72d7qHbGOFbJKOgcEBzwHbWGlVDx3rEFurrJWDAqqtqo6Bw7ZRM3vQQdtYZVV7w9OTtrHaqjnR23fYbRu1VlWP+znbqLOqQqbYs8aqHzWnRsL+6SnPiDcQsI211uqZ4PRZcyRsG+usmv7egZPDtlFvVQ909IsLrLeq+9TAG6zqY31y10arbtjd39s12Dc4YBubrKrDgydsY7NVI2WhwzYarFVDnUMdXeLk24TXw8c7beN24VlQCsQdVs1wX8dwj23cadV19B9zDw2rOO6y6pw4du+xjbuvWntt4x5rtTiuSyqOca9VPXxCurPFWtPVO9R1sr+7T8Z3n1X9bKfcfv8sIY228cDV6+y2jQet2j738PCJng7h90NWbf/gkFsbD8+edMg2tl496WnbeMSqHZmeFLkUImQ8Klgf7reNbdbKw4O2sd2q6pbJ2GGt7O22jZ1Wzame3j4R9y5BgfvEySFx6ces1d5QSGiqOP1xq+ZMYHpkwjaesNaIWgn7Jn1TYbHjSWudfyrgnxLKqfc/Za0N+ENhjz7VNp62tng8s4k76xv1T/nVnzMBM+QRse0WaXALH/ZYVb2Sp71W9SNuSew+q9rdNyx82i//kG4esFb1Ofk5aNW4j5/s6LONQ1a9xyNT5JE17NlvG40i8Sp3TdY6b2hS7jSlu7bRbK0N+sJmcMqjc/qMTL0qhhbrNo8H+/TFRPm2WrXyGjJE22izGuYJxTbaZ7MgSqBj1hDRdc4aohy65CBgR3Mgyv/w7FH7bMM9a4hYumcNkdEj1nqPciyszxSbesbfN3qtBrXZSYp2XQx31FrvC4g5bXaXbRhyk3+Um/rmO1uE0W9tErw6oeut+8Q0t0od6rR8Ssyb4v+ash0ypCAYK4T1Rlk0vcCnBVYJPCCwWuDnBdYIvL1sm8ZKefQqYZ0RW1cL7BRYK/BtgXUCxwSuEdgncK3ATwpcJ/AdgfUCCwLXC7xQ1j4E5VWr5FU3COtjztHPqbFXOFOEcgDGRhpVNFbQWAnDNKrlGJucTQNy/2YaG2nU02iAYRo1grvbhIfNkrtV8poy6gFx3PVYuV3g6I2zMuv+STXuajnUHc6mV6Vfd9K4i8ZKGnfT2ExjI417aNxLYwuNdTTuo7GBRg2N+2k8QKOaxoM0HqLxMI0qGitobIVhGrWs6+vU8ywFAdIWUOfXzVeTleNf4vEvqePXsDNkTfTPUwuPCLzo5DqAWqjUxtyamO2QtUuJRnbvsDx6nTz6Uce9Z6Sv22jU09hOYweNnTR20WiAYRr1crRKhJKBVxBJhYHrVbkTuWmsJ98yktNXeTeNDXKvZO9RdNr1WL5hdjem9El/kE29iZ0WY6fF2GkxlkCMnRZjp8XYaTF2WoydFmOnxdhpMXZajJ0WY6fF2GkxdlqMnRZjp8XYaTF2WoydFmOnxdhpMZX/zbraXMbXVQW5jLTD8TcFPibwRYGPC/ynqiOXYQp8QuC9Ap8U+B8nR38S+JTAD1XBugy/wKcFHlZl6jJ+qIrSZbwrR21YaM44R2rOMQXnGNk5RnaOCT2nIrtNjrHb2fSa3L+Hxl4YpnH7UgUgsZwSvUNevRKEl6561eh3LicJkvxzSEYlCQ0C7XmScU0S7povCRXH3mEfvMMkvKNcvjulG/2S7Lp75opIcTkici+Fr5HC10jha6TwNVL4Gil8jRS+Rgpfowpgy2KLobvKy1gM3ZeSRLmMNZKW+291b317vrQ+4Ojhk9KFBxeLcnI5UT5ElY1SZaNU2SgrPUqVjbK6oqyuKFU2SpWNUmWjVNkoVTZKlY1SSqJU2ShVNkqVjVJlo1TZKFU2Si2KUouiVNmoKraHWdqdLO1OlnYnS7uTpd3J0u5kaXeytDvVaFsXUlc/KfGTej8j8jMiPxPpV2M8wpZfaqvLQtzEln907v3L2fIC9y/beBfQxxLqYxx9pLSP9PQp17entIffkA2y40ZWmtPkYVpdbCd9GqJPQ/RpiD4N0achdZldCy1YX+SwL6rjH2NBHWZBKWMfjXoa22nsoLGLxk4a+2k0wDCNx6Ufm4W/P4aLw2rXE2TmEpm5RGYu0cVLHOGSusyTS52Z/11exsz8FJ006KRBJw06adBJQzn5tCipA+Kax2RJ7eY1e3hmD8/sUWfuWUofyfC/Ok8/zfbRXg7ZzSG7OWS3GnLfQrV2mrV2Wh2//1ZPY1PzTWMHlpr3HcvJ+0ES1s+89zPv/aSyn1T2K2oOycvIEH4kdt0qiq6hppHTb57Tb57Tb56pzHP6zTPgPAPOc/rNc/rNc/rNc/rNc/rNc/rNc67Jc/rNc/rNc/rNc/rNc/rNc/rNc7LKc7LKc/rNqzQ1LbYKer+8jFVQM2voOCk9TkqPs4aOs4aOK+eeoZQ3U8qbeWYz1buZ6t1MwW6mlDdztGY1WouuHZdxUtWDy+hSCXcZj6j0uoxplUyXcURVksuoV+XlMu5RteAy9iDzIVZYiAyEyECINRFiskNMdojVEmLmQ8x8iJkPMfMhVliIFRZiTYQUEa2VmWslPH1O7Wpjf6XYXyn2V4rRp9hfKVKRIhUp9leK/ZVif6XYXyn2V4pcpshYitGnGH2KlKdIeYosp8hyiiynyHKKXKYUYe3z9Zfsqyr02Q33Vwcbo4WN0cLGaGFjtLAxWtgYLWyMFjZGi4qhc+49bGN5GfewXTeyLJajtM13lcM3+3nAz8tLmFbczrr4b3IR0z1fe5xhxZ9RtB2ZS9ufl0Nbj7zKQefC77J73lWj9Fa8eVXsqhznU7uO8tnKK3TwFbXf4GOgsty/h8ZeGKbRx87PsfNz7Pwch8mx83P0PcfOz7Hzc+z8HDs/x87PsfNz7PwcOz/Hzs+x83Ps/Bw7P8fOz7Hzc+z8HDs/x87PKcL6JWFbRWLalXN6TfmQwPNqLJfxoLqyy3heeeUyfqVcdRnl8rW3pucZ1HmSd54+nadP55mK88qnAa5vDwl8HGPJIrqCU06oUwbnLjbrytcuFG5YwI7d6oXzL+Zr4+PO858PZBsPLbby+cpyAht2bndCcogTS3mPNncI+V7ti4sPNec92smF1FUO/dBSxObZm6mulbRIlU0upK6nHHU9Ljl7TroguXgdDlc4opqemSfQa9Lx/PWm389+lOp9gVpYpBYWqYVFNmCRWlikFhbZzkVqYZFaWKQWFqmFRWphkVpYpGwUqYVFamGRWlikFhaphUVqYZG6U6TuFKmFRVWdL6auRvisao2XqI6V12I3XyWvK4ymcZpJLDCJBSaxwCQWmMQCk1hgEgtMYoFJLDCJBSaxwCQWmMQCoyowiQUmscAkFpjEApNYYBIL5KhAjgpMYkER9rK+qXMZfxW7GgVud1LwPaeXDgpsEviE0yvbnB56Sp7tWejJ6xhDHCOVY/RwjB6OMTFjysNXmNIkU5pkSpM8M8mUJpnSJP1IMqVJpjTJlCaZ0iRTmmRKk4w3yZQmmdIkU5pkSpNMaZIpTZKwJAlLMqVJRZiXhJVIWImElUhYiYSVSFiJhJVIWImElUhYiYSVSFiJhJVIWImElUhYiYSVSFiJhJVIWImElUhYiYSVFGFnSJhJwkwSZpIwk4SZJMwkYSYJM0mYScJMEmaSMJOEmSTMJGEmCTNJmEnCTBJmkjCThJkkzCRhpiJshE+C3gyVr96cKqMBhmmcdRZPh+QM4XNWBR+XxqjzTtUrjbGF3s5eIcFXSPAVNcY4HRrkwYM8eJCuDtLVQXUZv+Pqb6RD53g7flEevI1GPY3tNHbQ2EljF40GGKYxwQgsDmDxYEsdHOACSD4T/klZL4BeKl//ByaLLYhmF0KTC4n6BEtwguROsIImWEETbJwJFcHUrVqTPlNeYE06XeFtNfi54Zv3mcrN+Ztl/fJ7r8BK6o4wdUeYuiMq8POL3aA0LCFV16xdg1SwNBUsTQVLMxFpKliaPZNmWtNUsDQVLE0FS1PB0lSwNBUszfJJU8HSVLA0FSxNBUtTwdJUsDTrL836S1PB0ioNIdafvLW8fAN1uOwXGWE5Kq9+97Vnm4Z5vdub75aXfnvTLPBn81RxJa0vKBoiQvCeEXtyUvCifHJ0UHK2h8ZeGKYRo14dY/UcY/UcYzscYzscU5eJU2Q7KLIdPLODIttBke2gyHZQZDs4WocaLXEjL7+n2CxT6vxXndmrR9KVTOnMPiCNlDOV/VQaaeeJxAZpZBhhEyNsYoRNjLCJETYxwiZG2MQIm5SHWTlaixi7u3z1zktq1RZoeSXCEUY4os7PMa1H6eBRDnZUHZxnaK8zNGXso1FPYzuNHTR20dhJYz+NBhimUZB+SMJXiV0VFcxSBbNUwSzDzlIFs6zjLOs4SxXMUgWzVMEsVTBLFcxSBbNUwSxVMEsVzFIFs1TBLFUwSxXMUgWzVMEsVTCriCty2oiTsDgJi5OwOAmLk7A4CYuTsDgJi5OwOAmLk7A4CYuTsDgJi5OwOAmLk7A4CYuTsDgJi5OwOAmLK8JKlbvlTztS+6+yXnY8LLBV4Ig8qrzYHO9ZgoBfM8e/puXZZfjE1jaBtymFdhmnIM4HlJsXFnNg/XIcuEj1lOue8PVV1DRev5kvXsOswDCLLsyiC7NmwiyGMIshzGoKszLCrIwwKyPMygizAsOswDBrJqyS8cZSf9hRW17GDzushW6b3iZTbytv3lzK8545z3nU859fy7MvOTdI++XMdvlWrOGvs3ZSTbZOuvCWHLWS1hlmcoalMMPkzTB5M6ylGUXK29TBDHUwQx3M8MwMdTBDojP0I0MdzFAHM9TBDHUwQx3MsKYzjDfDKsywCjMs/QxLP8Nqz7DaMyQsQ8IyrOmMIuyduW9BXygv40bqymIy9eXlyJTNVYmbqxI3FyJuLkTcXIi4ufZwc1Xi5trDrZh411nrfUp2xMcqrzlayjfhNcfHnUufkJf+BKPqYlRdjKqLUXUxqi5G1cWouhhVl4rqkzdTvINsmyA7JchOCbLQg6zgICs4yBYIspyDLOcgyznIcg6ybYJsmyALPaiI+NTcJy1rFxDxGxbvTzv3ExGZ4c/cyM3JJDmdVK6+Jy722YUe3YySuVFSP0qyRknWKMcZVeN8jpX4BitRGfto1NPYTmMHjV00dtLYT6MBhml8fqnz6meWk5ovXO8mPFv+CO8Yv+jcJn5JJvxLzmR6vzS+vNA8/hab5i0V/VcW+lHry8zay+r4r3KKi3CKi3CKi/DMCKe4CH2IsHoinOIinOIinOIinOIinOIi7PwIqzTCXo2wVyMUiAgFIkJNiFATIizzCMs8ws6PKMK+5mTnjzI7X3eMX0rjG5JK+c9qx8v6Hvv7Tgpc8rxvyr3twhoSWzsE/kVgp8Cmsr4TdzuFIW9WuwT2Cjws8KhAt8A7BHYLHCzLn/64jG/Jq35rsaly13LK8dvLWcHJlVi0vOyVnGm8v1DpeliAHpWJ78y98TEEHhH4WvnqDVCPwPfk0d+tPAFpLS/+BOR5NcAHy/lFx1xy5S88UteSPOcXHd9z/jV7tSyk7zvGP6TxA+dfUsWl8UNn6v+9NH60UJZkNn63QLaWnaUfL1Zx1nIq7icLTXJSGd8q4x7yp07bbZY0/Aw/NzgVklt+zgeWh0Llqw8slbEXhmn84lbercgsPDYfi7+c74GBfFAw4Zz1CYG9Akvy6F9VCnHrRyjEazj/NZ/pXaaMX6aMX+aEfZnz7WVF4G9u9a+7np2PwN/KUfcLa6PYelRgR1muMVzG1wQaAj9XtmdXI61cjbQynlYuQFq5AGnlmqOVq5FWctCqOPgdval40Sfwt453f3e8ysOrdnrVTq/a6VU7vWqnV+30qp1etSuvfi+9khm4Dxm55rXCH5a6XlpRXsZ66Y+3ujrunK86/sQfw57l1HFWMfNnrnoSXPUkuOpJ8MwEVz0JtkuC7ZLgqifBVU+Cq54EVz0JrnoSXPUkuOpJcNWT4KonwVVPgqueBFc9Ca56Elz1JLjqSXDVk1CEfZjSi44vSH39y/XWwPs+ihz91bnp2SmH+Bt/CG2TbFv583febLSxkdrYSG1spDY2UhsbqY2N1MZGalOj/cP5XkpMuvZPZ0LOSONfutBcxm5xUr/AmbJeVbxcvvrut5cu9fLyvery/5YXkZPcD1QSFrzTM43/MPQLDP0Cx7nA0C8w9AsM/QJDv0DfpGGa1jr9zZ/ZL++Mv298J2St8U2d/T/b3guZ40esDfIzXf6pse6g/Gjd1FnbHDdO/+8bdP/7Bt3/92/QrZ6ekV/TCumPJ571nTHH7Ivye1NB/0hY/LVhwueb8XgDAY/z1bmL1ppw0OfzjAS8oZA9YNWMeEfGfWJzvfrDMxb0Tk56g2LD6pnpUDjgi9kD4yvGP7Bq1Mcd7fFua2046J0KjU4HJ4U9MP7+afUBvNqZoH866A/HbWvVlNgnP/tY55084x8z1cZqrxmetq0a9QFJcfmGmeD0jHdMdKJHDOTXUQiHnW+FCpfPeEcmZGDW5klv/Iw4LOAd8Y1PB876giH7grXed9Yf9lz9lOjAuLj7HD980Vo3HRSH+ESf+8LywHX+yZlp+fkvb3hcflrSWhuaNoMjPrVBUFArPww25lckSjGo7vMGJ2zzyf8Cvl3umg=='
+)
+DATA = pickle.loads(zlib.decompress(base64.b64decode(DATA)))
+MEMO = (
+b'eJzVW0tw28YZFl8SRb3sxElfbhuztUtK1sPvlyyFluhYEUXJomU7lmUEEiEBMEjIJCC/6MR9pXaKtGnCzPTU6Uwf6XR66KkznWkvzfQx00lO7aWnznSmp5566qnTBbHU7nIBClhA08TjkUgA3+73f/vvv/+/WD2Ovbew0NH496iemjV/GNEyXxLqRmd+ae5CdrFudG3ymiZUynXzZmyLV3Rw963U5Fnr//LY8JmV9BD4JNSyaevazaHazeF0ehLdrhEP3xwhvqYna40rza/WzXbNpSfTNexb3YitK/xGtb5SNyIV/m49b3Ryd6WiJoIrqdnQm90d8F9IMOIcp93fFDiubnQvWKYtZuu6Ed+sSGpF0u7XZzvEPqPnilApSWVemRbW6/psCFgvho1oPjOXrYtR81uncQKakRm+sVJb5ocfrKRrXBpJg19vcAV304N1Mb5SFxN5sYciJ/aJ/bo4YBIQ9+izYavT7msFbiafm8mjnvugMi/UutPpIfctRqwWu/LZa0R7vVZ7fenJhJfmolZzkUvZ69tNpcZAQ/dq16EOHBo3U4p18DMzfHGFYh2x6yZsdRODrKfm5+ay+SvbXXWNji7fSqy0KBpuQ7gTEp7OXtxuJVIEI2y2YISkOi8mjM4kuJKU6sALEtBDClqljjXTBZuZwchEpLJmETluNQK+NxoRT2LIOPSj3EJmcRsaSkELjEgylWyFdEPIIgFJI0iagiQsSGfuwmJmCo1y6CECPaRAPRC02AJ6hECPKFAvdNFCdm5maj43n0e4cwh3jsL1QQUvziObIutqhVAQfKcV7LeQsWuXZnKIZeyuKCkCho4nG1do/ICFD88gDwhL6xgylpTWadgeCJueR7CiSsCKKg3bC+3MFOaQnXy1RNgJvtPIZ+CwZ3MY06igEFy7kuYFGvzsNriQxcFVoQVctVFoH1TYnG4ZNJ6H0XgepsbzuebEmkczIjSCECMU4vntXgivOYswZynMpyBmbia/VECYYYQZpjCfbs64wuULCLKMIMsU5DPNGUdAVhBkhYJ8FkIWcjixIQQZoiCfa8637JWlRaRAZ0XQdLDconHqTlqX6JHaD/XIXl7K5FC351G356luP29hwDKYyc/nuTHkzkPbuGhyiAZ+gQQeQcBhDDhMA79IAo8i4CAGHKSBL5DAYwg4igFHaeABEngcs3EIs5EekyQJPIHZOIzZSHvZl0jgSQQ8dAgBDx2igF9uBoj8NBYgykUyQJSL9OAfJLs8hbqs1VCXtRrV5SEYyrDQGyYibyxpF3i/QvZ3GoHPY6Nxnh6NFAk8g4AHMOABGpiGi0vT4zBfncCQEzRysAWJOes4hhynkUOQ7Nw8mJeXMlhkmkCzaoKCHYawXLZQIGHjCDZOwYZh2Chcwdf2QQQZpCAjcM4XcpnCJYQZRZhRCjMKE6iF7OIUnkCFDiLUQQo1BkXMzAFcAXfQ0CGEo136CDTq6gXcqBqC0C551IIkpmYWp5bmLuawfDJ0CwFvUcBjLQONBZfxcWygaemPtyCx6DIxgTkXPdYn4AhcmclNY3nSa4jnaxTmpFk9dYL6YkNqVFImvqrxFc3MMnvyarlZboBKpFu4t8mXq5JaBuWL9Ww/xzWe5jYVvWrG7D55KdTRofNGTK0UhQqoWYwYr0h8FdQ+XeqmBsDVRsU2cFsQNjleUThNvS2Ai0+Nrkb7xSP1J+JA3hjQhNKmwmsCV1X1ypoAGugDV7T7nFQuSmtCtZ42KS7qijAP29XBhah5ARRGp0An8mKoUUACos+u6+U18ykO5NBSWTI/brOVr4KfIEVvPCqOGYl1SQHZNafqGuDSZ8SRCHi5JUsA9hQ0IpuNWOCJxsUnxEUjyldAEdjszXpw2uZB8WU79H6OsyFvKX6kpdUFsgFBvgF+zXbIy+CXsQ9rZk3hK3xDBPmmJZJ8y7RG5hr4gbz8KviQl3nwE+gsr5rNgd9r5u/Z08zinraxUFbAR7diyir4yCilXKWw9oKFGoLJuvmDQZ4zpDy9UlmRygK3qqhrt1t1gQEGzCLg70JZQ37C44OXZ+Fx1gMPuBjGyJuWSFfbiNREsPA7R/KzE4H0npt2I2075br4alXaKLfOuqt2z8bX1NImXxFcPezQcPA+CCdtHBSbnKKqm0wKj3tVeNW1wk6q7dZsNBKNwpldi/NetRA/TlrASNtYbyHtxtJrli04zug3i2f01PZdKGbYErNXWseeYZFzYtfklH9LiRG0kPIH2GNQmYgV9P8QYgv6k59oPX5P6xH1p8eLn1A9oPUxf9ZnvFpfDnhEdyuS2+cCnVZU6SuqnM8ofcGrcJrrRNomeB5zlT93WdZ189USx57tTO2aZQ6045YLd4XZXHia5Ntv7ujarCsk5wcfpzWTzKRaDWDRJEtpYrvWkpo83kWLiO5ZLLpIWhQ3fdysEhzqA8fK19jLcU2sNbeOu6oioCk9JhZ4RMncYmSx4yVPdsgjYduSUx4LU+sgLAaPMk6jS4EQc1Av7I/bjEtuTtR4InNiZfGyJ4VEw3aLxXFH5h1b4aJYSFf4VUFhcrpZknmv2Rpf2dDtgoEzT54s+MxGGmcdWBjlPDNqHqiw5QRLr86yXloVKkyM5jwzary2t6UDi5eEKNzjfFDKe6AEne77dk5nLx1RTliNl4UNXpO22IZ03jvbH3ibIj9uN0W6zP4qfImJ+8Kuc/+5+4FpZ2wsAGMv77qxHrywnbEwW98DjfXnnoverXYdwcn8uxEZZb3EVlgUSJ7knjyZ5ESqeqllV6WPM42CVcOJ1k0VGLqtNlnIXXFBzlqEf4IlKESQln/GuPwuueibDL/WaxhmY6+SHcba7ItTu63+N8WvuekdOuov7Ry1xzr1wBE6kVuVXRw8LMFC8DpJ0La7Hf11H8dhOMttTzq4LdEDC+NX3DO2nPjPjk78EaMT33BPgfDlvZYv+1VgmeyecluXRZT4KzuHI4aXHLqE1RG3xbNlQjcD4v0bt7zhBOnni0XOJ/eVgLj/zi136DL9VX3VL/dbAXH/k1vuMBvtL+mKX+5cQNw/cssdJqL9RWnLL/dXA+L+l3ZJZLdUXquw78jwAXH8W7vcr7so+OG46oljjyJVNTh0LZtCOwc8a8X4kN6XgVnhHuDSmuTXMda8GCQPRlr36ezskIcjFGm4JzsaYVvmiu5owpx1+1jGGq8orSlUN3sKJbQstnbD63bbECQqGNw61XLKfrVj4rpOcqV3nXdKpcT/eFyT+2AXnHBH59n2lTZ8k/6vxwV5b5N0WdV8EBf9EpejIbjJ6H5Bfq7JfaMi8Oa5LXb+km/+CQ/84aL8TJO/IlSrPsjLvsnv8UAersoDLeIzMb/tm/nzHpjDZboXl52JtuKNttMbr7+7ez1GLuA9fLnIwWeYyJc8kZffppa8f9otee/SS561Tst1xiWvHIzI//IkchyWV2rFl8aqN41/RGn8bzuNf0prbC3m8vuMGm964unrfS4knGBf0e+4JGsTAGDq0wMDwAOhovoa3wpJheiL3MfarKhFfU1rZeIjsanu3LdzemC7a06RJFOECKjZmVTS/DC13fJ2YgoTAtDMKhNTvSW9bu2GfJXHayrlWj4GdMtd5ymH21Zs2B+yXwdJsuTARs0Kikmvu0FQTnqh3BzhorTFxPheEIxTXhjDJC96R1fZRL4fBOURL5Sbb/5WJVCXMZ7HeBAE6+NeWMO0rtNkrbLloQ+DIH3WC+lOTOp7jKxrQbB+0QtruPWSUIR1jauK0jqbZz8KgvhFL8TjzTce0oboh/lrJHOyL/fHKzr8H6943TUT52MVzQP2Po9VPHZNpc0pmGaAZ93I+6prEu23xyLsC/nXXFCAGX/Oi/PiYbnMuJh83TU3+yzfJkOzT/Bj7Pp9wz1H2+ywXaCN+zrr8E2SmYMHud2gZ/1bwZbtRpIEi1lvEGbJr4RQfUnMmLZ/57djAvx0Jxrf2pFGir5jXXkSdTi2yUTkCUmk6qSH/R/U+Rfi6Y79p+g71pV6oEK8SRL5wEkIp7Ph/qX49o4MUvQd68oPA5XCIInEwg5S0KdX/Yvw1o59p+g71pVfBCrCd0giY05ExDfsQpv90bAdX/HsyOq7LlkRd5x5yr8OVLO3SXbve9PM+T0TE5nvuSRD3Gkj1R8Dleodkt2H/1ep3nVJhrjTRqq/BipVnWT3UsSTVG3OWvpQ7D2XnIg7bRT7R7T17w1866aP/A8DQ2uz'
+)
+MEMO = pickle.loads(zlib.decompress(base64.b64decode(MEMO)))
+Shift = 0
+Reduce = 1
+def Lark_StandAlone(**kwargs):
+  return Lark._load_from_dict(DATA, MEMO, **kwargs)
+INLINE_DATA = pickle.loads(zlib.decompress(base64.b64decode(b'eJztnPd7E1f2xgW4F0zvkISS3ggk4IIrAsx1ITaENKIII1uK5YK6FBmEWuJkAimT7b237GZ77yXbd/+kvWVkf75gbKMNz/P9YZPnyet35s69557znnPvjCaTqXz3g9Mu/c+Mfa9VNe0NhX0hW/1dF/QlfCHPyNTkqOa1EV9oIjDpDYbtc/a9M7a1otMWrvCM7a8RKwysNLDKQIWBSgNVBqoN1BioNVBnoN5Ag4FGA6sNNBlYY2CtgXUG1hvYYGCjgU0GNhvYYmCrgW0GthvYYWCngV0G7jBwp4G7DOw2sMfAXgP7DNxt4B4D9xq4z8D9Bh4w8KCBhww8bOARA48a2G/gMQMHDBw08HjYZ1UFxianQj4VCKv27LCnd6Cvd8BtW9UD7rPOXz2D/f3ugdO2z2oc84R8Y76EZzToHQvLmFm10bDPcz4Z8YXt2VKcI8lpn23VyXBHfIlI1Bu0rRqPPurx2FZtn2rUo7QQteqNSualURmKBn2OLKSFTxhDDxk4bKDZQIuBVgNtBo4YaDfQYaDTQJeBbgM9Bo4acBs4ZuC4gRMGeg2cNCAM9BnoNzBgYNDAKQNPGhgyMGzgtIEzBp4ycNbA0waeMfCsgecMPG/gnIEXDHgMvGjAa+C8gREDFwz4DIwaGDPgNxAw8JKBcQNBAxMGJg1MGZg2cNFAyEDYQMRA1EDMQNxAwkDSQMrAywbSBmYMXDJw2UDGwBUDWQM5A3kDBQNFA68YeNXArIHXDLxuwDLwhoGrBq4ZeNPAWwbeNvCOAdvAuzJ1KsMRbygitep/zzunZCP+iqA3GLL9x626U/qwkbt/ha6Mkalx32RYyV0mUMXQ8JPdtlhhVZzqOzNsi5VWZX/vgPprlbXqqPuYLSqs9aPRyZFIYGrSc8E3GpgMqD9tUWmt6pVZKaqsir3ugaO2qLZqh939vT2DfYMDtqiRlw/K07VWxUBXv9sWdVbVUPdQV4/8s96qVEndZYsGa1WXurZRGnKqa8gWq1Wudg0MDngO2aLJWjkoj62ZO/aELdZalcN9XcMnbLHOqu3qP+UeGtY9rLdqnUb7H7PFhnl2wBYbrWrZrkcVEbHJqhg+rUbabNX19A71nOk/1ud+2hZbrIqnutXxrXOjNdti23w/+22x3arpcw8Pnz7RJSe4w6rpHxxyG7Jz7qLDttg1f9GjtrjDqujTU7tTznW43xZ3WSuPDtpit7XqmJrdHmtlr3TzXqvy7InePumdfdJR7tNnhmS3d1sV3sjUhC3usSpP9/YdlWfvtVadUPbeZ60KR+WZ+63GufCMeINBWzxgVU+Hpi5ERyK2eNCqGjjT3+2W4zxkVXvDYVluZeF82Ko8H5waGbfFI1adlFHEN+GbjMgTj1oNgclgYFIWVXN+v1UfDIQjHnOpLR6zdng8C+jBMx2Mhj3SRwesCnffsDT0oPpDzexxOYmQKtdPzDlJRujQHJEXHZ4jMlrN1gaPB4OarqUcWuZaHbRF6xx53BZtc0Q6/IhV6X7yTFefLdqtqj5Hch1WzcjUhEwSWd1Fp7Xa49HZY/qWF3X53xPdMlI6G3qsBm94wiOtjiq/2OKoVaMOKMfYwm01etS5sO5CDX9M6Vmr/ri1Vp5zmprz0tYTakYhXyQamsSFUsy91nptiON/c1y64ORCx6XThLXaFwz75k/Zok8dCozyUL9Vj8HkMlelTzopr/8j/40XZdpL/K7ElRKTRTsqVIUQqyS7Jo9WSKyWWCnxnxKr1Gm9KqqmK2dkysszzxTtsFilrqtxzh+T50UtSR1IVFSw8ZPqfD1JNUktSR1IVFRKA6rYVT+76mdX/eyqn131666qzbRXONVbzxmkCiQqalRj5bkzjuf+JrHBafKSat9IspqkiWQNSTVIVNSqMdY6h6Lq/DqSBpL1JI0kG0hWk1STbCTZRNJEsplkDclKki0kK0jqSbaSbCPZTrKDZCfJLpCoqJNiuEPG4gWlxnrlvUbJtmpLXeIXei4u8Q/tO5eIaH+4xBvq0gbV+k6ntyOq67tIakl2k+wh2Uuyj6QOJCoaHUPfV4auVkPfLVmtbHePxNMSVXq+J/E+iack3i/xksQHJM44kvuoNswl7i6a3qYkPihxuxqiiUlxknM4SXtOanvWqMYlH6l8Hl7MV2vZtWBQBWUlOKjgoEIPus643CX+rN3oEnXOfPZLfEjinRIflvh97UyX+J3ERyR+XOKjEj2OX7ZJ3C/xXR01l3hN4mMS9+pYuUSjjoxL/FqNul6NWvKu8vrf4c2S92/i1VIUomIDUzPB1EwwNRNMzQRTM8HUTDA1E/RhgqmZYGommJoJpmaCqZlgaiaYmgmmZoJRTDA1E0zNBFMzwdRMMDUTTM2EDvZG5bCSW6bpiWlOfpqzmuZEpumWad3nJoZyuSFUId/AUG6esXWZ+KPKxS0sA6+zDGhygKSWZDfJHpJ9JHtJDpLUgUTFVmddPaiM2qaMKk39An13QTfers6XVHaJ5y9RZZfo6Et05yWq7BJVdonCukQtXaJ8NFlLso6kgaSJZA3JFpKtJNtJ6kl2kOwi2UayEyQqdixVcc+VU3F3Xl9ZHiynsuxicR3gfAcYsgEqcIACGtBTvGOx3FDGhZZjzJ0z8yM+FVZavIubpMPcJB3mJumwNmK3alwvOxt3lpVVEktzO84ZHOcMjuuL96iLVTCuOBYvFKylgvS4xPwCMywlyBk91N5yVqI6iT1FsxKNFOdXpputSDesRPsWUqGa8CdvYYI3qPBu1as62lqcX3oyLAoZFoUMi0KGCsuwKGRYFDIsChkWhQyLQoZFIcOikGFRyLAoZFgUMiwKGRaFDItChkmSYVHIsChkWBQyLAoZLYJ7bvd25MWFRHBvOaPeTHJKknctR3r3zZhBjqmUvp8mKENP3AYH3GDCA86ym1ImPMjtVIpSSVEqKW6nUtR0ippOUdMpajpFTaeo6RRVmKLAU5RkimpPUZ8pSj9FSaao3BRVmKKMU1RuivpMUcYpLdaHFrv9HKVnRumMUc5ylBMbpZtG9RgPOxE6pCL0yM2KVe6/KVaPlhaIACwe1qPvV6eekKd+L08dkviIxMMSX9eudekbilKda5b4tsQWiUcktko8ILFN4g8kHpGYVb0+xq1Snn7KU0F5Oi1P1+SpoDwVlKdo8tRJntLIsyrmKfU8pZ5npPKMVJ6qy1NbecopTwnmqa085ZSnHvNUXV6H4QD3nl46zKvPH+SGuStcnN8wd3F912Q3yR6SvST7SOpAouJxKcl2GctvK0k+wZvW629WlXA3FnHTeoiRL3AiBUa+wMgXGPkCI19g5AuMfIGRLzDyBUa+wMgXGPkCI19g5AuMfIGRLzCKBcqgQBkUKIMCg12gJgra14cXc6/jVu3mT6vWzar1EaeDdznou7q3FtaPDomHnfrx9eKNuzqV1j9DHSnVlevryVwdaV3OXlHtBR++9Sp13V6x7WaF8KH/phAeYZq9SHW+qEdtL2czrCb8wC1PsIOJkqUpWSZKlomSZaJkmShZJkqWiZJlomSZKFkmSpaJkmWiZJkoWSZKlomSZaJkmRtZyjTL3MgyHbJMriyzJqsd1ulspl5RRanLIc2KdN/uLeXPiwvsrHp4i3ZI2VtJUgUSFUeXuhWuKUfObvZ6syxXVcBXTrYf4y3yEIM4RB0OcQEa4mIypKd+3HkI61ahOvFh7sOX2PzqffpFZUKv2fe6xB06s1zisk4dl9ikE8UlfqqF7BI7i2rj6xLrdTK4RExnlUs8j3wIM1fDTM8w3RJm2oSZNmFmZJgZGaaTw8yhMNMmzOQIM+/CzKEwsyusY3FSOWKXnNC+ollU+ov23P52h8SjekyXEHoEl2jT/bnEF/UgLrG6eOM++CJ9cJHTvshpX9QWiKUS4VPlJELfhxngCAMc4eQiDHCEM41wphEGOMIARxjgCAMcYYAjDHCEAY4wwBEGOKLd289VJceJ5Liq5DirHGeV46qS46qS46qS4xRznGKOq0qOq0qOq0qO3svRezmuKjlOPkeH5ejKHL2Xo1tydFiOfs1phw2wihdZxYus4kXdeHCh28GS516gt1/Q7U8tdvs4xvZjDMgYfTNG34wxVGN6jCed8tquyutQ6UZvDO2e1u2G1SlW2s03VtKoOH39w9WOYhkPV8+oXlTy9qJ1KanZe+0Cvd+Q3E992M9uvldcxoOTszPGhF3Kr087N0Q/UeSZ5a66a4plrLrP8hnNDPNnhvmjyXqSRpINJKtJqkk2kmwiaSLZTLKGZCXJFpIVJPUkW0m2kWwn2UGyk2QXSFQ8d/1rFAMSOyWuKM6/TtElsVK1fn45P2ap4E4vJvBzCyV2KQBvcsZvahtfUO2VJAoQ/od2W+bhw4FXw8X5hwOvcm+myW6SPSR7SfaR1IFExYu3Ywun0vKXi6Wj18nAl1QGnpdEvVZTocgIZz/L2c9y9rOc/SxnP8vZz3L2s5z9rJ79heXdrptLgky4oL7ex+vVDuzpm/cTFaM3uwt+p/hf3AWPLbUH+2w5vfp5u3CKOXCKbjjFoJyig09pBwWWMu5L5Rj3kupV3cp9WR69XbeKN4h23LjEJe6TR7sl/sax9awzpyrHxo84VqyV2CNxQl0dXKzIvE0Hv00Hv63dOMFoXGPja2x8jdG4xmhc091MOpnmV5k2tVRo7HJCM80FL8YFL8YFL8YFL8YFL8YFL8YFL8apxrjgxbjgxbjgxbjgxbjgxbjgxbjgxbjgxejsGBe8GBe8GBe8GBe8GBe8GBe8mI7JRRa8Nha8NkazjQWvjQWvjQWvjQWvjQpo06OFGJ44wxNneOIMT5zhiTM8cYYnzvDEGZ44wxNneOIMT5zhiTM8cYYnzvDEGZ44wxNneOIMT5zhiTM8cYYnrh0Wdh5NfVOlTGS5e8W/FMtY+KNUwlEqQZMDJLUku0n2kOwj2UtykKQOJCpi1981JIpl3DXEWbIGGaZBCmWQsxmkMYPamAQFm6RgkxRskoJNUrBJCjZJwSZpR5KCTVKwSQo2ScEmKdgkBZukYJMUbJKeSFKwSQo2ScEmKdgkBZukYJPaYUnnTue8EmzK2WetU+Tl0vrV6cTvzaLZqqUlHpVoqevTVGE3VdjNUHVTeN0UXje11k0VdjO83dramQ/zUU+IcQ8x1CGGOsSAhhjDEGMYYthCDFuIwQkxOCEGJ8TohhjdEMMW0o64xEc9VziRKxTwFc7qCmd1hQK+QgFfoWavcIpXOEVN1pKsI2kgaSJZQ7KFZCvJdpJ6kh0ku0i2kewEiYrLt/Ieo6pizy5UpTK3cgMwSX9PaiuucFfnlvhocX53px7d7MD1p/Ul2aX2Xf8qlrHvyi32MOsc9XROW5F33lN4XFWGwvW3Md6beyMqiosN5eFQHj3UK3KoY7JZkxrqVecB1x5FZllrWlhrWlhrWlhrWlhrWlhrWlhrWlhrWrQdrznF8B419OtLRaFYThQsLnpvcA5v0J43tD1vLHc3kSmWsZu4ert/RnuquMA90jVnu/Sk8vGb5vdZl3hLNjkucbeTFD8szr/R2Esv9dJLvdpLb9GlJ9j4BBuf0I3fLj0x7Sracz+s+/Spd9SpE/LUZ4rzP5Kopl9dQMUjVPGIvt6m6ks/tjjXRcW7M+Z9mVE174/Q5D6Wuz5WkD5Opo+T6dMjfvT6fdhjy6h0N1S4jy1XZfXlqOzjzOBmZnAzZ9fMDG5mBjczg5uZwc30SLP2yCfo2Kt07FU69iqHvspurupuPrnYg3w/Q+/ncuvnyufnyufn6H49xqcWG2OcY4xzjHGOMc4xxjnGuB7j005Bu1+J7jML/VhwngOd1xd9drHnEO/Qp+9wxHf0xZ9baAupto7fKpqt5Bck9kp8WbX+PMXxGsWhyQGSWpLdJHtI9pHsJTlIUgcSFV+gHT20o4dD93DoHg7dw9F6aEcPR+vRo32x9NbJb4vlv4J9w8rypcXC9hbD9pa24suLlX8VqW8ssgyU/Xb2V3i39jL3kC9zD6nJepJGkg0kq0mqSTaSbCJpItlMsoZkJckWkhUk9SRbSbaRbCfZQbKTZBdIVHx1qW1IsByxfK201g0Vl17rntGGfJ3vEnwo7xA0kizvhYI5m8zbBd9QNh2UfR/X1cIl/irxpMRfSRQS/yCxT+Lni/ZcfncyvzuZ353M707mdyfzu5P53cn87tRWfZMv7dkUiK3Pf4uLlEUDLHZm6cbv8bbvMt12mZlwmT68TE9dZiZcZiZcpvgvU++XKXFN1pKsI2kgaSJZQ7KFZCvJdpJ6kh0ku0i2kewEiYpv3+5t7b0L1bXv3M4XnVQ1ji406vtqVNX7Sox2w4/833Ue+EyqXcD3uNS5mQpuKtHNVHAzFdxMBTdTwU31unUwvu/8D3ezaugfXL/R/PcCJe2WS9kPl/Oji/qR5RPFG358iYof4X/FOhtWVv74Vm74p5hpU3rKP7nd+vvOQkr4acm3X4Evb/lW4GfXv078hBOpkwtEqnQrsFTE5iL189v1S/IHxUV2HL9Y7u3NhWIZtze/nDFD/UlJ51dcjtTy01CcX5bUMrSlOL8MtTP32pl77cy9duZeO3OvnbnXztxr10L8tfMgpUWZ9hvnttulyG8Xu/UIcI0JcFkJsMIHWOEDTIOAHv13N/sp+2u3kOz9En+0gGBLQz2rh/r9UlukwXLqyh9YKDsYrA4Gq4PB6mCwOhisDgarg8Hq0HP4o3On1q3i8ycnch9T5APa0Uo7WmlHK+1opR2ttKOVdrTSjlZtx58dOz6nhv7LrZTCCWpgQnf2V6ezq6qzv5VeEuuD18t+SezvvI9Ic1OS5qYkzfuINJWd5u4pTZmnOZE0d09p7p7SzIY0t1Jppkaa+6o0d0JpbrLS3PykuUdKc7+T5oYpzT1SmjuhNDdMaR2Lfyy3DP64nDL4T6e8vKoi/a/FHv8+xyA8p03792Ltn2d7RaJRq8F8X2juyzv+92RPVp1v8sL/OVYZjvqPW03qM12BybFjIfXRuskLdtQvzv3vG3T/+wbd//dv0FVPTauvf4XNxxMv+M5Hx+xZ9b2pUGAkIv9qGvf5pj3eYNDjfHXuVasuEvL5PCNBbzhsD1iVI94Rv0+2bNR/eMZC3okJb0geqJ6eCkeCvoQ94F/hf9+q1B93tP3HrPpIyDsZHp0KTUg+4H/vnP4AXs10KDAVCkSStlU1Kc+pzz7WeifOB8ai+mCFNxqZsq1K/QFJ2f366dDUtHdMZqJHDhQws5AGO98KlSaf946Mq4lZ6ya8yfOyWdA74vNPBS/4Qmoeq30XAhHP/KdEB/xyA+8/Oms1TIVkE5/Mc19ENWwITExPqU+NeSN+9WlJqz48FQ2N+PQB6YIa9RGysYB2oioGFX3e0Lgdffg/WFrkow==')))
+INLINE_MEMO = pickle.loads(zlib.decompress(base64.b64decode(b'eJzVW0tsG8cZFl8SRVmSnTjpy21jtnZJyXr4/ZKl0BIdK6IoWZRsx5K8WYkr7a6XXJnc9ZNO3Fdqp5s2TRigp6JAHymKHnoqUKC9NOgDKJJTe+mpQIGeeuqpp6Kz3KFmhrNL7c6u0MQw+Njdb+b7v/nnn/8fjh7H3puf72j8e1RPzZgvRrTMl4S60Zlfmr2YXagbXVu8pgmVct28GbvDKzq4+1Zq4pz1f3l06OxqehB8EmrZtHVtZbC2MpROT6DbNeLhlWHia3qi1rjS/GrdbNdceiJdw77VjdiGwm9W66t1I1Lh79bzRid3VypqIriSmgm92d0B/4UEI85x2v0tgePqRve8ZdpCtq4b8a2KpFYk7X59pkPsNXoWhUpJKvPKlLBR12dCwHoxbETzmdlsXYya3zqNk9CMzNCN1doyP/RgNV3j0kga/HqDK7ibHqiL8dW6mMiLPRQ5sVfs08V+k4C4V58JW512Xytw0/ncdB713AuVeaHWnU4Pum8xYrXYlc9eI9rbY7XXm55IeGkuajUXuZy9vt1UahQ0dK92HerAoXEzpdgAr5mhS6sU64hdN2GrmxhkPTk3O5vNL2531TUysnwzsdqiaLgN4U5IeCp7abuVSBGMsNmCEZLqvJgwOpPgSlKqAy9IQA8paJU61kwXbGYaIxORyppF5ITVCPjeaEQ8hSHj0I9y85mFbWgoBS0wIslUshXSDSELBCSNIGkKkrAgnbmLC5lJNMqhhwj0kAL1QNBCC+gRAj2iQHugixays9OTc7m5PMKdR7jzFK4XKnhpDtkU2VArhILgO61gn4WMXbs8nUMsY3dFSREwdDzZuELj+y18eBp5QFjawJCxpLRBw/ZC2NQcghVVAlZUadg+aGemMIvs5Kslwk7wnUY+A4c9m8OYRgWF4NqVNC/Q4Ge3wYUsDq4KLeCqjUL7ocLmdMug8TyCxvMINZ7PNSfWHJoRoWGEGKYQz2/3QnjNOYQ5R2E+BTGz0/mlAsIMIcwQhfl0c8YVrlxEkGUEWaYgn2nOOAKyiiCrFOSzEDKfw4kNIsggBflcc75lF5cWkAKdFUHTwXKLxqk7aV2iR+oA1CN7ZSmTQ91eQN1eoLr9vIUBy2AmP5fnRpE7D27joslBGvgFEngUAYcw4BAN/CIJPIaAAxhwgAa+QAKPI+AIBhyhgQdJ4AnMxkHMRnpMkiTwJGbjEGYj7WVfIoGnEPDwYQQ8fJgCfrkZIPJTWIAoF8kAUS7Sg3+I7PI06rJWQ13WalSXh2Eow0JvmIi8saRd4P0K2d8ZBL6AjcYFejRSJPAsAh7EgAdpYBouLk2Pw3x1HEOO08iBFiTmrGMYcoxGDkKys3NgXl7OYJFpHM2qcQp2BMJy2UKBhI0h2BgFG4Jho7CIr+0DCDJAQYbhnC/kMoXLCDOCMCMUZgQmUPPZhUk8gQodQqhDFGoUipiZBbgC7qChwwhHu/RRaNTVi7hRNQShXfKYBUlMTi9MLs1eymH5ZOgmAt6kgMdbBhoLLmNj2EDT0p9oQWLRZXwccy56rE/CEViczk1hedJriOdrFOaUWT11gvpiU2pUUia+qvEVzcwye/JquVlugEqkW7i3xZerkloG5Yv1bB/HNZ7mthS9asbsXnkp1NGh80ZMrRSFCqhZjBivSHwV1D5d6pYGwNVGxdZ/SxC2OF5ROE29JYCLT4yuRvvFo/UnYn/e6NeE0pbCawJXVfXKugAa6AVXtPucVC5K60K1njYpLuiKMAfb1cGFqHkBFEanQSfyQqhRQAKiz27o5XXzKQ7k0FJZMj9us5WvgleQojceFUeNxIakgOyaU3Wt/hS0GUci4OWWLAEYuC/LZiMWeNzmohHlK6AIbPZmPThlh37ZDn2A42zIW4ofbWl1nmxAkG+At5kOeRm8GfuxZtYVvsI3RJBXLJHkm+D9icyZr0B/+VXwIS/z4BXoLK+ZzYH3dfN95gyzuGdsLJQV8NGtmLIKPjJKKVcprL1goYZgsm6+MMhzlpRnj1RWpLLArSnq+q1WXWCAAbMI+LtQ1pCf8Pjg5Vl4nPPAAy6GMfKmJdLVNiI1ESz8zpP87EQgvWfF9ZTr4qtVabPcOuuu2j0bX1dLW3xFcPWwQ8PB+yCctHFQbHKKqm4xKTzmVeE11wo7qbZbs9FINApndi0ueNVC/DhpASNtY72FtBtLr1m24Dijzyye0VPbd6GYYUvMPdIG9gyLnOO7Jqf8W0qMoIWUP8Aeg8pErKD/hxBb0J/4ROvxe1qPqD89XvyE6gGtj/mzPuPV+nLAI7pbkdw+F+i0okpvUeV8RumLXoXTXCfSNsHzuKv8ucuyrpuvljj2bGdy1yxzoB23XLgrzObCUyTfPnNH12ZdITk/+DitmWQm1WoAiyZZShPbtZbU5PEuWkR0z2LRJdKiuOnjZpXgUB84Vr7GPo5rYq25dcJVFQFN6TGxwCNK5hYjix0vebJDHg7blpzyaJhaB2ExeIxxGl0OhJiDemF/3KZdcnOixhOZEyuLlz0pJBq2WyyOOzLv2AoXxUK6wq8JCpPTzZDM95it8ZVN3S4YOPPkyYLPbKRx1oGFUc4zo+aBCltOsPTqLOulNaHCxGjWM6PGz/a2dGDxkhCFe5wPSnkPlKDTfd/O6eylI8oJq/GysMlr0h22IZ3zzvYH3qbIj9tNkS6zvwpfYuI+v+vcf+5+YNoZGwvA2Cu7bqwHL2xnLMzW90Jj/bnngnerXUdwMv9uREZZL7EVFgWSJ7knTyY5kapeatlV6eVMo2DVcLJ1UwWGbqtNFnKLLshZi/BPsASFCNLyzxiX3yUXfZPh1/oZhtnYq2SHsTb74tRuq/9N8WtueoeO+ks7R+2xTj1whE7kVmUXBw9LsBC8ThK07W5Hf93PcRjOcttTDm5L9MDC+BX3jC0n/rOjE3/E6MQ33FMgfHmf5ct+FVgmu6fc1mURJf7KzuGI4SWHLmF1xN3h2TKhlYB4/8YtbzhB+vhikfPJfTUg7r9zyx26TF9VX/PL/WZA3P/kljvMRvtKuuKXOxcQ94/ccoeJaF9RuuOX+6sBcf9LuySyWyqvV9h3ZPiAOP6tXe7XXRT8cFzzxLFHkaoaHLqWTaGdA561YnxI78vArHAvcGlN8usY614Mkgcirft0dnbIQxGKNNyTHYmwLXNFdzRhzrp9LGOdV5TWFKqbPYUSWhZbu+F1u20IEhUMbp1qOW2/2jFx3SC50rvOO6VS4n88rsm9sAtOuK3zbPtKm75J/9fjgryvSbqsaj6Ii36Jy9GQ7f5nuwX5uSb3zYrAm+e22PlLvvknPPCHi/IzTf6KUK36IC/7Jr/XA3m4Kve3iM/E/JZv5s97YA6X6T247Ey0FW+0nX7x+ru7n8fIBbyHLxc5+AwT+ZIn8vLb1JL3T7sl7116ybPWabnOuOSVgxH5X55EjsPySq340lj1pvGPKI3/bafxT2mNrcVcfp9R4y1PPH39ngsJJ9hX9NsuydoEAJj69MAA8ECoqL7Gt0JSIfoi97G2KmpRX9damfhIbKo79+2cHtjumlMkyRQhAmp2JpU0P0xtt7ydmMKEADSzxsRUb0mvW7shf8rjNZVyLR8Desdd5ymH21ZsOBCyXwdJsuTARs0Kikmvu0FQTnqh3BzhonSHifG9IBinvDCGSV70tq6yiXw/CMrDXig3f/lbk0Bdxnge40EQrE94YQ3Tuk6TtcqWhz4MgvQ5L6Q7ManvMbKuBcH6RS+s4dZLQhE2NK4qShtsnv0oCOKXvBCPN3/xkDZFP8xfI5mTfbk/XtHh/3jF666ZOB+raB6w93ms4rFrKm1OwTQDPOtG3lddk2i/PRZhX8i/5oICzPhzXpwXD8tlxsXk66652Wf5NhmafYIfY9fvG+452maH7QJt3NdZh2+SzBw8yO0GPevfCrZsN5IkWMx6gzBLfiWE6ktixrT9O78dE+CnO9H41o40UvQd68qTqMOxTSYiT0giVSc97P+gzr8QT3fsP0Xfsa7UAxXiTZLIB05COJ0N9y/Ft3dkkKLvWFd+GKgUBkkkFnaQgj696l+Et3bsO0Xfsa78IlARvkMSGXUiIr5hF9rsj4bt+BPPjqy+65IVcceZp/zrQDV7m2T3vjfNnH9nYiLzPZdkiDttpPpjoFK9Q7L78P8q1bsuyRB32kj110ClqpPsXop4kqrNWUsfir3nkhNxp41i/4i2Jse+ddOH/wdFlmvP')))
+
+GRAMMAR_SHA256 = "c2ac742121aa99a89c46f466f7363353e80ceb40c2d56cb9023ac6b42c15690e"
+
+
+def load_parser(keep_all_tokens: bool = False, **kwargs) -> Lark:
+    """
+    returns the parser that builds the parse tree, or with keep_all_tokens the one that keeps every token
+    kwargs are the Lark options that can change when a parser is loaded, such as transformer
+    """
+    if keep_all_tokens:
+        return Lark._load_from_dict(INLINE_DATA, INLINE_MEMO, **kwargs)
+    return Lark_StandAlone(**kwargs)
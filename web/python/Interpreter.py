@@ -0,0 +1,292 @@
+import argparse
+from pathlib import Path
+
+from lark import Lark, Token, Tree
+
+from Framebuffer import Framebuffer
+
+
+def _wrap(value: int) -> int:
+    """
+    returns the value as a signed 16 bit word, like the registers hold it
+    """
+    value &= 0xFFFF
+    return value - 0x10000 if value & 0x8000 else value
+
+
+class _Stop(Exception):
+    """
+    ends the run, at HALT or when the program ran too long
+    """
+
+    def __init__(self, halted: bool):
+        super().__init__()
+        self.halted: bool = halted
+
+
+class _Return(Exception):
+    def __init__(self, values: list[int]):
+        super().__init__()
+        self.values: list[int] = values
+
+
+class Interpreter:
+    """
+    Runs a program straight from its parse tree, without the compiler, to check what the compiled program does
+    Every value is a signed 16 bit word that wraps around like the emulator's,
+    division and modulo round towards zero and dividing by zero gives 0 like DIV and QUOT do,
+    shifts use the low 4 bits of the amount and >> keeps the sign
+    VID draws into a Framebuffer like the emulators do
+    A step is a statement or a condition, a program that runs more than max_steps of them is stopped
+    """
+    # the builtins that set a part of the pixel VID draws next, and the part
+    video = {"VID_RED": 0, "VID_GREEN": 1, "VID_BLUE": 2, "VID_X": 3, "VID_Y": 4}
+
+    def __init__(self, grammar: str):
+        self.code_parser = Lark(grammar, start='start', parser='lalr')
+        self.functions: dict[str, Tree] = dict()
+        self.framebuffer: Framebuffer = Framebuffer()
+        # red, green, blue, x and y of the pixel VID draws next
+        self.pixel: list[int] = [0, 0, 0, 0, 0]
+        # the variables of main when the program stopped
+        self.variables: dict[str, int] = dict()
+        self.halted: bool = False
+        self.steps: int = 0
+        self.max_steps: int = 0
+
+    def run(self, program: str, max_steps: int = 100_000) -> bool:
+        """
+        runs main until it returns, HALT or max_steps, returns if the program finished
+        """
+        tree = self.code_parser.parse(program)
+        declarations = tree.children if tree.data == "start" else [tree]
+        self.functions = {declaration.children[0].value: declaration for declaration in declarations}
+        if "main" not in self.functions:
+            raise ValueError("The program has no main function")
+        self.framebuffer = Framebuffer()
+        self.pixel = [0, 0, 0, 0, 0]
+        self.variables = dict()
+        self.halted = False
+        self.steps = 0
+        self.max_steps = max_steps
+        try:
+            self.call("main", [], self.variables)
+            self.halted = True
+        except _Stop as stop:
+            self.halted = stop.halted
+        return self.halted
+
+    def _step(self) -> None:
+        self.steps += 1
+        if self.steps > self.max_steps:
+            raise _Stop(False)
+
+    def call(self, name: str, arguments: list[int], variables: dict[str, int] | None = None) -> list[int]:
+        """
+        runs the function and returns the values it returned
+        """
+        if name not in self.functions:
+            raise ValueError(f"The function {name} is not defined")
+        declaration = self.functions[name]
+        parameters = declaration.children[1]
+        names = [] if parameters.data == "empty_args" else [self._name(parameter) for parameter in parameters.children]
+        if len(names) != len(arguments):
+            raise ValueError(f"{name} takes {len(names)} arguments, not {len(arguments)}")
+        if variables is None:
+            variables = dict()
+        variables.update(zip(names, arguments))
+        try:
+            self.statements(declaration.children[2:], variables)
+        except _Return as returned:
+            return returned.values
+        return []
+
+    @staticmethod
+    def _name(node: Tree | Token) -> str:
+        return node.value if isinstance(node, Token) else node.children[0].value
+
+    def statements(self, statements: list[Tree], variables: dict[str, int]) -> None:
+        for statement in statements:
+            self.statement(statement, variables)
+
+    def statement(self, node: Tree, variables: dict[str, int]) -> None:
+        self._step()
+        children = node.children
+        match node.data:
+            case "block":
+                self.statements(children, variables)
+            case "assign_var":
+                variables[children[0].value] = self.value(children[1], variables)
+            case "add_assign_var" | "sub_assign_var" | "mul_assign_var" | "div_assign_var":
+                operation = {"add_assign_var": "add", "sub_assign_var": "sub",
+                             "mul_assign_var": "mult", "div_assign_var": "div"}[node.data]
+                name = children[0].value
+                variables[name] = self.arithmetic(operation, self._variable(name, variables),
+                                                  self.value(children[1], variables))
+            case "increment":
+                variables[children[0].value] = _wrap(self._variable(children[0].value, variables) + 1)
+            case "decrement":
+                variables[children[0].value] = _wrap(self._variable(children[0].value, variables) - 1)
+            case "multi_assign_var":
+                names = [name.value for name in children[0].children]
+                values: list[int] = []
+                for child in children[1:]:
+                    if isinstance(child, Tree) and child.data == "function_call":
+                        values += self.function_call(child, variables)
+                    else:
+                        values.append(self.value(child, variables))
+                if len(values) < len(names):
+                    raise ValueError(f"{len(names)} variables are assigned {len(values)} values")
+                variables.update(zip(names, values))
+            case "function_call":
+                self.function_call(node, variables)
+            case "_return":
+                returned = children[0] if children else None
+                values = returned.children if returned is not None and returned.data == "return_args" else []
+                raise _Return([self.value(value, variables) for value in values])
+            case "if_statement":
+                if self.condition(children[0], variables):
+                    self.statements([child for child in children[1:]
+                                     if child.data not in ("elif_statement", "else_statement")], variables)
+                    return
+                for child in children[1:]:
+                    if child.data == "elif_statement" and self.condition(child.children[0], variables):
+                        self.statements(child.children[1:], variables)
+                        return
+                    if child.data == "else_statement":
+                        self.statements(child.children, variables)
+                        return
+            case "for_loop":
+                self.statement(children[0], variables)
+                while self.condition(children[1], variables):
+                    self.statements(children[3:], variables)
+                    self.statement(children[2], variables)
+            case "while_loop":
+                while self.condition(children[0], variables):
+                    self.statements(children[1:], variables)
+            case "do_while_loop":
+                self.statements(children[:-1], variables)
+                while self.condition(children[-1], variables):
+                    self.statements(children[:-1], variables)
+            case "asm_block":
+                raise ValueError(f"Line {node.meta.line if not node.meta.empty else '?'}: "
+                                 f"an asm block cannot be interpreted")
+            case _:
+                raise ValueError(f"Cannot interpret {node.data}")
+
+    def condition(self, node: Tree, variables: dict[str, int]) -> bool:
+        self._step()
+        match node.data:
+            case "and_compare":
+                return self.condition(node.children[0], variables) and self.condition(node.children[1], variables)
+            case "or_compare":
+                return self.condition(node.children[0], variables) or self.condition(node.children[1], variables)
+            case "zero_compare":
+                return self.value(node.children[0], variables) != 0
+        first, second = self.value(node.children[0], variables), self.value(node.children[1], variables)
+        match node.data:
+            case "compare_equal":
+                return first == second
+            case "compare_not_equal":
+                return first != second
+            case "compare_greater_equal":
+                return first >= second
+            case "compare_less_equal":
+                return first <= second
+            case "compare_greater":
+                return first > second
+            case "compare_less":
+                return first < second
+        raise ValueError(f"Cannot compare with {node.data}")
+
+    @staticmethod
+    def arithmetic(operation: str, first: int, second: int) -> int:
+        match operation:
+            case "add":
+                return _wrap(first + second)
+            case "sub":
+                return _wrap(first - second)
+            case "mult":
+                return _wrap(first * second)
+            case "div":
+                return _wrap(int(first / second)) if second else 0
+            case "quot":
+                return _wrap(first - int(first / second) * second) if second else 0
+            case "bit_and":
+                return _wrap(first & second)
+            case "bit_or":
+                return _wrap(first | second)
+            case "bit_xor":
+                return _wrap(first ^ second)
+            case "left_shift":
+                return _wrap(first << (second & 0xF))
+            case "right_shift":
+                return _wrap(first >> (second & 0xF))
+        raise ValueError(f"Cannot interpret the operator {operation}")
+
+    @staticmethod
+    def _number(value: int) -> int:
+        if not -32768 <= value <= 32767:
+            raise ValueError("Number out of signed 16-bit range (-32768 to 32767)")
+        return value
+
+    @staticmethod
+    def _variable(name: str, variables: dict[str, int]) -> int:
+        if name not in variables:
+            raise ValueError(f"{name} is used before it is set")
+        return variables[name]
+
+    def value(self, node: Tree | Token, variables: dict[str, int]) -> int:
+        """
+        returns the value of an expression
+        """
+        if isinstance(node, Token):
+            return self._variable(node.value, variables) if node.type == "NAME" else self._number(int(node.value, 0))
+        match node.data:
+            case "number":
+                return self._number(int(node.children[0]))
+            case "hex_number":
+                return self._number(int(node.children[0], 16))
+            case "var":
+                return self._variable(node.children[0].value, variables)
+            case "negative":
+                return _wrap(-self.value(node.children[0], variables))
+            case "bit_not":
+                return _wrap(~self.value(node.children[0], variables))
+            case "function_call":
+                values = self.function_call(node, variables)
+                return values[0] if values else 0
+        return self.arithmetic(node.data, self.value(node.children[0], variables),
+                               self.value(node.children[1], variables))
+
+    def function_call(self, node: Tree, variables: dict[str, int]) -> list[int]:
+        name = node.children[0].value
+        arguments = node.children[1]
+        values = [] if arguments.data == "empty_args" else [self.value(child, variables) for child in arguments.children]
+        if name == "VID":
+            red, green, blue, x, y = self.pixel
+            self.framebuffer.draw(x, y, red, green, blue)
+        elif name in self.video:
+            self.pixel[self.video[name]] = values[0] % Framebuffer.size
+        elif name == "VIDEO":
+            self.pixel = [value % Framebuffer.size for value in values]
+            self.framebuffer.draw(self.pixel[3], self.pixel[4], *self.pixel[:3])
+        elif name == "HALT":
+            raise _Stop(True)
+        else:
+            return self.call(name, values)
+        return []
+
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="Runs a program from its parse tree and prints its variables")
+    arguments.add_argument("program", nargs="?", default="../examples/hello_world.txt", help="program to run")
+    arguments.add_argument("--max-steps", type=int, default=1_000_000, help="statements the program may run")
+    options = arguments.parse_args()
+
+    interpreter = Interpreter((Path(__file__).parent / "grammar.txt").read_text())
+    halted = interpreter.run(Path(options.program).read_text(), options.max_steps)
+    print(f"{'Finished' if halted else 'Stopped'} after {interpreter.steps} steps, "
+          f"{interpreter.framebuffer.draws} pixels drawn")
+    for name, value in interpreter.variables.items():
+        print(f"{name} = {value}")
@@ -1,32 +1,44 @@
 
 class JumpManager:
     def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        forgets every label, every compile starts with a reset so the labels of the last one are not reused
+        """
         self._counters = 0
         self._names: dict[int, str] = dict()  # key: id, value: name
         self._jumps: dict[str, int] = dict()  # key: name, value: position
         self._verify: set[str] = set()  # this checks if it has been used
+        self._placed: set[str] = set()  # the names whose label is in the program
+        self._ids: dict[str, list[int]] = dict()  # key: name, value: ids with the name
+
+    def _add_name(self, name: str) -> int:
+        """
+        gives the name a new id
+        """
+        self._names[self._counters] = name
+        self._ids.setdefault(name, []).append(self._counters)
+        self._counters += 1
+        return self._counters - 1
 
     def get_jump(self) -> int:
         """
         returns a new jump value id
         """
-        self._names[self._counters] = str(self._counters)
         self._jumps[str(self._counters)] = 0
-        self._counters += 1
-        return self._counters - 1
+        return self._add_name(str(self._counters))
 
     def get_function(self, jump_name: str) -> int:
         """
         take input from a string/function name and creates a jump
         """
-        key_found = next((key for key, val in self._names.items() if val == key), None)
-        if key_found is not None:
-            return key_found
+        if jump_name in self._ids:
+            return self._ids[jump_name][0]
 
-        self._names[self._counters] = jump_name
         self._jumps[jump_name] = 0
-        self._counters += 1
-        return self._counters - 1
+        return self._add_name(jump_name)
 
     def get_name(self, id_: int) -> str:
         """
@@ -58,10 +70,12 @@ class JumpManager:
             case _:
                 num_change = self._names[id1]
                 num_to_change = self._names[id2]
-                del self._jumps[self._names[id2]]
-                for key, value in self._names.items():
-                    if value == num_to_change:
-                        self._names[key] = num_change
+                if num_change == num_to_change:
+                    return id1
+                del self._jumps[num_to_change]
+                for key in self._ids.pop(num_to_change):
+                    self._names[key] = num_change
+                    self._ids[num_change].append(key)
                 return id1
 
     def set_pos(self, id_: int, pos: int):
@@ -70,6 +84,7 @@ class JumpManager:
         """
         if self._jumps[self._names[id_]] == 0:
             self._jumps[self._names[id_]] = pos
+            self._placed.add(self._names[id_])
         else:
             raise ValueError(f"Jump label has already been set: {self._names[id_]}")
 
@@ -80,6 +95,15 @@ class JumpManager:
         """
         self._verify.add(self._names[id_])
 
+    def check_placed(self) -> None:
+        """
+        raises if a jump or call goes to a label that is not in the program, it would jump to the start
+        """
+        for name in sorted(self._verify - self._placed):
+            if name.isdigit():
+                raise ValueError(f"Jump to .L{name}, a label that is never placed")
+            raise ValueError(f"Call of .{name}, a function that is never declared")
+
     def verify_jump(self, id_: int) -> bool:
         """
         verifies the label is used or not
@@ -0,0 +1,126 @@
+import argparse
+from pathlib import Path
+
+CIRCUIT = Path(__file__).resolve().parent.parent.parent / "16bitcomputer.circ"
+# the memory the control logic unit reads its instructions from
+PROGRAM_CIRCUIT = "CONTROL_LOGIC_UNIT"
+PROGRAM_LOCATION = "(1240,3210)"
+_WORDS = 0x10000
+
+
+def program_words(binary: str) -> list[int]:
+    """
+    returns the words of a program.bin, 4 hex digits each
+    """
+    binary = binary.strip()
+    if len(binary) % 4:
+        raise ValueError(f"The binary is {len(binary)} hex digits, not whole 16 bit words")
+    words = [int(binary[i:i + 4], 16) for i in range(0, len(binary), 4)]
+    if len(words) > _WORDS:
+        raise ValueError(f"The binary is {len(words)} words, the instruction memory holds {_WORDS}")
+    return words
+
+
+def memory_image(words: list[int]) -> str:
+    """
+    returns the words as a Logisim-evolution memory image, the file the memory's Load Image menu reads
+    """
+    lines = ["v3.0 hex words addressed"]
+    for address in range(0, len(words), 8):
+        lines.append(f"{address:04x}: " + " ".join(f"{word:04x}" for word in words[address:address + 8]))
+    return "\n".join(lines) + "\n"
+
+
+def memory_contents(words: list[int]) -> str:
+    """
+    returns the words like Logisim-evolution saves the contents of a memory in a .circ file,
+    a run of 4 or more of the same word is written once with its count and the zeros at the end are left out
+    """
+    end = len(words)
+    while end and not words[end - 1]:
+        end -= 1
+    values: list[str] = []
+    index = 0
+    while index < end:
+        run = index + 1
+        while run < end and words[run] == words[index]:
+            run += 1
+        count = run - index
+        values += [f"{count}*{words[index]:x}"] if count >= 4 else [f"{words[index]:x}"] * count
+        index = run
+    lines = ["addr/data: 16 16"] + [" ".join(values[i:i + 8]) for i in range(0, len(values), 8)]
+    return "\n".join(lines) + "\n"
+
+
+def _attribute_name(line: str) -> str | None:
+    text = line.strip()
+    if not text.startswith('<a name="'):
+        return None
+    return text[len('<a name="'):].split('"', 1)[0]
+
+
+def patch_circuit(source: str | Path, destination: str | Path, words: list[int], circuit: str = PROGRAM_CIRCUIT,
+                  location: str = PROGRAM_LOCATION) -> None:
+    """
+    writes a copy of the Logisim file with the words as the contents of the memory at the location of the circuit
+    The file is read and written a line at a time, Logisim saves every tag on its own line
+    and the contents of a memory as the text of its contents attribute, which can span many lines.
+    The attributes stay in Logisim's order so the copy only differs from the file Logisim would save in the memory
+    """
+    contents = f'      <a name="contents">{memory_contents(words)}</a>\n'
+    destination = Path(destination)
+    temporary = destination.with_name(destination.name + ".tmp")
+    current = None
+    # inside the memory, inside its old contents, and if the new contents are written
+    inside = replacing = written = False
+    with open(source, encoding="utf-8") as lines, open(temporary, "w", encoding="utf-8", newline="\n") as output:
+        for line in lines:
+            text = line.strip()
+            if replacing:
+                replacing = "</a>" not in line
+                continue
+            if text.startswith("<circuit "):
+                current = text.split('name="', 1)[1].split('"', 1)[0]
+            elif current == circuit and text.startswith("<comp ") and f'loc="{location}"' in text:
+                if 'name="RAM"' not in text and 'name="ROM"' not in text:
+                    raise ValueError(f"The component at {location} of {circuit} is not a RAM or ROM")
+                if text.endswith("/>"):
+                    indent = line[:len(line) - len(line.lstrip())]
+                    output.write(f"{indent}{text[:-2].rstrip()}>\n{contents}{indent}</comp>\n")
+                    written = True
+                    continue
+                inside = True
+            elif inside:
+                name = _attribute_name(line)
+                if name == "contents":
+                    replacing = "</a>" not in line
+                    continue
+                if text == "</comp>" or name is not None and name > "contents" and not written:
+                    if not written:
+                        output.write(contents)
+                        written = True
+                    inside = text != "</comp>"
+            output.write(line)
+    if not written:
+        temporary.unlink()
+        raise ValueError(f"{source} has no memory at {location} in the circuit {circuit}")
+    temporary.replace(destination)
+
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="Writes a binary as a Logisim-evolution memory image, "
+                                                    "or into the instruction memory of a copy of the circuit")
+    arguments.add_argument("file", nargs="?", default="../../program.bin", help="hex file to write")
+    arguments.add_argument("--image", default="../../program.img", help="the memory image to write")
+    arguments.add_argument("--circ", metavar="FILE", help="also write a copy of the circuit with the program in it")
+    arguments.add_argument("--source", default=str(CIRCUIT), help="the circuit to copy")
+    arguments.add_argument("--circuit", default=PROGRAM_CIRCUIT, help="the circuit that holds the memory")
+    arguments.add_argument("--location", default=PROGRAM_LOCATION, help="where the memory is in that circuit")
+    options = arguments.parse_args()
+
+    words = program_words(Path(options.file).read_text())
+    Path(options.image).write_text(memory_image(words))
+    print(f"Wrote {len(words)} words to {options.image}")
+    if options.circ:
+        patch_circuit(options.source, options.circ, words, options.circuit, options.location)
+        print(f"Wrote {options.circ} with the program in the memory at {options.location} of {options.circuit}")
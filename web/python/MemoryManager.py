@@ -16,9 +16,14 @@ class MemoryManager:
         # computed after ifetimes are computed
         self._lifetimes_stack: list[tuple[str, int]] = []
 
-        self.stack_offset = 2
+        # the caller reserves the return slots and pushes the arguments before the return address and base pointer
+        # so the arguments end at [bp - 3] and the return slots are below them
+        self.return_offset: int = -(shared_rtn.arg_count[function_name] + 2)
+        self.stack_offset: int = self.return_offset - shared_rtn.return_count[function_name]
 
-        self.return_offset: int = shared_rtn.return_count[function_name] + self.stack_offset
+        self._frame: int = 0  # the highest slot any variable used
+        self._depth: int = 0  # words pushed for the calls that are being set up
+        self._call_slots: list[RamVar] = []  # return slots of the calls counted from the top of the frame
 
     def inner_start(self):
         """
@@ -46,6 +51,7 @@ class MemoryManager:
         """
         min_num = self._get_min()
         self._ram[var_name] = min_num
+        self._frame = max(self._frame, min_num)
         return min_num
 
     def compute_lifetimes(self, var_name: str | list[str | int], instruction: int) -> None:
@@ -59,6 +65,9 @@ class MemoryManager:
             for i in var_name[1]:
                 self.compute_lifetimes(i.destination, instruction)
                 self.compute_lifetimes(i.source, instruction)
+        if isinstance(var_name, Command):  # the commands of an asm block
+            self.compute_lifetimes(var_name.destination, instruction)
+            self.compute_lifetimes(var_name.source, instruction)
 
         if var_name is None or (isinstance(var_name, str) and var_name.startswith(register_id)) or not isinstance(
                 var_name, str):
@@ -78,6 +87,12 @@ class MemoryManager:
         self._lifetimes_stack = list(self._lifetimes.items())
         self._lifetimes_stack.sort(key=lambda item: item[1], reverse=True)
 
+    def variable_count(self) -> int:
+        """
+        returns how many variables and temporary memory the function uses
+        """
+        return len(self._lifetimes)
+
     def _remove_dead_vars(self, instruction: int) -> None:
         """
         destroys all the variables that are not being used for the index of the instruction
@@ -88,10 +103,10 @@ class MemoryManager:
 
     def set_arguments(self, args: list[str]) -> None:
         """
-        Set the argument's variables for example def main (a, b) -> (a,1), (b,2)
+        Set the argument's variables for example def main (a, b) -> (a,-4), (b,-3)
         """
         for index, arg in enumerate(args):
-            self._ram[arg] = -(index+2)
+            self._ram[arg] = index + self.return_offset
 
     def _get_min(self) -> int:
         """
@@ -108,8 +123,18 @@ class MemoryManager:
         return expected_value
 
     def get_stack_pointer(self) -> int:
-        # 1 represents the base pointer that exists at [bp + 0]
-        return max(self._ram.values(), default=0) + 1
+        """
+        returns how far the stack pointer is moved past the locals, [bp + 0] is left free
+        """
+        return self._frame + 1
+
+    def place_call_slots(self) -> None:
+        """
+        moves the return slots of the calls above the locals, it is done once every variable is allocated
+        """
+        for slot in self._call_slots:
+            slot.val += self.get_stack_pointer()
+        self._call_slots.clear()
 
     def allocate_helper(self, var, op: Operand | None = None):
         """
@@ -120,8 +145,9 @@ class MemoryManager:
             if var.startswith(register_id):  # case where var is the temp variable
                 return RegVar(int(var[1:]))
             elif var_location is None:  # case where var does not exist
-                if op != Operand.MOV and not (
-                        isinstance(var, str) and var.startswith("-")):  # only MOV can create variables
+                if op not in (Operand.MOV, Operand.NOT, Operand.NEG) and not (
+                        isinstance(var, str) and var.startswith("-")):  # only MOV, NOT and NEG can create variables
+                    # the operand is only given for a destination, a variable that is read has to exist
                     raise ValueError(f"Initialise the variable {var} before using it")
                 return RamVar(self._set_var(var))
             else:
@@ -136,38 +162,41 @@ class MemoryManager:
         returns a tuple with a variable/integer, list of commands
         """
         variable, var_lists = self.compiler_helper.extract_variable_and_commands(cmd, [])
+        final_command: list[Command] = []
         for cmd in var_lists:
-            self.allocate_command(cmd, instruction, function_name, cmd.line_num)
-        temp_var = self.allocate_helper(variable, Operand.MOV)
-        return temp_var, var_lists
+            self.allocate_command(cmd, instruction, function_name, cmd.line_num, final_command)
+        temp_var = self.allocate_helper(variable)
+        return temp_var, final_command
 
-    def allocate_command(self, cmd: Command, instruction: int, function_name: str, line:int) -> list[Command]:
+    def allocate_command(self, cmd: Command, instruction: int, function_name: str, line:int,
+                         final_command: list[Command] | None = None) -> list[Command]:
         """
         Performs logic for command objects, it allocates the variables
         Performs logic for the RETURN_HELPER and CALL_HELPER
-        Calling and returning function:
+        The allocated commands are appended to final_command, which is returned
+        Calling and returning function, from the bottom of the stack for a, b = current_func(c, d):
 
-        base pointer for the current function starting at 0
-        return for the current function starting at 1
         ####################
-        reserved for returning for that function: example return a,b = 2-3
+        reserved for returning for that function: example return a,b = [bp - 6] to [bp - 5]
         ####################
-        reserved the argument for that function: example current_func(a,b) = 4-5
+        reserved the argument for that function: example current_func(c,d) = [bp - 4] to [bp - 3]
         ####################
-        reserved for functions locals and globals: example a = 8; b = 10; = 6-7
+        return address: = [bp - 2]
+        base pointer of the caller: = [bp - 1]
+        left free: = [bp + 0]
         ####################
-        reserved on CALLING example a,b = CALL new_function(a,b)
-        base pointer for the called function: = 8
-        return for the called function: = 9
+        reserved for functions locals and globals: example a = 8; b = 10; = [bp + 1] to [bp + 2]
         ####################
-        reserved for returns for call = 10-11
+        reserved on CALLING example a,b = CALL new_function(a,b), the stack pointer starts after the locals
+        reserved for returns for call = [bp + 3] to [bp + 4]
         ####################
-        reserved for arguments for call = 12-13
+        reserved for arguments for call = [bp + 5] to [bp + 6]
         ####################
-        reserved for future locals and globals on the call: 14-onwards
+        return address and base pointer for the called function: [bp + 7] to [bp + 8]
         """
 
-        final_command: list[Command] = []
+        if final_command is None:
+            final_command = []
 
         self._remove_dead_vars(instruction)
 
@@ -182,13 +211,14 @@ class MemoryManager:
 
                 var_location = self.allocate_helper(variable)
                 # gets the jump_label of the variable and put it in the right jump_label
-                final_command.extend(var_lists + [Command(Operand.MOV, RamVar(index + self.stack_offset), var_location, line_num=line)])
+                final_command.extend(var_lists)
+                final_command.append(Command(Operand.MOV, RamVar(index + self.stack_offset), var_location, line_num=line))
 
             # clean up before returning
-            final_command.extend([Command(Operand.MOV, stack_pointer(), base_pointer(), line_num=line),  # cleaning function's frame
+            final_command.extend((Command(Operand.MOV, stack_pointer(), base_pointer(), line_num=line),  # cleaning function's frame
                                   Command(Operand.POP, base_pointer(), line_num=line),  # pop the base_pointer
                                   Command(Operand.RTRN, line_num=line)
-                                  ])
+                                  ))
             return final_command
 
         # logic for calling functions
@@ -198,45 +228,69 @@ class MemoryManager:
             self.shared_rtn.validate_arg(cmd.call_label, len(cmd.source))
 
             if cmd.call_label in ["VID", "HALT"]:
-                return [Command(Operand[cmd.call_label])]
+                final_command.append(Command(Operand[cmd.call_label]))
+                return final_command
             elif cmd.call_label in ["VID_RED","VID_GREEN","VID_BLUE", "VID_X", "VID_Y"]:
                 variable, var_lists = self.complex_commands_helper(cmd.source[0], instruction, function_name)
-                return var_lists + [Command(Operand[cmd.call_label], variable, line_num=line)]
+                final_command.extend(var_lists)
+                final_command.append(Command(Operand[cmd.call_label], variable, line_num=line))
+                return final_command
             elif cmd.call_label == "VIDEO":
                 variable, var_lists = self.complex_commands_helper(cmd.source[0], instruction, function_name)
                 variable1, var_lists1 = self.complex_commands_helper(cmd.source[1], instruction, function_name)
                 variable2, var_lists2 = self.complex_commands_helper(cmd.source[2], instruction, function_name)
                 variable3, var_lists3 = self.complex_commands_helper(cmd.source[3], instruction, function_name)
                 variable4, var_lists4 = self.complex_commands_helper(cmd.source[4], instruction, function_name)
-                return (var_lists + [Command(Operand.VID_RED, variable, line_num=line)]
-                        + var_lists1 + [Command(Operand.VID_GREEN, variable1, line_num=line)]
-                        + var_lists2 + [Command(Operand.VID_BLUE, variable2, line_num=line)]
-                        + var_lists3 + [Command(Operand.VID_X, variable1, line_num=line)]
-                        + var_lists4 + [Command(Operand.VID_Y, variable2, line_num=line)]
-                        + [Command(Operand.VID, line_num=line)])
-
-            # compute the arguments
+                final_command.extend(var_lists)
+                final_command.append(Command(Operand.VID_RED, variable, line_num=line))
+                final_command.extend(var_lists1)
+                final_command.append(Command(Operand.VID_GREEN, variable1, line_num=line))
+                final_command.extend(var_lists2)
+                final_command.append(Command(Operand.VID_BLUE, variable2, line_num=line))
+                final_command.extend(var_lists3)
+                final_command.append(Command(Operand.VID_X, variable1, line_num=line))
+                final_command.extend(var_lists4)
+                final_command.append(Command(Operand.VID_Y, variable2, line_num=line))
+                final_command.append(Command(Operand.VID, line_num=line))
+                return final_command
+
+            # the return slots are reserved before the arguments so the callee finds them under its arguments
+            depth = self._depth
+            if cmd.destination:
+                final_command.append(Command(Operand.ADD, stack_pointer(), len(cmd.destination), line_num=line))
+                self._depth += len(cmd.destination)
+
+            # compute the arguments, calls inside them are pushed above what is already pushed
             for index, arg in enumerate(cmd.source):
                 variable, var_lists = self.complex_commands_helper(arg, instruction, function_name)
-                final_command.extend(var_lists + [Command(Operand.PUSH, variable, line_num=line)])
+                final_command.extend(var_lists)
+                final_command.append(Command(Operand.PUSH, variable, line_num=line))
+                self._depth += 1
+            self._depth = depth
 
-            # compute the returns if it does exist move it else let it be
+            final_command.append(Command(Operand.CALL, None, None, jump_manager.get_function(cmd.call_label), line_num=line))
+            if cmd.destination or cmd.source:
+                final_command.append(Command(Operand.SUB, stack_pointer(), len(cmd.destination) + len(cmd.source), line_num=line))
+
+            # the returns are left above the stack pointer and moved out before anything else is pushed
             for index, arg in enumerate(cmd.destination):
-                var_location = self._get_var(arg)
-                return_offset =  index + 1
-                if var_location is None:
-                    self._ram[arg] = return_offset  # let it exist without moving it
-                else:  # move it because it existed
-                    final_command.append(Command(Operand.MOV, RamVar(var_location), RamVar(return_offset), line_num=line))
-
-            return final_command + [
-                Command(Operand.CALL, None, None, jump_manager.get_function(cmd.call_label), line_num=line),
-                Command(Operand.ADD, stack_pointer(), len(cmd.source), line_num=line)
-            ]
+                slot = RamVar(depth + index)
+                self._call_slots.append(slot)
+                final_command.append(Command(Operand.MOV, self.allocate_helper(arg, Operand.MOV), slot, line_num=line))
+
+            return final_command
+
+        # the variables of an asm block are allocated in place, the block stays whole
+        if cmd.operand == Operand.INLINE_ASM:
+            for inner in cmd.source:
+                inner.destination = self.allocate_helper(inner.destination, inner.operand)
+                inner.source = self.allocate_helper(inner.source)
+            final_command.append(cmd)
+            return final_command
 
         # logic assigning ram locations for var _names, handling cases of allocating new variables and the jump_label of old variables
         cmd.destination = self.allocate_helper(cmd.destination, cmd.operand)
-        cmd.source = self.allocate_helper(cmd.source, cmd.operand)
+        cmd.source = self.allocate_helper(cmd.source)
 
         final_command.append(cmd)
 
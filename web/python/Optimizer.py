@@ -0,0 +1,682 @@
+import heapq
+
+from Command import Command
+from RunProfile import RunProfile
+from SharedFunc import register_id, CompileHelper
+from Type import Operand, RamVar, RegVar, base_pointer, stack_pointer
+
+
+class Optimizer:
+    """
+    Performs passes over the commands of a function before the variables are allocated
+    The commands still use the variable names, registers start with # and temporary memory with -
+    """
+
+    # commands that only write to their destination
+    _pure_writes = (Operand.MOV, Operand.NOT, Operand.NEG)
+
+    # commands that end a basic block, nothing is forwarded past them
+    _block_ends = (Operand.LABEL, Operand.INNER_START, Operand.INNER_END, Operand.RETURN_HELPER, Operand.INLINE_ASM)
+
+    def __init__(self, run_profile: RunProfile | None = None):
+        # the times every line ran, without it a command in a loop is thought to run _loop_weight times
+        self.run_profile: RunProfile | None = run_profile
+
+    def propagate_copies(self, commands: list[Command]) -> list[Command]:
+        """
+        Copy propagation for the temporary memory (-N-call temp)
+        a temp that is only moved into a variable is replaced by that variable where it is written:
+            CALL_HELPER [temp], [a]         CALL_HELPER [x], [a]
+            MOV x, temp                 ->
+        temps that are written but never read are removed
+        """
+        forward = self._temps_read_later(commands)
+
+        final_commands: list[Command] = []
+        for index, cmd in enumerate(commands):
+            if forward[index] == "dead":
+                continue
+            if forward[index] == "forward" and self._forward(final_commands, cmd.source, cmd.destination):
+                continue
+            final_commands.append(cmd)
+        return final_commands
+
+    def _temps_read_later(self, commands: list[Command]) -> list[str]:
+        """
+        Walks the commands backwards and finds out which temps are still read after each command
+        returns for each command:
+        "dead" if it writes a temp that is never read
+        "forward" if it moves a temp into a variable and the temp is never read again
+        "" otherwise
+        """
+        result = [""] * len(commands)
+        live: set[str] = set()
+        for index in range(len(commands) - 1, -1, -1):
+            cmd = commands[index]
+            if cmd.operand == Operand.CALL_HELPER:
+                live.difference_update(cmd.destination)
+                live.update(name for name in CompileHelper.read_names(cmd.source) if CompileHelper.is_temp(name))
+                continue
+
+            read = CompileHelper.read_names(cmd)
+            if cmd.operand in self._pure_writes and CompileHelper.is_temp(cmd.destination):
+                if cmd.destination not in live:
+                    result[index] = "dead"
+                    continue
+                live.discard(cmd.destination)
+                read = CompileHelper.read_names(cmd.source)
+            elif (cmd.operand == Operand.MOV and CompileHelper.is_temp(cmd.source) and cmd.source not in live
+                  and isinstance(cmd.destination, str) and not cmd.destination.startswith(register_id)
+                  and not CompileHelper.is_temp(cmd.destination)):
+                result[index] = "forward"
+
+            live.update(name for name in read if CompileHelper.is_temp(name))
+        return result
+
+    def _forward(self, commands: list[Command], temp: str, var: str) -> bool:
+        """
+        Finds where the temp was written and writes the variable there instead
+        the variable must not be used between the write and the move
+        returns if the temp was forwarded
+        """
+        for index in range(len(commands) - 1, -1, -1):
+            cmd = commands[index]
+            if cmd.operand in self._block_ends or cmd.operand.check_jump():
+                return False
+
+            if cmd.operand == Operand.CALL_HELPER and temp in cmd.destination:
+                # the arguments are pushed before the call returns, so x = f(x) is fine
+                if var in cmd.destination:
+                    return False
+                cmd.destination = [var if name == temp else name for name in cmd.destination]
+                return True
+            if cmd.operand in self._pure_writes and cmd.destination == temp:
+                # NOT x, x reads before it writes but MOV x, x is pointless
+                if cmd.operand == Operand.MOV and var in CompileHelper.read_names(cmd.source):
+                    return False
+                cmd.destination = var
+                return True
+            names = CompileHelper.read_names(cmd)
+            if temp in names or var in names:
+                return False
+        return False
+
+    # registers the expressions can use, R14 and R15 are the base and stack pointer
+    _registers = 14
+
+    def allocate_registers(self, commands: list[Command], busy: frozenset[int] = frozenset(),
+                           result: str | None = None) -> dict[str, str]:
+        """
+        Linear scan allocation of the virtual registers from CompileHelper.get_reg
+        a virtual register lives from the command that writes it to the last command that reads it,
+        it gets the lowest register that is free for that whole time
+        a call overwrites every register, so the registers alive across one are saved around it first
+        the arguments of calls and returns are allocated with the registers alive around them as busy
+        result is the virtual register the commands compute, it is read after them
+        the commands are changed in place, returns the register each virtual register ended in
+        """
+        aliases = self._save_across_calls(commands, result)
+        # the index of the last read for the index of every write
+        last_read: dict[int, int] = dict()
+        written_at: dict[str, int] = dict()
+        for index, cmd in enumerate(commands):
+            reads, write = self._register_use(cmd)
+            for name in reads:
+                last_read[written_at.setdefault(name, index)] = index
+            if write is not None:
+                written_at[write] = index
+                last_read[index] = index
+
+        free = [register for register in range(self._registers) if register not in busy]
+        heapq.heapify(free)
+        renamed: dict[str, str] = dict()
+        written_at.clear()
+
+        def take(name: str, index: int) -> str:
+            if not free:
+                raise ValueError(f"Expression needs more than {self._registers} registers")
+            renamed[name] = f"{register_id}{heapq.heappop(free)}"
+            written_at[name] = index
+            return renamed[name]
+
+        for index, cmd in enumerate(commands):
+            if cmd.operand in (Operand.CALL_HELPER, Operand.RETURN_HELPER):
+                alive = frozenset(int(renamed[name][1:]) for name in written_at)
+                self._allocate_nested(cmd, busy | alive)
+                continue
+            if cmd.operand == Operand.INLINE_ASM:
+                # asm blocks are statements of their own, no virtual register lives across them
+                continue
+
+            reads, write = self._register_use(cmd)
+            read_names = {name: renamed[name] if name in renamed else take(name, index) for name in reads}
+            for name in reads:
+                if name in written_at and last_read[written_at[name]] == index:
+                    heapq.heappush(free, int(renamed[name][1:]))
+                    del written_at[name]
+
+            if write is not None:
+                cmd.destination = take(write, index)
+                if last_read[index] == index:
+                    heapq.heappush(free, int(renamed[write][1:]))
+                    del written_at[write]
+            elif cmd.destination in read_names:
+                cmd.destination = read_names[cmd.destination]
+            if cmd.source in read_names:
+                cmd.source = read_names[cmd.source]
+        if result in aliases:
+            renamed[result] = renamed[aliases[result]]
+        return renamed
+
+    def _save_across_calls(self, commands: list[Command], result: str | None) -> dict[str, str]:
+        """
+        Saves every virtual register that is alive across a CALL_HELPER, the called function uses all the registers
+        it is moved into temporary memory before the call and into a new virtual register after it:
+            MOV #0, a                   MOV #0, a
+            CALL_HELPER [temp], [1]     MOV -#0 at 1-spill temp, #0
+            ADD #0, temp        ->      CALL_HELPER [temp], [1]
+                                        MOV #0.1, -#0 at 1-spill temp
+                                        ADD #0.1, temp
+        the commands are changed in place, returns the new name of every virtual register that was saved
+        """
+        # the virtual registers read after every call before they are written again
+        live: set[str] = {result} if self._is_virtual(result) else set()
+        saved: dict[int, list[str]] = dict()
+        for index in range(len(commands) - 1, -1, -1):
+            cmd = commands[index]
+            if cmd.operand == Operand.CALL_HELPER:
+                if live:
+                    saved[index] = sorted(live)
+                continue
+            reads, write = self._register_use(cmd)
+            live.discard(write)
+            live.update(reads)
+        if not saved:
+            return dict()
+
+        aliases: dict[str, str] = dict()
+        final_commands: list[Command] = []
+        for index, cmd in enumerate(commands):
+            if index in saved:
+                moves = [(name, aliases.get(name, name), f"-{name} at {index}-spill temp") for name in saved[index]]
+                for _, current, temp in moves:
+                    final_commands.append(Command(Operand.MOV, temp, current, line_num=cmd.line_num))
+                final_commands.append(cmd)
+                for name, _, temp in moves:
+                    aliases[name] = f"{name}.{index}"
+                    final_commands.append(Command(Operand.MOV, aliases[name], temp, line_num=cmd.line_num))
+                continue
+            reads, write = self._register_use(cmd)
+            if cmd.source in reads:
+                cmd.source = aliases.get(cmd.source, cmd.source)
+            if write is not None:
+                aliases.pop(write, None)
+            elif cmd.destination in reads:
+                cmd.destination = aliases.get(cmd.destination, cmd.destination)
+            final_commands.append(cmd)
+        commands[:] = final_commands
+        return aliases
+
+    def _allocate_nested(self, cmd: Command, busy: frozenset[int]) -> None:
+        """
+        Allocates the commands inside the arguments of a CALL_HELPER or the values of a RETURN_HELPER
+        """
+        values = cmd.source if cmd.operand == Operand.CALL_HELPER else cmd.destination
+        for index, value in enumerate(values):
+            if isinstance(value, tuple):
+                renamed = self.allocate_registers(value[1], busy, value[0])
+                values[index] = (renamed.get(value[0], value[0]), value[1])
+
+    def _register_use(self, cmd: Command) -> tuple[list[str], str | None]:
+        """
+        returns the virtual registers a command reads and the one it writes over
+        commands like ADD R0, R1 read R0 and keep it alive so it is not a write
+        """
+        reads = []
+        write = None
+        if cmd.operand in self._pure_writes:
+            if self._is_virtual(cmd.destination):
+                write = cmd.destination
+        elif self._is_virtual(cmd.destination):
+            reads.append(cmd.destination)
+        if self._is_virtual(cmd.source) and cmd.source not in reads:
+            reads.append(cmd.source)
+        return reads, write
+
+    @staticmethod
+    def _is_virtual(var) -> bool:
+        return isinstance(var, str) and var.startswith(register_id)
+
+    def number_values(self, commands: list[Command]) -> list[Command]:
+        """
+        Local value numbering for the commands after the variables are allocated
+        every register and ram location remembers the value it holds inside the basic block
+        a register that is computed again is reused instead:
+            MOV R0, [bp + 1]            MOV R0, [bp + 1]
+            ADD R0, [bp + 2]            ADD R0, [bp + 2]
+            VID_GREEN R0        ->      VID_GREEN R0
+            MOV R0, [bp + 1]            VID_BLUE R0
+            ADD R0, [bp + 2]
+            VID_BLUE R0
+        labels, calls and anything that moves the stack forget every value
+        """
+        values = _ValueTable()
+        final_commands: list[Command] = []
+        index = 0
+        while index < len(commands):
+            cmd = commands[index]
+
+            # a register that is loaded and then computed on is handled as a whole
+            if cmd.operand == Operand.MOV and self._is_temp_register(cmd.destination):
+                end = index + 1
+                while (end < len(commands) and commands[end].operand.check_arith()
+                       and commands[end].destination == cmd.destination):
+                    end += 1
+                final_commands.extend(self._number_chain(values, commands[index:end]))
+                index = end
+                continue
+
+            if self._changes_frame(cmd):
+                values.reset()
+            elif cmd.operand == Operand.MOV:
+                if values.get(cmd.destination) == values.get(cmd.source):
+                    index += 1
+                    continue
+                values.set(cmd.destination, values.get(cmd.source))
+            elif cmd.operand.check_arith():
+                values.set(cmd.destination, values.compute(cmd.operand, values.get(cmd.destination), values.get(cmd.source)))
+
+            final_commands.append(cmd)
+            index += 1
+        return self._drop_dead_registers(final_commands)
+
+    def _drop_dead_registers(self, commands: list[Command]) -> list[Command]:
+        """
+        Removes the writes to a register that is written again before it is read
+        every register is thought to be read at the end of a basic block
+        """
+        dead: set[RegVar] = set()
+        final_commands: list[Command] = []
+        for cmd in reversed(commands):
+            if cmd.operand.check_jump() or self._changes_frame(cmd) or cmd.operand == Operand.RTRN:
+                dead.clear()
+            writes = cmd.operand == Operand.MOV or cmd.operand.check_arith()
+            if writes and self._is_temp_register(cmd.destination):
+                if cmd.destination in dead:
+                    continue
+                if cmd.operand in self._pure_writes:
+                    dead.add(cmd.destination)
+                else:
+                    dead.discard(cmd.destination)
+            elif isinstance(cmd.destination, RegVar):
+                dead.discard(cmd.destination)
+            if isinstance(cmd.source, RegVar):
+                dead.discard(cmd.source)
+            final_commands.append(cmd)
+        final_commands.reverse()
+        return final_commands
+
+    def _number_chain(self, values: "_ValueTable", chain: list[Command]) -> list[Command]:
+        """
+        Computes the values of a register loaded by MOV and changed by the commands after it
+        the longest start of the chain that a location already holds is replaced with the cheapest move
+        commands that do not change the value such as ADD R0, 0 are dropped
+        """
+        register = chain[0].destination
+        chain_values = [values.get(chain[0].source)]
+        for cmd in chain[1:]:
+            source = chain_values[-1] if cmd.source == register else values.get(cmd.source)
+            chain_values.append(values.compute(cmd.operand, chain_values[-1], source))
+
+        final_commands: list[Command] = list(chain)
+        start = 1
+        for length in range(len(chain), 0, -1):
+            holder = values.find(chain_values[length - 1], register)
+            if holder == register:
+                final_commands, start = [], length
+                break
+            if holder is not None:
+                replacement = Command(Operand.MOV, register, holder, line_num=chain[0].line_num)
+                if replacement.num_instruct() < sum(cmd.num_instruct() for cmd in chain[:length]):
+                    final_commands, start = [replacement], length
+                    break
+        else:
+            final_commands, start = [chain[0]], 1
+
+        for index in range(start, len(chain)):
+            if chain_values[index] != chain_values[index - 1]:
+                final_commands.append(chain[index])
+
+        values.set(register, chain_values[-1])
+        return final_commands
+
+    # commands that only read their destination
+    _outputs = (Operand.PUSH, Operand.VID_RED, Operand.VID_GREEN, Operand.VID_BLUE, Operand.VID_X, Operand.VID_Y)
+
+    # a command inside a loop is thought to run this many times for every loop around it
+    _loop_weight = 8
+
+    # commands after which no register keeps its value
+    _flow_ends = (Operand.LABEL, Operand.CALL, Operand.RTRN, Operand.HALT)
+
+    def select_instructions(self, commands: list[Command], returns: frozenset[RamVar] = frozenset()) -> list[Command]:
+        """
+        Picks the cheapest forms for the allocated commands of a function using Operand.cost
+        a register computed only to be moved somewhere is computed there instead,
+        and a register loaded and then used once is replaced by what it was loaded from:
+            MOV R0, [bp + 1]
+            ADD R0, 1           ->      ADD [bp + 1], 1
+            MOV [bp + 1], R0
+        in functions without calls the ram variables are kept in the unused registers
+        when the cost saved where they are used is more than loading and storing them,
+        returns are the slots the caller reads the return values from
+        """
+        commands = self._fold_registers(commands, set())
+        commands, kept = self._promote_variables(commands, returns)
+        if kept:
+            commands = self._fold_registers(commands, kept)
+        return commands
+
+    def _fold_registers(self, commands: list[Command], kept: set[RegVar]) -> list[Command]:
+        """
+        Replaces the loads into a register with the cheaper forms found by _fold_chain
+        the kept registers hold variables and are never folded away
+        """
+        final_commands = list(commands)
+        index = 0
+        while index < len(final_commands):
+            cmd = final_commands[index]
+            if (cmd.operand == Operand.MOV and self._is_temp_register(cmd.destination)
+                    and cmd.destination not in kept):
+                folded = self._fold_chain(final_commands, index, kept)
+                if folded is not None:
+                    end, replacement = folded
+                    final_commands[index:end] = replacement
+                    continue
+            index += 1
+        return final_commands
+
+    def _fold_chain(self, commands: list[Command], index: int, kept: set[RegVar]) -> tuple[int, list[Command]] | None:
+        """
+        Looks at the register loaded at index, the commands that compute on it and the command that uses it
+        returns the end of the commands to replace and the cheaper commands, or None if there are none
+        """
+        load = commands[index]
+        register = load.destination
+        end = index + 1
+        while end < len(commands) and commands[end].operand.check_arith() and commands[end].destination == register:
+            end += 1
+        if end == len(commands):
+            return None
+        use = commands[end]
+        chain = commands[index + 1:end]
+
+        replacement = None
+        if use.operand == Operand.MOV and use.source == register and use.destination != register:
+            # computes the value straight into where it is moved
+            target = use.destination
+            if not (isinstance(target, RamVar) or self._is_temp_register(target)):
+                return None
+            if any(cmd.source == target for cmd in chain):
+                return None
+            replacement = [] if load.source == target else [Command(Operand.MOV, target, load.source, line_num=load.line_num)]
+            replacement += [Command(cmd.operand, target, target if cmd.source == register else cmd.source,
+                                    line_num=cmd.line_num) for cmd in chain]
+        elif not chain and use.source == register and use.destination != register:
+            # uses what the register was loaded from
+            if use.operand == Operand.CMP or use.operand.check_arith():
+                replacement = [Command(use.operand, use.destination, load.source, line_num=use.line_num)]
+        elif not chain and use.destination == register and use.source != register:
+            # an immediate can only be compared as the source
+            if use.operand in self._outputs or (use.operand == Operand.CMP and not isinstance(load.source, int)):
+                replacement = [Command(use.operand, load.source, use.source, line_num=use.line_num)]
+
+        if replacement is None or not self._dead_after(commands, end, register, kept):
+            return None
+        if self._total(replacement) >= self._total(commands[index:end + 1]):
+            return None
+        return end + 1, replacement
+
+    def _dead_after(self, commands: list[Command], index: int, register: RegVar, kept: set[RegVar]) -> bool:
+        """
+        checks if the register is written over before it is read after the index
+        nothing is kept in the registers past a label or a call, the kept registers are always alive
+        an asm block can read any register
+        """
+        if register in kept:
+            return False
+        for after in range(index + 1, len(commands)):
+            cmd = commands[after]
+            if cmd.operand == Operand.INLINE_ASM:
+                return False
+            if cmd.operand in self._flow_ends:
+                return True
+            if cmd.source == register or (cmd.destination == register and cmd.operand not in self._pure_writes):
+                return False
+            if cmd.destination == register:
+                return True
+        return True
+
+    def _promote_variables(self, commands: list[Command],
+                           returns: frozenset[RamVar] = frozenset()) -> tuple[list[Command], set[RegVar]]:
+        """
+        Keeps the ram variables in the registers the function does not use
+        the variables are picked by how much they save weighted by the loops they are used in
+        arguments are loaded after the frame is set up and changed return slots are stored before the frame
+        is left, the other slots are gone with the frame
+        the variables used in asm blocks are changed there too and the registers the blocks use are not taken
+        returns the new commands and the registers that hold variables
+        """
+        if any(inner.operand == Operand.CALL for cmd in commands for inner in self._inner(cmd)):
+            return commands, set()
+        used = {var for cmd in commands for inner in self._inner(cmd)
+                for var in (inner.destination, inner.source) if isinstance(var, RegVar)}
+        free = [RegVar(register) for register in range(self._registers) if RegVar(register) not in used]
+        start = next((index + 1 for index, cmd in enumerate(commands)
+                      if cmd.operand == Operand.MOV and cmd.destination == base_pointer()), None)
+        if not free or start is None:
+            return commands, set()
+        if start < len(commands) and commands[start].destination == stack_pointer():
+            start += 1
+
+        weights = self._run_weights(commands)
+        saved: dict[RamVar, int] = dict()
+        for cmd, weight in zip(commands, weights):
+            for inner in self._inner(cmd):
+                for var in (inner.destination, inner.source):
+                    if isinstance(var, RamVar):
+                        saved[var] = saved.get(var, 0) + weight
+        # the loads run once when the function starts and the stores at every return
+        profiled = self.run_profile is not None
+        entry = weights[start - 1] if profiled else 1
+        epilogues = [weight if profiled else 1 for cmd, weight in zip(commands, weights)
+                     if cmd.operand == Operand.MOV and cmd.destination == stack_pointer() and cmd.source == base_pointer()]
+
+        loads: list[Command] = []
+        stores: list[Command] = []
+        kept: set[RegVar] = set()
+        for slot in sorted(saved, key=lambda var: -saved[var]):
+            if not free:
+                break
+            register = free[0]
+            load = Command(Operand.MOV, register, slot)
+            store = Command(Operand.MOV, slot, register)
+            written = slot in returns and any(inner.destination == slot and self._writes(inner)
+                                              for cmd in commands for inner in self._inner(cmd))
+
+            gain = 0
+            for cmd, weight in zip(commands, weights):
+                for inner in self._inner(cmd):
+                    if slot in (inner.destination, inner.source):
+                        promoted = Command(inner.operand, register if inner.destination == slot else inner.destination,
+                                           register if inner.source == slot else inner.source)
+                        gain += self._weighted(inner, weight) - self._weighted(promoted, weight)
+            argument = slot.val < 0 and slot not in returns
+            cost = ((self._weighted(load, entry) if argument else 0)
+                    + (sum(self._weighted(store, weight) for weight in epilogues) if written else 0))
+            if gain <= cost:
+                continue
+
+            free.pop(0)
+            kept.add(register)
+            for cmd in commands:
+                for inner in self._inner(cmd):
+                    if inner.destination == slot:
+                        inner.destination = register
+                    if inner.source == slot:
+                        inner.source = register
+            if argument:
+                loads.append(load)
+            if written:
+                stores.append(store)
+
+        if not kept:
+            return commands, kept
+        final_commands = commands[:start] + loads
+        for cmd in commands[start:]:
+            if cmd.operand == Operand.MOV and cmd.destination == stack_pointer() and cmd.source == base_pointer():
+                final_commands.extend(Command(store.operand, store.destination, store.source) for store in stores)
+            final_commands.append(cmd)
+        return final_commands, kept
+
+    @staticmethod
+    def _inner(cmd: Command) -> list[Command] | tuple[Command]:
+        """
+        returns the commands of an asm block, or the command itself
+        """
+        return cmd.source if cmd.operand == Operand.INLINE_ASM else (cmd,)
+
+    @staticmethod
+    def _loop_depths(commands: list[Command]) -> list[int]:
+        """
+        returns the number of loops around each command, a loop is a jump back to a label before it
+        """
+        labels = {cmd.jump_label: index for index, cmd in enumerate(commands) if cmd.operand == Operand.LABEL}
+        depths = [0] * len(commands)
+        for index, cmd in enumerate(commands):
+            if cmd.operand.check_jump() and cmd.operand != Operand.CALL and labels.get(cmd.jump_label, index + 1) <= index:
+                for inner in range(labels[cmd.jump_label], index + 1):
+                    depths[inner] += 1
+        return depths
+
+    def _run_weights(self, commands: list[Command]) -> list[int]:
+        """
+        returns the times each command is thought to run, the runs of its line in the profile
+        or without a profile _loop_weight times for every loop around it
+        a command without a line is on the line of the command before it
+        """
+        if self.run_profile is None:
+            return [self._loop_weight ** depth for depth in self._loop_depths(commands)]
+        weights: list[int] = []
+        line = -1
+        for cmd in commands:
+            if cmd.line_num is not None and cmd.line_num > 0:
+                line = cmd.line_num
+            weights.append(self.run_profile.runs(line))
+        return weights
+
+    @staticmethod
+    def _weighted(cmd: Command, runs: int) -> int:
+        """
+        the words of the command plus its cycles times the times it is thought to run
+        """
+        words, cycles = cmd.cost()
+        return words + cycles * runs
+
+    @staticmethod
+    def _total(commands: list[Command]) -> tuple[int, int]:
+        """
+        returns the cycles and words of the commands, fewer cycles are picked first
+        """
+        costs = [cmd.cost() for cmd in commands]
+        return sum(cycles for _, cycles in costs), sum(words for words, _ in costs)
+
+    @staticmethod
+    def _writes(cmd: Command) -> bool:
+        return cmd.operand in (Operand.MOV, Operand.POP) or cmd.operand.check_arith()
+
+    @staticmethod
+    def _is_temp_register(var) -> bool:
+        """
+        checks for the registers used to compute expressions, not the base or stack pointer
+        """
+        return isinstance(var, RegVar) and var != base_pointer() and var != stack_pointer()
+
+    @staticmethod
+    def _changes_frame(cmd: Command) -> bool:
+        """
+        checks if the command can change a value that is not its destination
+        such as labels that can be jumped to, calls, asm blocks and moving the stack
+        """
+        if cmd.operand in (Operand.LABEL, Operand.CALL, Operand.RTRN, Operand.HALT, Operand.PUSH, Operand.POP,
+                           Operand.INLINE_ASM):
+            return True
+        return cmd.destination == base_pointer() or cmd.destination == stack_pointer()
+
+
+class _ValueTable:
+    """
+    Keeps the value of every location in a basic block
+    a value is either a location before it was changed (location, version), an integer
+    or the number given to an operand and its values, so values do not grow with the block
+    """
+
+    # operands where the order of the values does not matter
+    _commutative = (Operand.ADD, Operand.MULT, Operand.AND, Operand.OR, Operand.XOR)
+
+    # the value that leaves the other value the same, for example ADD R0, 0
+    _identity = {Operand.ADD: 0, Operand.SUB: 0, Operand.MULT: 1, Operand.DIV: 1, Operand.OR: 0,
+                 Operand.XOR: 0, Operand.SHL: 0, Operand.SHR: 0}
+
+    def __init__(self):
+        self._values: dict = dict()  # location: value
+        self._holders: dict = dict()  # value: locations that held it
+        self._versions: dict = dict()  # location: times it was changed
+        self._numbers: dict = dict()  # (operand, value, value): value
+
+    def reset(self) -> None:
+        self._values.clear()
+        self._holders.clear()
+        for location in self._versions:
+            self._versions[location] += 1
+
+    def get(self, location):
+        """
+        returns the value of a location or an integer
+        """
+        if isinstance(location, int):
+            return location
+        if location not in self._values:
+            self.set(location, (location, self._versions.get(location, 0)))
+        return self._values[location]
+
+    def set(self, location, value) -> None:
+        self._versions[location] = self._versions.get(location, 0) + 1
+        self._values[location] = value
+        self._holders.setdefault(value, []).append(location)
+
+    def compute(self, op: Operand, value1, value2):
+        """
+        returns the value of performing the operand on the two values
+        """
+        if op in (Operand.NEG, Operand.NOT):
+            value1 = None
+        elif value2 == self._identity.get(op):
+            return value1
+        elif op in self._commutative and repr(value2) < repr(value1):
+            value1, value2 = value2, value1
+        return self._numbers.setdefault((op, value1, value2), (op, len(self._numbers)))
+
+    def find(self, value, prefer):
+        """
+        returns a location that still holds the value, prefer is returned if it holds it
+        registers are picked before ram
+        """
+        holders = [location for location in self._holders.get(value, []) if self._values.get(location) == value]
+        self._holders[value] = holders
+        if prefer in holders:
+            return prefer
+        registers = [location for location in holders if isinstance(location, RegVar)]
+        if registers:
+            return registers[-1]
+        return holders[-1] if holders else None
@@ -1,19 +1,24 @@
 from typing import Any
 
-from lark import Transformer, v_args
-
 from Command import Command, CommandJump, CommandLabel, CommandReturn, CommandInnerStart, CommandInnerEnd
 from JumpManager import jump_manager
 from MemoryManager import MemoryManager
+from CompileProfile import CompileProfile
+from GrammarParser import Transformer, v_args
+from Optimizer import Optimizer
+from RunProfile import RunProfile
 from SharedFunc import register_id, CompileHelper, SharedFunc
-from Type import Operand, base_pointer, stack_pointer, Compare
+from Type import Operand, RamVar, RegVar, base_pointer, stack_pointer, Compare, register_names
 
 
 class Parser(Transformer):
-    def __init__(self):
+    def __init__(self, profile: CompileProfile | None = None, run_profile: RunProfile | None = None):
         super().__init__()
         self.compiler_helper = CompileHelper()
         self.shared_rtn = SharedFunc()
+        self.profile: CompileProfile = profile or CompileProfile()
+        # the times every line ran in the emulator, the branches and registers are picked by it when given
+        self.run_profile: RunProfile | None = run_profile
        # --- var/number functions --------------------------
     def NUMBER(self, n):
         return int(n)
@@ -44,7 +49,8 @@ class Parser(Transformer):
         # easily separates the input into the variable and commands
         product, final_commands = self.compiler_helper.extract_variable_and_commands(items[0], [])
         temp_name = self.compiler_helper.get_temp_ram() # gets new temp variable
-        return temp_name, final_commands + [Command(Operand.NOT, temp_name, product, line_num=meta.line)]
+        final_commands.append(Command(Operand.NOT, temp_name, product, line_num=meta.line))
+        return temp_name, final_commands
 
     @v_args(meta=True)
     def negative(self, meta, items):
@@ -57,10 +63,42 @@ class Parser(Transformer):
         # easily separates the input into the variable and commands
         product, final_commands = self.compiler_helper.extract_variable_and_commands(items[0], [])
         temp_name = self.compiler_helper.get_temp_ram() # gets new temp variable
-        return temp_name, final_commands + [Command(Operand.NEG, temp_name, product, line_num=meta.line)]
+        final_commands.append(Command(Operand.NEG, temp_name, product, line_num=meta.line))
+        return temp_name, final_commands
 
     # --- product functions --------------------------
 
+    # operands where the order of the inputs does not matter
+    commutative = (Operand.ADD, Operand.MULT, Operand.AND, Operand.OR, Operand.XOR)
+
+    def order_inputs(self, product1, commands1: list[Command], product2, commands2: list[Command],
+                     line: int) -> tuple[list[Command], int | str]:
+        """
+        Joins the commands of two inputs in the order they are computed in, returns them and the left variable
+        The input that needs more registers is computed first (Sethi-Ullman) so the other input
+        can use the registers it freed. A call overwrites every register, so an input with a call goes first,
+        and when both have one the left is saved to temporary memory before the right is computed
+        """
+        need1 = self.compiler_helper.get_need(product1)
+        need2 = self.compiler_helper.get_need(product2)
+        # the left input is only searched for a call when it would not go first anyway,
+        # the left side of a long expression holds all of it and is searched again at every operator
+        has_call2 = any(cmd.operand == Operand.CALL_HELPER for cmd in commands2)
+        has_call1 = (has_call2 or need2 > need1) and any(cmd.operand == Operand.CALL_HELPER for cmd in commands1)
+        if has_call1 and has_call2:
+            # the right call would overwrite the register of the left value
+            if isinstance(product1, str) and product1.startswith(register_id):
+                temp_name = self.compiler_helper.get_temp_ram()
+                commands1.append(Command(Operand.MOV, temp_name, product1, line_num=line))
+                product1 = temp_name
+            commands1.extend(commands2)
+            return commands1, product1
+        if has_call1 or (need1 >= need2 and not has_call2):
+            commands1.extend(commands2)
+            return commands1, product1
+        commands2.extend(commands1)
+        return commands2, product1
+
     def process_binary_operation(self, input1: int | str | tuple[str,list[Command]], input2: int | str | tuple[str,list[Command]], op: Operand, line: int) -> int | str | tuple[int | str, list[Command]]:
         """
         Takes two inputs performs the necessary product like +-*/%.
@@ -70,8 +108,8 @@ class Parser(Transformer):
         """
 
         # separating the variables from the list of commands
-        product2,final_commands = self.compiler_helper.extract_variable_and_commands(input2, [])
-        product1,final_commands = self.compiler_helper.extract_variable_and_commands(input1, final_commands)
+        product1, commands1 = self.compiler_helper.extract_variable_and_commands(input1, [])
+        product2, commands2 = self.compiler_helper.extract_variable_and_commands(input2, [])
 
         isint1 = isinstance(product1, int)
         isint2 = isinstance(product2, int)
@@ -100,26 +138,39 @@ class Parser(Transformer):
                 case _:
                     raise ValueError(f"Cannot move an integer {product1} into an integer {product2} for this operand {op}")
 
+        final_commands, product1 = self.order_inputs(product1, commands1, product2, commands2, line)
+        need1 = self.compiler_helper.get_need(product1)
+        need2 = self.compiler_helper.get_need(product2)
+
         # getting if the variable is a register
         is_reg1 = isinstance(product1, str) and product1.startswith(register_id)
         is_reg2 = isinstance(product2, str) and product2.startswith(register_id)
-        return_var = ""
 
         match (is_reg1, is_reg2):
             case True, True: # both are registers
-                # free the unused register coming from the destination
-                self.compiler_helper.free_reg(int(product2[1:]))
                 final_commands.append(Command(op, product1, product2, line_num=line))
                 return_var = product1
-            case False, True: # right is register
-                # free the unused register coming from the destination
-                self.compiler_helper.free_reg(int(product2[1:]))
+                need = max(need1, need2) if need1 != need2 else need1 + 1
+            case False, True if op in self.commutative: # right is register, the inputs can be swapped
                 final_commands.append(Command(op, product2, product1, line_num=line))
                 return_var = product2
+                need = need2
+            case False, True if op == Operand.SUB: # right is register, a - R0 is computed as -R0 + a
+                final_commands.append(Command(Operand.NEG, product2, product2, line_num=line))
+                final_commands.append(Command(Operand.ADD, product2, product1, line_num=line))
+                return_var = product2
+                need = need2
+            case False, True: # right is register, the left has to be moved into its own register
+                temp_reg = self.compiler_helper.get_reg()
+                final_commands.append(Command(Operand.MOV, temp_reg, product1, line_num=line))
+                final_commands.append(Command(op, temp_reg, product2, line_num=line))
+                return_var = temp_reg
+                need = need2 + 1
             case True, False: # left is register
                 final_commands.append(Command(op, product1, product2, line_num=line))
                 return_var = product1
-            case False, False: # none is a register
+                need = need1
+            case _: # none is a register
                 # first get a temp register
                 # move the first product into the register
                 # then perform the operation on the second product
@@ -127,7 +178,9 @@ class Parser(Transformer):
                 final_commands.append(Command(Operand.MOV, temp_reg, product1, line_num=line))
                 final_commands.append(Command(op, temp_reg, product2, line_num=line))
                 return_var = temp_reg
+                need = 1
 
+        self.compiler_helper.register_need[return_var] = need
         return return_var, final_commands
 
     @v_args(meta=True)
@@ -179,12 +232,13 @@ class Parser(Transformer):
         Helps performs an operand on two inputs.
         Returns the list of commands plus the operand
         """
-        # separates the variable with the commands
-        product2, final_commands = self.compiler_helper.extract_variable_and_commands(input2, [])
-        product1, final_commands = self.compiler_helper.extract_variable_and_commands(input1, final_commands)
-        self.compiler_helper.free_all_reg()
+        # separates the variable with the commands, a compare can have calls on both sides that go in order
+        product1, commands1 = self.compiler_helper.extract_variable_and_commands(input1, [])
+        product2, commands2 = self.compiler_helper.extract_variable_and_commands(input2, [])
+        final_commands, product1 = self.order_inputs(product1, commands1, product2, commands2, line)
 
-        return final_commands + [Command(op, product1, product2, line_num=line)]
+        final_commands.append(Command(op, product1, product2, line_num=line))
+        return final_commands
 
     @v_args(meta=True)
     def assign_var(self, meta, items) -> list[Command]: # a = b
@@ -207,6 +261,14 @@ class Parser(Transformer):
         return self.process_assignment_operation(items[0], items[1], Operand.DIV, meta.line)
 
     # --- Comparison --------------------------
+    def compare_helper(self, input1, input2, jump: Operand, line: int) -> tuple[list[Command], tuple[None, None, Compare]]:
+        """
+        Compares the two inputs and appends the jump taken when the comparison is true
+        """
+        final_commands = self.process_assignment_operation(input1, input2, Operand.CMP, line)
+        final_commands.append(Command(jump, line_num=line))
+        return final_commands, (None, None, Compare.SIMPLE)
+
     @v_args(meta=True)
     def compare_equal(self, meta, items) -> tuple[list[Any], tuple[None, None, Compare]]:
         """
@@ -217,34 +279,36 @@ class Parser(Transformer):
         AND for things like a == b && a == b
         OR for things like a == b && a == b
         """
-        return self.process_assignment_operation(items[0], items[1], Operand.CMP, meta.line) + [Command(Operand.JEQ, line_num=meta.line)], (None, None, Compare.SIMPLE)
+        return self.compare_helper(items[0], items[1], Operand.JEQ, meta.line)
 
     @v_args(meta=True)
     def compare_not_equal(self, meta, items) -> tuple[list[Any], tuple[None, None, Compare]]:
-        return self.process_assignment_operation(items[0], items[1], Operand.CMP, meta.line) + [Command(Operand.JNE, line_num=meta.line)], (None, None, Compare.SIMPLE)
+        return self.compare_helper(items[0], items[1], Operand.JNE, meta.line)
 
     @v_args(meta=True)
     def compare_greater_equal(self, meta, items) -> tuple[list[Any], tuple[None, None, Compare]]:
-        return self.process_assignment_operation(items[0], items[1], Operand.CMP, meta.line) + [Command(Operand.JGE, line_num=meta.line)], (None, None, Compare.SIMPLE)
+        return self.compare_helper(items[0], items[1], Operand.JGE, meta.line)
 
     @v_args(meta=True)
     def compare_less_equal(self, meta, items) -> tuple[list[Any], tuple[None, None, Compare]]:
-        return self.process_assignment_operation(items[0], items[1], Operand.CMP, meta.line) + [Command(Operand.JLE, line_num=meta.line)], (None, None, Compare.SIMPLE)
+        return self.compare_helper(items[0], items[1], Operand.JLE, meta.line)
 
     @v_args(meta=True)
     def compare_greater(self, meta, items) -> tuple[list[Any], tuple[None, None, Compare]]:
-        return self.process_assignment_operation(items[0], items[1], Operand.CMP, meta.line) + [Command(Operand.JG, line_num=meta.line)], (None, None, Compare.SIMPLE)
+        return self.compare_helper(items[0], items[1], Operand.JG, meta.line)
 
     @v_args(meta=True)
     def compare_less(self, meta, items) -> tuple[list[Any], tuple[None, None, Compare]]:
-        return self.process_assignment_operation(items[0], items[1], Operand.CMP, meta.line) + [Command(Operand.JL, line_num=meta.line)], (None, None, Compare.SIMPLE)
+        return self.compare_helper(items[0], items[1], Operand.JL, meta.line)
 
     @v_args(meta=True)
     def zero_compare(self, meta, items) -> tuple[list[Any], tuple[None, None, Compare]]:
         """
         Computes the compare for a single operand. For example if (a + 5)
         """
-        return self.process_assignment_operation(items[0], 0, Operand.CMP, meta.line) + [Command(Operand.JNE)], (None, None, Compare.SIMPLE)
+        final_commands = self.process_assignment_operation(items[0], 0, Operand.CMP, meta.line)
+        final_commands.append(Command(Operand.JNE))
+        return final_commands, (None, None, Compare.SIMPLE)
 
     def and_compare(self, items: list[tuple[list[Command], tuple[int, int, Compare]]]) -> tuple[list[Command], tuple[int, int, Compare]]:
         """
@@ -260,7 +324,6 @@ class Parser(Transformer):
         true_label2 = items[1][1][1]
         type2 = items[1][1][2]
 
-        final_true = None
         # merges the two fail labels together
         final_fail = jump_manager.remove_duplicate(fail_label2, fail_label1)
 
@@ -276,10 +339,11 @@ class Parser(Transformer):
         if true_label1 is not None:
             block1.append(CommandLabel(true_label1))
 
-        if type1 != Compare.SIMPLE and type2 != Compare.SIMPLE:
-            final_true = true_label2
+        # the right side is true where the whole compare is, its true label goes on, a SIMPLE side has none
+        final_true = true_label2
 
-        return block1 + block2, (final_fail, final_true, Compare.LOGICAL_AND)
+        block1.extend(block2)
+        return block1, (final_fail, final_true, Compare.LOGICAL_AND)
 
     def or_compare(self, items: list[tuple[list[Command], tuple[int, int, Compare]]]) -> tuple[list[Command], tuple[int, int, Compare]]:
         """
@@ -313,10 +377,21 @@ class Parser(Transformer):
         if fail_label1 is not None:
             block1.append(CommandLabel(fail_label1))
 
-        return block1 + block2, (final_fail, final_true, Compare.LOGICAL_OR)
+        block1.extend(block2)
+        return block1, (final_fail, final_true, Compare.LOGICAL_OR)
 
     # --- loops declaration --------------------------
 
+    # the copies of a loop body that are tried, they have to divide the times the loop runs
+    unroll_copies = (2, 4, 8)
+    # every copy saves the CMP and jump of one test, and is guessed to take two words per command
+    _test_cycles = 4
+    _command_words = 2
+    # the loop goes on while the jump after CMP counter, limit is taken
+    _loop_jumps = {Operand.JL: lambda a, b: a < b, Operand.JLE: lambda a, b: a <= b,
+                   Operand.JG: lambda a, b: a > b, Operand.JGE: lambda a, b: a >= b,
+                   Operand.JEQ: lambda a, b: a == b, Operand.JNE: lambda a, b: a != b}
+
     def loop_helper(self, true_label, fail_label, condition_block, compare_type):
         """
         Performs logic for the three loop types
@@ -338,6 +413,86 @@ class Parser(Transformer):
 
         return true_label
 
+    def unroll_count(self, initialization: list, condition: tuple, increment: list, main_block: list) -> int:
+        """
+        returns how many copies of the body a for loop is laid out with, 1 keeps it as it is
+        a loop is only unrolled with a run profile, when the cycles of the tests it saves in the runs the profile
+        counted are more than the words the copies add
+        the times it runs also have to be known: the counter starts at a number, is compared with a number
+        and is changed by a number in the increment, and the body does not change it, has no labels or jumps
+        and calls nothing but the video functions
+        """
+        if self.run_profile is None or condition[1][2] != Compare.SIMPLE:
+            return 1
+        commands = self.nested_commands(main_block)
+        body_runs = self.run_profile.block_runs(commands)
+
+        match initialization, condition[0], increment:
+            case ([Command(operand=Operand.MOV, destination=str(counter), source=int(start))],
+                  [Command(operand=Operand.CMP, destination=str(compared), source=int(limit)), jump],
+                  [Command(operand=Operand.ADD | Operand.SUB as change, destination=str(changed), source=int(step))]
+                  ) if counter == compared == changed and jump.operand in self._loop_jumps:
+                pass
+            case _:
+                return 1
+
+        for cmd in commands:
+            if (cmd.destination == counter or cmd.operand.check_jump() or cmd.operand in (
+                    Operand.LABEL, Operand.RETURN_HELPER, Operand.INLINE_ASM) or cmd.operand == Operand.CALL_HELPER
+                    and cmd.call_label not in ("VID", "VID_RED", "VID_GREEN", "VID_BLUE", "VID_X", "VID_Y", "VIDEO")):
+                return 1
+
+        # runs the counter to find the times the loop runs, counters that leave the 15 bit range are left alone
+        step = step if change == Operand.ADD else -step
+        runs = 0
+        while self._loop_jumps[jump.operand](start, limit):
+            if not 0 <= start < 1 << 15 or runs > 1 << 15:
+                return 1
+            start += step
+            runs += 1
+        if not 0 <= start < 1 << 15:
+            return 1
+
+        best, best_gain = 1, 0
+        for copies in self.unroll_copies:
+            if runs < copies or runs % copies:
+                continue
+            gain = (body_runs - body_runs // copies) * self._test_cycles
+            gain -= (copies - 1) * (len(commands) + len(increment)) * self._command_words
+            if gain > best_gain:
+                best, best_gain = copies, gain
+        return best
+
+    @classmethod
+    def nested_commands(cls, items) -> list[Command]:
+        """
+        returns every command in the items and the commands computing their values, such as call arguments
+        """
+        commands: list[Command] = []
+        for item in items if isinstance(items, (list, tuple)) else (items,):
+            if isinstance(item, Command):
+                commands.append(item)
+                commands.extend(cls.nested_commands([item.destination, item.source]))
+            elif isinstance(item, (list, tuple)):
+                commands.extend(cls.nested_commands(item))
+        return commands
+
+    @classmethod
+    def copy_commands(cls, items):
+        """
+        returns a copy of the items with new commands, the passes after the parser change commands in place
+        """
+        if isinstance(items, list):
+            return [cls.copy_commands(item) for item in items]
+        if isinstance(items, tuple):
+            return tuple(cls.copy_commands(item) for item in items)
+        if isinstance(items, Command):
+            copy = Command(items.operand, cls.copy_commands(items.destination), cls.copy_commands(items.source),
+                           items.jump_label, line_num=items.line_num)
+            copy.call_label = items.call_label
+            return copy
+        return items
+
     def for_loop(self, items) -> list[Command]:
         """
         Manages the logic in the for loop
@@ -347,20 +502,35 @@ class Parser(Transformer):
         initialization = items[0]
         condition = items[1]
         increment = items[2]
-        main_block = self.flatten_command_list(items[3:])
         fail_label = condition[1][0]
         true_label = condition[1][1]
         compare_type = condition[1][2]
         condition_block = condition[0]
 
-        start_loop_label = jump_manager.get_jump()
+        main_block = self.flatten_command_list(items[3:])
+        copies = self.unroll_count(initialization, condition, increment, main_block)
 
         true_label = self.loop_helper(true_label, fail_label, condition_block, compare_type)
 
-        final_commands = (initialization + [CommandJump(start_loop_label), CommandLabel(true_label)] +
-                          main_block + increment + [CommandLabel(start_loop_label)] + condition_block)
-
-        return [CommandInnerStart()] + final_commands + [CommandInnerEnd()]
+        final_commands = [CommandInnerStart()]
+        final_commands.extend(initialization)
+        if copies > 1:
+            # the loop is known to run at least once, so the condition is only checked after the last copy
+            final_commands.append(CommandLabel(true_label))
+            final_commands.extend(main_block)
+            final_commands.extend(increment)
+            for _ in range(copies - 1):
+                final_commands.extend(self.copy_commands(main_block))
+                final_commands.extend(self.copy_commands(increment))
+        else:
+            start_loop_label = jump_manager.get_jump()
+            final_commands.extend((CommandJump(start_loop_label), CommandLabel(true_label)))
+            final_commands.extend(main_block)
+            final_commands.extend(increment)
+            final_commands.append(CommandLabel(start_loop_label))
+        final_commands.extend(condition_block)
+        final_commands.append(CommandInnerEnd())
+        return final_commands
 
     def while_loop(self, items) -> list[Command]:
         """
@@ -373,16 +543,17 @@ class Parser(Transformer):
         true_label = condition[1][1]
         compare_type = condition[1][2]
         condition_block = condition[0]
-        main_block = self.flatten_command_list(items[1:])
 
         start_loop_label = jump_manager.get_jump()
 
         true_label = self.loop_helper(true_label, fail_label, condition_block, compare_type)
 
-        final_commands = ([CommandJump(start_loop_label), CommandLabel(true_label)] + main_block  +
-                          [CommandLabel(start_loop_label)] + condition_block)
-
-        return [CommandInnerStart()] + final_commands + [CommandInnerEnd()]
+        final_commands = [CommandInnerStart(), CommandJump(start_loop_label), CommandLabel(true_label)]
+        self.flatten_command_list(items[1:], final_commands)
+        final_commands.append(CommandLabel(start_loop_label))
+        final_commands.extend(condition_block)
+        final_commands.append(CommandInnerEnd())
+        return final_commands
 
     def do_while_loop(self, items) -> list[Command]:
         """
@@ -395,12 +566,13 @@ class Parser(Transformer):
         true_label = condition[1][1]
         compare_type = condition[1][2]
         condition_block = condition[0]
-        main_block = self.flatten_command_list(items[:-1])
         true_label = self.loop_helper(true_label, fail_label, condition_block, compare_type)
 
-        final_commands = [CommandLabel(true_label)] + main_block + condition_block
-
-        return [CommandInnerStart()] + final_commands + [CommandInnerEnd()]
+        final_commands = [CommandInnerStart(), CommandLabel(true_label)]
+        self.flatten_command_list(items[:-1], final_commands)
+        final_commands.extend(condition_block)
+        final_commands.append(CommandInnerEnd())
+        return final_commands
 
     # --- if-else declaration --------------------------
     def if_helper(self, compare_type:int, fail_label: int, true_label:int, compare_block: list[Command], main_block: list[Command]) -> list[Command]:
@@ -420,12 +592,18 @@ class Parser(Transformer):
         if true_label is not None:
             compare_block.append(CommandLabel(true_label))
 
-        return [CommandInnerStart()] + compare_block + main_block + [CommandInnerEnd()]
+        final_commands = [CommandInnerStart()]
+        final_commands.extend(compare_block)
+        final_commands.extend(main_block)
+        final_commands.append(CommandInnerEnd())
+        return final_commands
 
     def else_statement(self, items: list[list[Command]]) -> tuple[list[Command]]:
         # else statement does not have any comparison, just return the main block
-        # returning a tuple to differentiate between the if and else statement later
-        return ([CommandInnerStart()] + self.flatten_command_list(items) + [CommandInnerEnd()],)
+        # returning a tuple to differentiate between the if and else statement later, True marks the else
+        final_commands = self.flatten_command_list(items, [CommandInnerStart()])
+        final_commands.append(CommandInnerEnd())
+        return final_commands, True
 
     def elif_statement(self, items) -> tuple[list[Command]]:
         """
@@ -438,7 +616,7 @@ class Parser(Transformer):
         elif_block = self.flatten_command_list(items[1:])
 
         # returning a tuple to differentiate between the if and else statement later
-        return (self.if_helper(elif_compare_type, elif_fail_label, elif_true_label, elif_compare, elif_block),)
+        return self.if_helper(elif_compare_type, elif_fail_label, elif_true_label, elif_compare, elif_block), False
 
     def if_statement(self, items) -> list[Command]:
         """
@@ -461,6 +639,11 @@ class Parser(Transformer):
         # flattens the if statement
         if_block = self.flatten_command_list(items[1:if_block_ends])
 
+        others = items[if_block_ends:]
+        if (self.run_profile is not None and if_compare_type == Compare.SIMPLE and len(others) == 1 and others[0][1]
+                and self.run_profile.block_runs(if_block) > self.run_profile.block_runs(others[0][0])):
+            return self.hot_if_last(if_compare, if_block, others[0][0])
+
         final_commands = self.if_helper(if_compare_type, if_fail_label, if_true_label, if_compare, if_block)
 
         final_jump_label = jump_manager.get_jump()
@@ -468,7 +651,8 @@ class Parser(Transformer):
 
         # computes the rest of the elif and else statements
         for item in items[if_block_ends:]:
-            final_commands.insert(-1, final_jump)
+            # the arm before jumps to the end before its fail label, where the next arm starts
+            final_commands.insert(-2, final_jump)
             final_commands.extend(item[0])
 
         # appends the final jump label
@@ -480,18 +664,138 @@ class Parser(Transformer):
 
         return final_commands
 
-    def flatten_command_list(self, list_of_lists):
+    @staticmethod
+    def hot_if_last(compare_block: list[Command], if_block: list[Command], else_block: list[Command]) -> list[Command]:
+        """
+        Lays out an if else whose if block ran more often in the profile with the if block last,
+        so it falls through to the end and the else block jumps over it
+        Overall structure:
+        compare jumping to the if block when true, else block, jump to the end, if block, end label
+        """
+        if_label = jump_manager.get_jump()
+        end_label = jump_manager.get_jump()
+        compare_block[-1].jump_label = if_label
+
+        final_commands = [CommandInnerStart()]
+        final_commands.extend(compare_block)
+        final_commands.extend(else_block)
+        final_commands.extend((CommandJump(end_label), CommandLabel(if_label)))
+        final_commands.extend(if_block)
+        final_commands.extend((CommandInnerEnd(), CommandLabel(end_label)))
+        return final_commands
+
+    def flatten_command_list(self, list_of_lists, result: list | None = None) -> list:
         """
-        Flattens out a list
+        Flattens out a list, appending into result so the nested lists are only copied once
         """
-        result = []
+        if result is None:
+            result = []
         for item in list_of_lists:
             if isinstance(item, list):
-                result.extend(self.flatten_command_list(item))
+                self.flatten_command_list(item, result)
             else:
                 result.append(item)
         return result
 
+    # --- inline assembly --------------------------
+
+    def asm_name(self, items) -> RegVar | str:
+        """
+        a register such as R0, bp or sp, anything else is a variable of the function
+        """
+        name: str = items[0]
+        if name.lower() in register_names:
+            return RegVar(register_names[name.lower()])
+        return name
+
+    def asm_negative(self, items) -> int:
+        return -items[0]
+
+    def asm_ram(self, items) -> RamVar:
+        """
+        ram relative to the base pointer: [bp] or [bp + 2]
+        """
+        if items[0].lower() != "bp":
+            raise ValueError(f"Ram in assembly is relative to the base pointer, [bp + n], not {items[0]}")
+        return RamVar(items[1] if len(items) > 1 else 0)
+
+    def asm_ram_negative(self, items) -> RamVar:
+        return RamVar(-self.asm_ram(items).val)
+
+    def asm_jump(self, items) -> str:
+        # variables cannot start with a dot so the label stays apart from them
+        return f".{items[0]}"
+
+    @v_args(meta=True)
+    def asm_label(self, meta, items) -> Command:
+        # the label gets its id in asm_block once every label of the block is known
+        return CommandLabel(items[0], line_num=meta.line)
+
+    @v_args(meta=True)
+    def asm_command(self, meta, items) -> Command:
+        """
+        An instruction of an asm block such as MOV, R0, a
+        the operand can be written as a form, MOV_L, but the form is picked again once the variables are allocated
+        """
+        op = Operand.__members__.get(items[0].upper())
+        if op is None or op.value > Operand.RTRN.value:
+            raise ValueError(f"Unknown operand {items[0]} in assembly on line {meta.line}")
+        arguments = items[1:]
+        labels = [argument for argument in arguments if isinstance(argument, str) and argument.startswith(".")]
+
+        if op.check_jump():
+            if len(arguments) != 1 or not labels:
+                raise ValueError(f"{op.name} takes a label such as .loop on line {meta.line}")
+            return Command(op, None, None, labels[0][1:], line_num=meta.line)
+
+        op = op.base()
+        if len(arguments) != op.argument_count() or labels:
+            raise ValueError(f"{op.name} takes {op.argument_count()} registers, variables or numbers on line {meta.line}")
+        if op.argument_count() == 2 and isinstance(arguments[0], int):
+            raise ValueError(f"{op.name} cannot write to the number {arguments[0]} on line {meta.line}")
+        return Command(op, *arguments, line_num=meta.line)
+
+    @v_args(meta=True)
+    def asm_block(self, meta, items: list[Command]) -> list[Command]:
+        """
+        Inline assembly: asm { MOV, R0, a  VID_X, R0  VID }
+        the labels of the block are its own, CALL can also go to a function
+        the block is kept in one INLINE_ASM command so the optimizer does not move or fold its commands
+        """
+        labels: dict[str, int] = dict()
+        for cmd in items:
+            if cmd.operand == Operand.LABEL:
+                if cmd.jump_label in labels:
+                    raise ValueError(f"The label .{cmd.jump_label} is already in the assembly on line {cmd.line_num}")
+                labels[cmd.jump_label] = jump_manager.get_jump()
+
+        for cmd in items:
+            if cmd.jump_label is None:
+                continue
+            if cmd.jump_label in labels:
+                cmd.jump_label = labels[cmd.jump_label]
+            elif cmd.operand == Operand.CALL:
+                cmd.jump_label = jump_manager.get_function(cmd.jump_label)
+            else:
+                raise ValueError(f"The label .{cmd.jump_label} is not in the assembly on line {cmd.line_num}")
+
+        return [Command(Operand.INLINE_ASM, None, items, line_num=meta.line)]
+
+    @staticmethod
+    def expand_inline_asm(commands: list[Command]) -> list[Command]:
+        """
+        puts the commands of the asm blocks in the place of their INLINE_ASM command
+        """
+        if all(cmd.operand != Operand.INLINE_ASM for cmd in commands):
+            return commands
+        final_commands: list[Command] = []
+        for cmd in commands:
+            if cmd.operand == Operand.INLINE_ASM:
+                final_commands.extend(cmd.source)
+            else:
+                final_commands.append(cmd)
+        return final_commands
+
     # --- function declaration --------------------------
     @v_args(meta=True)
     def function_declaration(self, meta, items) -> list[Command]:
@@ -533,31 +837,58 @@ class Parser(Transformer):
                        Command(Operand.MOV, base_pointer(), stack_pointer(), line_num=meta.line),  # starting function's frame
                        ]
 
-        if len(function_arguments) != 0:
-            final_block.append(Command(Operand.ADD, stack_pointer(), len(function_arguments), line_num=meta.line))
-
         # processing the data to ensure it is correct removing the tuples
         for i, arg in enumerate(main_block):
             if isinstance(arg, tuple):
                 main_block[i] = arg[1][0]
 
-        # computing the life and deaths of every variable in the function
-        variable_process.compute_lifetimes_list(main_block)
-
-        # sets the lifetime for each argument variable
-        # if the variable is not used it will die
-        for arg in function_arguments:
-            variable_process.compute_lifetimes(arg, -1)
-
-        # computing the variable to register/memory conversion
-        # in addition to the return and calling functionality
-        for i, item in enumerate(main_block, start=0):
-            if item.operand == Operand.INNER_START:
-                variable_process.inner_start()
-            elif item.operand == Operand.INNER_END:
-                variable_process.inner_end()
-            else:
-                final_block.extend(variable_process.allocate_command(item, i, function_name, item.line_num))
+        with self.profile.phase("optimize"):
+            # forwards the temporary memory into the variables they are moved to
+            main_block = Optimizer().propagate_copies(main_block)
+            # picks the real registers for the virtual registers
+            Optimizer().allocate_registers(main_block)
+
+        with self.profile.phase("allocate"):
+            # computing the life and deaths of every variable in the function
+            variable_process.compute_lifetimes_list(main_block)
+
+            # sets the lifetime for each argument variable
+            # if the variable is not used it will die
+            for arg in function_arguments:
+                variable_process.compute_lifetimes(arg, -1)
+
+            # computing the variable to register/memory conversion
+            # in addition to the return and calling functionality
+            for i, item in enumerate(main_block, start=0):
+                if item.operand == Operand.INNER_START:
+                    variable_process.inner_start()
+                elif item.operand == Operand.INNER_END:
+                    variable_process.inner_end()
+                else:
+                    variable_process.allocate_command(item, i, function_name, item.line_num, final_block)
+
+            # calls and the pushes of asm blocks go above the locals, so the stack pointer is moved past them
+            variable_process.place_call_slots()
+            if any(cmd.operand == Operand.CALL or cmd.operand == Operand.INLINE_ASM and any(
+                    inner.operand in (Operand.CALL, Operand.PUSH) for inner in cmd.source) for cmd in final_block):
+                final_block.insert(3, Command(Operand.ADD, stack_pointer(), variable_process.get_stack_pointer(),
+                                              line_num=meta.line))
+
+        with self.profile.phase("optimize"):
+            # reuses the values that are computed more than once in a basic block
+            final_block = Optimizer().number_values(final_block)
+            # picks the cheapest forms and keeps the most used variables in registers
+            # the caller reads the return values from the slots under the arguments
+            returns = frozenset(RamVar(offset) for offset in range(variable_process.stack_offset,
+                                                                   variable_process.return_offset))
+            final_block = Optimizer(self.run_profile).select_instructions(final_block, returns)
+            final_block = self.expand_inline_asm(final_block)
+
+        self.profile.count("functions")
+        self.profile.count("variables", variable_process.variable_count())
+        # the words of ram the function uses above its base pointer
+        self.profile.count("frame", max([var.val for cmd in final_block for var in (cmd.destination, cmd.source)
+                                         if isinstance(var, RamVar)] + [0]))
 
         # after the main function is called halt
         if function_name == "main":
@@ -600,6 +931,8 @@ class Parser(Transformer):
         a, b, c, d = 6, new_function(a,b), d
         case: functions returning multiple variables
         case: integers and variables
+        Every value is computed before any variable is assigned, so a, b = b, a swaps
+        the final moves are ordered as parallel moves
         """
         to_assign: list[str] = items[0]
         from_assign: list[int|str|tuple[str,list[Command]]] = items[1:]
@@ -609,27 +942,54 @@ class Parser(Transformer):
             raise SyntaxError(f"Too few arguments: {to_assign}")
         size_function: int = len(to_assign) - len(from_assign) +1
 
-        final_commands = []
+        # pairs the variables to assign with the value assigned to them
+        pairs: list[tuple[list[str], int|str|tuple[str,list[Command]]]] = []
         var_offset = 0
-        # index of the variable to assign
-
-        # loops through the assignments
         for i, assign in enumerate(from_assign):
-            match assign:
-                case int()| str(): # case for variables and integers
-                    final_commands.append(Command(Operand.MOV, to_assign[i + var_offset], assign, line_num=meta.line))
-                case tuple():
-                    if assign[0] == "": # case for functions
-                        assign[1][-1].destination = to_assign[i + var_offset: i + var_offset + size_function]
-                        # the first function will fill in the amount of arguments, the rest will take in one variable
-                        if size_function != 1:
-                            var_offset = size_function - 1
-                            size_function = 1
-                        final_commands.extend(assign[1])
-                    else: # case for variables with a list of commands
-                        final_commands.extend(assign[1])
-                        final_commands.append(Command(Operand.MOV, to_assign[i + var_offset], assign[0], line_num=meta.line))
+            if isinstance(assign, tuple) and assign[0] == "": # case for functions
+                pairs.append((to_assign[i + var_offset: i + var_offset + size_function], assign))
+                # the first function will fill in the amount of arguments, the rest will take in one variable
+                if size_function != 1:
+                    var_offset = size_function - 1
+                    size_function = 1
+            else:
+                pairs.append(([to_assign[i + var_offset]], assign))
+
+        final_commands = []
+        moves: list[tuple[str, int|str]] = []
 
+        # the values are computed in order, a call overwrites every register,
+        # so a value in a register is saved to temporary memory when a call comes after it
+        has_call = [isinstance(assign, tuple) and any(cmd.operand == Operand.CALL_HELPER for cmd in assign[1])
+                    for _, assign in pairs]
+        for index, (names, assign) in enumerate(pairs):
+            match assign:
+                case int() | str(): # case for variables and integers
+                    moves.append((names[0], assign))
+                case tuple() if assign[0] == "": # case for functions
+                    # a call returns straight into its variables unless another value still reads them
+                    read = self.compiler_helper.read_names([value for i, (_, value) in enumerate(pairs) if i != index])
+                    returns = []
+                    for name in names:
+                        if name in read:
+                            temp_name = self.compiler_helper.get_temp_ram()
+                            moves.append((name, temp_name))
+                            returns.append(temp_name)
+                        else:
+                            returns.append(name)
+                    assign[1][-1].destination = returns
+                    final_commands.extend(assign[1])
+                case tuple(): # case for variables with a list of commands
+                    final_commands.extend(assign[1])
+                    value = assign[0]
+                    if isinstance(value, str) and value.startswith(register_id) and any(has_call[index + 1:]):
+                        value = self.compiler_helper.get_temp_ram()
+                        final_commands.append(Command(Operand.MOV, value, assign[0], line_num=meta.line))
+                    moves.append((names[0], value))
+
+        scratch = self.compiler_helper.get_reg()
+        for dest, source in self.compiler_helper.order_parallel_moves(moves, scratch):
+            final_commands.append(Command(Operand.MOV, dest, source, line_num=meta.line))
 
         return final_commands
 
@@ -638,4 +998,4 @@ class Parser(Transformer):
         return items
 
     def start(self, items):
-        return [Command(Operand.JMP, None, None, jump_manager.get_function("main"))] + self.flatten_command_list(items)
\ No newline at end of file
+        return self.flatten_command_list(items, [Command(Operand.JMP, None, None, jump_manager.get_function("main"))])
\ No newline at end of file
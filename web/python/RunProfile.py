@@ -0,0 +1,52 @@
+import hashlib
+import json
+
+from Command import Command
+
+
+def program_digest(program: str) -> str:
+    """
+    returns a hash of the lines of the program, the line endings do not change it
+    """
+    return hashlib.sha256("\n".join(program.splitlines()).encode()).hexdigest()
+
+
+class RunProfile:
+    """
+    The times every line of a program ran, read from the program.profile an ExecutionProfile wrote
+    The compiler uses it in place of guessing from the loops around a command
+    A line that is not in the profile did not run
+    """
+
+    def __init__(self, executions: dict[int, int], program: str | None = None):
+        self.executions: dict[int, int] = executions  # key: line, value: times it ran
+        # the hash of the program the profile was made from
+        self.program: str | None = program
+
+    @classmethod
+    def loads(cls, text: str) -> "RunProfile":
+        data = json.loads(text)
+        if data.get("version") != 1:
+            raise ValueError(f"Cannot read version {data.get('version')} of the profile")
+        executions = {entry["line"]: entry.get("executions", entry["runs"])
+                      for entry in data["lines"] if entry["line"] is not None}
+        return cls(executions, data.get("program"))
+
+    def check(self, program: str) -> None:
+        """
+        raises if the profile was made from another version of the program, its lines would not match
+        """
+        if self.program is not None and self.program != program_digest(program):
+            raise ValueError("The profile was made from another version of the program, run it again")
+
+    def runs(self, line: int) -> int:
+        return self.executions.get(line, 0)
+
+    def block_runs(self, commands: list[Command]) -> int:
+        """
+        returns the times the block ran, the runs of the line of its first command
+        """
+        for cmd in commands:
+            if isinstance(cmd, Command) and cmd.line_num is not None and cmd.line_num > 0:
+                return self.runs(cmd.line_num)
+        return 0
@@ -1,4 +1,4 @@
-import heapq
+from typing import Any
 
 from Command import Command
 from Type import Operand
@@ -45,21 +45,29 @@ class CompileHelper:
     """
     Performs extra logic for the compiler
     Manages the registers, such as assigning, and removing them
+    The registers handed out are virtual, every one is new inside a statement
+    Optimizer.allocate_registers picks the real registers once the function is complete
     """
     def __init__(self):
-        self._dead_temp: list[int] = [0]
-        heapq.heapify(self._dead_temp)
-        # just a number to store a temp when calling a function
+        self._next_reg: int = 0
+        # the amount of registers needed to compute the value of a virtual register (Sethi-Ullman number)
+        self.register_need: dict[str, int] = dict()
+        # just a number to store a temp when calling a function, it is not reset between statements
+        # as the memory manager names the temps of nested calls once the whole function is parsed
         self.call_temp: int = 0
 
-    def free_reg(self, var: int):
-        heapq.heappush(self._dead_temp, var)
-
     def get_reg(self) -> str:
-        temp = heapq.heappop(self._dead_temp)
-        if not self._dead_temp:
-            heapq.heappush(self._dead_temp, temp + 1)
-        return f"{register_id}{temp}"
+        self._next_reg += 1
+        return f"{register_id}{self._next_reg - 1}"
+
+    def get_need(self, var: int | str) -> int:
+        """
+        returns the amount of registers needed to compute a variable
+        integers, variables and temps are used straight from the ram so they need none
+        """
+        if isinstance(var, str) and var.startswith(register_id):
+            return self.register_need.get(var, 1)
+        return 0
 
     def get_temp_ram(self) -> str:
         """
@@ -68,18 +76,61 @@ class CompileHelper:
         self.call_temp += 1
         return f"-{self.call_temp}-call temp"
 
-    def free_all_reg(self):
-        self.call_temp = 0
-
     def reset(self):
-        self._dead_temp: list[int] = [0]
-        heapq.heapify(self._dead_temp)
-        self.call_temp: int = 0
+        self._next_reg = 0
+        self.register_need.clear()
+
+    @staticmethod
+    def is_temp(var) -> bool:
+        """
+        checks if the variable is a temporary memory from get_temp_ram
+        """
+        return isinstance(var, str) and var.startswith("-")
+
+    @staticmethod
+    def read_names(item) -> set[str]:
+        """
+        Returns every variable name used by an item, including the arguments of calls
+        the item can be a variable, a tuple of variable and commands, a list or a command
+        """
+        match item:
+            case str():
+                return {item}
+            case tuple():
+                return CompileHelper.read_names(item[0]) | CompileHelper.read_names(item[1])
+            case list():
+                return set().union(*(CompileHelper.read_names(i) for i in item))
+            case Command():
+                return CompileHelper.read_names(item.source) | CompileHelper.read_names(item.destination)
+        return set()
+
+    @staticmethod
+    def order_parallel_moves(moves: list[tuple[Any, Any]], scratch) -> list[tuple[Any, Any]]:
+        """
+        Orders a group of moves that happen at the same time, for example a, b = b, a
+        a move is performed once no other waiting move still reads its destination
+        if every destination is still read the moves form a cycle,
+        the cycle is broken by saving one destination into the scratch
+        returns the list of (destination, source) in the order they are performed
+        """
+        pending = [(dest, source) for dest, source in moves if dest != source]
+        ordered: list[tuple[Any, Any]] = []
+        while pending:
+            for index, (dest, _) in enumerate(pending):
+                if all(source != dest for _, source in pending):
+                    ordered.append(pending.pop(index))
+                    break
+            else:
+                saved = pending[0][0]
+                ordered.append((scratch, saved))
+                pending = [(dest, scratch if source == saved else source) for dest, source in pending]
+        return ordered
 
     def extract_variable_and_commands(self, input1: int | str | tuple[str, list[Command]], commands: list[Command]) -> tuple[str | int, list[Command]]:
         """
         takes in two inputs of either integer, string or tuple of string and list commands
         combines the two inputs and returns a tuple of string and list commands
+        the list of the input is reused instead of copied, so it belongs to the result afterwards
         """
         if isinstance(input1, Command):
             raise ValueError("Command object cannot be used as input")
@@ -88,9 +139,12 @@ class CompileHelper:
                 temp_name = self.get_temp_ram()
                 input1 = (temp_name, input1[1])
                 input1[1][-1].destination = [temp_name]
-                commands = input1[1] + commands
-            else:
+                input1[1].extend(commands)
+                commands = input1[1]
+            elif commands:
                 commands.extend(input1[1])
+            else:
+                commands = input1[1]
             return input1[0], commands
         else:
             return input1, commands
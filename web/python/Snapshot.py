@@ -0,0 +1,124 @@
+import argparse
+import mmap
+import struct
+import sys
+from array import array
+from pathlib import Path
+
+from Emulator import Emulator
+from Framebuffer import Framebuffer
+
+# the file starts with the header padded to a page, then the ram, the framebuffer, the registers and the program,
+# every word little endian
+_MAGIC = b"16BITEMU"
+_VERSION = 1
+# magic, version, words of the program, pc, steps, cycles, stack peak, greater, equal, less, halted,
+# red, green, blue, x, y, pixels drawn, dirty region or -1
+_HEADER = struct.Struct("<8sIIQQQI????HHHHHQhhhh")
+_PAGE = 4096
+_RAM_WORDS = 0x10000
+_REGISTERS = 16
+
+
+def _layout(program_words: int) -> tuple[int, int, int, int, int]:
+    """
+    returns the offsets of the ram, the framebuffer, the registers and the program and the size of the file
+    """
+    ram = _PAGE
+    framebuffer = ram + 2 * _RAM_WORDS
+    registers = framebuffer + 2 * Framebuffer.size * Framebuffer.size
+    program = registers + 2 * _REGISTERS
+    return ram, framebuffer, registers, program, program + 2 * program_words
+
+
+def _words(values) -> bytes:
+    words = array("H", values)
+    if sys.byteorder == "big":
+        words.byteswap()
+    return words.tobytes()
+
+
+def save_snapshot(emulator: Emulator, path: str | Path) -> None:
+    """
+    writes the state of the emulator to the file, a snapshot of it can go on in any emulator class
+    """
+    framebuffer = emulator.framebuffer
+    dirty = framebuffer.dirty if framebuffer.dirty is not None else (-1, -1, -1, -1)
+    header = _HEADER.pack(_MAGIC, _VERSION, len(emulator.program), emulator.pc, emulator.steps, emulator.cycles,
+                          emulator.stack_peak, emulator.greater, emulator.equal, emulator.less, emulator.halted,
+                          *emulator.color, emulator.x, emulator.y, framebuffer.draws, *dirty)
+    path = Path(path)
+    temporary = path.with_name(path.name + ".tmp")
+    with open(temporary, "wb") as file:
+        file.write(header.ljust(_PAGE, b"\0"))
+        file.write(_words(emulator.ram))
+        file.write(_words(framebuffer.pixels))
+        file.write(_words(emulator.registers))
+        file.write(_words(emulator.program))
+    temporary.replace(path)
+
+
+def load_snapshot(path: str | Path, emulator_class: type[Emulator] = Emulator) -> Emulator:
+    """
+    returns an emulator in the state of the snapshot
+    The ram is a view of the file mapped copy on write, so loading it reads nothing until the program does,
+    the file is never written and any number of emulators can start from it at once
+    """
+    with open(path, "rb") as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+    if len(mapped) < _HEADER.size or mapped[:len(_MAGIC)] != _MAGIC:
+        raise ValueError(f"{path} is not a snapshot of the emulator")
+    (_, version, program_words, pc, steps, cycles, stack_peak, greater, equal, less, halted,
+     red, green, blue, x, y, draws, *dirty) = _HEADER.unpack_from(mapped)
+    if version != _VERSION:
+        raise ValueError(f"Cannot read version {version} of the snapshot")
+    ram_start, framebuffer_start, registers_start, program_start, size = _layout(program_words)
+    if len(mapped) != size:
+        raise ValueError(f"{path} is {len(mapped)} bytes, its header says {size}")
+
+    view = memoryview(mapped)
+
+    def words(start: int, end: int):
+        if sys.byteorder == "big":
+            copy = array("H", view[start:end].tobytes())
+            copy.byteswap()
+            return copy
+        return view[start:end].cast("H")
+
+    program = words(program_start, size)
+    emulator = emulator_class("".join(f"{word:04X}" for word in program))
+    emulator.ram = words(ram_start, framebuffer_start)
+    emulator.registers = list(words(registers_start, program_start))
+    emulator.framebuffer.pixels = array("H", words(framebuffer_start, registers_start))
+    emulator.framebuffer.draws = draws
+    emulator.framebuffer.dirty = None if dirty[0] < 0 else tuple(dirty)
+    emulator.pc, emulator.steps, emulator.cycles, emulator.stack_peak = pc, steps, cycles, stack_peak
+    emulator.greater, emulator.equal, emulator.less, emulator.halted = greater, equal, less, halted
+    emulator.color = [red, green, blue]
+    emulator.x, emulator.y = x, y
+    return emulator
+
+
+if __name__ == "__main__":
+    from BlockEmulator import BlockEmulator
+
+    arguments = argparse.ArgumentParser(description="Saves the state of a binary after some commands, "
+                                                    "or runs on from a saved state")
+    arguments.add_argument("file", nargs="?", default="../../program.bin",
+                           help="hex file to run, or a snapshot to run on from with --resume")
+    arguments.add_argument("--resume", action="store_true", help="the file is a snapshot")
+    arguments.add_argument("--max-steps", type=int, default=10_000_000, help="commands the program may run in total")
+    arguments.add_argument("--save", help="write the state to this snapshot when it stops")
+    options = arguments.parse_args()
+
+    if options.resume:
+        emulator = load_snapshot(options.file, BlockEmulator)
+    else:
+        emulator = BlockEmulator(Path(options.file).read_text().strip())
+    started = emulator.steps
+    halted = emulator.run(options.max_steps)
+    print(f"{'Halted' if halted else 'Stopped'} after {emulator.steps} commands and {emulator.cycles} cycles, "
+          f"{emulator.steps - started} of them in this run")
+    if options.save:
+        save_snapshot(emulator, options.save)
+        print(f"Saved the state to {options.save}")
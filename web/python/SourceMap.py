@@ -0,0 +1,170 @@
+import argparse
+import json
+from array import array
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+
+_BASE64 = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+_BASE64_VALUES = {char: value for value, char in enumerate(_BASE64)}
+
+
+def _encode_vlq(value: int, output: list[str]) -> None:
+    """
+    writes a signed number as base64 digits of 5 bits, the lowest bit of the first digit is the sign
+    the 6th bit of a digit says another digit follows, like the mappings of JavaScript source maps
+    """
+    value = (-value << 1) | 1 if value < 0 else value << 1
+    while True:
+        digit = value & 0x1F
+        value >>= 5
+        if value:
+            output.append(_BASE64[digit | 0x20])
+        else:
+            output.append(_BASE64[digit])
+            return
+
+
+def _decode_vlq(text: str) -> list[int]:
+    values: list[int] = []
+    value = shift = 0
+    for char in text:
+        digit = _BASE64_VALUES[char]
+        value += (digit & 0x1F) << shift
+        if digit & 0x20:
+            shift += 5
+            continue
+        values.append(-(value >> 1) if value & 1 else value >> 1)
+        value = shift = 0
+    if shift:
+        raise ValueError("The mappings end in the middle of a number")
+    return values
+
+
+class SourceMap:
+    """
+    Maps the words of a binary to the lines of program.asm and of the program they were compiled from
+    Every command in the binary has its first address, its assembly line and its source line,
+    sorted by address so every lookup is a binary search
+    It is saved next to program.bin as program.map, the differences between one command and the next
+    are written as base64 VLQ numbers, so straight code takes about 3 characters a command
+    """
+    version = 1
+
+    def __init__(self):
+        self.addresses: array = array("l")
+        self.asm_lines: array = array("l")
+        self.source_lines: array = array("l")
+        # the words of the whole binary, the last command ends here
+        self.words: int = 0
+        # the commands in the order of their source lines, made on the first lookup by source line
+        self._by_source: list[tuple[int, int]] | None = None
+
+    def __len__(self) -> int:
+        return len(self.addresses)
+
+    def add(self, address: int, asm_line: int, source_line: int, words: int) -> None:
+        """
+        adds the command at the address, the commands have to be added in the order of their addresses
+        """
+        self.addresses.append(address)
+        self.asm_lines.append(asm_line)
+        self.source_lines.append(source_line)
+        self.words = address + words
+        self._by_source = None
+
+    def find(self, address: int) -> int | None:
+        """
+        returns the index of the command the address is part of, None if it is outside the binary
+        """
+        if not 0 <= address < self.words:
+            return None
+        index = bisect_right(self.addresses, address) - 1
+        return index if index >= 0 else None
+
+    def command_range(self, index: int) -> tuple[int, int]:
+        """
+        returns the first address of the command and the address after it
+        """
+        end = self.addresses[index + 1] if index + 1 < len(self.addresses) else self.words
+        return self.addresses[index], end
+
+    def source_line(self, address: int) -> int | None:
+        index = self.find(address)
+        return None if index is None else self.source_lines[index]
+
+    def asm_line(self, address: int) -> int | None:
+        index = self.find(address)
+        return None if index is None else self.asm_lines[index]
+
+    def address_of_asm_line(self, asm_line: int) -> int | None:
+        """
+        returns the address of the command on the assembly line, None for labels and empty lines
+        """
+        index = bisect_left(self.asm_lines, asm_line)
+        if index < len(self.asm_lines) and self.asm_lines[index] == asm_line:
+            return self.addresses[index]
+        return None
+
+    def addresses_of_source_line(self, source_line: int) -> list[tuple[int, int]]:
+        """
+        returns the start and end address of every command compiled from the source line
+        """
+        if self._by_source is None:
+            self._by_source = sorted(zip(self.source_lines, range(len(self.addresses))))
+        first = bisect_left(self._by_source, (source_line, -1))
+        ranges: list[tuple[int, int]] = []
+        for line, index in self._by_source[first:]:
+            if line != source_line:
+                break
+            ranges.append(self.command_range(index))
+        return ranges
+
+    def dumps(self) -> str:
+        """
+        returns the map as json, the mappings hold the address, assembly line and source line differences
+        """
+        output: list[str] = []
+        last = (0, 0, 0)
+        for values in zip(self.addresses, self.asm_lines, self.source_lines):
+            for value, previous in zip(values, last):
+                _encode_vlq(value - previous, output)
+            last = values
+        return json.dumps({"version": self.version, "words": self.words, "mappings": "".join(output)})
+
+    @classmethod
+    def loads(cls, text: str) -> "SourceMap":
+        data = json.loads(text)
+        if data.get("version") != cls.version:
+            raise ValueError(f"Cannot read version {data.get('version')} of the source map")
+        values = _decode_vlq(data["mappings"])
+        if len(values) % 3:
+            raise ValueError("The mappings do not have three numbers for every command")
+
+        source_map = cls()
+        address = asm_line = source_line = 0
+        for index in range(0, len(values), 3):
+            address += values[index]
+            asm_line += values[index + 1]
+            source_line += values[index + 2]
+            source_map.addresses.append(address)
+            source_map.asm_lines.append(asm_line)
+            source_map.source_lines.append(source_line)
+        source_map.words = data["words"]
+        return source_map
+
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="Looks up addresses in a source map such as program.map")
+    arguments.add_argument("addresses", nargs="+", help="addresses in hex, 001A")
+    arguments.add_argument("--map", default="../../program.map", help="the source map to read")
+    options = arguments.parse_args()
+
+    source_map = SourceMap.loads(Path(options.map).read_text())
+    for text in options.addresses:
+        address = int(text, 16)
+        index = source_map.find(address)
+        if index is None:
+            print(f"{address:04X}: outside the binary")
+        else:
+            print(f"{address:04X}: assembly line {source_map.asm_lines[index]}, "
+                  f"source line {source_map.source_lines[index]}")
@@ -1,5 +1,7 @@
+import json
 from enum import Enum, auto, IntEnum
 from functools import partial
+from pathlib import Path
 
 class Operand(Enum):
     def _generate_next_value_(name, start, count, last_values):
@@ -133,6 +135,7 @@ class Operand(Enum):
     INNER_END = auto()
     RETURN_HELPER = auto()
     CALL_HELPER = auto()
+    INLINE_ASM = auto()  # the commands of an asm { } block, kept whole until the function is optimized
 
     def negate(self):
         if not self.check_jump():
@@ -154,39 +157,100 @@ class Operand(Enum):
         MOV_L = auto()  # move register, ram
         MOV_RI = auto()  # move ram, immediate
         """
-        if Operand.PUSH.value <= self.value <= Operand.VIDY_RR.value:
+        value = self._value_
+        if value in _one_values:
             match source:
                 case int():
                     return self
                 case RegVar():
-                    return Operand(self.value + 1)
+                    return _operands[value + 1]
                 case RamVar():
-                    return Operand(self.value + 2)
+                    return _operands[value + 2]
 
-        if not Operand.MOV.value <= self.value <= Operand.NOT_R.value:
+        if value not in _two_values:
             return self
 
         match (source, dest):
             case RegVar(), RegVar():
                 return self
             case RamVar(), RegVar():
-                return Operand(self.value + 1)
+                return _operands[value + 1]
             case RegVar(), int():
-                return Operand(self.value + 2)
+                return _operands[value + 2]
             case RegVar(), RamVar():
-                return Operand(self.value + 3)
+                return _operands[value + 3]
             case RamVar(), int():
-                return Operand(self.value + 4)
+                return _operands[value + 4]
             case RamVar(), RamVar():
-                return Operand(self.value + 5)
+                return _operands[value + 5]
+
+    def cost(self) -> tuple[int, int]:
+        """
+        Returns the words and clock cycles of a computed operand such as MOV_RR
+        the costs are worked out once by _cost
+        """
+        return _costs[self._value_]
+
+    def _cost(self) -> tuple[int, int]:
+        """
+        the words follow the forms, a ram variable or an immediate takes a word of its own
+        the cycles come from cycles.json, which CycleTable.py works out from the CLU_Helper_Categoriser
+        in 16bitcomputer.circ, the helpers are not part of the binary and cost nothing
+        """
+        if self.value > Operand.RTRN.value:
+            return 0, 0
+        if Operand.PUSH.value <= self.value <= Operand.VIDY_RR.value:
+            words = (2, 1, 2)[(self.value - Operand.PUSH.value) % 3]
+        elif Operand.MOV.value <= self.value <= Operand.NOT_RR.value:
+            words = (1, 2, 2, 2, 3, 3)[(self.value - Operand.MOV.value) % 6]
+        elif self.check_jump():
+            words = 2
+        else:
+            words = 1
+        return words, _cycles[self.name]
+
+    def base(self):
+        """
+        returns the operand a form was computed from, MOV_L -> MOV
+        """
+        value = self._value_
+        if value in _one_values:
+            return _operands[value - (value - Operand.PUSH.value) % 3]
+        if Operand.MOV.value <= value <= Operand.NOT_RR.value:
+            return _operands[value - (value - Operand.MOV.value) % 6]
+        return self
+
+    def argument_count(self) -> int:
+        """
+        returns how many destinations and sources the operand takes, jumps take their label instead
+        """
+        value = self._value_
+        if value in _one_values:
+            return 1
+        if Operand.MOV.value <= value <= Operand.NOT_RR.value:
+            return 2
+        return 0
 
     def check_jump(self):
-        return Operand.JMP.value <= self.value <= Operand.CALL.value
+        return self._value_ in _jump_values
 
     def check_arith(self):
-        return Operand.ADD.value <= self.value <= Operand.NOT_R.value
+        return self._value_ in _arith_values
+
+# reading Operand.X, .value or calling Operand(value) goes through the enum machinery,
+# these plain lookups are used instead where the optimizer and the encoder run per command
+_operands: tuple[Operand, ...] = tuple(Operand)
+_one_values = range(Operand.PUSH.value, Operand.VIDY_RR.value + 1)
+_two_values = range(Operand.MOV.value, Operand.NOT_R.value + 1)
+_arith_values = range(Operand.ADD.value, Operand.NOT_R.value + 1)
+_jump_values = range(Operand.JMP.value, Operand.CALL.value + 1)
+# the clock cycles of every operand, regenerate with python CycleTable.py when the circuit changes
+_cycles: dict[str, int] = json.loads(Path(__file__).with_name("cycles.json").read_text())["cycles"]
+_costs: tuple[tuple[int, int], ...] = tuple(operand._cost() for operand in _operands)
 
 class RamVar:
+    __slots__ = ("val",)
+
     def __init__(self, val: int) -> None:
         self.val: int = val
 
@@ -198,8 +262,18 @@ class RamVar:
         else:
             return f"[bp - {-self.val}]"
 
+    __repr__ = __str__
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, RamVar) and self.val == other.val
+
+    def __hash__(self) -> int:
+        return hash((RamVar, self.val))
+
 
 class RegVar:
+    __slots__ = ("val",)
+
     def __init__(self, val: int) -> None:
         self.val: int = val
 
@@ -214,6 +288,17 @@ class RegVar:
             case _:
                 return f"R{self.val}"
 
+    __repr__ = __str__
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, RegVar) and self.val == other.val
+
+    def __hash__(self) -> int:
+        return hash((RegVar, self.val))
+
+# the names a register can be written with in assembly, RegVar prints R14 and R15 as bp and sp
+register_names: dict[str, int] = {f"r{number}": number for number in range(16)} | {"bp": 14, "sp": 15, "re": 14, "rf": 15}
+
 base_pointer = partial(RegVar, 14)
 stack_pointer = partial(RegVar, 15)
 
@@ -0,0 +1,77 @@
+"""Generates GrammarParser.py, the parser of grammar.txt that needs no Lark.
+
+Lark builds the LALR tables of the grammar every time a parser is made, which takes longer than compiling
+most programs. This writes Lark's standalone parser with the tables of the two parsers the compiler uses
+already built, the one that builds the parse tree and the one that keeps every token for the inline transform.
+The compiler only needs Lark to run this, so the web page does not install it.
+
+Run it after changing grammar.txt, the compiler refuses a grammar that does not match GrammarParser.py.
+--check compares the hash of the grammar, Lark numbers the tables differently every run:
+    python build_parser.py
+    python build_parser.py --check
+"""
+import argparse
+import base64
+import hashlib
+import io
+import pickle
+import sys
+import zlib
+from pathlib import Path
+
+from lark import Lark
+from lark.grammar import Rule
+from lark.lexer import TerminalDef
+from lark.tools.standalone import gen_standalone
+
+PYTHON_DIR = Path(__file__).resolve().parent
+GRAMMAR = PYTHON_DIR / "grammar.txt"
+OUTPUT = PYTHON_DIR / "GrammarParser.py"
+
+
+def grammar_hash(grammar: str) -> str:
+    return hashlib.sha256(grammar.encode()).hexdigest()
+
+
+def standalone_parser(grammar: str) -> str:
+    """
+    returns the source of GrammarParser.py for the grammar
+    """
+    tree_parser = Lark(grammar, start='start', parser='lalr')
+    inline_parser = Lark(grammar, start='start', parser='lalr', keep_all_tokens=True)
+    source = io.StringIO()
+    source.write('"""The parser of grammar.txt, generated by build_parser.py, do not edit"""\n')
+    # the tables are pickled and compressed, python compiles a literal of them far slower than it unpickles them
+    gen_standalone(tree_parser, out=source, compress=True)
+    for name, value in zip(("INLINE_DATA", "INLINE_MEMO"), inline_parser.memo_serialize([TerminalDef, Rule])):
+        packed = base64.b64encode(zlib.compress(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)))
+        source.write(f"{name} = pickle.loads(zlib.decompress(base64.b64decode({packed!r})))\n")
+    source.write("\n")
+    source.write(f'GRAMMAR_SHA256 = "{grammar_hash(grammar)}"\n\n\n')
+    source.write('def load_parser(keep_all_tokens: bool = False, **kwargs) -> Lark:\n'
+                 '    """\n'
+                 '    returns the parser that builds the parse tree, or with keep_all_tokens the one that keeps every token\n'
+                 '    kwargs are the Lark options that can change when a parser is loaded, such as transformer\n'
+                 '    """\n'
+                 '    if keep_all_tokens:\n'
+                 '        return Lark._load_from_dict(INLINE_DATA, INLINE_MEMO, **kwargs)\n'
+                 '    return Lark_StandAlone(**kwargs)\n')
+    return source.getvalue()
+
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="Generates GrammarParser.py from grammar.txt")
+    arguments.add_argument("--grammar", default=str(GRAMMAR), help="the grammar to generate the parser of")
+    arguments.add_argument("--output", default=str(OUTPUT), help="the module to write")
+    arguments.add_argument("--check", action="store_true",
+                           help="only check that the module was generated from the grammar, exit 1 if not")
+    options = arguments.parse_args()
+
+    grammar = Path(options.grammar).read_text()
+    if options.check:
+        current = f'GRAMMAR_SHA256 = "{grammar_hash(grammar)}"' in Path(options.output).read_text()
+        print(f"{options.output} is {'up to date' if current else 'out of date'}")
+        sys.exit(0 if current else 1)
+
+    Path(options.output).write_text(standalone_parser(grammar))
+    print(f"Wrote {options.output}")
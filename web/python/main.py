@@ -1,16 +1,29 @@
+import argparse
 from pathlib import Path
 
+from CompileCache import CompileCache
+from CompileProfile import CompileProfile
 from Compiler import Compiler
+from LogisimImage import CIRCUIT, memory_image, patch_circuit, program_words
+from RunProfile import RunProfile
+from SourceMap import SourceMap
 
 
 class LocalInterface(Compiler):
-    def __init__(self):
+    def __init__(self, trace_memory: bool = False, cprofile_path: str | None = None, build_tree: bool = True,
+                 cache: CompileCache | None = None, run_profile: RunProfile | None = None,
+                 circ_path: str | None = None):
         super().__init__(self.get_grammar())
+        self.trace_memory = trace_memory
+        self.cprofile_path = cprofile_path
+        self.build_tree = build_tree
+        self.cache = cache
+        self.run_profile = run_profile
+        self.circ_path = circ_path
 
     def run(self):
         program: str = self.get_program()
-        (tree, assembly, binary, error, execution_time,
-         binary_to_assembly_mappings, code_mappings)  = self._main(program)
+        tree, assembly, binary, error, execution_time, source_map, profile = self._main(program)
 
         if tree:
             self.write_parse_tree(tree)
@@ -20,12 +33,14 @@ class LocalInterface(Compiler):
 
         if binary:
             self.write_binary(binary)
+            self.write_source_map(source_map)
 
         if error:
             self.write_error(error)
 
         if execution_time != 0:
             self.print_success(execution_time)
+            self.print_profile(profile)
 
     def get_grammar(self) -> str:
         grammar_file = Path('grammar.txt')
@@ -43,16 +58,49 @@ class LocalInterface(Compiler):
 
     def write_binary(self, binary_str: str) -> None:
         Path('../../program.bin').write_text(binary_str)
+        words = program_words(binary_str)
+        Path('../../program.img').write_text(memory_image(words))
+        if self.circ_path is not None:
+            patch_circuit(CIRCUIT, self.circ_path, words)
+
+    def write_source_map(self, source_map: SourceMap) -> None:
+        Path('../../program.map').write_text(source_map.dumps())
 
     def write_error(self, error_str: str) -> None:
         print(f"\033[31m{error_str}\033[0m")
         Path('../../program.error').write_text(error_str)
 
     def print_success(self, execution_time: float) -> None:
+        saved = "program.tre, program.asm" if self.build_tree else "program.asm"
         print(f"Program successfully compiled! Execution time: {execution_time:.6f} seconds!"
-              f"\nFiles saved to program.tre, program.asm and program.bin.")
+              f"\nFiles saved to {saved}, program.bin, program.img and program.map.")
+        if self.circ_path is not None:
+            print(f"The program is in the instruction memory of {self.circ_path}")
+
+    def print_profile(self, profile: CompileProfile) -> None:
+        print(profile)
+        if self.cprofile_path is not None:
+            print(f"cProfile stats saved to {self.cprofile_path}")
 
 
 if __name__ == "__main__":
-    test = LocalInterface()
+    arguments = argparse.ArgumentParser(description="Compiles ../examples/hello_world.txt")
+    arguments.add_argument("--memory", action="store_true", help="trace the memory peak of every phase")
+    arguments.add_argument("--cprofile", metavar="FILE", help="write the cProfile stats of the compile to FILE")
+    arguments.add_argument("--no-tree", action="store_true",
+                           help="skip program.tre and compile while parsing, which is faster and smaller")
+    arguments.add_argument("--no-cache", action="store_true", help="compile even if the program is cached")
+    arguments.add_argument("--cache-dir", metavar="DIR",
+                           help="where compiles are cached, $COMPILE_CACHE_DIR or ~/.cache/16bitcomputer by default")
+    arguments.add_argument("--cache-size", type=int, default=64, metavar="MIB",
+                           help="the most the cache may take before the least recently used compiles are removed")
+    arguments.add_argument("--profile-use", metavar="FILE",
+                           help="lay out the branches and pick the registers by a program.profile of the program")
+    arguments.add_argument("--circ", metavar="FILE",
+                           help="also write a copy of 16bitcomputer.circ with the program in its instruction memory")
+    options = arguments.parse_args()
+
+    run_profile = RunProfile.loads(Path(options.profile_use).read_text()) if options.profile_use else None
+    cache = None if options.no_cache else CompileCache(options.cache_dir, options.cache_size * 1024 * 1024)
+    test = LocalInterface(options.memory, options.cprofile, not options.no_tree, cache, run_profile, options.circ)
     test.run()
\ No newline at end of file
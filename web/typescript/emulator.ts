@@ -246,10 +246,12 @@ export class emulator{
     CALL(value:number){
         let sp = this.register.getRegItem(STACK_POINTER);
         this.ram[sp] = this.pc.count + 1;
+        this.register.add_stack_pt();
         this.pc.JMP(value);
     }
 
     RTRN(){
+        this.register.sub_stack_pt();
         let sp = this.register.getRegItem(STACK_POINTER);
         this.pc.JMP(this.ram[sp] as number);
     }